@@ -2,15 +2,23 @@
 import requests
 import sqlite3
 import re
-import json
 import ipaddress
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from page_assets import extract_page_assets
+from global_catalog import get_ntg_catalog, get_empty_ntg_catalog
+from keyword_matcher import KeywordMatcher
+from inline_scripts import analyze_inline_scripts, ensure_inline_script_table
+from content_pool import SCANNER_ANALYZER, submit_content_scan, completed_scan, content_scan_result
+from scan_metrics import ScanMetrics, ensure_scan_metrics_table, record_scan_metrics
+from app_logging import get_logger, ScanSummary
+from normalized_storage import ensure_normalized_storage, headers_json, insert_scan
 from datetime import datetime
 import pytz
 import time
 from typing import Dict, List, Optional, Tuple
 
+logger = get_logger(__name__)
+
 # Configuración de timezone para Chile
 CHILE_TZ = pytz.timezone('America/Santiago')
 
@@ -32,20 +40,28 @@ def format_chile_time(dt_obj=None, fmt='%Y-%m-%d %H:%M:%S'):
 
 # Import our advanced library detectors
 try:
-    from library_detector import LibraryDetector, detect_libraries_advanced
+    from library_detector import get_library_detector, detect_libraries_advanced
     ADVANCED_DETECTION_AVAILABLE = True
-    print("✅ Advanced library detection enabled")
+    logger.info("✅ Advanced library detection enabled")
 except ImportError:
-    print("⚠️ Advanced library detector not available, using basic detection")
+    logger.warning("⚠️ Advanced library detector not available, using basic detection")
     ADVANCED_DETECTION_AVAILABLE = False
 
+# Estado de vulnerabilidad de las librerías guardadas (libraries.is_vulnerable)
+try:
+    from vulnerability_evaluator import reevaluate_library_vulnerabilities
+    VULNERABILITY_EVALUATOR_AVAILABLE = True
+except ImportError:
+    logger.warning("⚠️ Vulnerability evaluator not available, libraries.is_vulnerable will not be set")
+    VULNERABILITY_EVALUATOR_AVAILABLE = False
+
 # Import enhanced content-based detection
 try:
     from library_signatures import detect_libraries_by_content, get_library_info
     CONTENT_DETECTION_AVAILABLE = True
-    print("✅ Content-based library detection enabled")
+    logger.info("✅ Content-based library detection enabled")
 except ImportError:
-    print("⚠️ Content-based detection not available")
+    logger.warning("⚠️ Content-based detection not available")
     CONTENT_DETECTION_AVAILABLE = False
 
 
@@ -53,16 +69,52 @@ except ImportError:
 try:
     from cdn_analyzer import analyze_cdn_url, get_cdn_recommendations, cdn_analyzer
     CDN_ANALYZER_AVAILABLE = True
-    print("✅ CDN dependency analyzer enabled")
-    print(f"🌐 CDN Analyzer supports {len(cdn_analyzer.get_supported_cdns())} CDN providers")
+    logger.info("✅ CDN dependency analyzer enabled (%d CDN providers)", len(cdn_analyzer.get_supported_cdns()))
 except ImportError:
-    print("⚠️ CDN analyzer not available")
+    logger.warning("⚠️ CDN analyzer not available")
     CDN_ANALYZER_AVAILABLE = False
 
+# Reglas de contexto: categoría -> (palabras clave, dónde buscarlas, librerías probables)
+CONTEXT_RULES = {
+    'analytics': (['analytics', 'estadisticas', 'stats', 'metrics'], ('url', 'text', 'title'),
+                  ['chart.js', 'd3', 'datatables', 'plotly']),
+    'media': (['gallery', 'galeria', 'prensa', 'photos', 'media'], ('url', 'text', 'title'),
+              ['lightbox', 'swiper', 'fancybox']),
+    'forms': (['form', 'formulario', 'contact', 'registro', 'login'], ('url', 'text'),
+              ['select2', 'datepicker', 'validation']),
+    'admin': (['admin', 'dashboard', 'panel', 'manage'], ('url', 'title'),
+              ['datatables', 'select2', 'chart.js']),
+    'ecommerce': (['shop', 'tienda', 'cart', 'carrito', 'buy', 'comprar'], ('url', 'text'),
+                  ['swiper', 'select2']),
+}
+
+# Indicios en el HTML de que una librería contextual podría estar en uso
+EVIDENCE_PATTERNS = {
+    'chart.js': ['canvas', 'chart', 'graph'],
+    'd3': ['svg', 'd3', 'visualization'],
+    'datatables': ['table', 'datatable', 'sorting'],
+    'lightbox': ['lightbox', 'gallery', 'popup'],
+    'swiper': ['slider', 'carousel', 'swiper'],
+    'select2': ['select', 'dropdown', 'chosen'],
+    'moment': ['date', 'time', 'calendar'],
+    'lodash': ['_', 'utility', 'helper'],
+    'font-awesome': ['fa-', 'icon', 'fas ', 'far ']
+}
+
+# El análisis contextual revisa solo el inicio de la página: costo acotado en páginas enormes
+CONTEXT_TEXT_SAMPLE_CHARS = 64 * 1024
+EVIDENCE_HTML_SAMPLE_CHARS = 256 * 1024
+
+CONTEXT_MATCHER = KeywordMatcher({category: rule[0] for category, rule in CONTEXT_RULES.items()})
+EVIDENCE_MATCHER = KeywordMatcher(EVIDENCE_PATTERNS)
+
 class LibraryAnalyzer:
-    def __init__(self, db_path="analysis.db"):
+    def __init__(self, db_path="analysis.db", init_db=True):
+        # init_db=False: solo análisis de contenido (workers de content_pool), sin tocar la base
         self.db_path = db_path
-        self.init_database()
+        self.ntg_catalog = None
+        if init_db:
+            self.init_database()
 
     def init_database(self):
         conn = sqlite3.connect(self.db_path)
@@ -73,30 +125,30 @@ class LibraryAnalyzer:
             cursor.execute("SELECT description FROM libraries LIMIT 1")
         except sqlite3.OperationalError:
             # Columns don't exist, need to add them
-            print("🔄 Migrating database: Adding new library management columns...")
+            logger.info("🔄 Migrating database: Adding new library management columns...")
             try:
                 cursor.execute("ALTER TABLE libraries ADD COLUMN description TEXT")
                 cursor.execute("ALTER TABLE libraries ADD COLUMN latest_safe_version TEXT")
                 cursor.execute("ALTER TABLE libraries ADD COLUMN latest_version TEXT")
                 cursor.execute("ALTER TABLE libraries ADD COLUMN is_manual INTEGER DEFAULT 0")
-                print("✅ Database migration completed successfully!")
+                logger.info("✅ Database migration completed successfully!")
             except sqlite3.OperationalError as e:
-                print(f"⚠️ Migration warning: {e}")
+                logger.warning("⚠️ Migration warning: %s", e)
                 # Columns might already exist, continue
 
         # Check for project_id and reviewed columns in scans table
         try:
             cursor.execute("SELECT project_id, reviewed FROM scans LIMIT 1")
         except sqlite3.OperationalError:
-            print("🔄 Migrating database: Adding new project and review columns to scans...")
+            logger.info("🔄 Migrating database: Adding new project and review columns to scans...")
             try:
                 cursor.execute("ALTER TABLE scans ADD COLUMN project_id INTEGER")
             except sqlite3.OperationalError as e:
-                print(f"⚠️ Migration warning: {e}")
+                logger.warning("⚠️ Migration warning: %s", e)
             try:
                 cursor.execute("ALTER TABLE scans ADD COLUMN reviewed INTEGER DEFAULT 0")
             except sqlite3.OperationalError as e:
-                print(f"⚠️ Migration warning: {e}")
+                logger.warning("⚠️ Migration warning: %s", e)
 
         conn.commit()
 
@@ -142,6 +194,12 @@ class LibraryAnalyzer:
         )
         ''')
 
+        # Resultados por hash de los bloques <script> inline ya analizados
+        ensure_inline_script_table(cursor)
+
+        # Tiempos por etapa de cada escaneo (/metrics y página de rendimiento)
+        ensure_scan_metrics_table(cursor)
+
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS file_urls (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,57 +212,54 @@ class LibraryAnalyzer:
         )
         ''')
 
+        # Diccionario de URLs y headers deduplicados (vistas con los nombres de siempre)
+        ensure_normalized_storage(conn)
+
         conn.commit()
         conn.close()
 
-    def detect_js_libraries(self, soup, base_url):
+    def detect_js_libraries(self, assets, base_url):
         libraries = []
 
         if ADVANCED_DETECTION_AVAILABLE:
             # Use advanced detection system
-            detector = LibraryDetector()
-
             # Get all script files
-            scripts = soup.find_all('script', src=True)
-            for script in scripts:
-                src = script.get('src')
-                if src:
-                    full_url = urljoin(base_url, src)
-                    filename = full_url.split('/')[-1]
-
-                    # Try to get file content for deeper analysis
-                    try:
-                        content = self._fetch_file_content(full_url, max_size=5120)  # 5KB limit
-                    except:
-                        content = None
-
-                    # Use advanced detection
-                    detections = detect_libraries_advanced(full_url, filename, content)
-
-                    for detection in detections:
-                        if detection['type'] == 'js':
-                            libraries.append({
-                                'name': detection['library_name'].title(),
-                                'version': detection['version'],
-                                'type': 'js',
-                                'source': full_url,
-                                'confidence': detection['confidence'],
-                                'detection_method': detection['detection_method']
-                            })
+            for src in assets.script_srcs:
+                full_url = urljoin(base_url, src)
+                filename = full_url.split('/')[-1]
+
+                # Try to get file content for deeper analysis
+                try:
+                    content = self._fetch_file_content(full_url, max_size=5120)  # 5KB limit
+                except:
+                    content = None
+
+                # Use advanced detection
+                detections = detect_libraries_advanced(full_url, filename, content)
+
+                for detection in detections:
+                    if detection['type'] == 'js':
+                        libraries.append({
+                            'name': detection['library_name'].title(),
+                            'version': detection['version'],
+                            'type': 'js',
+                            'source': full_url,
+                            'confidence': detection['confidence'],
+                            'detection_method': detection['detection_method']
+                        })
         else:
             # Fallback to basic detection
-            libraries = self._detect_js_libraries_basic(soup, base_url)
+            libraries = self._detect_js_libraries_basic(assets, base_url)
 
         return libraries
 
-    def _detect_js_libraries_basic(self, soup, base_url):
+    def _detect_js_libraries_basic(self, assets, base_url):
         """Método básico de detección (fallback)"""
         libraries = []
 
         # jQuery detection
-        jquery_scripts = soup.find_all('script', src=re.compile(r'jquery', re.I))
-        for script in jquery_scripts:
-            src = script.get('src', '')
+        jquery_scripts = assets.scripts_matching(re.compile(r'jquery', re.I))
+        for src in jquery_scripts:
             version_match = re.search(r'jquery[-.]?(\d+\.\d+\.\d+)', src, re.I)
             if version_match:
                 libraries.append({
@@ -217,9 +272,8 @@ class LibraryAnalyzer:
                 })
 
         # React detection
-        react_scripts = soup.find_all('script', src=re.compile(r'react', re.I))
-        for script in react_scripts:
-            src = script.get('src', '')
+        react_scripts = assets.scripts_matching(re.compile(r'react', re.I))
+        for src in react_scripts:
             version_match = re.search(r'react[-.]?(\d+\.\d+\.\d+)', src, re.I)
             if version_match:
                 libraries.append({
@@ -232,9 +286,8 @@ class LibraryAnalyzer:
                 })
 
         # Bootstrap JS detection
-        bootstrap_scripts = soup.find_all('script', src=re.compile(r'bootstrap', re.I))
-        for script in bootstrap_scripts:
-            src = script.get('src', '')
+        bootstrap_scripts = assets.scripts_matching(re.compile(r'bootstrap', re.I))
+        for src in bootstrap_scripts:
             version_match = re.search(r'bootstrap[-.]?(\d+\.\d+\.\d+)', src, re.I)
             if version_match:
                 libraries.append({
@@ -247,9 +300,8 @@ class LibraryAnalyzer:
                 })
 
         # NTG Custom Libraries detection
-        ntg_scripts = soup.find_all('script', src=re.compile(r'ntg_\w+\.js', re.I))
-        for script in ntg_scripts:
-            src = script.get('src', '')
+        ntg_scripts = assets.scripts_matching(re.compile(r'ntg_\w+\.js', re.I))
+        for src in ntg_scripts:
             # Extract library name from filename
             filename_match = re.search(r'(ntg_\w+)\.js', src, re.I)
             if filename_match:
@@ -310,18 +362,17 @@ class LibraryAnalyzer:
             pass
         return None
 
-    def detect_css_libraries(self, soup, base_url):
+    def detect_css_libraries(self, assets, base_url):
         """CSS library detection disabled - returning empty list"""
         return []
 
-    def _detect_css_libraries_basic(self, soup, base_url):
+    def _detect_css_libraries_basic(self, assets, base_url):
         """Método básico de detección CSS (fallback)"""
         libraries = []
 
         # Bootstrap CSS detection
-        bootstrap_links = soup.find_all('link', href=re.compile(r'bootstrap', re.I))
-        for link in bootstrap_links:
-            href = link.get('href', '')
+        bootstrap_links = assets.links_matching(re.compile(r'bootstrap', re.I))
+        for href in bootstrap_links:
             version_match = re.search(r'bootstrap[-.]?(\d+\.\d+\.\d+)', href, re.I)
             if version_match:
                 libraries.append({
@@ -334,9 +385,8 @@ class LibraryAnalyzer:
                 })
 
         # Font Awesome detection
-        fa_links = soup.find_all('link', href=re.compile(r'font-?awesome', re.I))
-        for link in fa_links:
-            href = link.get('href', '')
+        fa_links = assets.links_matching(re.compile(r'font-?awesome', re.I))
+        for href in fa_links:
             version_match = re.search(r'font-?awesome[-.]?(\d+\.\d+\.\d+)', href, re.I)
             if version_match:
                 libraries.append({
@@ -350,44 +400,29 @@ class LibraryAnalyzer:
 
         return libraries
 
-    def _enhance_with_contextual_detection(self, libraries, url, soup):
+    def _enhance_with_contextual_detection(self, libraries, url, assets):
         """
         Enhance detection with contextual information from URL and page content
         """
         try:
-            detector = LibraryDetector()
+            detector = get_library_detector()
             url_lower = url.lower()
 
             # Get probable libraries based on URL context
             contextual_libs = detector.detect_contextual_libraries(url)
 
-            # Analyze page content for additional context clues
-            page_text = soup.get_text().lower()
-            title = soup.find('title')
-            title_text = title.text.lower() if title else ''
+            # Una sola pasada por fuente (URL, título y muestra del texto visible)
+            matched_by_source = {
+                'url': CONTEXT_MATCHER.match(url_lower),
+                'title': CONTEXT_MATCHER.match(assets.title or ''),
+                'text': CONTEXT_MATCHER.match(assets.text, limit=CONTEXT_TEXT_SAMPLE_CHARS)
+            }
 
             # Context detection rules
             additional_context = []
-
-            # Analytics context
-            if any(word in url_lower or word in page_text or word in title_text for word in ['analytics', 'estadisticas', 'stats', 'metrics']):
-                additional_context.extend(['chart.js', 'd3', 'datatables', 'plotly'])
-
-            # Media/Gallery context
-            if any(word in url_lower or word in page_text or word in title_text for word in ['gallery', 'galeria', 'prensa', 'photos', 'media']):
-                additional_context.extend(['lightbox', 'swiper', 'fancybox'])
-
-            # Forms context
-            if any(word in url_lower or word in page_text for word in ['form', 'formulario', 'contact', 'registro', 'login']):
-                additional_context.extend(['select2', 'datepicker', 'validation'])
-
-            # Admin/Dashboard context
-            if any(word in url_lower or word in title_text for word in ['admin', 'dashboard', 'panel', 'manage']):
-                additional_context.extend(['datatables', 'select2', 'chart.js'])
-
-            # E-commerce context
-            if any(word in url_lower or word in page_text for word in ['shop', 'tienda', 'cart', 'carrito', 'buy', 'comprar']):
-                additional_context.extend(['swiper', 'select2'])
+            for category, (_, sources, context_libraries) in CONTEXT_RULES.items():
+                if any(category in matched_by_source[source] for source in sources):
+                    additional_context.extend(context_libraries)
 
             # Combine all contextual libraries
             all_contextual = list(set(contextual_libs + additional_context))
@@ -395,11 +430,14 @@ class LibraryAnalyzer:
             # Try to detect missing contextual libraries
             missing_libraries = []
             detected_lib_names = [lib['name'].lower() for lib in libraries]
+            page_evidence = None
 
             for context_lib in all_contextual:
                 if context_lib not in detected_lib_names and context_lib.replace('-', ' ').replace('.', ' ') not in ' '.join(detected_lib_names):
                     # Try to find evidence of this library in the page
-                    if self._find_library_evidence(context_lib, soup, url):
+                    if page_evidence is None:
+                        page_evidence = self._find_library_evidence(assets)
+                    if context_lib in page_evidence:
                         missing_libraries.append({
                             'name': context_lib.title(),
                             'version': 'unknown',
@@ -419,39 +457,20 @@ class LibraryAnalyzer:
             # Add missing contextual libraries
             enhanced_libraries = libraries + missing_libraries
 
-            print(f"  → Contextual analysis: Found {len(missing_libraries)} additional probable libraries")
+            logger.debug("  → Contextual analysis: Found %d additional probable libraries", len(missing_libraries))
 
             return enhanced_libraries
 
         except Exception as e:
-            print(f"  → Contextual analysis failed: {str(e)}")
+            logger.warning("  → Contextual analysis failed: %s", e)
             return libraries
 
-    def _find_library_evidence(self, library_name, soup, url):
+    def _find_library_evidence(self, assets):
         """
-        Find evidence that a library might be used on the page
+        Find evidence that contextual libraries might be used on the page.
+        Returns the set of library names with DOM elements or classes suggesting usage.
         """
-        evidence_patterns = {
-            'chart.js': ['canvas', 'chart', 'graph'],
-            'd3': ['svg', 'd3', 'visualization'],
-            'datatables': ['table', 'datatable', 'sorting'],
-            'lightbox': ['lightbox', 'gallery', 'popup'],
-            'swiper': ['slider', 'carousel', 'swiper'],
-            'select2': ['select', 'dropdown', 'chosen'],
-            'moment': ['date', 'time', 'calendar'],
-            'lodash': ['_', 'utility', 'helper'],
-            'font-awesome': ['fa-', 'icon', 'fas ', 'far ']
-        }
-
-        patterns = evidence_patterns.get(library_name, [])
-        page_content = str(soup).lower()
-
-        # Check for DOM elements or classes that suggest library usage
-        for pattern in patterns:
-            if pattern in page_content:
-                return True
-
-        return False
+        return EVIDENCE_MATCHER.match(assets.html, limit=EVIDENCE_HTML_SAMPLE_CHARS)
 
     def _get_library_type(self, library_name):
         """
@@ -460,10 +479,46 @@ class LibraryAnalyzer:
         css_libraries = ['bootstrap', 'font-awesome', 'bulma', 'foundation']
         return 'css' if library_name in css_libraries else 'js'
 
+    def submit_file_scan(self, file_url, file_type, scan_id, metrics=None):
+        """
+        Descarga el archivo (I/O, en este hilo) y envía su contenido a la etapa de CPU
+        (content_pool). Retorna un ContentScan; leer con content_scan_result()
+        """
+        metrics = metrics or ScanMetrics()
+        try:
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+
+            with metrics.stage('file_downloads'):
+                response = requests.get(file_url, headers=headers, timeout=10)
+            metrics.count('file_bytes', len(response.content))
+            if response.status_code != 200:
+                return completed_scan()
+        except Exception as e:
+            logger.warning("  ✗ Error scanning %s: %s", file_url, e)
+            return completed_scan()
+
+        return submit_content_scan(SCANNER_ANALYZER, response.content, response.encoding, file_url, file_type,
+                                   scan_id, ntg_catalog=self._get_ntg_catalog(),
+                                   local_scan=self.scan_content_for_versions)
+
     def scan_file_for_versions(self, file_url, file_type, scan_id):
         """
         Enhanced version scanning with multiple patterns and automatic library detection
         """
+        return content_scan_result(self.submit_file_scan(file_url, file_type, scan_id))
+
+    def scan_content_for_versions(self, content, file_url, file_type, scan_id, timings=None):
+        """
+        Busca cadenas de versión y librerías en contenido ya descargado
+        (archivos externos y bloques de scripts inline)
+
+        Args:
+            timings: dict opcional donde se acumulan los segundos de las etapas
+                'regex_scan' y 'content_signatures' (ver scan_metrics)
+        """
+        started = time.perf_counter()
         version_strings = []
         detected_libraries = []
 
@@ -505,125 +560,116 @@ class LibraryAnalyzer:
         ]
 
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-
-            response = requests.get(file_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                content = response.text
-                lines = content.split('\n')
-
-                for line_num, line in enumerate(lines, 1):
-                    # SOLO LA PRIMERA CADENA DE VERSIÓN POR ARCHIVO
-                    if file_url not in first_version_string_per_source:
-
-                        # MANTENER funcionalidad existente para compatibilidad
-                        if re.search(r'version', line, re.I):
-                            first_version_string_per_source[file_url] = {
-                                'scan_id': scan_id,
-                                'file_url': file_url,
-                                'file_type': file_type,
-                                'line_number': line_num,
-                                'line_content': line.strip()[:200],
-                                'version_keyword': 'version'
-                            }
-                            continue
-
-                        if re.search(r'versión', line, re.I):
-                            first_version_string_per_source[file_url] = {
-                                'scan_id': scan_id,
-                                'file_url': file_url,
-                                'file_type': file_type,
-                                'line_number': line_num,
-                                'line_content': line.strip()[:200],
-                                'version_keyword': 'versión'
-                            }
-                            continue
-
-                        # NUEVOS PATRONES: Buscar versiones específicas
-                        for pattern, pattern_type in VERSION_PATTERNS:
-                            matches = re.finditer(pattern, line, re.I)
-                            for match in matches:
-                                # Manejo especial para bibliotecas NTG
-                                if pattern_type == 'ntg_library':
-                                    library_filename = match.group(1)  # ntg_*.js
-                                    version_number = match.group(2)    # número de versión
-                                    library_name = library_filename.replace('.js', '')
-
-                                    # Agregar biblioteca NTG detectada automáticamente
-                                    if file_url not in first_library_per_source:
-                                        # Verificar si existe en bibliotecas globales para asociar
-                                        global_ntg_libs = self.get_ntg_global_libraries()
-                                        global_library_id = None
-                                        if library_name in global_ntg_libs:
-                                            global_library_id = global_ntg_libs[library_name]['id']
-
-                                        first_library_per_source[file_url] = {
-                                            'name': library_name,
-                                            'version': version_number,
-                                            'type': file_type,
-                                            'source': file_url,
-                                            'detection_method': 'ntg_pattern',
-                                            'confidence': 0.9,
-                                            'global_library_id': global_library_id
-                                        }
-
-                                    # Agregar cadena de versión con información completa
-                                    first_version_string_per_source[file_url] = {
-                                        'scan_id': scan_id,
-                                        'file_url': file_url,
-                                        'file_type': file_type,
-                                        'line_number': line_num,
-                                        'line_content': line.strip()[:200],
-                                        'version_keyword': f'{library_name}_v{version_number}'
-                                    }
-                                else:
-                                    # Procesamiento normal para otros patrones
-                                    version_number = match.group(1)
-
-                                    # Agregar PRIMERA cadena de versión por archivo
-                                    first_version_string_per_source[file_url] = {
-                                        'scan_id': scan_id,
-                                        'file_url': file_url,
-                                        'file_type': file_type,
-                                        'line_number': line_num,
-                                        'line_content': line.strip()[:200],
-                                        'version_keyword': pattern_type
-                                    }
-                                break  # Solo el primer match por patrón
-
-                            # Si ya encontramos una cadena de versión, salir del bucle de patrones
-                            if file_url in first_version_string_per_source:
-                                break
+            lines = content.split('\n')
 
-                    # Detectar biblioteca automáticamente - SOLO LA PRIMERA POR URL
-                    # (omitir bibliotecas NTG ya procesadas arriba)
-                    if file_url not in first_library_per_source:
-                        for pattern, pattern_type in VERSION_PATTERNS:
-                            # Saltar patrón NTG ya procesado
+            for line_num, line in enumerate(lines, 1):
+                # SOLO LA PRIMERA CADENA DE VERSIÓN POR ARCHIVO
+                if file_url not in first_version_string_per_source:
+
+                    # MANTENER funcionalidad existente para compatibilidad
+                    if re.search(r'version', line, re.I):
+                        first_version_string_per_source[file_url] = {
+                            'scan_id': scan_id,
+                            'file_url': file_url,
+                            'file_type': file_type,
+                            'line_number': line_num,
+                            'line_content': line.strip()[:200],
+                            'version_keyword': 'version'
+                        }
+                        continue
+
+                    if re.search(r'versión', line, re.I):
+                        first_version_string_per_source[file_url] = {
+                            'scan_id': scan_id,
+                            'file_url': file_url,
+                            'file_type': file_type,
+                            'line_number': line_num,
+                            'line_content': line.strip()[:200],
+                            'version_keyword': 'versión'
+                        }
+                        continue
+
+                    # NUEVOS PATRONES: Buscar versiones específicas
+                    for pattern, pattern_type in VERSION_PATTERNS:
+                        matches = re.finditer(pattern, line, re.I)
+                        for match in matches:
+                            # Manejo especial para bibliotecas NTG
                             if pattern_type == 'ntg_library':
-                                continue
+                                library_filename = match.group(1)  # ntg_*.js
+                                version_number = match.group(2)    # número de versión
+                                library_name = library_filename.replace('.js', '')
+
+                                # Agregar biblioteca NTG detectada automáticamente
+                                if file_url not in first_library_per_source:
+                                    # Verificar si existe en bibliotecas globales para asociar (índice en memoria)
+                                    global_lib = self._get_ntg_catalog().lookup(library_name)
+                                    global_library_id = global_lib['id'] if global_lib else None
 
-                            matches = re.finditer(pattern, line, re.I)
-                            for match in matches:
-                                version_number = match.group(1)
-                                library_name = self._extract_library_name_from_context(line, file_url, version_number)
-                                if library_name:
                                     first_library_per_source[file_url] = {
                                         'name': library_name,
                                         'version': version_number,
                                         'type': file_type,
                                         'source': file_url,
-                                        'detection_method': 'version_pattern',
-                                        'confidence': 0.6
+                                        'detection_method': 'ntg_pattern',
+                                        'confidence': 0.9,
+                                        'global_library_id': global_library_id
                                     }
-                                    break
-                            if file_url in first_library_per_source:
+
+                                # Agregar cadena de versión con información completa
+                                first_version_string_per_source[file_url] = {
+                                    'scan_id': scan_id,
+                                    'file_url': file_url,
+                                    'file_type': file_type,
+                                    'line_number': line_num,
+                                    'line_content': line.strip()[:200],
+                                    'version_keyword': f'{library_name}_v{version_number}'
+                                }
+                            else:
+                                # Procesamiento normal para otros patrones
+                                version_number = match.group(1)
+
+                                # Agregar PRIMERA cadena de versión por archivo
+                                first_version_string_per_source[file_url] = {
+                                    'scan_id': scan_id,
+                                    'file_url': file_url,
+                                    'file_type': file_type,
+                                    'line_number': line_num,
+                                    'line_content': line.strip()[:200],
+                                    'version_keyword': pattern_type
+                                }
+                            break  # Solo el primer match por patrón
+
+                        # Si ya encontramos una cadena de versión, salir del bucle de patrones
+                        if file_url in first_version_string_per_source:
+                            break
+
+                # Detectar biblioteca automáticamente - SOLO LA PRIMERA POR URL
+                # (omitir bibliotecas NTG ya procesadas arriba)
+                if file_url not in first_library_per_source:
+                    for pattern, pattern_type in VERSION_PATTERNS:
+                        # Saltar patrón NTG ya procesado
+                        if pattern_type == 'ntg_library':
+                            continue
+
+                        matches = re.finditer(pattern, line, re.I)
+                        for match in matches:
+                            version_number = match.group(1)
+                            library_name = self._extract_library_name_from_context(line, file_url, version_number)
+                            if library_name:
+                                first_library_per_source[file_url] = {
+                                    'name': library_name,
+                                    'version': version_number,
+                                    'type': file_type,
+                                    'source': file_url,
+                                    'detection_method': 'version_pattern',
+                                    'confidence': 0.6
+                                }
                                 break
+                        if file_url in first_library_per_source:
+                            break
 
         except Exception as e:
-            print(f"  ✗ Error scanning {file_url}: {str(e)}")
+            logger.warning("  ✗ Error scanning %s: %s", file_url, e)
 
         # 🆕 POST-PROCESAMIENTO NTG: Buscar bibliotecas NTG en archivos sin biblioteca detectada
         if content and file_url not in first_library_per_source:
@@ -631,6 +677,8 @@ class LibraryAnalyzer:
             if ntg_library:
                 first_library_per_source[file_url] = ntg_library
 
+        regex_done = time.perf_counter()
+
         # 🚀 NUEVA DETECCIÓN POR CONTENIDO: Análisis inteligente del código fuente
         if CONTENT_DETECTION_AVAILABLE and content and file_url not in first_library_per_source:
             content_detections = self._detect_libraries_by_content_analysis(
@@ -641,6 +689,10 @@ class LibraryAnalyzer:
                 best_detection = max(content_detections, key=lambda x: x['confidence'])
                 first_library_per_source[file_url] = best_detection
 
+        if timings is not None:
+            timings['regex_scan'] = timings.get('regex_scan', 0.0) + regex_done - started
+            timings['content_signatures'] = timings.get('content_signatures', 0.0) + time.perf_counter() - regex_done
+
         # Convertir diccionarios a listas - solo UNA entrada por archivo fuente
         version_strings = list(first_version_string_per_source.values())
         detected_libraries = list(first_library_per_source.values())
@@ -695,17 +747,14 @@ class LibraryAnalyzer:
         # Si no se encuentra, retornar nombre genérico
         return f"Biblioteca desconocida ({filename.split('.')[0]})" if '.' in filename else "Biblioteca desconocida"
 
-    def get_all_js_files(self, soup, base_url):
+    def get_all_js_files(self, assets, base_url):
         """Get all JavaScript files from the page (CSS files excluded)"""
         files = []
 
         # Get all script files
-        scripts = soup.find_all('script', src=True)
-        for script in scripts:
-            src = script.get('src')
-            if src:
-                full_url = urljoin(base_url, src)
-                files.append({'url': full_url, 'type': 'js'})
+        for src in assets.script_srcs:
+            full_url = urljoin(base_url, src)
+            files.append({'url': full_url, 'type': 'js'})
 
         return files
 
@@ -734,7 +783,7 @@ class LibraryAnalyzer:
                     file_size = int(content_length)
 
             except Exception as e:
-                print(f"  ! Could not get info for {file_url}: {str(e)}")
+                logger.debug("  ! Could not get info for %s: %s", file_url, e)
                 status_code = 0
 
             # Store file URL information
@@ -802,12 +851,17 @@ class LibraryAnalyzer:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
 
-            response = requests.get(url, headers=headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            metrics = ScanMetrics()
+            summary = ScanSummary(logger)
+            with metrics.stage('page_fetch'):
+                response = requests.get(url, headers=headers, timeout=10)
+            metrics.count('page_bytes', len(response.content))
+
+            with metrics.stage('html_parse'):
+                assets = extract_page_assets(response.content)
 
             # Get page title
-            title_tag = soup.find('title')
-            title = title_tag.text.strip() if title_tag else 'No title'
+            title = assets.title if assets.title is not None else 'No title'
 
             # Store scan info with improved connection handling
             conn = sqlite3.connect(self.db_path, timeout=30.0)
@@ -818,21 +872,17 @@ class LibraryAnalyzer:
             conn.execute('PRAGMA busy_timeout=30000')
             cursor = conn.cursor()
 
-            cursor.execute('''
-            INSERT INTO scans (url, scan_date, status_code, title, headers, project_id, reviewed)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (url, get_chile_time().strftime('%Y-%m-%d %H:%M:%S'), response.status_code, title, json.dumps(dict(response.headers)), None, 0))
-
-            scan_id = cursor.lastrowid
+            scan_id = insert_scan(cursor, url, response.status_code, title, headers_json(response.headers),
+                                  scan_date=get_chile_time().strftime('%Y-%m-%d %H:%M:%S'), project_id=None, reviewed=0)
 
             # Detect libraries with contextual enhancement (JavaScript only)
-            js_libraries = self.detect_js_libraries(soup, url)
+            js_libraries = self.detect_js_libraries(assets, url)
 
             all_libraries = js_libraries
 
             # Apply contextual detection enhancement
             if ADVANCED_DETECTION_AVAILABLE:
-                all_libraries = self._enhance_with_contextual_detection(all_libraries, url, soup)
+                all_libraries = self._enhance_with_contextual_detection(all_libraries, url, assets)
 
             # Store libraries (only if source_url is unique) with vulnerability analysis
             for lib in all_libraries:
@@ -845,36 +895,53 @@ class LibraryAnalyzer:
                     ''', (scan_id, lib['name'], lib['version'], lib['type'], source_url,
                           lib.get('global_library_id')))
                     
-                    print(f"  → Stored library: {lib['name']} v{lib['version']}")
+                    logger.debug("  → Stored library: %s v%s", lib['name'], lib['version'])
+                    summary.add('stored', lib['name'])
                 else:
-                    print(f"  → Skipped duplicate library: {lib['name']} (source already exists: {source_url})")
+                    logger.debug("  → Skipped duplicate library: %s (source already exists: %s)", lib['name'], source_url)
+                    summary.add('duplicate')
 
             # 🌐 ANÁLISIS CDN: Detectar dependencias de CDN y recomendaciones
             if CDN_ANALYZER_AVAILABLE:
-                cdn_analysis = self._analyze_cdn_dependencies(all_libraries)
+                with metrics.stage('cdn_lookups'):
+                    cdn_analysis = self._analyze_cdn_dependencies(all_libraries)
                 if cdn_analysis['cdn_libraries']:
-                    print(f"  🌐 CDN Analysis: {len(cdn_analysis['cdn_libraries'])} libraries from CDN")
-                    if cdn_analysis['outdated_count'] > 0:
-                        print(f"    ⚠️ {cdn_analysis['outdated_count']} outdated CDN libraries detected")
+                    summary.add('cdn', amount=len(cdn_analysis['cdn_libraries']))
+                    summary.add('cdn_outdated', amount=cdn_analysis['outdated_count'])
 
             # Get all JavaScript files
-            js_files = self.get_all_js_files(soup, url)
+            js_files = self.get_all_js_files(assets, url)
 
-            print(f"  → Found {len(js_files)} JavaScript files")
+            logger.debug("  → Found %d JavaScript files", len(js_files))
 
             # Store all file URLs with additional info using the same connection
-            print(f"  → Storing file URLs and getting file information...")
-            self.store_file_urls_with_info(js_files, scan_id, cursor)
+            with metrics.stage('head_requests'):
+                self.store_file_urls_with_info(js_files, scan_id, cursor)
+            metrics.count('head_requests', len(js_files))
+            metrics.count('files_count', len(js_files))
 
             # Scan files for version strings and detect libraries
             all_version_strings = []
             all_detected_libraries = []
-            print(f"  → Scanning all {len(js_files)} JavaScript files for version strings...")
-            for file_info in js_files:
-                version_strings, detected_libraries = self.scan_file_for_versions(file_info['url'], file_info['type'], scan_id)
+            # Cada archivo pasa al pool de CPU apenas se descarga, mientras se descarga el siguiente
+            pending_scans = [self.submit_file_scan(file_info['url'], file_info['type'], scan_id, metrics)
+                             for file_info in js_files]
+            for pending_scan in pending_scans:
+                version_strings, detected_libraries = content_scan_result(pending_scan, metrics)
                 all_version_strings.extend(version_strings)
                 all_detected_libraries.extend(detected_libraries)
 
+            # Scripts inline: los detectores solo corren sobre bloques no vistos antes (hash SHA-256)
+            inline_version_strings, inline_libraries, inline_stats = analyze_inline_scripts(
+                conn, scan_id, url, assets.inline_scripts, self.scan_content_for_versions)
+            all_version_strings.extend(inline_version_strings)
+            all_detected_libraries.extend(inline_libraries)
+            metrics.count('inline_cache_hits', inline_stats['reused'])
+            metrics.count('inline_cache_misses', inline_stats['analyzed'])
+            if inline_stats['blocks']:
+                logger.debug("  → Inline scripts: %d blocks (%d analyzed, %d cached)",
+                             inline_stats['blocks'], inline_stats['analyzed'], inline_stats['reused'])
+
             # Store version strings
             for vs in all_version_strings:
                 cursor.execute('''
@@ -892,17 +959,26 @@ class LibraryAnalyzer:
                     ''', (scan_id, lib['name'], lib['version'], lib['type'], source_url,
                           f"Detectada automáticamente por patrón de versión ({lib['detection_method']})", 0,
                           lib.get('global_library_id')))
-                    print(f"  → Stored auto-detected library: {lib['name']} from {source_url or 'No source'}")
+                    logger.debug("  → Stored auto-detected library: %s from %s", lib['name'], source_url or 'No source')
+                    summary.add('auto_detected', lib['name'])
                 else:
-                    print(f"  → Skipped duplicate auto-detected library: {lib['name']} (source already exists: {source_url})")
+                    logger.debug("  → Skipped duplicate auto-detected library: %s (source already exists: %s)", lib['name'], source_url)
+                    summary.add('duplicate')
 
-            conn.commit()
+            # is_vulnerable de las librerías del escaneo, en la misma transacción
+            if VULNERABILITY_EVALUATOR_AVAILABLE:
+                reevaluate_library_vulnerabilities(conn, scan_id=scan_id, commit=False)
+
+            with metrics.stage('db_commit'):
+                conn.commit()
+            record_scan_metrics(conn, scan_id, metrics)
 
-            print(f"✓ Analyzed {url} - Found {len(all_libraries)} libraries, {len(js_files)} files, {len(all_version_strings)} version strings, {len(all_detected_libraries)} auto-detected libraries")
+            summary.log("✓ Analyzed %s - %d files, %d version strings, %.1f s", url, len(js_files),
+                        len(all_version_strings), metrics.total_seconds)
             return True
 
         except Exception as e:
-            print(f"✗ Error analyzing {url}: {str(e)}")
+            logger.error("✗ Error analyzing %s: %s", url, e)
 
             # Store failed scan
             try:
@@ -912,10 +988,8 @@ class LibraryAnalyzer:
                     conn.execute('PRAGMA synchronous=FULL')
                     conn.execute('PRAGMA busy_timeout=30000')
                 cursor = conn.cursor()
-                cursor.execute('''
-                INSERT INTO scans (url, scan_date, status_code, title, headers, project_id, reviewed)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (url, get_chile_time().strftime('%Y-%m-%d %H:%M:%S'), 0, f"Error: {str(e)}", "{}", None, 0))
+                insert_scan(cursor, url, 0, f"Error: {str(e)}", "{}",
+                            scan_date=get_chile_time().strftime('%Y-%m-%d %H:%M:%S'), project_id=None, reviewed=0)
                 conn.commit()
             except:
                 pass  # If we can't store the error, just continue
@@ -926,54 +1000,43 @@ class LibraryAnalyzer:
                 conn.close()
 
     def analyze_urls(self, urls, delay=1):
-        print(f"Starting analysis of {len(urls)} URLs...")
+        logger.info("Starting analysis of %d URLs...", len(urls))
+        # El catálogo NTG se lee una vez por lote; los cambios posteriores aplican al siguiente
+        self.refresh_ntg_catalog()
 
         for i, url in enumerate(urls, 1):
-            print(f"[{i}/{len(urls)}] Analyzing: {url}")
+            logger.info("[%d/%d] Analyzing: %s", i, len(urls), url)
             self.analyze_url(url)
 
             if delay > 0:
                 time.sleep(delay)
 
-        print("Analysis completed!")
+        logger.info("Analysis completed!")
 
-    def get_ntg_global_libraries(self):
+    def refresh_ntg_catalog(self):
         """
-        Obtiene todas las bibliotecas globales que empiecen con 'ntg_'
-        Retorna diccionario {nombre_biblioteca: {id, data}}
+        Carga (o revalida) el índice en memoria de bibliotecas globales ntg_*.
+        Se llama una vez por lote de escaneos (analyze_urls); un analyze_url
+        suelto lo carga la primera vez que lo necesita. El loop por línea y los
+        workers de content_pool nunca tocan la base de datos por el catálogo.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # Buscar bibliotecas globales que empiecen con 'ntg_'
-            ntg_libraries = cursor.execute('''
-                SELECT id, library_name, type, latest_safe_version, latest_version, description
-                FROM global_libraries
-                WHERE library_name LIKE 'ntg_%'
-                ORDER BY library_name
-            ''').fetchall()
-
-            conn.close()
-
-            # Convertir a diccionario para búsqueda rápida
-            result = {}
-            for lib in ntg_libraries:
-                result[lib['library_name']] = {
-                    'id': lib['id'],
-                    'name': lib['library_name'],
-                    'type': lib['type'],
-                    'latest_safe_version': lib['latest_safe_version'],
-                    'latest_version': lib['latest_version'],
-                    'description': lib['description']
-                }
+            self.ntg_catalog = get_ntg_catalog(self.db_path)
+        except Exception as e:
+            logger.warning("  ✗ Error getting NTG global libraries: %s", e)
+        return self.ntg_catalog
 
-            return result
+    def _get_ntg_catalog(self):
+        if self.ntg_catalog is None:
+            self.refresh_ntg_catalog()
+        return self.ntg_catalog or get_empty_ntg_catalog()
 
-        except Exception as e:
-            print(f"  ✗ Error getting NTG global libraries: {str(e)}")
-            return {}
+    def get_ntg_global_libraries(self):
+        """
+        Obtiene todas las bibliotecas globales que empiecen con 'ntg_'
+        Retorna diccionario {nombre_biblioteca: {id, data}}
+        """
+        return self._get_ntg_catalog().as_dict()
 
     def search_ntg_hrodrigu_pattern(self, content, file_url):
         """
@@ -992,13 +1055,13 @@ class LibraryAnalyzer:
                     ntg_match = re.search(r'ntg_(\w+)', line_lower)
                     if ntg_match:
                         library_name = f"ntg_{ntg_match.group(1)}"
-                        print(f"  → Found NTG pattern: {library_name} with hrodrigu at line {line_num}")
+                        logger.debug("  → Found NTG pattern: %s with hrodrigu at line %d", library_name, line_num)
                         return library_name
 
             return None
 
         except Exception as e:
-            print(f"  ✗ Error searching NTG pattern in {file_url}: {str(e)}")
+            logger.warning("  ✗ Error searching NTG pattern in %s: %s", file_url, e)
             return None
 
     def post_process_ntg_libraries(self, file_url, file_type, scan_id, content, first_library_per_source):
@@ -1017,13 +1080,12 @@ class LibraryAnalyzer:
                 return None
 
             # Verificar si existe en bibliotecas globales
-            global_ntg_libs = self.get_ntg_global_libraries()
-            if ntg_name not in global_ntg_libs:
-                print(f"  → NTG library '{ntg_name}' not found in global catalog")
+            global_lib = self._get_ntg_catalog().lookup(ntg_name)
+            if global_lib is None:
+                logger.debug("  → NTG library '%s' not found in global catalog", ntg_name)
                 return None
 
             # Crear biblioteca con asociación global
-            global_lib = global_ntg_libs[ntg_name]
             detected_library = {
                 'name': ntg_name,
                 'version': 'unknown',  # Versión no disponible en este contexto
@@ -1034,11 +1096,11 @@ class LibraryAnalyzer:
                 'global_library_id': global_lib['id']
             }
 
-            print(f"  ✓ Auto-associated '{ntg_name}' with global library ID {global_lib['id']}")
+            logger.debug("  ✓ Auto-associated '%s' with global library ID %s", ntg_name, global_lib['id'])
             return detected_library
 
         except Exception as e:
-            print(f"  ✗ Error in NTG post-processing for {file_url}: {str(e)}")
+            logger.warning("  ✗ Error in NTG post-processing for %s: %s", file_url, e)
             return None
 
     def _detect_libraries_by_content_analysis(self, content, file_type, file_url, scan_id, version_strings_dict):
@@ -1082,12 +1144,13 @@ class LibraryAnalyzer:
                 
                 processed_detections.append(processed_detection)
                 
-                print(f"  🎯 Content analysis detected: {library_name} v{version} (confidence: {confidence:.1f}, matches: {detection.get('matches', 0)})")
+                logger.debug("  🎯 Content analysis detected: %s v%s (confidence: %.1f, matches: %d)",
+                             library_name, version, confidence, detection.get('matches', 0))
             
             return processed_detections
             
         except Exception as e:
-            print(f"  ⚠️ Error in content analysis for {file_url}: {str(e)}")
+            logger.warning("  ⚠️ Error in content analysis for %s: %s", file_url, e)
             return []
 
 
@@ -1114,7 +1177,8 @@ class LibraryAnalyzer:
                         
                         if cdn_analysis.get('is_outdated', False):
                             outdated_count += 1
-                            print(f"    📦 {lib['name']} v{lib['version']} → v{cdn_analysis.get('latest_version', 'unknown')} available")
+                            logger.debug("    📦 %s v%s → v%s available", lib['name'], lib['version'],
+                                         cdn_analysis.get('latest_version', 'unknown'))
             
             # Generar recomendaciones
             recommendations = []
@@ -1130,7 +1194,7 @@ class LibraryAnalyzer:
             }
             
         except Exception as e:
-            print(f"  ⚠️ Error in CDN analysis: {str(e)}")
+            logger.warning("  ⚠️ Error in CDN analysis: %s", e)
             return {'cdn_libraries': [], 'outdated_count': 0, 'recommendations': []}
 
 def main():
@@ -1141,7 +1205,7 @@ def main():
         with open('urls.txt', 'r') as f:
             urls = [line.strip() for line in f.readlines() if line.strip()]
     except FileNotFoundError:
-        print("urls.txt file not found. Creating sample file...")
+        logger.info("urls.txt file not found. Creating sample file...")
         sample_urls = [
             "https://getbootstrap.com",
             "https://jquery.com",
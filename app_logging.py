@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Logging con niveles y escritura asíncrona para el analizador y el dashboard
+
+Los módulos piden su logger con get_logger(__name__) y registran con niveles
+(debug para el detalle por fila, info para el resumen de cada escaneo, warning
+para errores recuperables). Todos cuelgan del logger 'js_analyzer', que tiene un
+único QueueHandler: el hilo del escaneo solo encola el registro y un
+QueueListener en segundo plano hace la escritura en stdout. Si la cola se llena
+el registro se descarta en vez de bloquear el escaneo.
+
+RateLimitFilter limita los mensajes repetidos (misma plantilla) por ventana de
+tiempo, y ScanSummary reemplaza las líneas por fila ("Stored library",
+"Skipped duplicate", ...) por una línea con contadores al final del escaneo.
+
+Configuración:
+    LOG_LEVEL=<nivel>          DEBUG, INFO (default), WARNING, ERROR; el mismo que usa gunicorn
+    LOG_FORMAT=<formato>       formato de logging (default: hora, nivel, módulo y mensaje)
+    LOG_QUEUE_SIZE=<n>         registros pendientes antes de descartar (default: 10000)
+    LOG_RATE_LIMIT=<n>         repeticiones de un mismo mensaje por ventana (default: 20; 0 desactiva)
+    LOG_RATE_WINDOW=<seg>      duración de la ventana (default: 10)
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+LOGGER_NAMESPACE = 'js_analyzer'
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', '%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', 20))
+LOG_RATE_WINDOW = float(os.environ.get('LOG_RATE_WINDOW', 10))
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Deja pasar como máximo `limit` registros por plantilla de mensaje cada
+    `window` segundos; el primero de la ventana siguiente indica cuántos se
+    omitieron. ERROR y CRITICAL nunca se limitan.
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, window: float = LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._windows: Dict[tuple, list] = {}  # (logger, plantilla) -> [inicio, emitidos, omitidos]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 2048:
+                    self._prune(now)
+            elif state[1] < self.limit:
+                state[1] += 1
+                return True
+            else:
+                state[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similares omitidos)"
+            record.args = None
+        return True
+
+    def _prune(self, now: float):
+        for key in [key for key, state in self._windows.items() if now - state[0] >= self.window]:
+            del self._windows[key]
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """StreamHandler sobre el sys.stdout vigente (respeta redirecciones posteriores)"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que nunca bloquea: descarta si la cola está llena y revive el listener tras un fork"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if _listener_pid != os.getpid():
+            _start_listener()
+        super().emit(record)
+
+
+_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+_setup_lock = threading.Lock()
+
+
+def _start_listener():
+    """Crea la cola y el hilo escritor de este proceso (los hilos no sobreviven a un fork)"""
+    global _listener, _listener_pid
+    with _setup_lock:
+        if _listener_pid == os.getpid():
+            return
+        output = _StdoutHandler()
+        output.setFormatter(logging.Formatter(LOG_FORMAT))
+        _handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def _stop_listener():
+    """Vacía la cola al terminar el proceso"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        if _handler.dropped:
+            sys.stdout.write(f"⚠️ Logging: {_handler.dropped} registros descartados (cola llena)\n")
+
+
+def configure_logging(level: Optional[str] = None):
+    """Configura el logger raíz de la aplicación (idempotente)"""
+    global _handler
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    if level:
+        root.setLevel(level.upper())
+    if _handler is not None:
+        return root
+    with _setup_lock:
+        if _handler is None:
+            _handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+            _handler.addFilter(RateLimitFilter())
+            root.setLevel((level or LOG_LEVEL).upper())
+            root.addHandler(_handler)
+            root.propagate = False
+            atexit.register(_stop_listener)
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger del módulo dentro del espacio 'js_analyzer' (ej. js_analyzer.analyzer)"""
+    configure_logging()
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name.rsplit('.', 1)[-1]}")
+
+
+def flush_logging():
+    """Espera a que el listener escriba lo encolado (CLI y pruebas)"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener.start()
+
+
+class ScanSummary:
+    """
+    Contadores de eventos de un escaneo: el detalle por fila va a DEBUG y al
+    final se registra una sola línea INFO con los totales
+    """
+
+    # Evento -> etiqueta en el resumen
+    LABELS = {
+        'stored': 'guardadas',
+        'duplicate': 'duplicadas omitidas',
+        'auto_detected': 'auto-detectadas',
+        'cdn': 'desde CDN',
+        'cdn_outdated': 'CDN desactualizadas',
+        'file_error': 'archivos con error',
+    }
+    SAMPLES = 3
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.counts = Counter()
+        self.samples: Dict[str, List[str]] = {}
+
+    def add(self, event: str, detail: Optional[str] = None, amount: int = 1):
+        self.counts[event] += amount
+        if detail is not None:
+            samples = self.samples.setdefault(event, [])
+            if len(samples) < self.SAMPLES:
+                samples.append(detail)
+
+    def format(self) -> str:
+        parts = []
+        for event, count in self.counts.items():
+            if not count:
+                continue
+            part = f"{count} {self.LABELS.get(event, event)}"
+            samples = self.samples.get(event)
+            if samples:
+                part += f" ({', '.join(samples)}{', …' if count > len(samples) else ''})"
+            parts.append(part)
+        return ', '.join(parts)
+
+    def log(self, message: str, *args, level: int = logging.INFO):
+        summary = self.format()
+        if summary:
+            self.logger.log(level, f"{message} | librerías: %s", *args, summary)
+        else:
+            self.logger.log(level, message, *args)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Respaldos en línea de analysis.db con la API de backup de SQLite
+
+Copiar el archivo mientras hay escritores en modo WAL produce una copia
+inconsistente, sin las páginas que aún están en el WAL, y mantiene una lectura
+abierta que impide los checkpoints durante toda la descarga. Aquí la copia se
+hace con sqlite3.Connection.backup por tramos de BACKUP_STEP_PAGES páginas, con
+una pausa entre tramos para no frenar a los escritores (ver snapshot()); el resultado es una
+instantánea consistente en un archivo temporal, que luego se transmite o se
+comprime sin tocar la base en uso.
+
+  - /export/db:        instantánea descargable (?compress=gzip la comprime
+                       mientras se transmite)
+  - respaldos programados (start_backup_worker, BACKUP_INTERVAL_HOURS):
+        analysis-<cadena>-full.db.gz                 respaldo completo
+        analysis-<cadena>-incr-<n>-<fecha>.delta.gz  solo las páginas que
+                                                     cambiaron desde el anterior
+    Cada BACKUP_FULL_EVERY incrementales se inicia una cadena nueva y se
+    conservan las últimas BACKUP_KEEP_CHAINS cadenas.
+
+Configuración:
+    BACKUP_DIR=data/backups
+    BACKUP_INTERVAL_HOURS=0      cada cuánto se respalda en segundo plano (0 desactiva)
+    BACKUP_FULL_EVERY=24         incrementales por cadena
+    BACKUP_KEEP_CHAINS=7
+    BACKUP_STEP_PAGES=256        páginas por tramo de la API de backup
+
+Uso:
+    python backup.py snapshot destino.db [--gzip]
+    python backup.py run                    # un respaldo programado (completo o incremental)
+    python backup.py list
+    python backup.py restore <archivo .db.gz|.delta.gz> destino.db
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join('data', 'backups'))
+BACKUP_INTERVAL_HOURS = float(os.environ.get('BACKUP_INTERVAL_HOURS', '0'))
+BACKUP_FULL_EVERY = int(os.environ.get('BACKUP_FULL_EVERY', '24'))
+BACKUP_KEEP_CHAINS = int(os.environ.get('BACKUP_KEEP_CHAINS', '7'))
+BACKUP_STEP_PAGES = int(os.environ.get('BACKUP_STEP_PAGES', '256'))
+
+# Pausa entre tramos de la copia (segundos): los escritores toman el lock entre medio
+STEP_PAUSE_SECONDS = 0.005
+
+# Cada cuánto revisa el hilo si toca respaldar (los workers se reciclan, el intervalo no)
+SCHEDULE_CHECK_SECONDS = 300
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+DELTA_FORMAT = 1
+STATE_FILE = 'state.json'
+LOCK_FILE = '.lock'
+
+
+# --- Instantánea -------------------------------------------------------------
+
+def snapshot(source_path: str, dest_path: str, step_pages: int = BACKUP_STEP_PAGES,
+             pause: float = STEP_PAUSE_SECONDS) -> Dict:
+    """
+    Copia consistente de source_path en dest_path con la API de backup
+
+    En modo WAL la conexión de origen mantiene abierta una transacción de
+    lectura durante todos los tramos: cada tramo lee la misma instantánea y los
+    escritores siguen confirmando en el WAL. Sin esa transacción, SQLite
+    reiniciaría la copia con cada escritura de otra conexión y con escrituras
+    continuas no terminaría nunca. En modo rollback la lectura bloquearía a los
+    escritores, así que se copia tramo a tramo (con reinicios si hay escrituras).
+    Retorna {'pages', 'steps', 'seconds'}.
+    """
+    stats = {'pages': 0, 'steps': 0}
+
+    def progress(status, remaining, total):
+        stats['pages'] = total
+        stats['steps'] += 1
+        if remaining and pause:
+            time.sleep(pause)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(source_path, timeout=60.0, isolation_level=None)
+    dest = sqlite3.connect(dest_path)
+    try:
+        wal = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+        if wal:
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(dest, pages=step_pages, progress=progress)
+        if wal:
+            source.execute('COMMIT')
+        # Un archivo autocontenido: sin WAL al lado
+        dest.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        dest.close()
+        source.close()
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def create_snapshot(source_path: str = 'analysis.db', directory: Optional[str] = None) -> str:
+    """Instantánea en un archivo temporal; quien la usa debe borrarla"""
+    handle, path = tempfile.mkstemp(prefix='analysis-snapshot-', suffix='.db', dir=directory)
+    os.close(handle)
+    try:
+        stats = snapshot(source_path, path)
+    except Exception:
+        os.remove(path)
+        raise
+    logger.debug("Snapshot of %s: %d pages in %d steps (%.2f s)", source_path, stats['pages'], stats['steps'],
+                 stats['seconds'])
+    return path
+
+
+def stream_file(path: str, compress: bool = False, remove: bool = False,
+                chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Lee el archivo por bloques, opcionalmente comprimido en gzip al vuelo"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                    if not chunk:
+                        continue
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        if remove:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# --- Respaldos programados ---------------------------------------------------
+
+def _page_digests(path: str, page_size: int) -> List[bytes]:
+    digests = []
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return digests
+            digests.append(hashlib.blake2b(page, digest_size=16).digest())
+
+
+def _read_digests(path: str) -> List[bytes]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [data[offset:offset + 16] for offset in range(0, len(data), 16)]
+
+
+def _write_atomic(path: str, data: bytes):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _load_state(backup_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(backup_dir, STATE_FILE), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = [state.get('full'), state.get('digests')]
+    if not all(name and os.path.exists(os.path.join(backup_dir, name)) for name in files):
+        return None
+    return state
+
+
+def _write_full(snapshot_path: str, backup_dir: str, chain: str) -> str:
+    name = f'analysis-{chain}-full.db.gz'
+    temporary = os.path.join(backup_dir, f'{name}.tmp')
+    with open(temporary, 'wb') as out:
+        for chunk in stream_file(snapshot_path, compress=True):
+            out.write(chunk)
+    os.replace(temporary, os.path.join(backup_dir, name))
+    return name
+
+
+def _write_delta(snapshot_path: str, backup_dir: str, state: Dict, digests: List[bytes],
+                 previous: List[bytes], stamp: str) -> Tuple[str, int]:
+    page_size = state['page_size']
+    changed = [number for number, digest in enumerate(digests)
+               if number >= len(previous) or previous[number] != digest]
+    sequence = state['sequence'] + 1
+    name = f"analysis-{state['chain']}-incr-{sequence:04d}-{stamp}.delta.gz"
+    header = {'format': DELTA_FORMAT, 'chain': state['chain'], 'sequence': sequence,
+              'page_size': page_size, 'page_count': len(digests), 'pages': len(changed)}
+    temporary = os.path.join(backup_dir, f'{name}.tmp')
+    with open(snapshot_path, 'rb') as source, gzip.open(temporary, 'wb', compresslevel=6) as out:
+        out.write(json.dumps(header).encode('utf-8') + b'\n')
+        for number in changed:
+            source.seek(number * page_size)
+            out.write(struct.pack('>I', number) + source.read(page_size))
+    os.replace(temporary, os.path.join(backup_dir, name))
+    return name, len(changed)
+
+
+def _chains(backup_dir: str) -> Dict[str, List[str]]:
+    """{cadena: [archivos]} de los respaldos en backup_dir (cadena = fecha del completo)"""
+    chains = {}
+    for name in sorted(os.listdir(backup_dir)):
+        if name.startswith('analysis-') and name.endswith(('-full.db.gz', '.delta.gz')):
+            chain = name[len('analysis-'):].split('-full')[0].split('-incr')[0]
+            chains.setdefault(chain, []).append(name)
+    return chains
+
+
+def rotate(backup_dir: str = BACKUP_DIR, keep_chains: int = BACKUP_KEEP_CHAINS) -> int:
+    """Borra las cadenas más antiguas; retorna la cantidad de archivos eliminados"""
+    chains = _chains(backup_dir)
+    removed = 0
+    for chain in sorted(chains)[:-keep_chains] if keep_chains > 0 else []:
+        for name in chains[chain]:
+            os.remove(os.path.join(backup_dir, name))
+            removed += 1
+        digests = os.path.join(backup_dir, f'analysis-{chain}.pages')
+        if os.path.exists(digests):
+            os.remove(digests)
+    return removed
+
+
+def run_backup(source_path: str = 'analysis.db', backup_dir: str = BACKUP_DIR,
+               full_every: int = BACKUP_FULL_EVERY, keep_chains: int = BACKUP_KEEP_CHAINS) -> Optional[Dict]:
+    """
+    Respaldo programado: completo al iniciar cadena, si no solo las páginas cambiadas
+
+    Retorna {'file', 'kind', 'pages', 'bytes', 'removed'} o None si otro proceso
+    está respaldando.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, LOCK_FILE), 'w') as lock:
+        if FCNTL_AVAILABLE:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        snapshot_path = create_snapshot(source_path, directory=backup_dir)
+        try:
+            conn = sqlite3.connect(snapshot_path)
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            conn.close()
+            digests = _page_digests(snapshot_path, page_size)
+
+            state = _load_state(backup_dir)
+            if state is None or state['sequence'] >= full_every or state['page_size'] != page_size:
+                state = {'chain': stamp, 'sequence': 0, 'page_size': page_size,
+                         'full': _write_full(snapshot_path, backup_dir, stamp),
+                         'digests': f'analysis-{stamp}.pages'}
+                name, kind, pages = state['full'], 'full', len(digests)
+            else:
+                previous = _read_digests(os.path.join(backup_dir, state['digests']))
+                name, pages = _write_delta(snapshot_path, backup_dir, state, digests, previous, stamp)
+                kind = 'incremental'
+                state['sequence'] += 1
+
+            _write_atomic(os.path.join(backup_dir, state['digests']), b''.join(digests))
+            _write_atomic(os.path.join(backup_dir, STATE_FILE), json.dumps(state).encode('utf-8'))
+        finally:
+            os.remove(snapshot_path)
+
+        removed = rotate(backup_dir, keep_chains)
+
+    result = {'file': name, 'kind': kind, 'pages': pages,
+              'bytes': os.path.getsize(os.path.join(backup_dir, name)), 'removed': removed}
+    logger.info("💾 Backup %s: %s (%d pages, %.1f KB)", kind, name, pages, result['bytes'] / 1024)
+    return result
+
+
+def restore(backup_path: str, dest_path: str) -> Dict:
+    """
+    Reconstruye la base de un respaldo: el completo de su cadena más los
+    incrementales hasta el indicado. Retorna {'applied', 'integrity'}.
+    """
+    backup_dir = os.path.dirname(os.path.abspath(backup_path))
+    name = os.path.basename(backup_path)
+    chain = name[len('analysis-'):].split('-full')[0].split('-incr')[0]
+    files = _chains(backup_dir).get(chain, [])
+    full = f'analysis-{chain}-full.db.gz'
+    if full not in files:
+        raise FileNotFoundError(f'No se encontró el respaldo completo {full}')
+    deltas = [] if name == full else [delta for delta in files if '-incr-' in delta and delta <= name]
+
+    with gzip.open(os.path.join(backup_dir, full), 'rb') as source, open(dest_path, 'wb') as out:
+        while True:
+            chunk = source.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            out.write(chunk)
+
+    with open(dest_path, 'r+b') as out:
+        for delta in deltas:
+            with gzip.open(os.path.join(backup_dir, delta), 'rb') as source:
+                header = json.loads(source.readline())
+                page_size = header['page_size']
+                for _ in range(header['pages']):
+                    number = struct.unpack('>I', source.read(4))[0]
+                    out.seek(number * page_size)
+                    out.write(source.read(page_size))
+                out.truncate(header['page_count'] * page_size)
+
+    conn = sqlite3.connect(dest_path)
+    integrity = conn.execute('PRAGMA quick_check').fetchone()[0]
+    conn.close()
+    return {'applied': [full] + deltas, 'integrity': integrity}
+
+
+def backup_due(backup_dir: str = BACKUP_DIR, interval_hours: float = BACKUP_INTERVAL_HOURS) -> bool:
+    """True si el último respaldo (state.json) tiene más de interval_hours"""
+    try:
+        last = os.path.getmtime(os.path.join(backup_dir, STATE_FILE))
+    except OSError:
+        return True
+    return time.time() - last >= interval_hours * 3600
+
+
+_worker_started = False
+_worker_lock = threading.Lock()
+
+
+def start_backup_worker(source_path: str = 'analysis.db') -> bool:
+    """Hilo en segundo plano que corre run_backup cada BACKUP_INTERVAL_HOURS (uno por proceso)"""
+    global _worker_started
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return False
+    with _worker_lock:
+        if _worker_started:
+            return True
+        _worker_started = True
+
+    source_path = os.path.abspath(source_path)
+    backup_dir = os.path.abspath(BACKUP_DIR)
+
+    def loop():
+        while True:
+            time.sleep(SCHEDULE_CHECK_SECONDS)
+            try:
+                if backup_due(backup_dir):
+                    run_backup(source_path, backup_dir)
+            except Exception as e:
+                logger.warning("⚠️ Scheduled backup failed: %s", e)
+
+    threading.Thread(target=loop, name='backup', daemon=True).start()
+    logger.info("💾 Scheduled backups every %s h in %s", BACKUP_INTERVAL_HOURS, backup_dir)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='analysis.db')
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot_parser = commands.add_parser('snapshot')
+    snapshot_parser.add_argument('dest')
+    snapshot_parser.add_argument('--gzip', action='store_true')
+    commands.add_parser('run')
+    commands.add_parser('list')
+    restore_parser = commands.add_parser('restore')
+    restore_parser.add_argument('backup')
+    restore_parser.add_argument('dest')
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        path = create_snapshot(args.db, directory=os.path.dirname(os.path.abspath(args.dest)))
+        if args.gzip:
+            with open(args.dest, 'wb') as out:
+                for chunk in stream_file(path, compress=True, remove=True):
+                    out.write(chunk)
+        else:
+            os.replace(path, args.dest)
+        print(f"✅ Instantánea en {args.dest} ({os.path.getsize(args.dest) / 1e6:.2f} MB)")
+    elif args.command == 'run':
+        result = run_backup(args.db, args.dir)
+        if result is None:
+            print("⚠️ Otro proceso está respaldando")
+            raise SystemExit(1)
+        print(f"✅ Respaldo {result['kind']}: {result['file']} ({result['pages']} páginas, "
+              f"{result['bytes'] / 1e6:.2f} MB; {result['removed']} archivos rotados)")
+    elif args.command == 'list':
+        for chain, files in sorted(_chains(args.dir).items()) if os.path.isdir(args.dir) else []:
+            print(f"📦 {chain}")
+            for name in files:
+                print(f"   {name:60} {os.path.getsize(os.path.join(args.dir, name)) / 1e6:>8.2f} MB")
+    elif args.command == 'restore':
+        result = restore(args.backup, args.dest)
+        print(f"✅ {args.dest} restaurada desde {len(result['applied'])} archivos (quick_check: {result['integrity']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark: re-evaluación vectorizada vs loop por fila con has_vulnerability
+
+Genera una tabla libraries sintética (1M filas por defecto) en un archivo temporal
+y compara ambos caminos, verificando que produzcan exactamente los mismos flags.
+
+Uso:
+    python benchmarks/bench_bulk_vulnerability.py [--rows 1000000] [--seed 42]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard import has_vulnerability  # noqa: E402
+from vulnerability_evaluator import evaluate_vulnerabilities, reevaluate_library_vulnerabilities  # noqa: E402
+
+LIBRARIES = ['jquery', 'bootstrap', 'lodash', 'moment', 'angular', 'react', 'vue', 'd3',
+             'chart.js', 'select2', 'datatables', 'swiper', 'ntg_hlsearch.js', 'ntg_hrodrigu.js']
+VERSION_POOL_SIZE = 2000
+
+
+def random_version(rng):
+    style = rng.random()
+    if style < 0.05:
+        return None
+    if style < 0.08:
+        return ''
+    if style < 0.12:
+        return str(rng.randint(1000, 99999))  # revisión NTG ($Id)
+    major, minor, patch = rng.randint(0, 5), rng.randint(0, 20), rng.randint(0, 30)
+    if style < 0.2:
+        return f'v{major}.{minor}'
+    if style < 0.25:
+        return f'{major}.{minor}.{patch}-beta'
+    return f'{major}.{minor}.{patch}'
+
+
+def build_database(path, rows, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('''
+        CREATE TABLE global_libraries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            library_name TEXT UNIQUE NOT NULL,
+            type TEXT,
+            latest_safe_version TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE libraries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER,
+            library_name TEXT NOT NULL,
+            version TEXT,
+            type TEXT,
+            latest_safe_version TEXT,
+            global_library_id INTEGER,
+            is_vulnerable INTEGER
+        )
+    ''')
+    # Las versiones reales se repiten mucho entre escaneos: se usa un pool acotado
+    version_pool = [random_version(rng) for _ in range(VERSION_POOL_SIZE)]
+
+    conn.executemany(
+        "INSERT INTO global_libraries (library_name, type, latest_safe_version) VALUES (?, 'js', ?)",
+        [(name, random_version(rng) or '3.5.0') for name in LIBRARIES]
+    )
+
+    def generate():
+        for i in range(rows):
+            global_id = rng.randint(1, len(LIBRARIES)) if rng.random() < 0.7 else None
+            individual_safe = rng.choice(version_pool) if rng.random() < 0.3 else None
+            yield (i // 20, LIBRARIES[(global_id or 1) - 1], rng.choice(version_pool), 'js',
+                   individual_safe, global_id)
+
+    conn.executemany('''
+        INSERT INTO libraries (scan_id, library_name, version, type, latest_safe_version, global_library_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', generate())
+    conn.commit()
+    return conn
+
+
+def per_row_loop(conn):
+    """Camino actual: un has_vulnerability por fila y executemany de todos los flags"""
+    start = time.perf_counter()
+    rows = conn.execute('''
+        SELECT l.id, l.version, l.latest_safe_version, gl.latest_safe_version
+        FROM libraries l
+        LEFT JOIN global_libraries gl ON l.global_library_id = gl.id
+    ''').fetchall()
+    flags = [(1 if has_vulnerability(version, safe, global_safe_version=global_safe) else 0, lib_id)
+             for lib_id, version, safe, global_safe in rows]
+    conn.executemany("UPDATE libraries SET is_vulnerable = ? WHERE id = ?", flags)
+    conn.commit()
+    return time.perf_counter() - start, dict((lib_id, flag) for flag, lib_id in flags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench_libraries.db')
+        print(f"🧪 Generando {args.rows:,} filas sintéticas...")
+        start = time.perf_counter()
+        conn = build_database(db_path, args.rows, args.seed)
+        print(f"   listo en {time.perf_counter() - start:.1f}s")
+
+        loop_time, expected = per_row_loop(conn)
+        print(f"🐢 Loop por fila (has_vulnerability): {loop_time:.2f}s")
+
+        conn.execute("UPDATE libraries SET is_vulnerable = NULL")
+        conn.commit()
+
+        start = time.perf_counter()
+        result = reevaluate_library_vulnerabilities(conn)
+        vector_time = time.perf_counter() - start
+        print(f"🚀 Evaluador vectorizado: {vector_time:.2f}s "
+              f"({result['vulnerable']:,} vulnerables, {result['updated']:,} escritas)")
+
+        # Solo cómputo (sin I/O) sobre las mismas filas
+        rows = conn.execute('''
+            SELECT l.version, NULLIF(l.latest_safe_version, ''), gl.latest_safe_version
+            FROM libraries l
+            LEFT JOIN global_libraries gl ON l.global_library_id = gl.id
+        ''').fetchall()
+        start = time.perf_counter()
+        for version, safe, global_safe in rows:
+            has_vulnerability(version, safe, global_safe_version=global_safe)
+        loop_compute = time.perf_counter() - start
+        start = time.perf_counter()
+        evaluate_vulnerabilities([row[0] for row in rows], [row[1] or row[2] for row in rows])
+        vector_compute = time.perf_counter() - start
+        print(f"🧮 Solo cómputo: loop {loop_compute:.2f}s vs vectorizado {vector_compute:.2f}s "
+              f"({loop_compute / vector_compute:.1f}x)")
+
+        # Caso real: cambia la versión segura de una librería global y solo se reescriben sus filas
+        conn.execute("UPDATE global_libraries SET latest_safe_version = '2.0.0' WHERE id = 1")
+        conn.commit()
+        start = time.perf_counter()
+        incremental = reevaluate_library_vulnerabilities(conn, global_library_id=1)
+        print(f"🔁 Re-evaluación tras editar global_library #1: {time.perf_counter() - start:.2f}s "
+              f"({incremental['evaluated']:,} evaluadas, {incremental['updated']:,} cambios)")
+        expected.update(
+            (lib_id, 1 if has_vulnerability(version, safe, global_safe_version='2.0.0') else 0)
+            for lib_id, version, safe in conn.execute(
+                "SELECT id, version, latest_safe_version FROM libraries WHERE global_library_id = 1")
+        )
+
+        mismatches = sum(1 for lib_id, flag in conn.execute("SELECT id, is_vulnerable FROM libraries")
+                         if expected[lib_id] != flag)
+        conn.close()
+
+    print(f"📊 Speedup: {loop_time / vector_time:.1f}x")
+    if mismatches:
+        print(f"❌ {mismatches:,} filas difieren entre ambos caminos")
+        sys.exit(1)
+    print("✅ Ambos caminos producen los mismos flags")
+
+
+if __name__ == "__main__":
+    main()
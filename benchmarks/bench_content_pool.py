@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: análisis de contenido en el hilo del escaneo vs pool de procesos
+
+Analiza varios bundles JS grandes con scan_content_for_versions en el mismo
+proceso (camino anterior) y a través de content_pool. Mide el tiempo total y la
+pausa máxima que sufre un hilo "latido" que simula al resto del servidor
+(otras peticiones, descargas): con el análisis en proceso el GIL lo bloquea.
+
+Uso:
+    python benchmarks/bench_content_pool.py [--files 8] [--size-kb 2048] [--workers N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_bundle(index, size_kb):
+    """Bundle minificado con pocas líneas muy largas y la versión recién al final"""
+    rng = random.Random(index)
+    parts = []
+    while sum(len(part) for part in parts) < size_kb * 1024:
+        line = ''.join(f'function f{rng.randint(0, 10**9)}(a,b){{return a.map(function(x){{return x*{rng.random():.5f}+b}})}};'
+                       for _ in range(3000))
+        parts.append(line + '\n')
+    parts.append(f'/*! modulo-{index} v{index}.{index % 7}.{rng.randint(0, 9)} */jQuery.fn.jquery="3.5.1";\n')
+    return ''.join(parts).encode('utf-8')
+
+
+class Heartbeat(threading.Thread):
+    """Registra la mayor pausa entre latidos de 5 ms (bloqueo del GIL)"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.max_gap = 0.0
+        self.running = True
+
+    def run(self):
+        last = time.perf_counter()
+        while self.running:
+            time.sleep(0.005)
+            now = time.perf_counter()
+            self.max_gap = max(self.max_gap, now - last)
+            last = now
+
+
+def measure(func):
+    heartbeat = Heartbeat()
+    heartbeat.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    heartbeat.running = False
+    heartbeat.join()
+    return elapsed, heartbeat.max_gap, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--size-kb', type=int, default=2048)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ['CONTENT_POOL_WORKERS'] = str(args.workers)
+    import content_pool
+    from content_scanner import scan_content_for_versions
+
+    bodies = {f'https://cdn.ejemplo.cl/modulo-{i}.js': synthetic_bundle(i, args.size_kb) for i in range(args.files)}
+
+    def in_process():
+        return [scan_content_for_versions(body.decode('utf-8'), url, 'js', 1) for url, body in bodies.items()]
+
+    def pooled():
+        scans = [content_pool.submit_content_scan(content_pool.SCANNER_DASHBOARD, body, 'utf-8', url, 'js', 1,
+                                                  local_scan=scan_content_for_versions)
+                 for url, body in bodies.items()]
+        return [content_pool.content_scan_result(scan) for scan in scans]
+
+    # Arranque de los workers fuera de la medición
+    content_pool.get_content_pool()
+    pooled()
+
+    print(f"📦 {args.files} bundles x {args.size_kb:,} KB, pool de {args.workers} procesos ({os.cpu_count()} CPUs)")
+    local_time, local_gap, expected = measure(in_process)
+    pool_time, pool_gap, actual = measure(pooled)
+    print(f"   en proceso: {local_time:7.2f} s total, pausa máxima del servidor {local_gap * 1000:7.1f} ms")
+    print(f"   pool:       {pool_time:7.2f} s total, pausa máxima del servidor {pool_gap * 1000:7.1f} ms "
+          f"{'✅' if actual == expected else '❌ resultados distintos'}")
+
+    content_pool.shutdown_content_pool()
+    if actual != expected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: extracción de recursos HTML (BeautifulSoup html.parser vs PageAssets)
+
+Compara el camino anterior (árbol completo de BeautifulSoup + un find_all por
+detector) con extract_page_assets (una pasada sobre el parser de lxml) y verifica
+que ambos produzcan el mismo título, scripts y hojas de estilo.
+
+Por defecto genera una página grande tipo portal institucional; con --file o
+--url se mide sobre páginas reales.
+
+Uso:
+    python benchmarks/bench_page_assets.py [--size-kb 2048] [--runs 5]
+    python benchmarks/bench_page_assets.py --file pagina.html --url https://www.ejemplo.cl
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_assets import extract_page_assets  # noqa: E402
+
+# Mismas consultas que detect_js_libraries/detect_css_libraries/get_all_js_css_files
+SCRIPT_PATTERNS = [re.compile(name, re.I) for name in ('jquery', 'react', 'vue', 'bootstrap', 'angular')]
+LINK_PATTERNS = [re.compile(r'bootstrap', re.I), re.compile(r'font-?awesome', re.I)]
+
+CDN_SCRIPTS = [
+    'https://code.jquery.com/jquery-3.5.1.min.js',
+    'https://cdn.jsdelivr.net/npm/bootstrap@4.6.0/dist/js/bootstrap.bundle.min.js',
+    '/js/ntg_hlsearch.js?v=12',
+    '/assets/vendor/swiper-6.8.4.min.js',
+    '//cdnjs.cloudflare.com/ajax/libs/moment.js/2.29.1/moment.min.js',
+]
+CDN_STYLES = [
+    'https://cdn.jsdelivr.net/npm/bootstrap@4.6.0/dist/css/bootstrap.min.css',
+    'https://use.fontawesome.com/releases/v5.15.4/css/font-awesome-5.15.4.css',
+    '/css/portal.css?v=3',
+]
+
+
+def synthetic_page(size_kb, seed=7):
+    """Página con menús, tablas, JSON inline y scripts repartidos por el cuerpo"""
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">',
+             '<title>Portal Municipal &amp; Servicios en Línea</title>']
+    parts += [f'<link rel="stylesheet" href="{href}">' for href in CDN_STYLES]
+    parts += [f'<script src="{src}"></script>' for src in CDN_SCRIPTS]
+    parts.append('</head><body><nav><ul>')
+    parts += [f'<li class="menu-item"><a href="/seccion/{i}">Sección {i} — trámites</a></li>' for i in range(200)]
+    parts.append('</ul></nav><main>')
+
+    block = 0
+    while sum(len(p) for p in parts) < size_kb * 1024:
+        block += 1
+        parts.append(f'<section id="s{block}"><h2>Noticias y estadisticas {block}</h2><table class="datatable">')
+        for row in range(30):
+            parts.append(f'<tr><td>{row}</td><td class="fa-icon">Comuna {rng.randint(1, 346)}</td>'
+                         f'<td><span data-value="{rng.random():.4f}">{rng.randint(0, 99999)}</span></td></tr>')
+        parts.append('</table>')
+        parts.append(f'<script>window.__data{block} = {{"items": [{", ".join(str(rng.randint(0, 999)) for _ in range(80))}]}};'
+                     f' if (a < b && "</div>".length) {{ render({block}); }}</script>')
+        if block % 5 == 0:
+            parts.append(f'<script src="/js/modulo_{block}.js?rev={rng.randint(1000, 9999)}" defer></script>')
+            parts.append(f'<link rel="preload" href="/fonts/font-{block}.woff2">')
+        parts.append('<p>Formulario de contacto, galería de prensa y carrito de compras.</p></section>')
+
+    parts.append('</main><footer>Municipalidad</footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def soup_path(content):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    title_tag = soup.find('title')
+    title = title_tag.text.strip() if title_tag else None
+    matches = [[s.get('src', '') for s in soup.find_all('script', src=pattern)] for pattern in SCRIPT_PATTERNS]
+    matches += [[l.get('href', '') for l in soup.find_all('link', href=pattern)] for pattern in LINK_PATTERNS]
+    scripts = [s.get('src') for s in soup.find_all('script', src=True) if s.get('src')]
+    styles = [l.get('href') for l in soup.find_all('link', {'rel': 'stylesheet', 'href': True}) if l.get('href')]
+    return title, matches, scripts, styles
+
+
+def assets_path(content):
+    assets = extract_page_assets(content)
+    matches = [assets.scripts_matching(pattern) for pattern in SCRIPT_PATTERNS]
+    matches += [assets.links_matching(pattern) for pattern in LINK_PATTERNS]
+    return assets.title, matches, list(assets.script_srcs), list(assets.stylesheet_hrefs)
+
+
+def best_time(func, content, runs):
+    best, result = float('inf'), None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(content)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench(label, content, runs):
+    soup_time, expected = best_time(soup_path, content, runs)
+    assets_time, actual = best_time(assets_path, content, runs)
+    same = expected == actual
+    print(f"📄 {label} ({len(content) / 1024:,.0f} KB, {len(actual[2])} scripts, {len(actual[3])} css)")
+    print(f"   BeautifulSoup html.parser: {soup_time * 1000:8.1f} ms")
+    print(f"   PageAssets (una pasada):   {assets_time * 1000:8.1f} ms  ({soup_time / assets_time:.1f}x) "
+          f"{'✅' if same else '❌ resultados distintos'}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=2048, help='Tamaño de la página sintética')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--file', action='append', default=[], help='Archivo HTML real (repetible)')
+    parser.add_argument('--url', action='append', default=[], help='URL real a descargar (repetible)')
+    args = parser.parse_args()
+
+    pages = [(f'sintética {args.size_kb} KB', synthetic_page(args.size_kb))]
+    for path in args.file:
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read()))
+    for url in args.url:
+        import requests
+        response = requests.get(url, timeout=15, headers={'User-Agent': 'Mozilla/5.0'})
+        pages.append((url, response.content))
+
+    all_same = all([bench(label, content, args.runs) for label, content in pages])
+    if not all_same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
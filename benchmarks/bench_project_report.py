@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reporte consolidado de un proyecto grande (5.000 URLs por defecto)
+
+Crea un proyecto sintético con el esquema real (cada URL escaneada dos veces,
+solo la más reciente revisada, librerías compartidas desde un CDN común) y mide:
+  - la consolidación en Python (deduplicate_libraries + agrupación por escaneo)
+    contra la versión anterior con búsquedas en listas, verificando que ambas
+    produzcan el mismo resultado
+  - get_project_consolidated_data completo (consultas incluidas)
+  - el reporte renderizado y su lectura desde report_cache
+
+Uso:
+    python benchmarks/bench_project_report.py [--urls 5000] [--seed 42]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from synthetic_db import LIBRARY_CATALOG, FILE_NAMES, _create_schema, _working_directory  # noqa: E402
+
+LIBRARIES_PER_URL = 8
+FILES_PER_URL = 10
+
+
+def build_project(directory, urls, seed):
+    """Un proyecto con `urls` URLs revisadas; retorna (dashboard, project_id)"""
+    dashboard = _create_schema(directory)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(os.path.join(directory, 'analysis.db'))
+    conn.execute('PRAGMA synchronous=OFF')
+    project_id = conn.execute("INSERT INTO projects (name) VALUES ('Proyecto grande')").lastrowid
+
+    js_catalog = [entry for entry in LIBRARY_CATALOG if entry[1] == 'js']
+    headers = json.dumps({'Server': 'nginx', 'X-Frame-Options': 'SAMEORIGIN',
+                          'Strict-Transport-Security': 'max-age=31536000'})
+    scan_id = 0
+    scan_rows, library_rows, file_rows = [], [], []
+    for n in range(urls):
+        url = f'https://www.sitio{n % 400}.gob.cl/pagina-{n}'
+        host = url.split('/')[2]
+        # Escaneo anterior sin revisar y el más reciente revisado
+        for day, reviewed in ((1, 0), (2, 1)):
+            scan_id += 1
+            scan_rows.append((scan_id, url, f'2026-01-0{day} 10:00:00', 200, f'Página {n}', headers,
+                              project_id, reviewed))
+            for index in range(LIBRARIES_PER_URL):
+                name, _, versions, _ = js_catalog[(n + index) % len(js_catalog)]
+                version = rng.choice(versions)
+                slug = name.lower().replace(' ', '-')
+                if rng.random() < 0.5:
+                    source = f'https://cdn.jsdelivr.net/npm/{slug}@{version}/dist/{slug}.min.js'
+                else:
+                    source = f'https://{host}/js/{slug}-{version}.min.js'
+                library_rows.append((scan_id, name, version, 'js', source))
+            for index in range(FILES_PER_URL):
+                file_rows.append((scan_id, f'https://{host}/js/{FILE_NAMES[index]}.js?v={n}', 'js',
+                                  rng.randint(1_000, 900_000), 200))
+
+    conn.executemany('''
+        INSERT INTO scans (id, url, scan_date, status_code, title, headers, project_id, reviewed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', scan_rows)
+    conn.executemany('INSERT INTO libraries (scan_id, library_name, version, type, source_url) VALUES (?, ?, ?, ?, ?)',
+                     library_rows)
+    conn.executemany('INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code) VALUES (?, ?, ?, ?, ?)',
+                     file_rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return dashboard, project_id
+
+
+def legacy_consolidation(scans, all_libraries, all_file_urls):
+    """Consolidación anterior: pertenencia en listas y un filtro por escaneo"""
+    libraries_dict = {}
+    for lib in all_libraries:
+        key = f"{lib['library_name']}_{lib['version'] or 'unknown'}"
+        if key not in libraries_dict:
+            lib_dict = dict(lib)
+            lib_dict['used_in_urls'] = [lib['url']]
+            lib_dict['source_urls_list'] = [lib['source_url']] if lib['source_url'] else []
+            lib_dict['scan_count'] = 1
+            lib_dict['scan_urls'] = [lib['url']]
+            libraries_dict[key] = lib_dict
+        else:
+            if lib['url'] not in libraries_dict[key]['used_in_urls']:
+                libraries_dict[key]['used_in_urls'].append(lib['url'])
+                libraries_dict[key]['scan_urls'].append(lib['url'])
+                libraries_dict[key]['scan_count'] += 1
+            if lib['source_url'] and lib['source_url'] not in libraries_dict[key]['source_urls_list']:
+                libraries_dict[key]['source_urls_list'].append(lib['source_url'])
+    consolidated = sorted(libraries_dict.values(), key=lambda x: (x['library_name'], x['version'] or ''))
+
+    per_scan = []
+    for scan in scans:
+        per_scan.append(([dict(lib) for lib in all_libraries if lib['scan_id'] == scan['id']],
+                         [dict(f) for f in all_file_urls if f['scan_id'] == scan['id']]))
+    return consolidated, per_scan
+
+
+def current_consolidation(dashboard, scans, all_libraries, all_file_urls):
+    """Mismo trabajo con el código actual del dashboard"""
+    all_libraries = [dict(lib) for lib in all_libraries]
+    all_file_urls = [dict(f) for f in all_file_urls]
+    consolidated = dashboard.deduplicate_libraries(all_libraries)
+    libraries_by_scan, files_by_scan = {}, {}
+    for lib in all_libraries:
+        libraries_by_scan.setdefault(lib['scan_id'], []).append(lib)
+    for f in all_file_urls:
+        files_by_scan.setdefault(f['scan_id'], []).append(f)
+    per_scan = [(libraries_by_scan.get(scan['id'], []), files_by_scan.get(scan['id'], [])) for scan in scans]
+    return consolidated, per_scan
+
+
+def fetch_rows(directory, project_id):
+    """Las mismas filas que consulta get_project_consolidated_data"""
+    conn = sqlite3.connect(os.path.join(directory, 'analysis.db'))
+    conn.row_factory = sqlite3.Row
+    scans = conn.execute('SELECT * FROM scans WHERE project_id = ? AND reviewed = 1 ORDER BY scan_date DESC',
+                         (project_id,)).fetchall()
+    all_libraries = conn.execute('''
+        SELECT l.*, s.url, s.scan_date FROM libraries l INNER JOIN scans s ON l.scan_id = s.id
+        WHERE s.project_id = ? AND s.reviewed = 1 AND l.type = 'js' ORDER BY s.url, l.library_name
+    ''', (project_id,)).fetchall()
+    all_file_urls = conn.execute('''
+        SELECT f.*, s.url AS scan_url FROM file_urls f INNER JOIN scans s ON f.scan_id = s.id
+        WHERE s.project_id = ? AND s.reviewed = 1 AND f.file_type = 'js' ORDER BY s.url, f.file_url
+    ''', (project_id,)).fetchall()
+    conn.close()
+    return scans, all_libraries, all_file_urls
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=5_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-legacy', action='store_true', help='No medir la consolidación anterior (cuadrática)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='js-analyzer-report-')
+    try:
+        print(f"🏗️  Generando proyecto con {args.urls:,} URLs...")
+        dashboard, project_id = build_project(directory, args.urls, args.seed)
+        scans, all_libraries, all_file_urls = fetch_rows(directory, project_id)
+        print(f"   {len(scans):,} escaneos revisados, {len(all_libraries):,} librerías, {len(all_file_urls):,} archivos")
+
+        current, current_s = timed(current_consolidation, dashboard, scans, all_libraries, all_file_urls)
+        print(f"⚡ Consolidación actual:   {current_s * 1000:10.1f} ms")
+        if not args.skip_legacy:
+            legacy, legacy_s = timed(legacy_consolidation, scans, all_libraries, all_file_urls)
+            print(f"🐢 Consolidación anterior: {legacy_s * 1000:10.1f} ms  ({legacy_s / current_s:.0f}x)")
+            if legacy != current:
+                print("❌ Los resultados no coinciden")
+                return 1
+            print("✅ Mismos resultados")
+
+        with _working_directory(directory):
+            data, report_s = timed(dashboard.get_project_consolidated_data, project_id)
+            print(f"📊 get_project_consolidated_data: {report_s * 1000:.1f} ms "
+                  f"({data['project_stats']['total_urls']:,} URLs, "
+                  f"{data['project_stats']['total_libraries']:,} librerías consolidadas)")
+            report, build_s = timed(dashboard.get_project_report, project_id)
+            _, cached_s = timed(dashboard.get_project_report, project_id)
+            size = len(report['content_html']) + len(report['scripts_html'])
+            print(f"📄 Reporte renderizado: {build_s * 1000:.1f} ms ({size / 1e6:.1f} MB), "
+                  f"desde la caché: {cached_s * 1000:.1f} ms")
+            dashboard.storage.get_storage().close_all()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
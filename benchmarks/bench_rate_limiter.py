@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark del rate limiter: deque de timestamps (anterior) vs contador de ventana deslizante
+
+Mide throughput, memoria con muchas IPs distintas, desalojo de claves inactivas y
+que el límite se respete exactamente con varios hilos sobre la misma clave.
+
+Uso:
+    python benchmarks/bench_rate_limiter.py [--keys 200000] [--hits-per-key 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_state import MemoryStateStore, SQLiteStateStore, RATE_LIMIT_SWEEP_INTERVAL  # noqa: E402
+
+
+class LegacyDequeLimiter:
+    """Réplica del limitador original: un deque sin límite por ip:limit_key"""
+
+    def __init__(self):
+        self.store = defaultdict(lambda: deque())
+
+    def rate_limit_hit(self, rate_key, max_requests, window, now=None):
+        now = time.time() if now is None else now
+        queue = self.store[rate_key]
+        while queue and queue[0] <= now - window:
+            queue.popleft()
+        if len(queue) >= max_requests:
+            return False, None
+        queue.append(now)
+        return True, None
+
+    def rate_limit_key_count(self):
+        return len(self.store)
+
+
+def bench_throughput(limiter, operations):
+    start = time.perf_counter()
+    now = time.time()
+    for i in range(operations):
+        limiter.rate_limit_hit(f"10.0.{i % 256}.{i % 97}:analysis", 10, 60, now + i * 0.001)
+    return operations / (time.perf_counter() - start)
+
+
+def bench_memory(factory, keys, hits_per_key):
+    tracemalloc.start()
+    limiter = factory()
+    now = time.time()
+    for hit in range(hits_per_key):
+        for key in range(keys):
+            limiter.rate_limit_hit(f"ip-{key}:export", 20, 3600, now + hit)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return limiter, current
+
+
+def bench_concurrency(limiter, threads, attempts_per_thread, limit):
+    allowed = [0] * threads
+
+    def worker(index):
+        for _ in range(attempts_per_thread):
+            if limiter.rate_limit_hit('shared:login', limit, 3600)[0]:
+                allowed[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(allowed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=200_000)
+    parser.add_argument('--hits-per-key', type=int, default=10)
+    parser.add_argument('--operations', type=int, default=500_000)
+    args = parser.parse_args()
+
+    print(f"⚡ Throughput ({args.operations:,} hits)")
+    print(f"   deque (anterior):   {bench_throughput(LegacyDequeLimiter(), args.operations):>12,.0f} ops/s")
+    print(f"   ventana deslizante: {bench_throughput(MemoryStateStore(), args.operations):>12,.0f} ops/s")
+
+    print(f"🧠 Memoria ({args.keys:,} IPs x {args.hits_per_key} hits)")
+    _, legacy_bytes = bench_memory(LegacyDequeLimiter, args.keys, args.hits_per_key)
+    store, new_bytes = bench_memory(lambda: MemoryStateStore(max_keys=args.keys * 2),
+                                    args.keys, args.hits_per_key)
+    print(f"   deque (anterior):   {legacy_bytes / 1e6:8.1f} MB ({legacy_bytes / args.keys:.0f} B/clave)")
+    print(f"   ventana deslizante: {new_bytes / 1e6:8.1f} MB ({new_bytes / args.keys:.0f} B/clave)")
+
+    # Dos ventanas después todas las claves están inactivas y el barrido las elimina
+    later = time.time() + 2 * 3600 + RATE_LIMIT_SWEEP_INTERVAL + 1
+    store.rate_limit_hit('late:export', 20, 3600, later)
+    print(f"🧹 Claves tras el barrido de inactivas: {store.rate_limit_key_count():,} (antes {args.keys:,})")
+
+    capped = MemoryStateStore(max_keys=10_000)
+    for key in range(args.keys):
+        capped.rate_limit_hit(f"ip-{key}:login", 5, 60)
+    print(f"📦 Con RATE_LIMIT_MAX_KEYS=10,000: {capped.rate_limit_key_count():,} claves retenidas")
+
+    threads, attempts, limit = 8, 500, 1000
+    allowed = bench_concurrency(MemoryStateStore(), threads, attempts, limit)
+    print(f"🔒 {threads} hilos x {attempts} intentos, límite {limit}: {allowed} permitidos "
+          f"{'✅' if allowed == limit else '❌'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_store = SQLiteStateStore(os.path.join(tmp, 'state.db'))
+        operations = min(args.operations, 20_000)
+        print(f"💾 SQLiteStateStore: {bench_throughput(sqlite_store, operations):,.0f} ops/s "
+              f"({sqlite_store.rate_limit_key_count():,} filas para {operations:,} hits)")
+
+    if allowed != limit:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark: página de detalle de un escaneo con miles de archivos
+
+Sobre una base sintética agrega una URL escaneada varias veces cuyo último
+escaneo tiene `--files` archivos JavaScript (con version strings de varias
+líneas) y mide:
+  - la lectura anterior: siete consultas y el agrupado de version strings en Python
+  - storage.scan_detail: una consulta con agregación JSON y funciones de ventana,
+    verificando que ambas entreguen los mismos datos
+  - GET /scan/<id> completo (plantilla incluida)
+
+Uso:
+    python benchmarks/bench_scan_detail.py [--scans 20000] [--files 3000] [--runs 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import storage  # noqa: E402
+from normalized_storage import insert_scan  # noqa: E402
+from synthetic_db import LIBRARY_CATALOG, build_database, _working_directory  # noqa: E402
+
+RESCANS = 12
+LINES_PER_VERSIONED_FILE = 3
+
+
+def add_large_scan(db_path, files, rescans):
+    """Una URL con `rescans` escaneos; el del medio tiene `files` archivos JS. Retorna su id"""
+    conn = sqlite3.connect(db_path)
+    url = 'https://www.portal-grande.gob.cl/'
+    headers = '{"Server": "nginx", "Strict-Transport-Security": "max-age=31536000"}'
+    scan_ids = []
+    cursor = conn.cursor()
+    for day in range(rescans):
+        scan_ids.append(insert_scan(cursor, url, 200, 'Portal grande', headers,
+                                    scan_date=f'2026-02-{day + 1:02d} 09:00:00'))
+    scan_id = scan_ids[rescans // 2]
+
+    cursor.executemany('INSERT INTO libraries (scan_id, library_name, version, type, source_url) VALUES (?, ?, ?, ?, ?)',
+                       [(scan_id, name, versions[-1], lib_type, f'{url}{lib_type}/{name}.min.{lib_type}')
+                        for name, lib_type, versions, _ in LIBRARY_CATALOG])
+    cursor.executemany('INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code) VALUES (?, ?, ?, ?, ?)',
+                       [(scan_id, f'{url}js/modulo-{n:05d}.js', 'js', 1_000 + n, 200) for n in range(files)])
+    cursor.executemany('''
+        INSERT INTO version_strings (scan_id, file_url, file_type, line_number, line_content, version_keyword)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(scan_id, f'{url}js/modulo-{n:05d}.js', 'js', line * 10 + 1, f'/*! modulo-{n} v1.{line}.0 */', 'v_pattern')
+          for n in range(0, files, 3) for line in range(LINES_PER_VERSIONED_FILE)])
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return scan_id
+
+
+def legacy_read(conn, scan_id):
+    """Lectura anterior de scan_detail (consultas separadas, agrupado en Python)"""
+    scan = storage.get_scan(conn, scan_id)
+    libraries = storage.libraries_for_scan(conn, scan_id)
+    version_strings_grouped = {}
+    for vs in storage.version_strings_for_scan(conn, scan_id):
+        group = version_strings_grouped.setdefault(vs['file_url'], {
+            'id': vs['id'], 'file_url': vs['file_url'], 'file_type': vs['file_type'], 'lines': [],
+            'version_keywords': set(), 'lines_count': 0, 'all_ids': []})
+        group['lines'].append({'id': vs['id'], 'line_number': vs['line_number'],
+                               'line_content': vs['line_content'], 'version_keyword': vs['version_keyword']})
+        group['version_keywords'].add(vs['version_keyword'])
+        group['lines_count'] += 1
+        group['all_ids'].append(vs['id'])
+    version_strings = sorted(version_strings_grouped.values(), key=lambda x: x['file_url'])
+    file_urls = storage.file_urls_for_scan(conn, scan_id)
+    projects = storage.active_projects(conn)
+    # La página anterior además incrustaba el catálogo global completo
+    storage.list_global_libraries(conn)
+    url_scans = storage.scans_for_url(conn, scan['url'])
+    navigation = {'current_position': 0, 'total_scans': len(url_scans), 'previous_scan_id': None, 'next_scan_id': None}
+    for i, url_scan in enumerate(url_scans):
+        if url_scan['id'] == scan_id:
+            navigation['current_position'] = i + 1
+            if i > 0:
+                navigation['previous_scan_id'] = url_scans[i - 1]['id']
+            if i < len(url_scans) - 1:
+                navigation['next_scan_id'] = url_scans[i + 1]['id']
+            break
+    # Como antes, las filas sqlite3.Row van directo a la plantilla
+    return {'scan': scan, 'libraries': libraries, 'file_urls': file_urls,
+            'version_strings': version_strings, 'navigation': navigation}, projects
+
+
+def as_dicts(read):
+    detail, projects = read
+    detail = dict(detail, scan=dict(detail['scan']), libraries=[dict(lib) for lib in detail['libraries']],
+                  file_urls=[dict(f) for f in detail['file_urls']])
+    return detail, [dict(p) for p in projects]
+
+
+def current_read(dashboard, conn, scan_id):
+    # El catálogo global ya no se incrusta: los selectores lo piden a /api/global-libraries/search
+    return storage.scan_detail(conn, scan_id), dashboard.project_choices(conn)
+
+
+def measure(func, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', type=int, default=20_000, help='Escaneos de la base sintética')
+    parser.add_argument('--files', type=int, default=3_000, help='Archivos JS del escaneo medido')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='js-analyzer-detail-')
+    try:
+        print(f"🏗️  Base sintética de {args.scans:,} escaneos y un escaneo con {args.files:,} archivos...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_path = build_database(directory, args.scans, evaluate_vulnerabilities=False)
+        scan_id = add_large_scan(db_path, args.files, RESCANS)
+
+        import dashboard
+        dashboard.app.config['WTF_CSRF_ENABLED'] = False
+        client = dashboard.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+            session['username'] = 'admin'
+            session['user_role'] = 'admin'
+
+        with _working_directory(directory):
+            conn = storage.connect()
+            try:
+                legacy = legacy_read(conn, scan_id)
+                current = current_read(dashboard, conn, scan_id)
+                if as_dicts(legacy) != current:
+                    print("❌ Los resultados no coinciden")
+                    return 1
+                print(f"✅ Mismos datos ({len(current[0]['file_urls']):,} archivos, "
+                      f"{len(current[0]['version_strings']):,} grupos de version strings, "
+                      f"escaneo {current[0]['navigation']['current_position']} de "
+                      f"{current[0]['navigation']['total_scans']})")
+
+                legacy_ms = measure(lambda: legacy_read(conn, scan_id), args.runs)
+                current_ms = measure(lambda: current_read(dashboard, conn, scan_id), args.runs)
+            finally:
+                conn.close()
+            print(f"🐢 Lectura anterior (7 consultas):  {legacy_ms:8.1f} ms")
+            print(f"⚡ storage.scan_detail (1 consulta): {current_ms:8.1f} ms  ({legacy_ms / current_ms:.1f}x)")
+
+            path = f'/scan/{scan_id}'
+            status = client.get(path).status_code
+            if status != 200:
+                print(f"❌ {path} respondió {status}")
+                return 1
+            print(f"📄 GET {path}: {measure(lambda: client.get(path), args.runs):.1f} ms (mediana de {args.runs})")
+            storage.get_storage().close_all()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Tamaño de analysis.db y caché de páginas: esquema antiguo vs normalizado
+
+Crea una base sintética (benchmarks/synthetic_db.py) o toma una real (--db),
+arma una copia con el esquema antiguo (URLs y headers como texto en cada fila),
+la migra con normalized_storage.ensure_normalized_storage y compara:
+
+  - tamaño del archivo y por tabla (dbstat), ambos tras VACUUM
+  - duración de la migración
+  - aciertos y fallos de la caché de páginas de SQLite (sqlite3_db_status) y
+    tiempo de una carga de consultas del dashboard con la caché acotada a
+    --cache-kb, como un servidor con poca memoria frente a una base grande
+
+Uso:
+    python benchmarks/bench_storage_layout.py [--scans 10000] [--cache-kb 2048]
+    python benchmarks/bench_storage_layout.py --db analysis.db
+"""
+
+import argparse
+import contextlib
+import ctypes
+import io
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from normalized_storage import DATA_TABLES, ensure_normalized_storage, table_sizes  # noqa: E402
+from synthetic_db import build_database  # noqa: E402
+
+SQLITE_DBSTATUS_CACHE_HIT = 7
+SQLITE_DBSTATUS_CACHE_MISS = 8
+
+# Consultas con la forma de las páginas del dashboard (los mismos nombres sirven en ambos esquemas)
+SCAN_DETAIL_QUERIES = [
+    'SELECT * FROM scans WHERE id = ?',
+    'SELECT * FROM libraries WHERE scan_id = ? ORDER BY type, library_name',
+    'SELECT * FROM file_urls WHERE scan_id = ? ORDER BY file_type, file_url',
+    'SELECT * FROM version_strings WHERE scan_id = ? ORDER BY file_url, line_number',
+]
+LISTING_QUERIES = [
+    '''SELECT s.id, s.url, s.scan_date, s.status_code, COUNT(l.id)
+       FROM scans s LEFT JOIN libraries l ON l.scan_id = s.id
+       GROUP BY s.id ORDER BY s.scan_date DESC LIMIT 50''',
+    "SELECT COUNT(*) FROM file_urls WHERE file_url LIKE '%/vendor.%'",
+    'SELECT library_name, source_url, COUNT(*) FROM libraries GROUP BY library_name, source_url',
+    'SELECT headers FROM scans ORDER BY id DESC LIMIT 500',
+]
+
+
+class PageCacheCounter:
+    """
+    Aciertos y fallos de la caché de páginas de una conexión
+
+    sqlite3_db_status no está expuesto en el módulo sqlite3: se llama por ctypes
+    con el puntero sqlite3* de la conexión (primer campo tras PyObject_HEAD). Si
+    el puntero no corresponde al archivo esperado, las cifras quedan en None.
+    """
+
+    def __init__(self, conn, path):
+        self.available = False
+        try:
+            self._lib = ctypes.CDLL(sys.modules['_sqlite3'].__file__)
+            self._handle = ctypes.c_void_p.from_address(id(conn) + 2 * ctypes.sizeof(ctypes.c_void_p)).value
+            self._lib.sqlite3_db_filename.restype = ctypes.c_char_p
+            self._lib.sqlite3_db_filename.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+            filename = self._lib.sqlite3_db_filename(self._handle, b'main')
+            self.available = bool(filename) and os.path.realpath(filename.decode()) == os.path.realpath(path)
+        except (OSError, AttributeError, KeyError, ValueError):
+            pass
+
+    def _status(self, op, reset):
+        current, highwater = ctypes.c_int(), ctypes.c_int()
+        self._lib.sqlite3_db_status(ctypes.c_void_p(self._handle), op, ctypes.byref(current),
+                                    ctypes.byref(highwater), int(reset))
+        return current.value
+
+    def read(self, reset=False):
+        if not self.available:
+            return None, None
+        return (self._status(SQLITE_DBSTATUS_CACHE_HIT, reset),
+                self._status(SQLITE_DBSTATUS_CACHE_MISS, reset))
+
+
+def build_legacy_copy(normalized_path, legacy_path):
+    """Copia con el esquema antiguo: cada vista de compatibilidad se materializa como tabla"""
+    shutil.copy(normalized_path, legacy_path)
+    conn = sqlite3.connect(legacy_path)
+    indexes = conn.execute(f'''
+        SELECT tbl_name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({', '.join('?' * len(DATA_TABLES))})
+    ''', list(DATA_TABLES.values())).fetchall()
+
+    for view, data_table in DATA_TABLES.items():
+        stored = {row[1]: (row[2], row[4]) for row in conn.execute(f'PRAGMA table_info({data_table})')}
+        definitions = []
+        for row in conn.execute(f'PRAGMA table_info({view})').fetchall():
+            name = row[1]
+            if name == 'id':
+                definitions.append('id INTEGER PRIMARY KEY AUTOINCREMENT')
+            elif name in stored:
+                column_type, default = stored[name]
+                definitions.append(f"{name} {column_type}{f' DEFAULT {default}' if default is not None else ''}")
+            else:
+                definitions.append(f'{name} TEXT')
+        conn.execute(f"CREATE TABLE {view}_legacy ({', '.join(definitions)})")
+        conn.execute(f'INSERT INTO {view}_legacy SELECT * FROM {view}')
+
+    for view, data_table in DATA_TABLES.items():
+        conn.execute(f'DROP VIEW {view}')
+        conn.execute(f'DROP TABLE {data_table}')
+    conn.execute('DROP TABLE urls')
+    conn.execute('DROP TABLE header_blobs')
+    for view in DATA_TABLES:
+        conn.execute(f'ALTER TABLE {view}_legacy RENAME TO {view}')
+    for table, sql in indexes:
+        view = next(name for name, data_table in DATA_TABLES.items() if data_table == table)
+        conn.execute(sql.replace(f' {table}(', f' {view}(').replace(f' {table} (', f' {view} ('))
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def run_workload(path, cache_kb, scan_ids):
+    """(aciertos, fallos, segundos) de la carga de consultas en una conexión nueva"""
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA cache_size=-{cache_kb}')
+    counter = PageCacheCounter(conn, path)
+    counter.read(reset=True)
+    start = time.perf_counter()
+    for scan_id in scan_ids:
+        for query in SCAN_DETAIL_QUERIES:
+            conn.execute(query, (scan_id,)).fetchall()
+    for query in LISTING_QUERIES:
+        conn.execute(query).fetchall()
+    elapsed = time.perf_counter() - start
+    hits, misses = counter.read()
+    conn.close()
+    return hits, misses, elapsed
+
+
+def describe(label, path, cache_kb, scan_ids):
+    conn = sqlite3.connect(path)
+    sizes = table_sizes(conn) or {}
+    conn.close()
+    hits, misses, elapsed = run_workload(path, cache_kb, scan_ids)
+    return {
+        'label': label,
+        'bytes': os.path.getsize(path),
+        'sizes': sizes,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits is not None and hits + misses else None,
+        'workload_s': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', type=int, default=10_000, help='Escaneos de la base sintética')
+    parser.add_argument('--db', help='Base existente con el esquema antiguo (se trabaja sobre una copia)')
+    parser.add_argument('--cache-kb', type=int, default=2048, help='Caché de páginas de la carga de consultas')
+    parser.add_argument('--detail-scans', type=int, default=200, help='Escaneos consultados en la carga')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-storage-')
+    try:
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        if args.db:
+            shutil.copy(args.db, legacy_path)
+            conn = sqlite3.connect(legacy_path)
+            conn.execute('VACUUM')
+            conn.close()
+            source = args.db
+        else:
+            print(f"🗄️  Base sintética de {args.scans:,} escaneos...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                normalized_source = build_database(os.path.join(workdir, 'synthetic'), args.scans)
+            build_legacy_copy(normalized_source, legacy_path)
+            source = f'sintética ({args.scans:,} escaneos)'
+
+        migrated_path = os.path.join(workdir, 'normalized.db')
+        shutil.copy(legacy_path, migrated_path)
+        conn = sqlite3.connect(migrated_path)
+        start = time.perf_counter()
+        ensure_normalized_storage(conn)
+        migration_s = time.perf_counter() - start
+        conn.close()
+
+        conn = sqlite3.connect(legacy_path)
+        ids = [row[0] for row in conn.execute('SELECT id FROM scans')]
+        conn.close()
+        scan_ids = random.Random(7).sample(ids, min(args.detail_scans, len(ids)))
+
+        before = describe('antiguo', legacy_path, args.cache_kb, scan_ids)
+        after = describe('normalizado', migrated_path, args.cache_kb, scan_ids)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n📦 {source} — migración en {migration_s:.2f} s, caché de {args.cache_kb} KB")
+    print(f"  {'':14} {'archivo':>12} {'aciertos':>10} {'fallos':>10} {'hit rate':>9} {'consultas':>10}")
+    for result in (before, after):
+        hit_rate = f"{result['hit_rate']:.1%}" if result['hit_rate'] is not None else 'n/d'
+        print(f"  {result['label']:14} {result['bytes'] / 1e6:>9.2f} MB {result['hits'] or 0:>10,} "
+              f"{result['misses'] or 0:>10,} {hit_rate:>9} {result['workload_s'] * 1000:>7.0f} ms")
+    print(f"  Reducción de tamaño: {1 - after['bytes'] / before['bytes']:.1%}")
+
+    print("\n  Bytes por tabla (índices incluidos):")
+    for label, result in (('antiguo', before), ('normalizado', after)):
+        top = ', '.join(f'{table} {size / 1e6:.2f} MB' for table, size in list(result['sizes'].items())[:6])
+        print(f"  {label:14} {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de tiempo de arranque del dashboard (python -X importtime)
+
+Importa dashboard en un proceso limpio, toma el mejor de N intentos y falla
+(exit 1) si supera el presupuesto o si alguna dependencia pesada que debería
+cargarse de forma diferida aparece en el arranque.
+
+Uso:
+    python benchmarks/check_import_time.py [--module dashboard] [--budget-ms 800] [--runs 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Solo se necesitan en exportaciones/reportes/escaneos, nunca al arrancar un worker
+LAZY_MODULES = ('pandas', 'numpy', 'openpyxl', 'reportlab', 'bs4', 'lxml', 'matplotlib')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)$')
+
+
+def measure(module):
+    """Retorna (tiempo acumulado en ms del módulo, set de módulos importados)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"❌ No se pudo importar {module}")
+
+    cumulative_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(3)
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(match.group(2))
+
+    return (cumulative_us or 0) / 1000.0, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='dashboard')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', '800')))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    results = [measure(args.module) for _ in range(args.runs)]
+    best_ms = min(ms for ms, _ in results)
+    eager_heavy = sorted(set(LAZY_MODULES) & results[0][1])
+
+    print(f"⏱️  import {args.module}: {best_ms:.0f} ms (mejor de {args.runs}, presupuesto {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if best_ms > args.budget_ms:
+        print(f"❌ El arranque supera el presupuesto por {best_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if eager_heavy:
+        print(f"❌ Dependencias pesadas importadas al arrancar: {', '.join(eager_heavy)}")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Arranque dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
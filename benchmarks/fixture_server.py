@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local con el corpus de páginas y bundles para los benchmarks
+
+El corpus vive en un directorio con un manifest.json:
+
+    {"pages": ["index.html", ...],
+     "bundles": [{"path": "js/jquery-3.5.1.min.js", "type": "js"}, ...]}
+
+build_synthetic_corpus() genera uno determinista (jQuery, Bootstrap, archivos
+NTG con $Id de tests/, bundles minificados de varios MB y páginas con scripts
+inline) para que las mediciones no dependan de la red. record_corpus() graba
+páginas reales (HTML + scripts + hojas de estilo, con las rutas reescritas a
+locales) y el suite las mide igual que las sintéticas.
+
+Uso:
+    python benchmarks/fixture_server.py serve [--corpus DIR] [--port 8765]
+    python benchmarks/fixture_server.py record https://www.ejemplo.cl ... --corpus benchmarks/corpus
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NTG_FIXTURES = [os.path.join(REPO_ROOT, 'tests', name) for name in ('test_ntg_hlsearch.js', 'test_ntg_hrodrigu.js')]
+
+MANIFEST = 'manifest.json'
+
+
+def _minified_filler(rng, size_kb, line_kb=256):
+    """Código minificado sin versiones: pocas líneas muy largas, como un bundle real"""
+    lines, line, total = [], [], 0
+    while total < size_kb * 1024:
+        chunk = (f'function _{rng.randint(0, 16 ** 6):x}(e,t){{var n=e.length,r=[];'
+                 f'for(var i=0;i<n;i++)r.push(t(e[i],i)*{rng.random():.4f});return r}};')
+        line.append(chunk)
+        total += len(chunk)
+        if sum(len(part) for part in line) >= line_kb * 1024:
+            lines.append(''.join(line))
+            line = []
+    lines.append(''.join(line))
+    return '\n'.join(lines)
+
+
+def _synthetic_files(seed=2024):
+    rng = random.Random(seed)
+    files = {
+        'js/jquery-3.5.1.min.js': (
+            '/*! jQuery v3.5.1 | (c) JS Foundation and other contributors | jquery.org/license */\n'
+            + _minified_filler(rng, 88, line_kb=32)
+            + '\njQuery.fn.jquery="3.5.1";jQuery=function(e,t){return new jQuery.fn.init(e,t)};\n'),
+        'js/bootstrap.bundle.min.js': (
+            '/*!\n  * Bootstrap v4.6.0 (https://getbootstrap.com/)\n  * Copyright 2011-2021 The Bootstrap Authors\n  */\n'
+            + _minified_filler(rng, 80, line_kb=40)),
+        'css/bootstrap.min.css': (
+            '/*!\n * Bootstrap v4.6.0 (https://getbootstrap.com/)\n */\n'
+            + ''.join(f'.col-{i}{{flex:0 0 {i / 12:.4%};max-width:{i / 12:.4%}}}' for i in range(1, 13)) * 400),
+        'js/vendor.bundle.min.js': (
+            _minified_filler(rng, 700)
+            + '\n/*! Lo-Dash 4.17.15 */_.VERSION="4.17.15";_.forEach=function(){};\n'
+            + _minified_filler(rng, 700)
+            + '\n//! moment.js\n//! version : 2.29.1\n'),
+        'js/app.bundle.min.js': (
+            _minified_filler(rng, 3 * 1024)
+            + '\n/** @license React v17.0.2 react.production.min.js */React.version="17.0.2";React.createElement;\n'),
+    }
+    for path in NTG_FIXTURES:
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                files[f"js/{os.path.basename(path).replace('test_', '')}"] = f.read()
+    return files, rng
+
+
+def _page(title, scripts, styles, inline_blocks, body_kb, rng):
+    parts = ['<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">', f'<title>{title}</title>']
+    parts += [f'<link rel="stylesheet" href="{href}">' for href in styles]
+    parts += [f'<script src="{src}"></script>' for src in scripts]
+    parts.append('</head><body><main>')
+    section = 0
+    while sum(len(part) for part in parts) < body_kb * 1024:
+        section += 1
+        parts.append(f'<section><h2>Noticias {section}</h2><p>Trámites, formularios y carrito de compras '
+                     f'{rng.randint(0, 10 ** 6)}</p>')
+        if inline_blocks and section % 4 == 0:
+            # Mitad bloques repetidos en todas las páginas (caché inline), mitad únicos
+            block = inline_blocks[section % len(inline_blocks)] if section % 8 else \
+                f'window.__state{section}={{"id":{rng.randint(0, 10 ** 9)}}};'
+            parts.append(f'<script>{block}</script>')
+        parts.append('</section>')
+    parts.append('</main></body></html>')
+    return ''.join(parts)
+
+
+def build_synthetic_corpus(directory, seed=2024):
+    """Escribe el corpus sintético en directory y retorna el manifest"""
+    files, rng = _synthetic_files(seed)
+    ntg_scripts = [f'js/{name}' for name in ('ntg_hlsearch.js', 'ntg_hrodrigu.js') if f'js/{name}' in files]
+    inline_blocks = [
+        '/*! Analytics loader v2.1.0 */(function(w){w.dataLayer=w.dataLayer||[]})(window);',
+        'jQuery.fn.jquery = "1.12.4"; var config = {"version": "3.2.1"};',
+        'document.documentElement.className += " js";',
+    ]
+    pages = {
+        'index.html': _page('Portal Municipal', ['js/jquery-3.5.1.min.js', 'js/bootstrap.bundle.min.js'] + ntg_scripts,
+                            ['css/bootstrap.min.css'], inline_blocks, 64, rng),
+        'portal.html': _page('Portal con muchos scripts inline', ['js/jquery-3.5.1.min.js', 'js/vendor.bundle.min.js'],
+                             ['css/bootstrap.min.css'], inline_blocks, 1024, rng),
+        'spa.html': _page('Aplicación SPA', ['js/vendor.bundle.min.js', 'js/app.bundle.min.js'], [], [], 8, rng),
+    }
+    files.update(pages)
+
+    for path, content in files.items():
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    manifest = {
+        'source': 'synthetic',
+        'seed': seed,
+        'pages': sorted(pages),
+        'bundles': [{'path': path, 'type': 'css' if path.endswith('.css') else 'js'}
+                    for path in sorted(files) if path.endswith(('.js', '.css'))],
+    }
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_corpus(directory):
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def record_corpus(urls, directory):
+    """Graba páginas reales con sus scripts y hojas de estilo para medirlas sin red"""
+    import requests
+    from page_assets import extract_page_assets
+
+    headers = {'User-Agent': 'Mozilla/5.0 (js-analyzer benchmark recorder)'}
+    manifest = load_corpus(directory) if os.path.exists(os.path.join(directory, MANIFEST)) else \
+        {'source': 'recorded', 'pages': [], 'bundles': []}
+    known_bundles = {bundle['path'] for bundle in manifest['bundles']}
+
+    for url in urls:
+        response = requests.get(url, headers=headers, timeout=20)
+        html = response.text
+        assets = extract_page_assets(response.content)
+        page_name = f"{urlparse(url).netloc.replace(':', '_')}-{hashlib.sha1(url.encode()).hexdigest()[:8]}.html"
+
+        for reference, file_type in [(src, 'js') for src in assets.script_srcs] + \
+                                    [(href, 'css') for href in assets.stylesheet_hrefs]:
+            absolute = urljoin(url, reference)
+            try:
+                asset = requests.get(absolute, headers=headers, timeout=20)
+            except requests.RequestException as e:
+                print(f"  ⚠️ {absolute}: {e}")
+                continue
+            if asset.status_code != 200:
+                continue
+            name = os.path.basename(urlparse(absolute).path) or 'index'
+            local_path = f"{file_type}/{hashlib.sha1(absolute.encode()).hexdigest()[:8]}-{name}"
+            target = os.path.join(directory, local_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(asset.content)
+            html = html.replace(f'"{reference}"', f'"{local_path}"').replace(f"'{reference}'", f"'{local_path}'")
+            if local_path not in known_bundles:
+                manifest['bundles'].append({'path': local_path, 'type': file_type, 'origin': absolute})
+                known_bundles.add(local_path)
+
+        with open(os.path.join(directory, page_name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        if page_name not in manifest['pages']:
+            manifest['pages'].append(page_name)
+        print(f"📼 {url} -> {page_name}")
+
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Servidor HTTP en 127.0.0.1 (puerto libre) sobre el directorio del corpus"""
+
+    def __init__(self, directory, port=0):
+        handler = partial(_QuietHandler, directory=directory)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return urljoin(self.base_url, path)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve', help='Sirve el corpus (sintético si no se indica --corpus)')
+    serve.add_argument('--corpus')
+    serve.add_argument('--port', type=int, default=8765)
+    record = subparsers.add_parser('record', help='Graba páginas reales en el corpus')
+    record.add_argument('urls', nargs='+')
+    record.add_argument('--corpus', default=os.path.join(REPO_ROOT, 'benchmarks', 'corpus'))
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        sys.path.insert(0, REPO_ROOT)
+        os.makedirs(args.corpus, exist_ok=True)
+        manifest = record_corpus(args.urls, args.corpus)
+        print(f"✅ Corpus en {args.corpus}: {len(manifest['pages'])} páginas, {len(manifest['bundles'])} archivos")
+        return
+
+    import tempfile
+    directory = args.corpus or tempfile.mkdtemp(prefix='js-analyzer-corpus-')
+    manifest = load_corpus(directory) if args.corpus else build_synthetic_corpus(directory)
+    with FixtureServer(directory, args.port) as server:
+        print(f"🌐 Sirviendo {directory} en {server.base_url}")
+        for page in manifest['pages']:
+            print(f"   {server.url(page)}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    if not args.corpus:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: throughput del dashboard según la cantidad de workers WSGI
+
+Para cada valor de --workers levanta gunicorn (gunicorn.conf.py + wsgi:application)
+sobre una copia temporal de analysis.db, inicia sesión una vez y golpea las
+páginas de lectura con N clientes concurrentes durante --duration segundos.
+
+Uso:
+    python benchmarks/load_test.py --workers 1 2 4 --clients 16 --duration 15
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --user admin --password ...
+"""
+
+import argparse
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.security import generate_password_hash
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ['/', '/api/stats', '/api/scans', '/statistics', '/global-libraries']
+LOADTEST_USER = 'loadtest'
+LOADTEST_PASSWORD = 'loadtest-password'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(workdir, source_db):
+    """Copia (o crea) la base de datos y agrega un usuario para la prueba"""
+    db_path = os.path.join(workdir, 'analysis.db')
+    if source_db and os.path.exists(source_db):
+        shutil.copy(source_db, db_path)
+    subprocess.run([sys.executable, '-c', 'import dashboard; dashboard.init_database()'],
+                   cwd=workdir, env=dict(os.environ, PYTHONPATH=REPO_ROOT),
+                   check=True, capture_output=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM users WHERE username = ?", (LOADTEST_USER,))
+    conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, 'admin')",
+                 (LOADTEST_USER, generate_password_hash(LOADTEST_PASSWORD)))
+    conn.commit()
+    conn.close()
+
+
+def start_server(workdir, workers, threads, port):
+    env = dict(os.environ,
+               PYTHONPATH=REPO_ROOT,
+               FLASK_ENV='production',
+               FLASK_SECRET_KEY='load-test-secret',
+               WEB_WORKERS=str(workers),
+               WEB_THREADS=str(threads),
+               WEB_BIND=f'127.0.0.1:{port}',
+               WEB_ACCESS_LOG='',
+               SHARED_STATE_PATH=os.path.join(workdir, 'shared_state.db'))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+         '--chdir', workdir, 'wsgi:application'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'{base_url}/login', timeout=1)
+            return proc, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def login(base_url, username, password):
+    session = requests.Session()
+    page = session.get(f'{base_url}/login', timeout=10)
+    match = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page.text)
+    response = session.post(f'{base_url}/login', data={
+        'csrf_token': match.group(1) if match else '',
+        'username': username,
+        'password': password
+    }, timeout=10, allow_redirects=False)
+    if response.status_code != 302 or 'login' in response.headers.get('Location', ''):
+        raise RuntimeError(f"Login fallido ({response.status_code})")
+    return session.cookies
+
+
+def run_load(base_url, cookies, paths, clients, duration):
+    """Retorna (requests completadas, errores, latencias en ms)"""
+    deadline = time.time() + duration
+
+    def client(index):
+        session = requests.Session()
+        session.cookies.update(cookies)
+        done, errors, latencies = 0, 0, []
+        i = index
+        while time.time() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(f'{base_url}{path}', timeout=60, allow_redirects=False)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            done += 1
+            errors += 0 if ok else 1
+        return done, errors, latencies
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+
+    latencies = [lat for _, _, lats in results for lat in lats]
+    return sum(r[0] for r in results), sum(r[1] for r in results), latencies
+
+
+def report(label, total, errors, latencies, duration):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{label:>12} | {total / duration:8.1f} req/s | p50 {statistics.median(latencies) if latencies else 0:7.1f} ms"
+          f" | p95 {p95:7.1f} ms | errores {errors}")
+    return total / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--db', default=os.path.join(REPO_ROOT, 'analysis.db'),
+                        help='Base de datos a copiar para la prueba')
+    parser.add_argument('--url', help='Probar un servidor ya levantado en vez de iniciar gunicorn')
+    parser.add_argument('--user', default=LOADTEST_USER)
+    parser.add_argument('--password', default=LOADTEST_PASSWORD)
+    args = parser.parse_args()
+
+    print(f"🚦 {args.clients} clientes, {args.duration:.0f}s por corrida, rutas: {', '.join(args.paths)}")
+
+    if args.url:
+        cookies = login(args.url, args.user, args.password)
+        report('externo', *run_load(args.url, cookies, args.paths, args.clients, args.duration), args.duration)
+        return
+
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            prepare_workdir(workdir, args.db)
+            proc, base_url = start_server(workdir, workers, args.threads, free_port())
+            try:
+                cookies = login(base_url, LOADTEST_USER, LOADTEST_PASSWORD)
+                throughput = report(f'{workers} workers',
+                                    *run_load(base_url, cookies, args.paths, args.clients, args.duration),
+                                    args.duration)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        baseline = baseline or throughput
+        print(f"{'':>12}   escalamiento x{throughput / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks con resultados en JSON comparables entre commits
+
+Mide, sin salir a internet:
+  - analyze:  LibraryAnalyzer.analyze_url sobre las páginas del corpus
+  - scan:     scan_file_for_versions (dashboard y analyzer) sobre cada bundle
+  - detect:   detect_libraries_by_content sobre cada bundle
+  - pages:    páginas de listado del dashboard (test client de Flask) sobre
+              bases sintéticas de 1k, 10k y 100k escaneos
+
+El corpus se sirve con benchmarks/fixture_server.py: el sintético siempre, y
+además benchmarks/corpus/ si existe (grabado con `fixture_server.py record`).
+
+Uso:
+    python benchmarks/run_suite.py --output results/abc123.json
+    python benchmarks/run_suite.py --quick --groups scan detect
+    python benchmarks/run_suite.py --compare results/base.json results/new.json [--threshold 0.15] [--fail-on-regression]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Solo advertencias del analizador: el resumen por escaneo ensuciaría la tabla de resultados
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fixture_server import FixtureServer, build_synthetic_corpus, load_corpus, MANIFEST  # noqa: E402
+from synthetic_db import build_database  # noqa: E402
+
+GROUPS = ('analyze', 'scan', 'detect', 'pages')
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+RECORDED_CORPUS = os.path.join(BENCH_DIR, 'corpus')
+
+# Páginas de listado del dashboard; /scan/{scan_id} usa el escaneo más reciente
+DASHBOARD_PAGES = [
+    '/',
+    '/?page=50',
+    '/statistics',
+    '/projects',
+    '/global-libraries',
+    '/historial',
+    '/api/scans',
+    '/api/stats',
+    '/scan/{scan_id}',
+]
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def measure(func, runs, warmup=1):
+    """Ejecuta func (silenciando sus prints) y retorna las estadísticas de tiempo"""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    return _stats(samples)
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class Suite:
+    def __init__(self, runs, workdir):
+        self.runs = runs
+        self.workdir = workdir
+        self.results = []
+
+    def record(self, group, name, case, stats, **extra):
+        entry = {'group': group, 'name': name, 'case': case, **stats, **extra}
+        self.results.append(entry)
+        print(f"  {group:8} {name:38} {case:34} median {stats['median_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms")
+
+    def empty_database(self, name):
+        """Esquema completo del dashboard (catálogo global incluido) sin escaneos"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build_database(os.path.join(self.workdir, name), 0)
+
+    # --- Corpus (servidor local) ----------------------------------------------
+
+    def run_corpus_groups(self, groups, corpora):
+        for label, directory, manifest in corpora:
+            with FixtureServer(directory) as server:
+                if 'analyze' in groups:
+                    self._bench_analyze(label, server, manifest)
+                if 'scan' in groups:
+                    self._bench_scan(label, server, manifest)
+                if 'detect' in groups:
+                    self._bench_detect(label, directory, manifest)
+
+    def _bench_analyze(self, label, server, manifest):
+        from analyzer import LibraryAnalyzer
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer = LibraryAnalyzer(self.empty_database(f'analyze-{label}'))
+        # El filtro SSRF rechaza 127.0.0.1; el servidor de fixtures es local a propósito
+        analyzer.is_safe_url = lambda url: (True, '')
+        for page in manifest['pages']:
+            url = server.url(page)
+            self.record('analyze', 'LibraryAnalyzer.analyze_url', f'{label}/{page}',
+                        measure(lambda: analyzer.analyze_url(url), self.runs))
+
+    def _bench_scan(self, label, server, manifest):
+        import dashboard
+        from analyzer import LibraryAnalyzer
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer = LibraryAnalyzer(self.empty_database(f'scan-{label}'))
+        for bundle in manifest['bundles']:
+            url, file_type, case = server.url(bundle['path']), bundle['type'], f"{label}/{bundle['path']}"
+            self.record('scan', 'dashboard.scan_file_for_versions', case,
+                        measure(lambda: dashboard.scan_file_for_versions(url, file_type, 1), self.runs))
+            self.record('scan', 'LibraryAnalyzer.scan_file_for_versions', case,
+                        measure(lambda: analyzer.scan_file_for_versions(url, file_type, 1), self.runs))
+
+    def _bench_detect(self, label, directory, manifest):
+        try:
+            from library_signatures import detect_libraries_by_content
+        except ImportError:
+            print("  ⚠️ library_signatures no disponible, se omite el grupo detect")
+            return
+        for bundle in manifest['bundles']:
+            with open(os.path.join(directory, bundle['path']), encoding='utf-8', errors='replace') as f:
+                content = f.read()
+            self.record('detect', 'detect_libraries_by_content', f"{label}/{bundle['path']}",
+                        measure(lambda: detect_libraries_by_content(content, bundle['type']), self.runs),
+                        bytes=len(content.encode('utf-8')))
+
+    # --- Páginas del dashboard ------------------------------------------------
+
+    def run_pages(self, sizes):
+        import dashboard
+        dashboard.app.config['WTF_CSRF_ENABLED'] = False
+        client = dashboard.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+            session['username'] = 'admin'
+            session['user_role'] = 'admin'
+
+        for size in sizes:
+            db_dir = os.path.join(self.workdir, f'db-{size}')
+            print(f"🗄️  Base sintética de {size:,} escaneos...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_database(db_dir, size)
+            # get_db_connection() abre analysis.db relativo al directorio actual
+            with _working_directory(db_dir):
+                for path in DASHBOARD_PAGES:
+                    path = path.format(scan_id=size)
+                    status = client.get(path).status_code
+                    if status != 200:
+                        print(f"  ⚠️ {path} respondió {status}, se omite")
+                        continue
+                    self.record('pages', path, f'{size}_scans',
+                                measure(lambda: client.get(path), self.runs))
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _corpora(workdir):
+    synthetic_dir = os.path.join(workdir, 'corpus')
+    corpora = [('synthetic', synthetic_dir, build_synthetic_corpus(synthetic_dir))]
+    if os.path.exists(os.path.join(RECORDED_CORPUS, MANIFEST)):
+        corpora.append(('recorded', RECORDED_CORPUS, load_corpus(RECORDED_CORPUS)))
+    return corpora
+
+
+def compare(base_path, new_path, threshold):
+    """Imprime la variación de la mediana por caso; retorna la cantidad de regresiones"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    def key(entry):
+        return entry['group'], entry['name'], entry['case']
+
+    base_results = {key(entry): entry for entry in base['results']}
+    print(f"📊 {base['meta'].get('commit')} → {new['meta'].get('commit')} (umbral {threshold:.0%})")
+    regressions = 0
+    for entry in new['results']:
+        previous = base_results.pop(key(entry), None)
+        if previous is None:
+            print(f"  🆕 {entry['group']:8} {entry['name']:38} {entry['case']}")
+            continue
+        before, after = previous['median_ms'], entry['median_ms']
+        change = (after - before) / before if before else 0.0
+        marker = '🔴' if change > threshold else '🟢' if change < -threshold else '  '
+        regressions += change > threshold
+        print(f"  {marker} {entry['group']:8} {entry['name']:38} {entry['case']:34} "
+              f"{before:>10.2f} → {after:>10.2f} ms ({change:+.1%})")
+    for group, name, case in base_results:
+        print(f"  ➖ {group:8} {name:38} {case} (ya no se mide)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES),
+                        help='Escaneos de cada base sintética (grupo pages)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='2 repeticiones y solo la base de 1k escaneos')
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=0.15, help='Variación de la mediana considerada regresión')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"{'❌' if regressions else '✅'} {regressions} regresiones")
+        sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+    runs = 2 if args.quick else args.runs
+    sizes = [min(args.sizes)] if args.quick else args.sizes
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-bench-')
+    suite = Suite(runs, workdir)
+    started = time.perf_counter()
+    try:
+        corpus_groups = [group for group in args.groups if group != 'pages']
+        if corpus_groups:
+            suite.run_corpus_groups(corpus_groups, _corpora(workdir))
+        if 'pages' in args.groups:
+            suite.run_pages(sizes)
+    finally:
+        from content_pool import shutdown_content_pool
+        shutdown_content_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'runs': runs,
+            'sizes': sizes if 'pages' in args.groups else [],
+            'duration_s': round(time.perf_counter() - started, 1),
+        },
+        'results': suite.results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados en {args.output}")
+    print(f"✅ {len(suite.results)} casos en {report['meta']['duration_s']} s")
+
+
+if __name__ == "__main__":
+    main()
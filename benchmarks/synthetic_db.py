@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Bases de datos sintéticas para medir las páginas del dashboard
+
+build_database() crea el esquema real (dashboard.init_database, con todas sus
+migraciones) y lo llena de forma determinista: N escaneos repartidos en
+proyectos, ~5 librerías, ~8 archivos y ~3 cadenas de versión por escaneo,
+un catálogo global con versiones seguras y la columna is_vulnerable evaluada.
+Cada sitio se escanea ~3 veces con los mismos archivos y headers (salvo Date y
+Set-Cookie), y parte de las librerías vienen de un CDN común.
+
+Uso:
+    python benchmarks/synthetic_db.py --scans 10000 --output /tmp/bench.db
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from normalized_storage import compact_headers, headers_json  # noqa: E402
+
+# (nombre, tipo, versiones observadas, última versión segura)
+LIBRARY_CATALOG = [
+    ('jQuery', 'js', ['1.12.4', '2.2.4', '3.4.1', '3.5.1', '3.6.0'], '3.5.0'),
+    ('Bootstrap', 'js', ['3.3.7', '4.3.1', '4.6.0', '5.1.3'], '4.3.1'),
+    ('Bootstrap', 'css', ['3.3.7', '4.6.0', '5.1.3'], '3.4.1'),
+    ('Font Awesome', 'css', ['4.7.0', '5.15.4', '6.1.1'], None),
+    ('Moment.js', 'js', ['2.18.1', '2.29.1', '2.29.4'], '2.29.4'),
+    ('Lodash', 'js', ['4.17.4', '4.17.15', '4.17.21'], '4.17.21'),
+    ('Swiper', 'js', ['4.5.0', '6.8.4', '8.4.5'], None),
+    ('ntg_hlsearch', 'js', ['1123', '1587', '2044'], '1587'),
+    ('ntg_hrodrigu', 'js', ['1288', '1932'], None),
+    ('Vue.js', 'js', ['2.6.12', '3.2.31'], '2.6.12'),
+]
+
+# Headers de seguridad que cada sitio envía o no (siempre los mismos por sitio)
+SITE_HEADERS = [
+    ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+    ('X-Content-Type-Options', 'nosniff'),
+    ('Content-Security-Policy', "default-src 'self'; script-src 'self' https://cdn.jsdelivr.net"),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+]
+SERVERS = ['nginx', 'Apache', 'cloudflare', 'Microsoft-IIS/10.0']
+
+FILE_NAMES = ['app', 'main', 'vendor', 'menu', 'slider', 'forms', 'analytics', 'tramites', 'portal', 'buscador']
+
+PROJECTS = 40
+LIBRARIES_PER_SCAN = 5
+FILES_PER_SCAN = 8
+VERSION_STRINGS_PER_SCAN = 3
+
+
+def _response_headers(site, scan_date, rng):
+    """Headers estables del sitio más Date y Set-Cookie propios de cada respuesta"""
+    site_rng = random.Random(site)
+    headers = {'Server': site_rng.choice(SERVERS), 'Content-Type': 'text/html; charset=UTF-8'}
+    headers.update(site_rng.sample(SITE_HEADERS, site_rng.randint(0, len(SITE_HEADERS))))
+    headers['Date'] = scan_date.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    headers['Set-Cookie'] = f'PHPSESSID={rng.getrandbits(64):016x}; path=/; HttpOnly'
+    return headers_json(headers)
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _create_schema(directory):
+    """Esquema real del dashboard (analysis.db dentro de directory)"""
+    import dashboard
+    with _working_directory(directory):
+        dashboard.init_database()
+    return dashboard
+
+
+def build_database(directory, scans, seed=42, evaluate_vulnerabilities=True):
+    """
+    Crea directory/analysis.db con `scans` escaneos
+
+    Returns:
+        ruta de la base de datos
+    """
+    os.makedirs(directory, exist_ok=True)
+    db_path = os.path.join(directory, 'analysis.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    dashboard = _create_schema(directory)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    # Las filas pasan por las vistas de compatibilidad (normalized_storage)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA journal_mode=MEMORY')
+
+    conn.executemany('INSERT INTO projects (name, description) VALUES (?, ?)',
+                     [(f'Proyecto {i:03d}', f'Sitios del servicio {i}') for i in range(1, PROJECTS + 1)])
+
+    global_ids = {}
+    for name, lib_type, versions, safe in LIBRARY_CATALOG:
+        key = name if lib_type == 'js' or name != 'Bootstrap' else f'{name} CSS'
+        cursor = conn.execute('''
+            INSERT INTO global_libraries (library_name, type, latest_safe_version, latest_version, description)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, lib_type, safe, versions[-1], f'{name} ({lib_type})'))
+        global_ids[(name, lib_type)] = cursor.lastrowid
+
+    start = datetime(2024, 1, 1)
+    scan_rows, library_rows, file_rows, version_rows = [], [], [], []
+    for scan_id in range(1, scans + 1):
+        site = scan_id % max(1, scans // 3)
+        host = f'www.sitio{site}.gob.cl'
+        url = f'https://{host}/{rng.choice(["", "tramites", "noticias", "servicios"])}'
+        scanned_at = start + timedelta(minutes=scan_id * 7)
+        scan_date = scanned_at.strftime('%Y-%m-%d %H:%M:%S')
+        status = 200 if rng.random() > 0.03 else rng.choice([0, 404, 500])
+        scan_rows.append((scan_id, url, scan_date, status, f'Sitio {scan_id}', _response_headers(site, scanned_at, rng),
+                          rng.randint(1, PROJECTS) if rng.random() > 0.2 else None, int(rng.random() > 0.7)))
+        if status != 200:
+            continue
+
+        for name, lib_type, versions, _ in rng.sample(LIBRARY_CATALOG, LIBRARIES_PER_SCAN):
+            version = rng.choice(versions)
+            slug = name.lower().replace(' ', '-')
+            # Parte desde un CDN compartido por todos los sitios, parte alojada en el sitio
+            if rng.random() < 0.4:
+                source = f'https://cdn.jsdelivr.net/npm/{slug}@{version}/dist/{slug}.min.{lib_type}'
+            else:
+                source = f'https://{host}/{lib_type}/{slug}-{version}.min.{lib_type}'
+            linked = global_ids[(name, lib_type)] if rng.random() > 0.25 else None
+            library_rows.append((scan_id, name, version, lib_type, source, linked))
+
+        for index in range(FILES_PER_SCAN):
+            file_type = 'css' if index % 4 == 3 else 'js'
+            # Los archivos de un sitio se repiten en cada re-escaneo
+            file_url = f'https://{host}/{file_type}/{FILE_NAMES[(site + index) % len(FILE_NAMES)]}.{file_type}?v={index}'
+            file_rows.append((scan_id, file_url, file_type, rng.randint(1_000, 900_000), 200))
+            if index < VERSION_STRINGS_PER_SCAN:
+                version_rows.append((scan_id, file_url, file_type, rng.randint(1, 40),
+                                     f'/*! {FILE_NAMES[index]} v{rng.randint(1, 5)}.{rng.randint(0, 9)}.{rng.randint(0, 9)} */',
+                                     'v_pattern'))
+
+    conn.executemany('''
+        INSERT INTO scans (id, url, scan_date, status_code, title, headers, project_id, reviewed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', scan_rows)
+    conn.executemany('''
+        INSERT INTO libraries (scan_id, library_name, version, type, source_url, global_library_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', library_rows)
+    conn.executemany('''
+        INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code)
+        VALUES (?, ?, ?, ?, ?)
+    ''', file_rows)
+    conn.executemany('''
+        INSERT INTO version_strings (scan_id, file_url, file_type, line_number, line_content, version_keyword)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', version_rows)
+    # Los INSERT a la vista guardan los headers tal cual; el analizador los deduplica al escribir
+    compact_headers(conn)
+    conn.commit()
+
+    if evaluate_vulnerabilities:
+        dashboard.reevaluate_vulnerabilities(conn)
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Ruta del .db resultante (default: directorio temporal)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='js-analyzer-db-')
+    db_path = build_database(directory, args.scans, args.seed)
+    if args.output:
+        os.replace(db_path, args.output)
+        db_path = args.output
+    print(f"✅ {args.scans:,} escaneos en {db_path} ({os.path.getsize(db_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
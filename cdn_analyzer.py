@@ -10,6 +10,10 @@ from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urljoin
 import json
 
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
 class CDNAnalyzer:
     """
     Analizador de dependencias CDN con identificación automática
@@ -163,7 +167,7 @@ class CDNAnalyzer:
             else:
                 return None
         except Exception as e:
-            print(f"  ⚠️ Error fetching latest version for {library_name} from {cdn_key}: {str(e)}")
+            logger.warning("  ⚠️ Error fetching latest version for %s from %s: %s", library_name, cdn_key, e)
             return None
 
     def _get_cdnjs_latest_version(self, library_name: str) -> Optional[str]:
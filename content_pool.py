@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Etapa de CPU para el análisis de contenido en un pool de procesos
+
+Las regex de versiones, las firmas de library_signatures y la búsqueda de
+patrones NTG son CPU puro; corriendo en el hilo que descarga los archivos, un
+bundle de varios MB bloquea (GIL) al resto de los escaneos. Aquí el análisis se
+ejecuta en un ProcessPoolExecutor: el hilo del escaneo descarga cada archivo y
+envía los bytes al pool apenas llegan, mientras sigue con la descarga siguiente.
+
+Cada worker compila las firmas una vez (initializer) y recibe el cuerpo como
+bytes pickleados junto con el charset de la respuesta; la decodificación (que
+puede requerir detección de charset) también ocurre en el worker. Los workers no
+abren la base de datos: el catálogo NTG del lote viaja con cada archivo.
+
+Archivos pequeños se analizan en el mismo proceso: el costo de IPC supera al de
+las regex. Si el pool no se puede crear o se rompe, el análisis sigue en proceso.
+
+Configuración:
+    CONTENT_POOL_WORKERS=<n>      procesos del pool (default: CPUs; 0 desactiva el pool)
+    CONTENT_POOL_MIN_BYTES=<n>    tamaño mínimo para enviar al pool (default: 64 KB)
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_POOL_WORKERS = int(os.environ.get('CONTENT_POOL_WORKERS', os.cpu_count() or 1))
+CONTENT_POOL_MIN_BYTES = int(os.environ.get('CONTENT_POOL_MIN_BYTES', 64 * 1024))
+
+# Escáner que ejecuta el worker: el del dashboard (content_scanner) o el de analyzer.py
+SCANNER_DASHBOARD = 'dashboard'
+SCANNER_ANALYZER = 'analyzer'
+
+ScanResult = Tuple[List[Dict], List[Dict]]
+LocalScanFunc = Callable[..., ScanResult]
+# Resultado interno de cada tarea: (ScanResult, segundos por etapa para scan_metrics)
+TimedScanResult = Tuple[ScanResult, Dict[str, float]]
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> str:
+    """Mismo resultado que requests.Response.text para (content, encoding)"""
+    if not body:
+        return ''
+    if not encoding:
+        from requests.compat import chardet
+        encoding = chardet.detect(body)['encoding'] if chardet is not None else None
+    try:
+        return str(body, encoding, errors='replace')
+    except (LookupError, TypeError):
+        return str(body, errors='replace')
+
+
+# --- Lado worker ---------------------------------------------------------------
+
+_worker_analyzer = None
+
+
+def _init_worker():
+    """Compila firmas y patrones una sola vez por proceso worker"""
+    try:
+        from library_signatures import get_detection_engine
+        get_detection_engine()
+    except ImportError:
+        pass
+    import content_scanner  # noqa: F401  (compila VERSION_PATTERNS)
+
+
+def _get_worker_analyzer():
+    """LibraryAnalyzer sin base de datos (no corre init_database en cada worker)"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        from analyzer import LibraryAnalyzer
+        _worker_analyzer = LibraryAnalyzer(db_path=None, init_db=False)
+    return _worker_analyzer
+
+
+def _run_scan(scanner: str, body: bytes, encoding: Optional[str], file_url: str,
+              file_type: str, scan_id: int, ntg_catalog=None) -> TimedScanResult:
+    timings = {}
+    content = decode_body(body, encoding)
+    if scanner == SCANNER_ANALYZER:
+        from global_catalog import get_empty_ntg_catalog
+        analyzer = _get_worker_analyzer()
+        # Catálogo NTG del lote en curso, enviado con el archivo (el worker no lo lee de la base)
+        analyzer.ntg_catalog = ntg_catalog if ntg_catalog is not None else get_empty_ntg_catalog()
+        return analyzer.scan_content_for_versions(content, file_url, file_type, scan_id, timings=timings), timings
+
+    from content_scanner import scan_content_for_versions
+    return scan_content_for_versions(content, file_url, file_type, scan_id, timings=timings), timings
+
+
+# --- Lado del escaneo ------------------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    # fork desde un proceso con hilos (Flask/gunicorn gthread) puede heredar locks tomados
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_content_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool compartido por los escaneos de este proceso (None si está desactivado)"""
+    global _pool, _pool_pid
+    if CONTENT_POOL_WORKERS <= 0:
+        return None
+    # Tras un fork (workers de gunicorn) el pool del padre no es utilizable
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            try:
+                _pool = ProcessPoolExecutor(max_workers=CONTENT_POOL_WORKERS, mp_context=_mp_context(),
+                                            initializer=_init_worker)
+                _pool_pid = os.getpid()
+            except (OSError, ValueError, NotImplementedError) as e:
+                logger.warning("⚠️ Content pool no disponible, análisis en proceso: %s", e)
+                _pool, _pool_pid = None, None
+                return None
+    return _pool
+
+
+def _reset_content_pool(broken: ProcessPoolExecutor):
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is broken:
+            _pool, _pool_pid = None, None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_content_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool, _pool, _pool_pid = _pool, None, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class ContentScan:
+    """
+    Análisis enviado a la etapa de CPU: el Future del pool (o ya resuelto) y lo
+    necesario para repetirlo en este proceso si el worker muere
+    """
+
+    __slots__ = ('future', 'scan_args', 'local_scan', 'pool')
+
+    def __init__(self, future: Future, scan_args=None, local_scan: Optional[LocalScanFunc] = None,
+                 pool: Optional[ProcessPoolExecutor] = None):
+        self.future = future
+        self.scan_args = scan_args
+        self.local_scan = local_scan
+        self.pool = pool
+
+
+def _run_local(local_scan: Optional[LocalScanFunc], scan_args) -> TimedScanResult:
+    scanner, body, encoding, file_url, file_type, scan_id, ntg_catalog = scan_args
+    if local_scan is not None:
+        timings = {}
+        return local_scan(decode_body(body, encoding), file_url, file_type, scan_id, timings=timings), timings
+    return _run_scan(*scan_args)
+
+
+def submit_content_scan(scanner: str, body: bytes, encoding: Optional[str], file_url: str, file_type: str,
+                        scan_id: int, ntg_catalog=None, local_scan: Optional[LocalScanFunc] = None) -> ContentScan:
+    """
+    Envía un archivo descargado a la etapa de CPU
+
+    Args:
+        scanner: SCANNER_DASHBOARD o SCANNER_ANALYZER (escáner que corre en el worker)
+        body, encoding: response.content y response.encoding
+        ntg_catalog: NTGCatalog del lote para asociar librerías ntg_* (solo SCANNER_ANALYZER)
+        local_scan: escáner equivalente para ejecutar en este proceso (archivos
+            pequeños o sin pool); recibe el contenido ya decodificado y timings=
+
+    Returns:
+        ContentScan con (version_strings, detected_libraries); leer con content_scan_result()
+    """
+    scan_args = (scanner, body, encoding, file_url, file_type, scan_id, ntg_catalog)
+    pool = get_content_pool() if len(body or b'') >= CONTENT_POOL_MIN_BYTES else None
+
+    if pool is not None:
+        try:
+            return ContentScan(pool.submit(_run_scan, *scan_args), scan_args, local_scan, pool)
+        except (BrokenProcessPool, RuntimeError):
+            _reset_content_pool(pool)
+
+    future = Future()
+    try:
+        future.set_result(_run_local(local_scan, scan_args))
+    except Exception as e:
+        future.set_exception(e)
+    return ContentScan(future)
+
+
+def completed_scan(result: ScanResult = ([], [])) -> ContentScan:
+    """Análisis ya resuelto (archivos que no se pudieron descargar)"""
+    future = Future()
+    future.set_result((result, {}))
+    return ContentScan(future)
+
+
+def content_scan_result(scan: ContentScan, metrics=None) -> ScanResult:
+    """
+    Resultado del análisis; si el worker murió, repite el análisis en este proceso
+
+    Args:
+        metrics: ScanMetrics opcional que recibe los tiempos de regex y firmas
+    """
+    try:
+        result, timings = scan.future.result()
+    except BrokenProcessPool:
+        _reset_content_pool(scan.pool)
+        logger.warning("  ⚠️ Content pool roto, re-analizando en proceso: %s", scan.scan_args[3])
+        result, timings = _run_local(scan.local_scan, scan.scan_args)
+    if metrics is not None:
+        metrics.add_stage_times(timings)
+    return result
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Escáner de versiones sobre contenido ya descargado (archivos JS/CSS e inline)
+
+Funciones puras, sin Flask ni base de datos: el dashboard las llama en el mismo
+proceso y content_pool las ejecuta en los procesos worker de la etapa de CPU.
+Los patrones se compilan una vez al importar el módulo (una vez por worker).
+"""
+
+import re
+import time
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from library_signatures import detect_libraries_by_content
+    CONTENT_DETECTION_AVAILABLE = True
+except ImportError:
+    CONTENT_DETECTION_AVAILABLE = False
+
+# Patrones de versión solicitados por el usuario
+VERSION_PATTERN_SOURCES = [
+    # Patrones v/V con números
+    (r'\bv\.?\s*(\d+(?:\.\d+)*)\b', 'v_pattern'),
+    (r'\bV\.?\s*(\d+(?:\.\d+)*)\b', 'V_pattern'),
+
+    # Versiones con formato x.x.x
+    (r'\b(\d+\.\d+\.\d+)\b', 'semver'),
+    (r'["\'](\d+\.\d+\.\d+)["\']', 'quoted_semver'),
+    (r'\s(\d+\.\d+\.\d+)\s', 'spaced_semver'),
+
+    # Patrones version con =
+    (r'\bversion\s*=\s*["\']?(\d+\.\d+\.\d+)["\']?', 'version_equals'),
+    (r'\bVersion\s*=\s*["\']?(\d+\.\d+\.\d+)["\']?', 'Version_equals'),
+
+    # Patrones version con :
+    (r'\bversion\s*:\s*["\']?(\d+\.\d+\.\d+)["\']?', 'version_colon'),
+    (r'\bVersion\s*:\s*["\']?(\d+\.\d+\.\d+)["\']?', 'Version_colon'),
+
+    # Patrones adicionales útiles
+    (r'/\*.*?v\.?\s*(\d+\.\d+\.\d+).*?\*/', 'comment_version'),
+    (r'//.*?v\.?\s*(\d+\.\d+\.\d+)', 'line_comment_version'),
+    (r'\brelease[:\s]+["\']?(\d+\.\d+\.\d+)["\']?', 'release'),
+    (r'\bbuild[:\s]+["\']?(\d+\.\d+\.\d+)["\']?', 'build'),
+    (r'@version\s+(\d+\.\d+\.\d+)', 'jsdoc_version'),
+    (r'-(\d+\.\d+\.\d+)\.(?:min\.)?(?:js|css)', 'filename_version'),
+    (r'["\']version["\']\s*:\s*["\'](\d+\.\d+\.\d+)["\']', 'json_version'),
+]
+
+VERSION_PATTERNS = [(re.compile(pattern, re.I), pattern_type) for pattern, pattern_type in VERSION_PATTERN_SOURCES]
+
+VERSION_KEYWORD = re.compile(r'version', re.I)
+VERSION_KEYWORD_ES = re.compile(r'versión', re.I)
+
+
+def scan_content_for_versions(content, file_url, file_type, scan_id, timings=None):
+    """
+    Busca cadenas de versión y librerías en contenido ya descargado
+    (archivos externos y bloques de scripts inline)
+
+    Args:
+        timings: dict opcional donde se acumulan los segundos de las etapas
+            'regex_scan' y 'content_signatures' (ver scan_metrics)
+    """
+    started = time.perf_counter()
+    version_strings = []
+    detected_libraries = []
+
+    # Diccionarios para evitar duplicados por URL fuente
+    # Solo mantenemos la PRIMERA biblioteca y cadena de versión detectada por archivo
+    first_library_per_source = {}
+    first_version_string_per_source = {}
+
+    try:
+        lines = content.split('\n')
+
+        for line_num, line in enumerate(lines, 1):
+            # SOLO LA PRIMERA CADENA DE VERSIÓN POR ARCHIVO
+            if file_url not in first_version_string_per_source:
+
+                # MANTENER funcionalidad existente para compatibilidad
+                if VERSION_KEYWORD.search(line):
+                    first_version_string_per_source[file_url] = {
+                        'scan_id': scan_id,
+                        'file_url': file_url,
+                        'file_type': file_type,
+                        'line_number': line_num,
+                        'line_content': line.strip()[:200],
+                        'version_keyword': 'version'
+                    }
+                    continue
+
+                if VERSION_KEYWORD_ES.search(line):
+                    first_version_string_per_source[file_url] = {
+                        'scan_id': scan_id,
+                        'file_url': file_url,
+                        'file_type': file_type,
+                        'line_number': line_num,
+                        'line_content': line.strip()[:200],
+                        'version_keyword': 'versión'
+                    }
+                    continue
+
+                # NUEVOS PATRONES: Buscar versiones específicas
+                for pattern, pattern_type in VERSION_PATTERNS:
+                    matches = pattern.finditer(line)
+                    for match in matches:
+                        version_number = match.group(1)
+
+                        # Agregar PRIMERA cadena de versión por archivo
+                        first_version_string_per_source[file_url] = {
+                            'scan_id': scan_id,
+                            'file_url': file_url,
+                            'file_type': file_type,
+                            'line_number': line_num,
+                            'line_content': line.strip()[:200],
+                            'version_keyword': pattern_type
+                        }
+                        break  # Solo el primer match por patrón
+
+                    # Si ya encontramos una cadena de versión, salir del bucle de patrones
+                    if file_url in first_version_string_per_source:
+                        break
+
+            # Detectar biblioteca automáticamente - SOLO LA PRIMERA POR URL
+            if file_url not in first_library_per_source:
+                for pattern, pattern_type in VERSION_PATTERNS:
+                    matches = pattern.finditer(line)
+                    for match in matches:
+                        version_number = match.group(1)
+                        library_name = extract_library_name_from_context(line, file_url, version_number)
+                        if library_name:
+                            first_library_per_source[file_url] = {
+                                'name': library_name,
+                                'version': version_number,
+                                'type': file_type,
+                                'source': file_url,
+                                'detection_method': 'version_pattern',
+                                'confidence': 0.6
+                            }
+                            break
+                    if file_url in first_library_per_source:
+                        break
+
+    except Exception as e:
+        logger.warning("  ✗ Error scanning %s: %s", file_url, e)
+
+    regex_done = time.perf_counter()
+
+    # 🚀 FASE 2: DETECCIÓN AVANZADA POR CONTENIDO
+    if CONTENT_DETECTION_AVAILABLE and content and file_url not in first_library_per_source:
+        try:
+            content_detections = detect_libraries_by_content(content, file_type)
+            if content_detections:
+                # Tomar la detección con mayor confianza
+                best_detection = max(content_detections, key=lambda x: x['confidence'])
+                
+                first_library_per_source[file_url] = {
+                    'name': best_detection['library_name'].title(),
+                    'version': best_detection.get('version', 'unknown'),
+                    'type': file_type,
+                    'source': file_url,
+                    'detection_method': 'content_analysis',
+                    'confidence': best_detection.get('confidence', 0.8),
+                    'analysis_details': best_detection.get('details', []),
+                    'matches': best_detection.get('matches', 0)
+                }
+                
+                # Agregar versión string si se detectó versión
+                version = best_detection.get('version', 'unknown')
+                if version != 'unknown' and file_url not in first_version_string_per_source:
+                    first_version_string_per_source[file_url] = {
+                        'scan_id': scan_id,
+                        'file_url': file_url,
+                        'file_type': file_type,
+                        'line_number': 1,  # Línea estimada
+                        'line_content': f'Library detected: {best_detection["library_name"]} v{version}',
+                        'version_keyword': f'{best_detection["library_name"]}_content_analysis'
+                    }
+                
+                logger.debug("  🎯 Content analysis detected: %s v%s (confidence: %.1f, matches: %d)",
+                             best_detection['library_name'], version, best_detection['confidence'],
+                             best_detection.get('matches', 0))
+                
+        except Exception as e:
+            logger.warning("  ⚠️ Error in content analysis for %s: %s", file_url, e)
+
+    if timings is not None:
+        timings['regex_scan'] = timings.get('regex_scan', 0.0) + regex_done - started
+        timings['content_signatures'] = timings.get('content_signatures', 0.0) + time.perf_counter() - regex_done
+
+    # Convertir diccionarios a listas - solo UNA entrada por archivo fuente
+    version_strings = list(first_version_string_per_source.values())
+    detected_libraries = list(first_library_per_source.values())
+    return version_strings, detected_libraries
+
+
+def extract_library_name_from_context(line, file_url, version):
+    """
+    Intenta extraer el nombre de la biblioteca del contexto
+    """
+    line_lower = line.lower()
+    url_lower = file_url.lower()
+
+    # Bibliotecas conocidas en comentarios/líneas
+    LIBRARY_PATTERNS = [
+        ('jquery', 'jQuery'),
+        ('bootstrap', 'Bootstrap'),
+        ('react', 'React'),
+        ('vue', 'Vue.js'),
+        ('angular', 'Angular'),
+        ('lodash', 'Lodash'),
+        ('moment', 'Moment.js'),
+        ('chart', 'Chart.js'),
+        ('d3', 'D3.js'),
+        ('three', 'Three.js'),
+        ('axios', 'Axios'),
+        ('underscore', 'Underscore.js'),
+        ('backbone', 'Backbone.js'),
+        ('ember', 'Ember.js'),
+        ('knockout', 'Knockout.js'),
+        ('handlebars', 'Handlebars.js'),
+        ('mustache', 'Mustache.js'),
+        ('font-awesome', 'Font Awesome'),
+        ('fontawesome', 'Font Awesome'),
+        ('material', 'Material UI'),
+        ('semantic', 'Semantic UI'),
+        ('foundation', 'Foundation'),
+        ('bulma', 'Bulma'),
+        ('tailwind', 'Tailwind CSS'),
+    ]
+
+    # Buscar en la línea
+    for pattern, name in LIBRARY_PATTERNS:
+        if pattern in line_lower or pattern in url_lower:
+            return name
+
+    # Buscar en la URL del archivo
+    filename = file_url.split('/')[-1].lower()
+    for pattern, name in LIBRARY_PATTERNS:
+        if pattern in filename:
+            return name
+
+    # Si no se encuentra, retornar nombre genérico
+    return f"Biblioteca desconocida ({filename.split('.')[0]})" if '.' in filename else "Biblioteca desconocida"
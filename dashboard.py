@@ -1,37 +1,51 @@
 #!/usr/bin/env python3
-from functools import wraps
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, send_file, make_response, session, Response
+from functools import lru_cache, wraps
+from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, send_file, make_response, session, Response, stream_with_context
 import sqlite3
 import json
 import os
 import requests
 import re
 import time
+import threading
 import csv
 import io
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from markupsafe import Markup
+from jinja2 import Undefined
+from itertools import chain, groupby
 from datetime import datetime
 import pytz
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-import pandas as pd
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import generate_etag
 from security_config import rate_limit, log_security_event
+from shared_state import get_state_store, job_heartbeat
+from global_catalog import invalidate_ntg_catalog, bump_catalog_version, cached_for_version, get_global_catalog, PROJECTS_STATE
+from inline_scripts import analyze_inline_scripts, ensure_inline_script_table
+from content_scanner import scan_content_for_versions
+from content_pool import SCANNER_DASHBOARD, submit_content_scan, completed_scan, content_scan_result
+from scan_metrics import ScanMetrics, ensure_scan_metrics_table, record_scan_metrics, render_prometheus, summarize_recent_scans
+from app_logging import get_logger, configure_logging, ScanSummary
+from incremental_scan import (KIND_FILE, KIND_PAGE, ensure_http_validators_table, conditional_headers,
+                              load_validators, save_validators, touch_validators, pack_results,
+                              unpack_results, pack_page, unpack_page)
+from normalized_storage import ensure_normalized_storage, headers_json
+import storage
+from storage import insert_scan
+from retention import ensure_retention_tables, start_retention_worker
+from backup import create_snapshot, start_backup_worker, stream_file
+from report_cache import ensure_report_cache_tables, invalidate_project_reports, get_project_report, set_report_builder
+
+logger = get_logger(__name__)
 
 # Import Fase 2 enhanced detection systems
 try:
-    from library_signatures import detect_libraries_by_content, get_library_info
+    from library_signatures import get_library_info
     CONTENT_DETECTION_AVAILABLE = True
-    print("🎯 Dashboard: Content-based library detection enabled")
+    logger.info("🎯 Dashboard: Content-based library detection enabled")
 except ImportError:
-    print("⚠️ Dashboard: Content-based detection not available")
+    logger.warning("⚠️ Dashboard: Content-based detection not available")
     CONTENT_DETECTION_AVAILABLE = False
 
 
@@ -39,11 +53,24 @@ try:
     from cdn_analyzer import analyze_cdn_url, get_cdn_recommendations, cdn_analyzer
     CDN_ANALYZER_AVAILABLE = True
     supported_cdns = len(cdn_analyzer.get_supported_cdns())
-    print(f"🌐 Dashboard: CDN analyzer enabled ({supported_cdns} CDNs)")
+    logger.info("🌐 Dashboard: CDN analyzer enabled (%d CDNs)", supported_cdns)
 except ImportError:
-    print("⚠️ Dashboard: CDN analyzer not available")
+    logger.warning("⚠️ Dashboard: CDN analyzer not available")
     CDN_ANALYZER_AVAILABLE = False
 
+# Heavy dependencies (bs4, reportlab, openpyxl, numpy/pandas) are imported lazily
+# inside the scan, report and export routes to keep worker startup fast.
+
+def reevaluate_vulnerabilities(conn, global_library_id=None, scan_id=None, library_ids=None, commit=True):
+    """Re-evaluación de libraries.is_vulnerable (numpy/pandas se cargan solo aquí)"""
+    try:
+        from vulnerability_evaluator import reevaluate_library_vulnerabilities
+    except ImportError:
+        logger.warning("⚠️ Dashboard: Bulk vulnerability evaluator not available")
+        return None
+    return reevaluate_library_vulnerabilities(conn, global_library_id=global_library_id, scan_id=scan_id,
+                                              library_ids=library_ids, commit=commit)
+
 app = Flask(__name__)
 csrf = CSRFProtect(app)
 
@@ -76,8 +103,11 @@ app.secret_key = os.environ.get('FLASK_SECRET_KEY') or secrets.token_hex(32)
 ENABLE_ACTION_LOGGING = os.environ.get('ENABLE_ACTION_LOGGING', 'false').lower() == 'true'
 LOGGING_DEBUG = os.environ.get('LOGGING_DEBUG', 'false').lower() == 'true'
 
-print(f"🔧 Action Logging: {'ENABLED' if ENABLE_ACTION_LOGGING else 'DISABLED'}")
-print(f"🔍 Debug Logging: {'ENABLED' if LOGGING_DEBUG else 'DISABLED'}")
+if LOGGING_DEBUG:
+    configure_logging('DEBUG')
+
+logger.info("🔧 Action Logging: %s", 'ENABLED' if ENABLE_ACTION_LOGGING else 'DISABLED')
+logger.info("🔍 Debug Logging: %s", 'ENABLED' if LOGGING_DEBUG else 'DISABLED')
 
 # Add custom Jinja2 filters
 @app.template_filter('tojsonfilter')
@@ -107,11 +137,14 @@ def has_vulnerability_filter(current_version, safe_version):
     return has_vulnerability(current_version, safe_version)
 
 @app.template_global()
-def check_vulnerability_with_global(current_version, individual_safe, global_safe):
+def check_vulnerability_with_global(current_version, individual_safe, global_safe, is_vulnerable=None):
     """
     Template global function to check vulnerability with global fallback
     Usage in template: {{ check_vulnerability_with_global(lib.version, lib.latest_safe_version, lib.gl_latest_safe_version) }}
+    is_vulnerable: libraries.is_vulnerable when the row has it (None = not evaluated yet, compute it)
     """
+    if is_vulnerable is not None and not isinstance(is_vulnerable, Undefined):
+        return bool(is_vulnerable)
     return has_vulnerability(current_version, individual_safe, global_safe_version=global_safe)
 
 @app.template_global()
@@ -139,116 +172,139 @@ def get_effective_safe_version_filter(individual_safe, global_safe):
     """Template filter to get effective safe version"""
     return get_effective_safe_version(individual_safe, global_safe)
 
+# Headers clasificados por prioridad de seguridad (claves en minúsculas)
+SECURITY_HEADERS = {
+    # CRÍTICOS (40% del score)
+    'strict-transport-security': {
+        'name': 'Strict-Transport-Security',
+        'description': 'Enforces HTTPS connections',
+        'recommendation': 'max-age=31536000; includeSubDomains; preload',
+        'priority': 'critical',
+        'weight': 20
+    },
+    'content-security-policy': {
+        'name': 'Content-Security-Policy',
+        'description': 'Controls resource loading and prevents XSS',
+        'recommendation': "default-src 'self'; script-src 'self'; style-src 'self' 'unsafe-inline'",
+        'priority': 'critical',
+        'weight': 20
+    },
+    
+    # ALTOS (30% del score)
+    'x-frame-options': {
+        'name': 'X-Frame-Options',
+        'description': 'Prevents clickjacking attacks',
+        'recommendation': 'DENY or SAMEORIGIN',
+        'priority': 'high',
+        'weight': 10
+    },
+    'x-content-type-options': {
+        'name': 'X-Content-Type-Options',
+        'description': 'Prevents MIME type sniffing',
+        'recommendation': 'nosniff',
+        'priority': 'high',
+        'weight': 10
+    },
+    'cross-origin-embedder-policy': {
+        'name': 'Cross-Origin-Embedder-Policy',
+        'description': 'Controls cross-origin resource embedding',
+        'recommendation': 'require-corp',
+        'priority': 'high',
+        'weight': 5
+    },
+    'cross-origin-opener-policy': {
+        'name': 'Cross-Origin-Opener-Policy',
+        'description': 'Isolates browsing context from cross-origin windows',
+        'recommendation': 'same-origin',
+        'priority': 'high',
+        'weight': 5
+    },
+    
+    # MEDIOS (20% del score)
+    'referrer-policy': {
+        'name': 'Referrer-Policy',
+        'description': 'Controls referrer information leakage',
+        'recommendation': 'strict-origin-when-cross-origin',
+        'priority': 'medium',
+        'weight': 7
+    },
+    'permissions-policy': {
+        'name': 'Permissions-Policy',
+        'description': 'Controls browser API access',
+        'recommendation': 'geolocation=(), microphone=(), camera=()',
+        'priority': 'medium',
+        'weight': 7
+    },
+    'cross-origin-resource-policy': {
+        'name': 'Cross-Origin-Resource-Policy',
+        'description': 'Controls cross-origin resource sharing',
+        'recommendation': 'cross-origin',
+        'priority': 'medium',
+        'weight': 6
+    },
+    
+    # BAJOS (10% del score)
+    'x-xss-protection': {
+        'name': 'X-XSS-Protection',
+        'description': 'Legacy XSS filtering (deprecated, use CSP)',
+        'recommendation': '0 (deprecated, use CSP)',
+        'priority': 'low',
+        'weight': 3
+    },
+    'expect-ct': {
+        'name': 'Expect-CT',
+        'description': 'Certificate Transparency monitoring',
+        'recommendation': 'max-age=86400, enforce',
+        'priority': 'low',
+        'weight': 4
+    },
+    'origin-agent-cluster': {
+        'name': 'Origin-Agent-Cluster',
+        'description': 'Requests origin-keyed agent clustering',
+        'recommendation': '?1',
+        'priority': 'low',
+        'weight': 3
+    }
+}
+
+# Análisis distintos en memoria; los escaneos de un mismo sitio suelen repetir sus headers
+SECURITY_ANALYSIS_CACHE_SIZE = int(os.environ.get('SECURITY_ANALYSIS_CACHE_SIZE', '4096'))
+
+def security_headers_key(headers):
+    """
+    Canonical key of the headers analyze_security_headers looks at:
+    (lowercase name, value) of the security headers present, in SECURITY_HEADERS order
+    """
+    headers_lower = {k.lower(): v for k, v in headers.items()}
+    return tuple((key, headers_lower[key]) for key in SECURITY_HEADERS if key in headers_lower)
+
 def analyze_security_headers(headers):
     """
     Analyzes HTTP headers for security best practices (Enhanced 2024)
     Returns dict with present headers, missing headers, warnings, and weighted security score
+
+    Memoized per distinct set of security headers (LRU of SECURITY_ANALYSIS_CACHE_SIZE):
+    the returned dict is shared between scans and must not be modified.
     """
-    # Headers clasificados por prioridad de seguridad
-    security_headers = {
-        # CRÍTICOS (40% del score)
-        'strict-transport-security': {
-            'name': 'Strict-Transport-Security',
-            'description': 'Enforces HTTPS connections',
-            'recommendation': 'max-age=31536000; includeSubDomains; preload',
-            'priority': 'critical',
-            'weight': 20
-        },
-        'content-security-policy': {
-            'name': 'Content-Security-Policy',
-            'description': 'Controls resource loading and prevents XSS',
-            'recommendation': "default-src 'self'; script-src 'self'; style-src 'self' 'unsafe-inline'",
-            'priority': 'critical',
-            'weight': 20
-        },
-        
-        # ALTOS (30% del score)
-        'x-frame-options': {
-            'name': 'X-Frame-Options',
-            'description': 'Prevents clickjacking attacks',
-            'recommendation': 'DENY or SAMEORIGIN',
-            'priority': 'high',
-            'weight': 10
-        },
-        'x-content-type-options': {
-            'name': 'X-Content-Type-Options',
-            'description': 'Prevents MIME type sniffing',
-            'recommendation': 'nosniff',
-            'priority': 'high',
-            'weight': 10
-        },
-        'cross-origin-embedder-policy': {
-            'name': 'Cross-Origin-Embedder-Policy',
-            'description': 'Controls cross-origin resource embedding',
-            'recommendation': 'require-corp',
-            'priority': 'high',
-            'weight': 5
-        },
-        'cross-origin-opener-policy': {
-            'name': 'Cross-Origin-Opener-Policy',
-            'description': 'Isolates browsing context from cross-origin windows',
-            'recommendation': 'same-origin',
-            'priority': 'high',
-            'weight': 5
-        },
-        
-        # MEDIOS (20% del score)
-        'referrer-policy': {
-            'name': 'Referrer-Policy',
-            'description': 'Controls referrer information leakage',
-            'recommendation': 'strict-origin-when-cross-origin',
-            'priority': 'medium',
-            'weight': 7
-        },
-        'permissions-policy': {
-            'name': 'Permissions-Policy',
-            'description': 'Controls browser API access',
-            'recommendation': 'geolocation=(), microphone=(), camera=()',
-            'priority': 'medium',
-            'weight': 7
-        },
-        'cross-origin-resource-policy': {
-            'name': 'Cross-Origin-Resource-Policy',
-            'description': 'Controls cross-origin resource sharing',
-            'recommendation': 'cross-origin',
-            'priority': 'medium',
-            'weight': 6
-        },
-        
-        # BAJOS (10% del score)
-        'x-xss-protection': {
-            'name': 'X-XSS-Protection',
-            'description': 'Legacy XSS filtering (deprecated, use CSP)',
-            'recommendation': '0 (deprecated, use CSP)',
-            'priority': 'low',
-            'weight': 3
-        },
-        'expect-ct': {
-            'name': 'Expect-CT',
-            'description': 'Certificate Transparency monitoring',
-            'recommendation': 'max-age=86400, enforce',
-            'priority': 'low',
-            'weight': 4
-        },
-        'origin-agent-cluster': {
-            'name': 'Origin-Agent-Cluster',
-            'description': 'Requests origin-keyed agent clustering',
-            'recommendation': '?1',
-            'priority': 'low',
-            'weight': 3
-        }
-    }
+    key = security_headers_key(headers)
+    try:
+        return _analyze_security_headers_key(key)
+    except TypeError:
+        # Unhashable header value (not a string): analyze without caching
+        return _analyze_security_headers_key.__wrapped__(key)
 
-    # Convert headers to lowercase for case-insensitive comparison
-    headers_lower = {k.lower(): v for k, v in headers.items()}
+@lru_cache(maxsize=SECURITY_ANALYSIS_CACHE_SIZE)
+def _analyze_security_headers_key(key):
+    """analyze_security_headers on a security_headers_key"""
+    headers_lower = dict(key)
 
     present_headers = []
     missing_headers = []
     warnings = []
-    total_weight = sum(header_info['weight'] for header_info in security_headers.values())
+    total_weight = sum(header_info['weight'] for header_info in SECURITY_HEADERS.values())
     achieved_weight = 0
 
-    for header_key, header_info in security_headers.items():
+    for header_key, header_info in SECURITY_HEADERS.items():
         if header_key in headers_lower:
             header_value = headers_lower[header_key]
             present_headers.append({
@@ -279,7 +335,7 @@ def analyze_security_headers(headers):
         'missing': missing_headers,
         'warnings': warnings,
         'security_score': weighted_score,
-        'priority_breakdown': _calculate_priority_breakdown(present_headers, security_headers)
+        'priority_breakdown': _calculate_priority_breakdown(present_headers, SECURITY_HEADERS)
     }
 
 
@@ -391,23 +447,31 @@ def _calculate_priority_breakdown(present_headers, security_headers):
 
 def init_database():
     """Initialize database tables if they don't exist"""
+    if storage.get_storage().dialect == 'postgresql':
+        # Esquema único (storage.POSTGRES_SCHEMA); las migraciones de abajo son de SQLite
+        storage.get_storage().ensure_schema()
+        return
+
     conn = sqlite3.connect('analysis.db')
     cursor = conn.cursor()
 
+    # Solo tiene efecto en una base nueva; las existentes las convierte retention.py
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
     # Check if database needs migration for new library columns
     try:
         cursor.execute("SELECT description FROM libraries LIMIT 1")
     except sqlite3.OperationalError:
         # Columns don't exist, need to add them
-        print("🔄 Migrating database: Adding new library management columns...")
+        logger.info("🔄 Migrating database: Adding new library management columns...")
         try:
             cursor.execute("ALTER TABLE libraries ADD COLUMN description TEXT")
             cursor.execute("ALTER TABLE libraries ADD COLUMN latest_safe_version TEXT")
             cursor.execute("ALTER TABLE libraries ADD COLUMN latest_version TEXT")
             cursor.execute("ALTER TABLE libraries ADD COLUMN is_manual INTEGER DEFAULT 0")
-            print("✅ Database migration completed successfully!")
+            logger.info("✅ Database migration completed successfully!")
         except sqlite3.OperationalError as e:
-            print(f"⚠️ Migration warning: {e}")
+            logger.warning("⚠️ Migration warning: %s", e)
             # Columns might already exist, continue
 
     conn.commit()
@@ -452,6 +516,15 @@ def init_database():
     )
     ''')
 
+    # Resultados por hash de los bloques <script> inline ya analizados
+    ensure_inline_script_table(cursor)
+
+    # Tiempos por etapa de cada escaneo (/metrics y página de rendimiento)
+    ensure_scan_metrics_table(cursor)
+
+    # Validadores HTTP y análisis reutilizables por URL (re-escaneo incremental)
+    ensure_http_validators_table(cursor)
+
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS file_urls (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -508,7 +581,7 @@ def init_database():
         cursor.execute("SELECT project_id FROM scans LIMIT 1")
     except sqlite3.OperationalError:
         cursor.execute("ALTER TABLE scans ADD COLUMN project_id INTEGER")
-        print("✅ Added project_id column to scans table")
+        logger.info("✅ Added project_id column to scans table")
 
     # Add role column to users table if it doesn't exist
     try:
@@ -517,21 +590,59 @@ def init_database():
         cursor.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'admin'")
         # Migrate existing users to admin role
         cursor.execute("UPDATE users SET role = 'admin' WHERE role IS NULL OR role = ''")
-        print("✅ Added role column to users table and migrated existing users to admin")
+        logger.info("✅ Added role column to users table and migrated existing users to admin")
 
     # Add reviewed column to scans table if it doesn't exist
     try:
         cursor.execute("SELECT reviewed FROM scans LIMIT 1")
     except sqlite3.OperationalError:
         cursor.execute("ALTER TABLE scans ADD COLUMN reviewed INTEGER DEFAULT 0")
-        print("✅ Added reviewed column to scans table")
+        logger.info("✅ Added reviewed column to scans table")
 
     # Add global_library_id column to libraries table if it doesn't exist
     try:
         cursor.execute("SELECT global_library_id FROM libraries LIMIT 1")
     except sqlite3.OperationalError:
         cursor.execute("ALTER TABLE libraries ADD COLUMN global_library_id INTEGER REFERENCES global_libraries(id) ON DELETE SET NULL")
-        print("✅ Added global_library_id column to libraries table")
+        logger.info("✅ Added global_library_id column to libraries table")
+
+    # Add is_vulnerable column (materialized by vulnerability_evaluator) if it doesn't exist
+    backfill_vulnerabilities = False
+    try:
+        cursor.execute("SELECT is_vulnerable FROM libraries LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE libraries ADD COLUMN is_vulnerable INTEGER")
+        backfill_vulnerabilities = True
+        logger.info("✅ Added is_vulnerable column to libraries table")
+
+    # Re-escaneo incremental: escaneo cuyo análisis de página se reutilizó y archivos sin cambios (304)
+    try:
+        cursor.execute("SELECT base_scan_id FROM scans LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE scans ADD COLUMN base_scan_id INTEGER")
+        logger.info("✅ Added base_scan_id column to scans table")
+    try:
+        cursor.execute("SELECT not_modified FROM file_urls LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE file_urls ADD COLUMN not_modified INTEGER DEFAULT 0")
+        logger.info("✅ Added not_modified column to file_urls table")
+
+    # Diccionario de URLs y headers deduplicados; scans, libraries, file_urls y
+    # version_strings pasan a ser vistas sobre las tablas *_data
+    ensure_normalized_storage(conn)
+
+    # Bulk re-evaluation filters libraries by global_library_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_libraries_global_lib ON libraries_data(global_library_id)")
+    # Reviewed scans per project (consolidated report and its cache watermark)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scans_project_id ON scans_data(project_id, reviewed)")
+    # Navegación entre escaneos de la misma URL (scan_detail)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scans_url ON scans_data(url, scan_date)")
+
+    # Resúmenes de los escaneos archivados por retention.py (historial de URL)
+    ensure_retention_tables(conn)
+
+    # Reportes consolidados por proyecto ya renderizados (report_cache.py)
+    ensure_report_cache_tables(conn)
 
     # Add action_history table for audit trail if it doesn't exist
     try:
@@ -568,9 +679,15 @@ def init_database():
         cursor.execute("CREATE INDEX idx_action_history_target_id ON action_history(target_id)")
         cursor.execute("CREATE INDEX idx_action_history_session_id ON action_history(session_id)")
 
-        print("✅ Created action_history table with indexes for audit trail")
+        logger.info("✅ Created action_history table with indexes for audit trail")
 
     conn.commit()
+
+    # Las librerías guardadas antes de la columna se evalúan una vez; las nuevas la traen al insertarse
+    if backfill_vulnerabilities:
+        result = reevaluate_vulnerabilities(conn)
+        if result:
+            logger.info("✅ Evaluated is_vulnerable for %d existing libraries", result['evaluated'])
     conn.close()
 
 def compare_versions(version1, version2):
@@ -652,41 +769,21 @@ def create_default_admin():
     conn.close()
 
 def get_db_connection():
-    """Crea una conexión ultra-optimizada a la base de datos con manejo robusto de concurrencia"""
-    import time
-    import random
+    """Conexión del pool de storage.py (SQLite o PostgreSQL según STORAGE_BACKEND); close() la devuelve"""
+    return storage.connect()
 
-    # Retry en la conexión misma si es necesario
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Agregar pequeño delay aleatorio para distribuir conexiones
-            if attempt > 0:
-                time.sleep(random.uniform(0.05, 0.1))
-
-            conn = sqlite3.connect('analysis.db', timeout=60.0)  # Timeout aumentado
-            conn.row_factory = sqlite3.Row
-
-            # Configuración ultra-optimizada para concurrencia máxima
-            conn.execute('PRAGMA journal_mode=WAL')           # Write-Ahead Logging
-            conn.execute('PRAGMA synchronous=NORMAL')         # Balance seguridad/velocidad
-            conn.execute('PRAGMA temp_store=memory')          # Temp files en memoria
-            conn.execute('PRAGMA busy_timeout=60000')         # 60 segundos timeout
-            conn.execute('PRAGMA cache_size=-128000')         # 128MB cache (más grande)
-            conn.execute('PRAGMA wal_autocheckpoint=500')     # Checkpoints más frecuentes
-            conn.execute('PRAGMA page_size=32768')            # Page size más grande
-            conn.execute('PRAGMA mmap_size=268435456')        # 256MB memory mapping
-            conn.execute('PRAGMA wal_timeout=30000')          # 30s timeout para WAL
-            conn.execute('PRAGMA optimize')                   # Optimizar automáticamente
-
-            return conn
+def project_choices(conn):
+    """Proyectos activos (id, name) para los selectores; en memoria hasta que cambie un proyecto"""
+    return cached_for_version(conn, PROJECTS_STATE, lambda c: [dict(row) for row in storage.active_projects(c)],
+                              storage.database_key(conn))
 
-        except sqlite3.OperationalError as e:
-            if attempt < max_retries - 1:
-                print(f"Error conectando a BD (intento {attempt + 1}): {e}")
-                continue
-            else:
-                raise
+def current_global_catalog(conn):
+    """Catálogo global en memoria (global_catalog.GlobalCatalog); se recarga cuando cambia su versión"""
+    return get_global_catalog(conn, storage.database_key(conn))
+
+def invalidate_project_choices(conn):
+    """Tras crear, editar o desactivar proyectos (dentro de la transacción del llamador)"""
+    bump_catalog_version(conn, PROJECTS_STATE)
 
 def row_to_dict(row):
     """Convert sqlite3.Row to dictionary for compatibility"""
@@ -769,13 +866,11 @@ def log_user_action(action_type, target_table, target_id=None, target_descriptio
     """
     # Verificar si el logging está habilitado
     if not ENABLE_ACTION_LOGGING:
-        if LOGGING_DEBUG:
-            print(f"[DEBUG] Action logging disabled, skipping: {action_type} on {target_table}")
+        logger.debug("Action logging disabled, skipping: %s on %s", action_type, target_table)
         return
 
     import time
     import random
-    import threading
 
     # Configuración más agresiva para resolver conflictos
     max_retries = 5
@@ -812,17 +907,12 @@ def log_user_action(action_type, target_table, target_id=None, target_descriptio
             # Usar transacción IMMEDIATE para reducir conflicts
             conn.execute('BEGIN IMMEDIATE')
 
-            conn.execute('''
-                INSERT INTO action_history (
-                    user_id, username, user_role, action_type, target_table,
-                    target_id, target_description, data_before, data_after,
-                    ip_address, user_agent, success, error_message, session_id, notes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id, username, user_role, action_type, target_table,
-                target_id, target_description, data_before_json, data_after_json,
-                ip_address, user_agent, success, error_message, session_id, notes
-            ))
+            storage.record_action(
+                conn, user_id=user_id, username=username, user_role=user_role,
+                action_type=action_type, target_table=target_table, target_id=target_id,
+                target_description=target_description, data_before=data_before_json,
+                data_after=data_after_json, ip_address=ip_address, user_agent=user_agent,
+                success=success, error_message=error_message, session_id=session_id, notes=notes)
 
             conn.commit()
             return  # Éxito, salir del loop
@@ -844,13 +934,11 @@ def log_user_action(action_type, target_table, target_id=None, target_descriptio
                     delay += random.uniform(0.5, 1.0)
 
                 time.sleep(delay)
-                if LOGGING_DEBUG:
-                    print(f"[DEBUG] Database locked, reintentando en {delay:.2f}s (intento {attempt + 1}/{max_retries}) - Thread: {threading.current_thread().ident} - Action: {action_type} on {target_table}")
-                else:
-                    print(f"Database locked, reintentando en {delay:.2f}s (intento {attempt + 1}/{max_retries})")
+                logger.warning("Database locked, reintentando en %.2fs (intento %d/%d) - Action: %s on %s",
+                               delay, attempt + 1, max_retries, action_type, target_table)
                 continue
             else:
-                print(f"Error de base de datos en historial (intento {attempt + 1}): {e}")
+                logger.error("Error de base de datos en historial (intento %d): %s", attempt + 1, e)
                 if conn:
                     try:
                         conn.rollback()
@@ -858,7 +946,7 @@ def log_user_action(action_type, target_table, target_id=None, target_descriptio
                         pass
                 break
         except Exception as e:
-            print(f"Error al registrar acción en historial (intento {attempt + 1}): {e}")
+            logger.error("Error al registrar acción en historial (intento %d): %s", attempt + 1, e)
             if conn:
                 try:
                     conn.rollback()
@@ -927,7 +1015,7 @@ def log_batch_actions(actions_list):
                 ))
 
             conn.commit()
-            print(f"✅ Registradas {len(actions_list)} acciones en lote")
+            logger.info("✅ Registradas %d acciones en lote", len(actions_list))
             return  # Éxito
 
         except sqlite3.OperationalError as e:
@@ -939,10 +1027,10 @@ def log_batch_actions(actions_list):
                         pass
                 delay = base_delay * (2 ** attempt) + random.uniform(0, 0.1)
                 time.sleep(delay)
-                print(f"Database locked en lote, reintentando en {delay:.2f}s (intento {attempt + 1}/{max_retries})")
+                logger.warning("Database locked en lote, reintentando en %.2fs (intento %d/%d)", delay, attempt + 1, max_retries)
                 continue
             else:
-                print(f"Error de base de datos en lote (intento {attempt + 1}): {e}")
+                logger.error("Error de base de datos en lote (intento %d): %s", attempt + 1, e)
                 if conn:
                     try:
                         conn.rollback()
@@ -950,7 +1038,7 @@ def log_batch_actions(actions_list):
                         pass
                 break
         except Exception as e:
-            print(f"Error en logging de lote (intento {attempt + 1}): {e}")
+            logger.error("Error en logging de lote (intento %d): %s", attempt + 1, e)
             if conn:
                 try:
                     conn.rollback()
@@ -986,7 +1074,7 @@ def get_record_data(table_name, record_id):
         return None
 
     except Exception as e:
-        print(f"Error al obtener datos del registro {table_name}#{record_id}: {e}")
+        logger.warning("Error al obtener datos del registro %s#%s: %s", table_name, record_id, e)
         return None
     finally:
         conn.close()
@@ -1115,7 +1203,7 @@ def log_action_async(action_type, target_table, get_target_id=None, get_descript
                                 success=True
                             )
                         except Exception as e:
-                            print(f"⚠️ Background logging failed: {e}")
+                            logger.warning("⚠️ Background logging failed: %s", e)
 
                     # Solo hacer logging si está habilitado
                     if ENABLE_ACTION_LOGGING:
@@ -1123,7 +1211,7 @@ def log_action_async(action_type, target_table, get_target_id=None, get_descript
                         thread.start()
 
                 except Exception as e:
-                    print(f"⚠️ Error setting up background logging: {e}")
+                    logger.warning("⚠️ Error setting up background logging: %s", e)
 
                 return result
 
@@ -1328,7 +1416,7 @@ def index():
     stats['vulnerable_scans'] = vulnerable_scans_count
 
     # Get projects for filter dropdown
-    projects = conn.execute('SELECT id, name FROM projects WHERE is_active = 1 ORDER BY name').fetchall()
+    projects = project_choices(conn)
     selected_project = None
     if project_id_param and project_id_param != 'null':
         try:
@@ -1351,7 +1439,7 @@ def index():
         LEFT JOIN version_strings vs ON s.id = vs.scan_id
         LEFT JOIN file_urls fu ON s.id = fu.scan_id
         {where_clause}
-        GROUP BY s.id
+        GROUP BY s.id, c.name
         ORDER BY scan_date DESC
         LIMIT ? OFFSET ?
     '''
@@ -1470,71 +1558,13 @@ def index():
 def scan_detail(scan_id):
     conn = get_db_connection()
 
-    # Get scan details with project information
-    scan = conn.execute('''
-        SELECT s.*, c.name as project_name
-        FROM scans s
-        LEFT JOIN projects c ON s.project_id = c.id
-        WHERE s.id = ?
-    ''', (scan_id,)).fetchone()
-    if not scan:
+    # Escaneo, librerías, archivos, version strings agrupadas y navegación en una consulta
+    detail = storage.scan_detail(conn, scan_id)
+    if not detail:
+        conn.close()
         return "Scan not found", 404
 
-    libraries = conn.execute('''
-        SELECT
-            l.id, l.library_name, l.version, l.type, l.source_url, l.description,
-            l.latest_safe_version, l.latest_version, l.is_manual, l.global_library_id,
-            gl.latest_safe_version as gl_latest_safe_version,
-            gl.latest_version as gl_latest_version
-        FROM libraries l
-        LEFT JOIN global_libraries gl ON l.global_library_id = gl.id
-        WHERE l.scan_id = ? AND l.type = 'js'
-        ORDER BY l.type, l.library_name
-    ''', (scan_id,)).fetchall()
-
-    # Get version strings for this scan (JavaScript files only)
-    version_strings_raw = conn.execute('''
-        SELECT id, file_url, file_type, line_number, line_content, version_keyword
-        FROM version_strings
-        WHERE scan_id = ? AND file_type = 'js'
-        ORDER BY file_url, line_number
-    ''', (scan_id,)).fetchall()
-
-    # Group version strings by file_url to avoid duplicates
-    version_strings_grouped = {}
-    for vs in version_strings_raw:
-        file_url = vs['file_url']
-        if file_url not in version_strings_grouped:
-            version_strings_grouped[file_url] = {
-                'id': vs['id'],  # Use first occurrence ID for operations
-                'file_url': file_url,
-                'file_type': vs['file_type'],
-                'lines': [],
-                'version_keywords': set(),
-                'lines_count': 0,
-                'all_ids': []  # Keep track of all IDs for deletion
-            }
-
-        version_strings_grouped[file_url]['lines'].append({
-            'id': vs['id'],
-            'line_number': vs['line_number'],
-            'line_content': vs['line_content'],
-            'version_keyword': vs['version_keyword']
-        })
-        version_strings_grouped[file_url]['version_keywords'].add(vs['version_keyword'])
-        version_strings_grouped[file_url]['lines_count'] += 1
-        version_strings_grouped[file_url]['all_ids'].append(vs['id'])
-
-    # Convert to list and sort by file_url
-    version_strings = sorted(version_strings_grouped.values(), key=lambda x: x['file_url'])
-
-    # Get JavaScript file URLs for this scan (CSS excluded)
-    file_urls = conn.execute('''
-        SELECT id, file_url, file_type, file_size, status_code
-        FROM file_urls
-        WHERE scan_id = ? AND file_type = 'js'
-        ORDER BY file_type, file_url
-    ''', (scan_id,)).fetchall()
+    scan = detail['scan']
 
     # Parse headers
     headers = json.loads(scan['headers']) if scan['headers'] else {}
@@ -1542,67 +1572,27 @@ def scan_detail(scan_id):
     # Analyze security headers
     security_analysis = analyze_security_headers(headers)
 
-    # Get all active projects for the edit modal
-    projects = conn.execute('''
-        SELECT id, name
-        FROM projects
-        WHERE is_active = 1
-        ORDER BY name
-    ''').fetchall()
-
-    # Get all global libraries for association dropdown
-    global_libraries = conn.execute('SELECT id, library_name, type, latest_safe_version, latest_version FROM global_libraries ORDER BY library_name').fetchall()
-
-    # Get navigation info for scans of the same URL
-    url_scans = conn.execute('''
-        SELECT id, scan_date
-        FROM scans
-        WHERE url = ?
-        ORDER BY scan_date ASC
-    ''', (scan['url'],)).fetchall()
-
-    # Find current position and navigation
-    scan_navigation = {
-        'current_position': 0,
-        'total_scans': len(url_scans),
-        'previous_scan_id': None,
-        'next_scan_id': None
-    }
-
-    for i, url_scan in enumerate(url_scans):
-        if url_scan['id'] == scan_id:
-            scan_navigation['current_position'] = i + 1
-            if i > 0:
-                scan_navigation['previous_scan_id'] = url_scans[i - 1]['id']
-            if i < len(url_scans) - 1:
-                scan_navigation['next_scan_id'] = url_scans[i + 1]['id']
-            break
+    # Proyectos del formulario (en memoria mientras no cambien); el selector de
+    # librería global se carga bajo demanda desde /api/global-libraries/search
+    projects = project_choices(conn)
 
     conn.close()
 
     return render_template('scan_detail.html',
                          scan=scan,
-                         libraries=libraries,
-                         version_strings=version_strings,
-                         file_urls=file_urls,
+                         libraries=detail['libraries'],
+                         version_strings=detail['version_strings'],
+                         file_urls=detail['file_urls'],
                          headers=headers,
                          security_analysis=security_analysis,
                          projects=projects,
-                         global_libraries=global_libraries,
-                         scan_navigation=scan_navigation)
+                         scan_navigation=detail['navigation'])
 
 @app.route('/api/scans')
 @login_required
 def api_scans():
     conn = get_db_connection()
-    scans = conn.execute('''
-        SELECT s.id, s.url, s.scan_date, s.status_code, s.title,
-               COUNT(l.id) as library_count
-        FROM scans s
-        LEFT JOIN libraries l ON s.id = l.scan_id
-        GROUP BY s.id
-        ORDER BY scan_date DESC
-    ''').fetchall()
+    scans = storage.list_scans_with_library_counts(conn)
     conn.close()
 
     return jsonify([dict(scan) for scan in scans])
@@ -1642,41 +1632,12 @@ def api_version_strings():
 @login_required
 def api_stats():
     conn = get_db_connection()
+    try:
+        stats = storage.library_stats(conn)
+    finally:
+        conn.close()
 
-    stats = {
-        'overview': conn.execute('''
-            SELECT
-                COUNT(DISTINCT s.id) as total_scans,
-                COUNT(CASE WHEN s.status_code = 200 THEN s.id END) as successful_scans,
-                COUNT(DISTINCT library_name) as unique_libraries,
-                COUNT(vs.id) as total_version_strings
-            FROM scans s
-            LEFT JOIN libraries l ON s.id = l.scan_id
-            LEFT JOIN version_strings vs ON s.id = vs.scan_id
-        ''').fetchone(),
-
-        'library_types': conn.execute('''
-            SELECT type, COUNT(*) as count
-            FROM libraries
-            GROUP BY type
-        ''').fetchall(),
-
-        'popular_libraries': conn.execute('''
-            SELECT library_name, COUNT(*) as usage_count
-            FROM libraries
-            GROUP BY library_name
-            ORDER BY usage_count DESC
-            LIMIT 10
-        ''').fetchall()
-    }
-
-    conn.close()
-
-    return jsonify({
-        'overview': dict(stats['overview']),
-        'library_types': [dict(row) for row in stats['library_types']],
-        'popular_libraries': [dict(row) for row in stats['popular_libraries']]
-    })
+    return jsonify(stats)
 
 @app.route('/statistics')
 @login_required
@@ -1761,7 +1722,7 @@ def statistics():
             LEFT JOIN version_strings vs ON s.id = vs.scan_id
             LEFT JOIN file_urls fu ON s.id = fu.scan_id
             WHERE s.id IN ({placeholders})
-            GROUP BY s.id
+            GROUP BY s.id, c.name
             ORDER BY s.scan_date DESC
         '''
         scans_raw = conn.execute(scans_query, paginated_vulnerable_ids).fetchall()
@@ -1837,6 +1798,7 @@ def reset_database():
         # Close any existing connections first
         import gc
         gc.collect()
+        storage.get_storage().close_all()
 
         # Remove the database file completely
         db_path = 'analysis.db'
@@ -1872,16 +1834,17 @@ def toggle_reviewed(scan_id):
     conn = get_db_connection()
     try:
         # Get current reviewed status
-        current_status = conn.execute('SELECT reviewed FROM scans WHERE id = ?', (scan_id,)).fetchone()
-        if not current_status:
+        current_status = storage.get_scan_reviewed(conn, scan_id)
+        if current_status is None:
             flash('Escaneo no encontrado', 'error')
             return redirect(request.referrer or url_for('index'))
 
         # Toggle the status
-        new_status = 1 if not current_status['reviewed'] else 0
+        new_status = 1 if not current_status else 0
 
         # Update the scan
-        conn.execute('UPDATE scans SET reviewed = ? WHERE id = ?', (new_status, scan_id))
+        storage.set_scan_reviewed(conn, scan_id, new_status)
+        invalidate_project_reports(conn, scan_ids=[scan_id])
         conn.commit()
 
         status_text = 'marcado como revisado' if new_status else 'marcado como no revisado'
@@ -1902,13 +1865,10 @@ def toggle_reviewed(scan_id):
 def delete_scan(scan_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
 
         # Delete related records first (foreign key constraints)
-        cursor.execute('DELETE FROM version_strings WHERE scan_id = ?', (scan_id,))
-        cursor.execute('DELETE FROM file_urls WHERE scan_id = ?', (scan_id,))
-        cursor.execute('DELETE FROM libraries WHERE scan_id = ?', (scan_id,))
-        cursor.execute('DELETE FROM scans WHERE id = ?', (scan_id,))
+        invalidate_project_reports(conn, scan_ids=[scan_id])
+        storage.delete_scans(conn, [scan_id])
 
         conn.commit()
         conn.close()
@@ -1975,7 +1935,8 @@ def update_scan_project(scan_id):
         if project_id:
             project_name = cursor.execute('SELECT name FROM projects WHERE id = ?', (project_id,)).fetchone()['name']
 
-        # Update the scan with the new project_id
+        # Update the scan with the new project_id (reports of the old and new project change)
+        invalidate_project_reports(conn, scan_ids=[scan_id], project_ids=[project_id])
         cursor.execute('UPDATE scans SET project_id = ? WHERE id = ?', (project_id, scan_id))
         conn.commit()
         conn.close()
@@ -2025,7 +1986,8 @@ def update_scan_project_dashboard(scan_id):
         if project_id:
             project_name = cursor.execute('SELECT name FROM projects WHERE id = ?', (project_id,)).fetchone()['name']
 
-        # Update the scan with the new project_id
+        # Update the scan with the new project_id (reports of the old and new project change)
+        invalidate_project_reports(conn, scan_ids=[scan_id], project_ids=[project_id])
         cursor.execute('UPDATE scans SET project_id = ? WHERE id = ?', (project_id, scan_id))
         conn.commit()
         conn.close()
@@ -2094,6 +2056,7 @@ def bulk_update_scan_project():
             project_name = project['name']
 
         # Update all selected scans
+        invalidate_project_reports(conn, scan_ids=scan_ids, project_ids=[project_id])
         placeholders = ','.join(['?'] * len(scan_ids))
         query = f'UPDATE scans SET project_id = ? WHERE id IN ({placeholders})'
         cursor.execute(query, [project_id] + scan_ids)
@@ -2135,18 +2098,10 @@ def bulk_delete_scans():
             return redirect(url_for('index'))
 
         conn = get_db_connection()
-        cursor = conn.cursor()
 
         # Delete related records first for all scans (foreign key constraints)
-        placeholders = ','.join(['?'] * len(scan_ids))
-        cursor.execute(f'DELETE FROM version_strings WHERE scan_id IN ({placeholders})', scan_ids)
-        cursor.execute(f'DELETE FROM file_urls WHERE scan_id IN ({placeholders})', scan_ids)
-        cursor.execute(f'DELETE FROM libraries WHERE scan_id IN ({placeholders})', scan_ids)
-        
-        # Delete the scans
-        cursor.execute(f'DELETE FROM scans WHERE id IN ({placeholders})', scan_ids)
-
-        deleted_count = cursor.rowcount
+        invalidate_project_reports(conn, scan_ids=scan_ids)
+        deleted_count = storage.delete_scans(conn, scan_ids)
         conn.commit()
         conn.close()
 
@@ -2195,11 +2150,17 @@ def re_scan_url(scan_id):
 
         conn.close()
 
-        # Re-analyze the URL using existing function
-        result = analyze_single_url(original_scan['url'], project_id=original_scan['project_id'])
+        # Re-escaneo incremental (peticiones condicionales); full=1 fuerza el análisis completo
+        incremental = request.form.get('full') != '1'
+        result = analyze_single_url(original_scan['url'], project_id=original_scan['project_id'],
+                                    incremental=incremental)
 
         if result['success']:
-            flash(f'¡Re-escaneo completado! Se encontraron {result["libraries_count"]} librerías, {result["files_count"]} archivos, y {result["version_strings_count"]} cadenas de versión.', 'success')
+            unchanged = ''
+            if incremental and (result['page_unchanged'] or result['unchanged_files']):
+                unchanged = (f' {result["unchanged_files"]} de {result["files_count"]} archivos sin cambios'
+                             f'{" y página sin cambios" if result["page_unchanged"] else ""} desde el escaneo anterior.')
+            flash(f'¡Re-escaneo completado! Se encontraron {result["libraries_count"]} librerías, {result["files_count"]} archivos, y {result["version_strings_count"]} cadenas de versión.{unchanged}', 'success')
             return redirect(url_for('scan_detail', scan_id=result['scan_id']))
         else:
             flash(f'Re-escaneo fallido: {result["error"]}', 'error')
@@ -2225,14 +2186,28 @@ def url_history(scan_id):
             return redirect(url_for('index'))
 
         url = original_scan['url']
+        # retention.py (y sus tablas scan_rollups/library_timelines) solo existe en SQLite
+        archived = storage.dialect_of(conn) == 'sqlite'
 
         # Get all scans for this URL with additional details
-        scans = conn.execute('''
+        # (los escaneos archivados por retention.py vienen de scan_rollups)
+        archived_scans = '''
+            UNION ALL
+            SELECT r.id, ? as url, r.scan_date, r.status_code, r.title, r.project_id,
+                   p.name as project_name,
+                   r.library_count, r.version_string_count, r.file_count,
+                   1 as archived
+            FROM scan_rollups r
+            LEFT JOIN projects p ON r.project_id = p.id AND p.is_active = 1
+            WHERE r.url_id = (SELECT id FROM urls WHERE url = ?)
+        ''' if archived else ''
+        scans = conn.execute(f'''
             SELECT s.id, s.url, s.scan_date, s.status_code, s.title, s.project_id,
                    p.name as project_name,
                    COUNT(DISTINCT l.id) as library_count,
                    COUNT(DISTINCT vs.id) as version_string_count,
-                   COUNT(DISTINCT fu.id) as file_count
+                   COUNT(DISTINCT fu.id) as file_count,
+                   0 as archived
             FROM scans s
             LEFT JOIN projects p ON s.project_id = p.id AND p.is_active = 1
             LEFT JOIN libraries l ON s.id = l.scan_id
@@ -2240,24 +2215,52 @@ def url_history(scan_id):
             LEFT JOIN file_urls fu ON s.id = fu.scan_id
             WHERE s.url = ?
             GROUP BY s.id, s.url, s.scan_date, s.status_code, s.title, s.project_id, p.name
-            ORDER BY s.scan_date DESC
-        ''', (url,)).fetchall()
+            {archived_scans}
+            ORDER BY scan_date DESC
+        ''', (url, url, url) if archived else (url,)).fetchall()
 
         # Get latest safe version and latest version for each library across all scans
-        library_summary = conn.execute('''
+        # (escaneos vigentes + resumen compacto de los archivados). Las filas de
+        # conteo traen escaneos distintos por librería y las de versión suman 0,
+        # así un escaneo con dos versiones de la misma librería cuenta una vez
+        archived_libraries = '''
+                UNION ALL
+                SELECT library_name, NULLIF(type, ''), NULL, scan_count, first_seen, last_seen
+                FROM library_rollups
+                WHERE url_id = (SELECT id FROM urls WHERE url = ?)
+                UNION ALL
+                SELECT library_name, NULLIF(type, ''), NULLIF(version, ''), 0, first_seen, last_seen
+                FROM library_timelines
+                WHERE url_id = (SELECT id FROM urls WHERE url = ?)
+        ''' if archived else ''
+        library_summary = conn.execute(f'''
             SELECT
-                l.library_name,
-                l.type,
-                COUNT(DISTINCT s.id) as scan_count,
-                MIN(s.scan_date) as first_detected,
-                MAX(s.scan_date) as last_detected,
-                GROUP_CONCAT(DISTINCT l.version) as versions_found
-            FROM libraries l
-            JOIN scans s ON l.scan_id = s.id
-            WHERE s.url = ?
-            GROUP BY l.library_name, l.type
-            ORDER BY l.library_name
-        ''', (url,)).fetchall()
+                library_name,
+                type,
+                SUM(scan_count) as scan_count,
+                MIN(first_detected) as first_detected,
+                MAX(last_detected) as last_detected,
+                GROUP_CONCAT(DISTINCT version) as versions_found
+            FROM (
+                SELECT l.library_name, l.type, NULL as version,
+                       COUNT(DISTINCT s.id) as scan_count,
+                       MIN(s.scan_date) as first_detected,
+                       MAX(s.scan_date) as last_detected
+                FROM libraries l
+                JOIN scans s ON l.scan_id = s.id
+                WHERE s.url = ?
+                GROUP BY l.library_name, l.type
+                UNION ALL
+                SELECT l.library_name, l.type, l.version, 0, MIN(s.scan_date), MAX(s.scan_date)
+                FROM libraries l
+                JOIN scans s ON l.scan_id = s.id
+                WHERE s.url = ?
+                GROUP BY l.library_name, l.type, l.version
+                {archived_libraries}
+            ) summary
+            GROUP BY library_name, type
+            ORDER BY library_name
+        ''', (url, url, url, url) if archived else (url, url)).fetchall()
 
         conn.close()
 
@@ -2495,6 +2498,7 @@ def delete_version_string(version_string_ids):
         # Delete all version strings with the provided IDs
         placeholders = ','.join('?' * len(ids))
         deleted_count = cursor.execute(f'DELETE FROM version_strings WHERE id IN ({placeholders})', ids).rowcount
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2535,6 +2539,7 @@ def batch_delete_version_strings():
         # Delete selected version strings (secure SQL with proper parameterization)
         placeholders = ','.join(['?'] * len(version_string_ids))
         cursor.execute(f'DELETE FROM version_strings WHERE id IN ({placeholders})', tuple(version_string_ids))
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2576,6 +2581,7 @@ def batch_delete_file_urls():
         # Delete selected file URLs (secure SQL with proper parameterization)
         placeholders = ','.join(['?'] * len(file_url_ids))
         cursor.execute(f'DELETE FROM file_urls WHERE id IN ({placeholders})', tuple(file_url_ids))
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2608,6 +2614,7 @@ def delete_individual_file_url(file_url_id):
         file_url = file_url_record['file_url']
 
         cursor.execute('DELETE FROM file_urls WHERE id = ?', (file_url_id,))
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2653,6 +2660,8 @@ def add_manual_library():
         ''', (scan_id, library_name, version or None, library_type, source_url or None,
               description or None, latest_safe_version or None, latest_version or None,
               global_library_id if global_library_id and global_library_id.isdigit() else None))
+        reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2723,6 +2732,8 @@ def edit_library(library_id):
         ''', (library_name, version or None, library_type, source_url or None,
               description or None, latest_safe_version or None, latest_version or None,
               global_library_id if global_library_id and global_library_id.isdigit() else None, library_id))
+        reevaluate_vulnerabilities(conn, library_ids=[library_id], commit=False)
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2751,6 +2762,7 @@ def delete_library(library_id):
         library_name = library['library_name']
 
         cursor.execute('DELETE FROM libraries WHERE id = ?', (library_id,))
+        invalidate_project_reports(conn, scan_ids=[scan_id])
 
         conn.commit()
         conn.close()
@@ -2767,6 +2779,181 @@ def delete_library(library_id):
         flash(f'Error al eliminar librería: {str(e)}', 'error')
         return redirect(request.referrer or url_for('index'))
 
+# ========================================
+# EXPORTACIONES EN STREAMING
+# ========================================
+
+EXPORT_FETCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def iter_query(query, params=(), fetch_size=EXPORT_FETCH_SIZE, setup=None):
+    """
+    Itera un SELECT en bloques de fetch_size filas con su propia conexión.
+    Pensado para respuestas en streaming: la conexión se cierra al agotar el generador.
+    setup(conn) permite registrar funciones SQL antes de ejecutar la consulta.
+    """
+    conn = get_db_connection()
+    try:
+        if setup:
+            setup(conn)
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def _buffered_chunks(pieces, chunk_size=EXPORT_CHUNK_SIZE):
+    """Agrupa fragmentos pequeños de texto en chunks de ~chunk_size para la respuesta"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_csv(rows):
+    """Genera el CSV por chunks a partir de un iterable de filas (listas)"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row in rows:
+        writer.writerow(row)
+        if output.tell() >= EXPORT_CHUNK_SIZE:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+    yield output.getvalue()
+
+class JsonObjectStream:
+    """Objeto JSON cuyos pares (clave, valor) se producen de forma perezosa"""
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+def _iter_json(value, indent, level):
+    if isinstance(value, (dict, JsonObjectStream)):
+        pairs = value.items() if isinstance(value, dict) else value.pairs
+        opener, closer = '{', '}'
+    elif isinstance(value, (list, tuple)) or hasattr(value, '__next__'):
+        pairs = ((None, item) for item in value)
+        opener, closer = '[', ']'
+    else:
+        yield json.dumps(value, ensure_ascii=False, default=str)
+        return
+
+    inner = '\n' + ' ' * (indent * (level + 1))
+    empty = True
+    for key, item in pairs:
+        yield (opener if empty else ',') + inner
+        empty = False
+        if key is not None:
+            yield json.dumps(str(key), ensure_ascii=False) + ': '
+        yield from _iter_json(item, indent, level + 1)
+    yield opener + closer if empty else '\n' + ' ' * (indent * level) + closer
+
+def stream_json(value, indent=2):
+    """
+    Serializa value a JSON de forma incremental. Listas, generadores y JsonObjectStream
+    se recorren sin materializarse, por lo que la memoria no depende del número de filas.
+    """
+    return _buffered_chunks(_iter_json(value, indent, 0))
+
+def streaming_download(chunks, mimetype, filename):
+    """Respuesta de descarga que envía los chunks a medida que se generan"""
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def register_vulnerability_function(conn):
+    """
+    Expone has_vulnerability como función SQL para filtrar/contar dentro de la consulta.
+    Retorna False si el backend no admite funciones Python (PostgreSQL).
+    """
+    if storage.dialect_of(conn) != 'sqlite':
+        return False
+    conn.create_function(
+        'has_vulnerability', 2,
+        lambda version, safe_version: 1 if has_vulnerability(version, safe_version) else 0,
+        deterministic=True
+    )
+    return True
+
+# Escaneos con librerías vulnerables; has_vulnerability corre dentro de SQLite por librería
+VULNERABLE_SCANS_QUERY = '''
+    SELECT * FROM (
+        SELECT
+            s.id,
+            s.url,
+            s.title,
+            s.scan_date,
+            s.status_code,
+            c.name as project_name,
+            (SELECT COUNT(*) FROM libraries l2 WHERE l2.scan_id = s.id) as library_count,
+            (SELECT COUNT(*) FROM file_urls f WHERE f.scan_id = s.id) as file_count,
+            (SELECT COUNT(*)
+             FROM libraries l
+             LEFT JOIN global_libraries gl ON l.library_name = gl.library_name AND l.type = gl.type
+             WHERE l.scan_id = s.id
+             AND COALESCE(l.latest_safe_version, gl.latest_safe_version) IS NOT NULL
+             AND l.version IS NOT NULL
+             AND l.version != ''
+             AND has_vulnerability(l.version, COALESCE(l.latest_safe_version, gl.latest_safe_version))
+            ) as vulnerability_count
+        FROM scans s
+        LEFT JOIN projects c ON s.project_id = c.id
+    ) vulnerable
+    WHERE vulnerability_count > 0
+    ORDER BY scan_date DESC
+'''
+
+# Sin funciones SQL: las librerías con versión segura, por escaneo, y has_vulnerability en Python
+VULNERABLE_SCANS_PORTABLE_QUERY = '''
+    SELECT
+        s.id,
+        s.url,
+        s.title,
+        s.scan_date,
+        s.status_code,
+        c.name as project_name,
+        (SELECT COUNT(*) FROM libraries l2 WHERE l2.scan_id = s.id) as library_count,
+        (SELECT COUNT(*) FROM file_urls f WHERE f.scan_id = s.id) as file_count,
+        l.version,
+        COALESCE(l.latest_safe_version, gl.latest_safe_version) as safe_version
+    FROM scans s
+    LEFT JOIN projects c ON s.project_id = c.id
+    JOIN libraries l ON l.scan_id = s.id
+    LEFT JOIN global_libraries gl ON l.library_name = gl.library_name AND l.type = gl.type
+    WHERE COALESCE(l.latest_safe_version, gl.latest_safe_version) IS NOT NULL
+    AND l.version IS NOT NULL
+    AND l.version != ''
+    ORDER BY s.scan_date DESC, s.id
+'''
+
+VULNERABLE_SCAN_FIELDS = ('id', 'url', 'title', 'scan_date', 'status_code', 'project_name',
+                          'library_count', 'file_count')
+
+def iter_vulnerable_scans():
+    """Escaneos con vulnerability_count > 0, del más reciente al más antiguo, como dicts"""
+    if storage.get_storage().dialect == 'sqlite':
+        for scan in iter_query(VULNERABLE_SCANS_QUERY, setup=register_vulnerability_function):
+            yield dict(scan)
+        return
+    for _, rows in groupby(iter_query(VULNERABLE_SCANS_PORTABLE_QUERY), key=lambda row: row['id']):
+        rows = list(rows)
+        vulnerability_count = sum(1 for row in rows if has_vulnerability(row['version'], row['safe_version']))
+        if vulnerability_count:
+            scan = {field: rows[0][field] for field in VULNERABLE_SCAN_FIELDS}
+            scan['vulnerability_count'] = vulnerability_count
+            yield scan
+
 def get_scan_export_data(scan_id):
     """Get all scan data for export"""
     conn = get_db_connection()
@@ -2863,6 +3050,7 @@ def get_project_consolidated_data(project_id):
             'consolidated_file_urls': [], 
             'consolidated_headers': {},
             'consolidated_security_analysis': {},
+            'attention_entries': {'vulnerable': [], 'unknown': []},
             'urls_data': [],
             'project_stats': {
                 'total_urls': 0,
@@ -2909,26 +3097,35 @@ def get_project_consolidated_data(project_id):
     
     conn.close()
     
+    # Rows -> dicts once; the per-URL lists below share these dicts
+    all_libraries = [dict(lib) for lib in all_libraries]
+    all_file_urls = [dict(f) for f in all_file_urls]
+    
     # Process and deduplicate libraries across URLs
     consolidated_libraries = deduplicate_libraries(all_libraries)
     
     # Consolidate security headers from all scans
     consolidated_headers, consolidated_security_analysis = consolidate_security_headers(scans)
     
+    # Group libraries and files by scan in one pass (query order is kept inside each group)
+    libraries_by_scan = {}
+    for lib in all_libraries:
+        libraries_by_scan.setdefault(lib['scan_id'], []).append(lib)
+    files_by_scan = {}
+    for f in all_file_urls:
+        files_by_scan.setdefault(f['scan_id'], []).append(f)
+    
     # Create URL-specific data for detailed view
     urls_data = []
     for scan in scans:
-        url_libraries = [lib for lib in all_libraries if lib['scan_id'] == scan['id']]
-        url_files = [f for f in all_file_urls if f['scan_id'] == scan['id']]
-        
         # Parse headers for this specific URL
         scan_headers = json.loads(scan['headers']) if scan['headers'] else {}
         url_security_analysis = analyze_security_headers(scan_headers)
         
         urls_data.append({
-            'scan': convert_rows_deep(scan),
-            'libraries': convert_rows_deep(url_libraries),
-            'file_urls': convert_rows_deep(url_files),
+            'scan': dict(scan),
+            'libraries': libraries_by_scan.get(scan['id'], []),
+            'file_urls': files_by_scan.get(scan['id'], []),
             'headers': scan_headers,
             'security_analysis': url_security_analysis
         })
@@ -2937,10 +3134,11 @@ def get_project_consolidated_data(project_id):
     project_stats = calculate_project_stats(scans, consolidated_libraries, all_file_urls)
     
     result = {
+        'attention_entries': library_attention_entries(consolidated_libraries, all_libraries),
         'project': convert_rows_deep(project),
         'scans': convert_rows_deep(scans),
         'consolidated_libraries': consolidated_libraries,
-        'consolidated_file_urls': convert_rows_deep(all_file_urls),
+        'consolidated_file_urls': all_file_urls,
         'consolidated_version_strings': convert_rows_deep(all_version_strings),
         'consolidated_headers': consolidated_headers,
         'consolidated_security_analysis': consolidated_security_analysis,
@@ -2950,6 +3148,10 @@ def get_project_consolidated_data(project_id):
     
     return result
 
+def library_key(lib):
+    """Consolidation key: library name and version"""
+    return (lib['library_name'], lib['version'] or 'unknown')
+
 def deduplicate_libraries(all_libraries):
     """
     Deduplicate libraries across URLs:
@@ -2957,30 +3159,39 @@ def deduplicate_libraries(all_libraries):
     - Keep track of which URLs use each library
     - Maintain vulnerability information
     - Track source URLs and scan URLs separately
+
+    Single pass: membership is checked against per-key sets, the lists only
+    keep first-seen order for the report.
     """
     libraries_dict = {}
+    seen_urls = {}  # key -> (scan URLs, source URLs)
     
     for lib in all_libraries:
-        key = f"{lib['library_name']}_{lib['version'] or 'unknown'}"
+        key = library_key(lib)
         
-        if key not in libraries_dict:
+        lib_dict = libraries_dict.get(key)
+        if lib_dict is None:
             lib_dict = dict(lib)
-            lib_dict['used_in_urls'] = [lib['url']]  # scan URLs
-            lib_dict['source_urls_list'] = [lib['source_url']] if lib['source_url'] else []
-            lib_dict['scan_count'] = 1
+            lib_dict['used_in_urls'] = []  # scan URLs
+            lib_dict['source_urls_list'] = []
+            lib_dict['scan_count'] = 0
             # Add scan_url field for clarity
-            lib_dict['scan_urls'] = [lib['url']]
+            lib_dict['scan_urls'] = []
             libraries_dict[key] = lib_dict
-        else:
-            # Add scan URL to the list if not already present
-            if lib['url'] not in libraries_dict[key]['used_in_urls']:
-                libraries_dict[key]['used_in_urls'].append(lib['url'])
-                libraries_dict[key]['scan_urls'].append(lib['url'])
-                libraries_dict[key]['scan_count'] += 1
-            
-            # Add source URL if not already present and not null
-            if lib['source_url'] and lib['source_url'] not in libraries_dict[key]['source_urls_list']:
-                libraries_dict[key]['source_urls_list'].append(lib['source_url'])
+            seen_urls[key] = (set(), set())
+        scan_urls, source_urls = seen_urls[key]
+        
+        # Add scan URL to the list if not already present
+        if lib['url'] not in scan_urls:
+            scan_urls.add(lib['url'])
+            lib_dict['used_in_urls'].append(lib['url'])
+            lib_dict['scan_urls'].append(lib['url'])
+            lib_dict['scan_count'] += 1
+        
+        # Add source URL if not already present and not null
+        if lib['source_url'] and lib['source_url'] not in source_urls:
+            source_urls.add(lib['source_url'])
+            lib_dict['source_urls_list'].append(lib['source_url'])
     
     # Convert back to list and sort
     consolidated = list(libraries_dict.values())
@@ -2988,6 +3199,41 @@ def deduplicate_libraries(all_libraries):
     
     return consolidated
 
+def library_attention_entries(consolidated_libraries, all_libraries):
+    """
+    Entries for the "requires attention" table of the consolidated report:
+    one per library/version, site and source URL actually observed together,
+    split into vulnerable and unknown (no safe version known), sorted by site
+    """
+    status = {}
+    for lib in consolidated_libraries:
+        if check_vulnerability_with_global(lib.get('version'), lib.get('latest_safe_version'),
+                                           lib.get('gl_latest_safe_version')):
+            status[library_key(lib)] = ('vulnerable', lib)
+        elif not lib.get('latest_safe_version') and not lib.get('gl_latest_safe_version'):
+            status[library_key(lib)] = ('unknown', lib)
+    
+    entries = {'vulnerable': [], 'unknown': []}
+    seen = set()
+    for row in all_libraries:
+        key = library_key(row)
+        if key not in status or (key, row['url'], row['source_url']) in seen:
+            continue
+        seen.add((key, row['url'], row['source_url']))
+        group, lib = status[key]
+        entries[group].append({
+            'scan_url': row['url'],
+            'source_url': row['source_url'],
+            'library_name': lib['library_name'],
+            'version': lib.get('version'),
+            'description': lib.get('description'),
+            'latest_safe_version': lib.get('latest_safe_version'),
+            'gl_latest_safe_version': lib.get('gl_latest_safe_version')
+        })
+    for group in entries.values():
+        group.sort(key=lambda entry: (entry['scan_url'], entry['library_name'], entry['version'] or ''))
+    return entries
+
 def consolidate_security_headers(scans):
     """
     Consolidate security headers from multiple scans:
@@ -2996,19 +3242,11 @@ def consolidate_security_headers(scans):
     - Generate consolidated recommendations
     """
     all_headers = {}
-    security_analyses = []
     
     # Process each scan's headers
     for scan in scans:
         scan_headers = json.loads(scan['headers']) if scan['headers'] else {}
         all_headers[scan['url']] = scan_headers
-        
-        # Get security analysis for this scan
-        security_analysis = analyze_security_headers(scan_headers)
-        security_analyses.append({
-            'url': scan['url'],
-            'analysis': security_analysis
-        })
     
     # Consolidate security analysis across all URLs
     all_security_headers = {
@@ -3123,51 +3361,78 @@ def enhanced_report(scan_id):
                              headers=data['headers'])
 
     except Exception as e:
-        print(f"Enhanced report error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Enhanced report error: %s", e)
         flash(f'Error al generar reporte: {str(e)}', 'error')
         return redirect(url_for('scan_detail', scan_id=scan_id))
 
+PROJECT_REPORT_TEMPLATE = 'project_consolidated_report.html'
+REPORT_CONTENT_SLOT = '<!--report-content-->'
+REPORT_SCRIPTS_SLOT = '<!--report-scripts-->'
+
+def render_project_report(project_id):
+    """
+    Render the heavy blocks (content and scripts) of the consolidated report.
+    Used by report_cache; returns None when the project does not exist.
+    """
+    data = get_project_consolidated_data(project_id)
+    if not data:
+        return None
+    if not data['scans']:
+        return {'content_html': '', 'scripts_html': '', 'scan_count': 0}
+    
+    context = dict(data, project_stats_json=json.dumps(data['project_stats']))
+    # Rendered outside of any user request (background rebuilds): the blocks
+    # only use the report data, url_for and the template filters
+    with app.test_request_context(f'/report/project/{project_id}'):
+        app.update_template_context(context)
+        template = app.jinja_env.get_template(PROJECT_REPORT_TEMPLATE)
+        template_context = template.new_context(context)
+        return {
+            'content_html': ''.join(template.blocks['content'](template_context)),
+            'scripts_html': ''.join(template.blocks['scripts'](template_context)),
+            'scan_count': len(data['scans'])
+        }
+
+def _project_report_format():
+    """Cached reports are rebuilt when the report template changes"""
+    try:
+        return str(int(os.path.getmtime(os.path.join(app.root_path, app.template_folder, PROJECT_REPORT_TEMPLATE))))
+    except OSError:
+        return ''
+
+set_report_builder(render_project_report, _project_report_format())
+
 @app.route('/report/project/<int:project_id>')
 @login_required
 def project_consolidated_report(project_id):
-    """Display consolidated HTML report for project with all reviewed scans"""
+    """Display consolidated HTML report for project with all reviewed scans (served from report_cache)"""
     try:
-        data = get_project_consolidated_data(project_id)
-        if not data:
+        conn = get_db_connection()
+        project = conn.execute('SELECT * FROM projects WHERE id = ? AND is_active = 1', (project_id,)).fetchone()
+        conn.close()
+        report = get_project_report(project_id) if project else None
+        if not report:
             flash('Proyecto no encontrado', 'error')
             return redirect(url_for('projects'))
         
         # Check if project has any reviewed scans
-        if not data['scans']:
+        if not report['scan_count']:
             flash('No hay escaneos revisados en este proyecto para generar el reporte', 'warning')
             return redirect(url_for('project_detail', project_id=project_id))
         
-        # Pre-serialize data to JSON for JavaScript
-        import json
-        consolidated_libraries_json = json.dumps(data['consolidated_libraries'])
-        urls_data_json = json.dumps(data['urls_data'])
-        project_stats_json = json.dumps(data['project_stats'])
-        
-        return render_template('project_consolidated_report.html',
-                             project=data['project'],
-                             scans=data['scans'],
-                             consolidated_libraries=data['consolidated_libraries'],
-                             consolidated_libraries_json=consolidated_libraries_json,
-                             consolidated_file_urls=data['consolidated_file_urls'],
-                             consolidated_version_strings=data['consolidated_version_strings'],
-                             consolidated_headers=data['consolidated_headers'],
-                             consolidated_security_analysis=data['consolidated_security_analysis'],
-                             urls_data=data['urls_data'],
-                             urls_data_json=urls_data_json,
-                             project_stats=data['project_stats'],
-                             project_stats_json=project_stats_json)
+        # The page shell is rendered per request (session, flashes); the cached
+        # blocks are spliced in as separate chunks instead of being copied into it
+        page = render_template('project_consolidated_report_cached.html',
+                               project=dict(project),
+                               report_content=Markup(REPORT_CONTENT_SLOT),
+                               report_scripts=Markup(REPORT_SCRIPTS_SLOT))
+        head, rest = page.split(REPORT_CONTENT_SLOT, 1)
+        middle, tail = rest.split(REPORT_SCRIPTS_SLOT, 1)
+        return Response([head, report['content_html'], middle, report['scripts_html'], tail],
+                        mimetype='text/html')
     
     except Exception as e:
-        print(f"Project consolidated report error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Project consolidated report error: %s", e)
         flash(f'Error al generar reporte consolidado: {str(e)}', 'error')
         return redirect(url_for('project_detail', project_id=project_id))
 
@@ -3205,6 +3470,12 @@ def export_pdf(scan_id):
 
 def create_basic_pdf_report(data):
     """Fallback basic PDF generation"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch)
     styles = getSampleStyleSheet()
@@ -3440,6 +3711,9 @@ def export_excel(scan_id):
             flash('Escaneo no encontrado', 'error')
             return redirect(url_for('index'))
 
+        import openpyxl
+        from openpyxl.styles import Font, PatternFill
+
         # Create Excel workbook in memory
         output = io.BytesIO()
         workbook = openpyxl.Workbook()
@@ -3685,13 +3959,12 @@ def export_excel(scan_id):
         return redirect(url_for('scan_detail', scan_id=scan_id))
 
 # Import analyzer functionality
-def detect_js_libraries(soup, base_url):
+def detect_js_libraries(assets, base_url):
     libraries = []
 
     # jQuery detection
-    jquery_scripts = soup.find_all('script', src=re.compile(r'jquery', re.I))
-    for script in jquery_scripts:
-        src = script.get('src', '')
+    jquery_scripts = assets.scripts_matching(re.compile(r'jquery', re.I))
+    for src in jquery_scripts:
         version_match = re.search(r'jquery[-.]?(\d+\.\d+\.\d+)', src, re.I)
         if version_match:
             libraries.append({
@@ -3702,9 +3975,8 @@ def detect_js_libraries(soup, base_url):
             })
 
     # React detection
-    react_scripts = soup.find_all('script', src=re.compile(r'react', re.I))
-    for script in react_scripts:
-        src = script.get('src', '')
+    react_scripts = assets.scripts_matching(re.compile(r'react', re.I))
+    for src in react_scripts:
         version_match = re.search(r'react[-.]?(\d+\.\d+\.\d+)', src, re.I)
         if version_match:
             libraries.append({
@@ -3715,9 +3987,8 @@ def detect_js_libraries(soup, base_url):
             })
 
     # Vue.js detection
-    vue_scripts = soup.find_all('script', src=re.compile(r'vue', re.I))
-    for script in vue_scripts:
-        src = script.get('src', '')
+    vue_scripts = assets.scripts_matching(re.compile(r'vue', re.I))
+    for src in vue_scripts:
         version_match = re.search(r'vue[-.]?(\d+\.\d+\.\d+)', src, re.I)
         if version_match:
             libraries.append({
@@ -3728,9 +3999,8 @@ def detect_js_libraries(soup, base_url):
             })
 
     # Bootstrap JS detection
-    bootstrap_scripts = soup.find_all('script', src=re.compile(r'bootstrap', re.I))
-    for script in bootstrap_scripts:
-        src = script.get('src', '')
+    bootstrap_scripts = assets.scripts_matching(re.compile(r'bootstrap', re.I))
+    for src in bootstrap_scripts:
         version_match = re.search(r'bootstrap[-.]?(\d+\.\d+\.\d+)', src, re.I)
         if version_match:
             libraries.append({
@@ -3741,9 +4011,8 @@ def detect_js_libraries(soup, base_url):
             })
 
     # Angular detection
-    angular_scripts = soup.find_all('script', src=re.compile(r'angular', re.I))
-    for script in angular_scripts:
-        src = script.get('src', '')
+    angular_scripts = assets.scripts_matching(re.compile(r'angular', re.I))
+    for src in angular_scripts:
         version_match = re.search(r'angular[-.]?(\d+\.\d+\.\d+)', src, re.I)
         if version_match:
             libraries.append({
@@ -3755,13 +4024,12 @@ def detect_js_libraries(soup, base_url):
 
     return libraries
 
-def detect_css_libraries(soup, base_url):
+def detect_css_libraries(assets, base_url):
     libraries = []
 
     # Bootstrap CSS detection
-    bootstrap_links = soup.find_all('link', href=re.compile(r'bootstrap', re.I))
-    for link in bootstrap_links:
-        href = link.get('href', '')
+    bootstrap_links = assets.links_matching(re.compile(r'bootstrap', re.I))
+    for href in bootstrap_links:
         version_match = re.search(r'bootstrap[-.]?(\d+\.\d+\.\d+)', href, re.I)
         if version_match:
             libraries.append({
@@ -3772,9 +4040,8 @@ def detect_css_libraries(soup, base_url):
             })
 
     # Font Awesome detection
-    fa_links = soup.find_all('link', href=re.compile(r'font-?awesome', re.I))
-    for link in fa_links:
-        href = link.get('href', '')
+    fa_links = assets.links_matching(re.compile(r'font-?awesome', re.I))
+    for href in fa_links:
         version_match = re.search(r'font-?awesome[-.]?(\d+\.\d+\.\d+)', href, re.I)
         if version_match:
             libraries.append({
@@ -3786,239 +4053,97 @@ def detect_css_libraries(soup, base_url):
 
     return libraries
 
-def scan_file_for_versions(file_url, file_type, scan_id):
-    """
-    Enhanced version scanning with multiple patterns and automatic library detection
+def submit_file_scan(file_url, file_type, scan_id, metrics=None, validator=None):
     """
-    version_strings = []
-    detected_libraries = []
-
-    # Diccionarios para evitar duplicados por URL fuente
-    # Solo mantenemos la PRIMERA biblioteca y cadena de versión detectada por archivo
-    first_library_per_source = {}
-    first_version_string_per_source = {}
-
-    # Patrones de versión solicitados por el usuario
-    VERSION_PATTERNS = [
-        # Patrones v/V con números
-        (r'\bv\.?\s*(\d+(?:\.\d+)*)\b', 'v_pattern'),
-        (r'\bV\.?\s*(\d+(?:\.\d+)*)\b', 'V_pattern'),
-
-        # Versiones con formato x.x.x
-        (r'\b(\d+\.\d+\.\d+)\b', 'semver'),
-        (r'["\'](\d+\.\d+\.\d+)["\']', 'quoted_semver'),
-        (r'\s(\d+\.\d+\.\d+)\s', 'spaced_semver'),
-
-        # Patrones version con =
-        (r'\bversion\s*=\s*["\']?(\d+\.\d+\.\d+)["\']?', 'version_equals'),
-        (r'\bVersion\s*=\s*["\']?(\d+\.\d+\.\d+)["\']?', 'Version_equals'),
-
-        # Patrones version con :
-        (r'\bversion\s*:\s*["\']?(\d+\.\d+\.\d+)["\']?', 'version_colon'),
-        (r'\bVersion\s*:\s*["\']?(\d+\.\d+\.\d+)["\']?', 'Version_colon'),
-
-        # Patrones adicionales útiles
-        (r'/\*.*?v\.?\s*(\d+\.\d+\.\d+).*?\*/', 'comment_version'),
-        (r'//.*?v\.?\s*(\d+\.\d+\.\d+)', 'line_comment_version'),
-        (r'\brelease[:\s]+["\']?(\d+\.\d+\.\d+)["\']?', 'release'),
-        (r'\bbuild[:\s]+["\']?(\d+\.\d+\.\d+)["\']?', 'build'),
-        (r'@version\s+(\d+\.\d+\.\d+)', 'jsdoc_version'),
-        (r'-(\d+\.\d+\.\d+)\.(?:min\.)?(?:js|css)', 'filename_version'),
-        (r'["\']version["\']\s*:\s*["\'](\d+\.\d+\.\d+)["\']', 'json_version'),
-    ]
+    Descarga el archivo (I/O, en este hilo) y envía su contenido a la etapa de CPU
+    (content_pool). Retorna (ContentScan, fetch); el análisis se lee con
+    content_scan_result()
 
+    Con validator (re-escaneo incremental) la petición es condicional y un 304
+    reutiliza el análisis guardado del archivo. fetch lleva estado, tamaño y
+    cabeceras de la respuesta para collect_file_scans().
+    """
+    metrics = metrics or ScanMetrics()
+    fetch = {'url': file_url, 'type': file_type, 'status_code': 0, 'size': None,
+             'not_modified': False, 'headers': None}
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-
-        response = requests.get(file_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            content = response.text
-            lines = content.split('\n')
-
-            for line_num, line in enumerate(lines, 1):
-                # SOLO LA PRIMERA CADENA DE VERSIÓN POR ARCHIVO
-                if file_url not in first_version_string_per_source:
-
-                    # MANTENER funcionalidad existente para compatibilidad
-                    if re.search(r'version', line, re.I):
-                        first_version_string_per_source[file_url] = {
-                            'scan_id': scan_id,
-                            'file_url': file_url,
-                            'file_type': file_type,
-                            'line_number': line_num,
-                            'line_content': line.strip()[:200],
-                            'version_keyword': 'version'
-                        }
-                        continue
-
-                    if re.search(r'versión', line, re.I):
-                        first_version_string_per_source[file_url] = {
-                            'scan_id': scan_id,
-                            'file_url': file_url,
-                            'file_type': file_type,
-                            'line_number': line_num,
-                            'line_content': line.strip()[:200],
-                            'version_keyword': 'versión'
-                        }
-                        continue
-
-                    # NUEVOS PATRONES: Buscar versiones específicas
-                    for pattern, pattern_type in VERSION_PATTERNS:
-                        matches = re.finditer(pattern, line, re.I)
-                        for match in matches:
-                            version_number = match.group(1)
-
-                            # Agregar PRIMERA cadena de versión por archivo
-                            first_version_string_per_source[file_url] = {
-                                'scan_id': scan_id,
-                                'file_url': file_url,
-                                'file_type': file_type,
-                                'line_number': line_num,
-                                'line_content': line.strip()[:200],
-                                'version_keyword': pattern_type
-                            }
-                            break  # Solo el primer match por patrón
-
-                        # Si ya encontramos una cadena de versión, salir del bucle de patrones
-                        if file_url in first_version_string_per_source:
-                            break
-
-                # Detectar biblioteca automáticamente - SOLO LA PRIMERA POR URL
-                if file_url not in first_library_per_source:
-                    for pattern, pattern_type in VERSION_PATTERNS:
-                        matches = re.finditer(pattern, line, re.I)
-                        for match in matches:
-                            version_number = match.group(1)
-                            library_name = extract_library_name_from_context(line, file_url, version_number)
-                            if library_name:
-                                first_library_per_source[file_url] = {
-                                    'name': library_name,
-                                    'version': version_number,
-                                    'type': file_type,
-                                    'source': file_url,
-                                    'detection_method': 'version_pattern',
-                                    'confidence': 0.6
-                                }
-                                break
-                        if file_url in first_library_per_source:
-                            break
-
+        headers.update(conditional_headers(validator))
+
+        with metrics.stage('file_downloads'):
+            response = requests.get(file_url, headers=headers, timeout=10)
+        metrics.count('file_bytes', len(response.content))
+        fetch['status_code'] = response.status_code
+
+        if validator and response.status_code == 304:
+            metrics.count('not_modified')
+            fetch.update(status_code=200, size=validator['size'], not_modified=True)
+            content_scan = completed_scan(unpack_results(validator['analysis'], scan_id))
+        elif response.status_code != 200:
+            content_scan = completed_scan()
+        else:
+            fetch.update(size=len(response.content), headers=response.headers)
+            content_scan = submit_content_scan(SCANNER_DASHBOARD, response.content, response.encoding, file_url,
+                                               file_type, scan_id, local_scan=scan_content_for_versions)
     except Exception as e:
-        print(f"  ✗ Error scanning {file_url}: {str(e)}")
+        logger.warning("  ✗ Error scanning %s: %s", file_url, e)
+        content_scan = completed_scan()
 
-    # 🚀 FASE 2: DETECCIÓN AVANZADA POR CONTENIDO
-    if CONTENT_DETECTION_AVAILABLE and 'content' in locals() and content and file_url not in first_library_per_source:
-        try:
-            content_detections = detect_libraries_by_content(content, file_type)
-            if content_detections:
-                # Tomar la detección con mayor confianza
-                best_detection = max(content_detections, key=lambda x: x['confidence'])
-                
-                first_library_per_source[file_url] = {
-                    'name': best_detection['library_name'].title(),
-                    'version': best_detection.get('version', 'unknown'),
-                    'type': file_type,
-                    'source': file_url,
-                    'detection_method': 'content_analysis',
-                    'confidence': best_detection.get('confidence', 0.8),
-                    'analysis_details': best_detection.get('details', []),
-                    'matches': best_detection.get('matches', 0)
-                }
-                
-                # Agregar versión string si se detectó versión
-                version = best_detection.get('version', 'unknown')
-                if version != 'unknown' and file_url not in first_version_string_per_source:
-                    first_version_string_per_source[file_url] = {
-                        'scan_id': scan_id,
-                        'file_url': file_url,
-                        'file_type': file_type,
-                        'line_number': 1,  # Línea estimada
-                        'line_content': f'Library detected: {best_detection["library_name"]} v{version}',
-                        'version_keyword': f'{best_detection["library_name"]}_content_analysis'
-                    }
-                
-                print(f"  🎯 Content analysis detected: {best_detection['library_name']} v{version} (confidence: {best_detection['confidence']:.1f}, matches: {best_detection.get('matches', 0)})")
-                
-        except Exception as e:
-            print(f"  ⚠️ Error in content analysis for {file_url}: {str(e)}")
+    return content_scan, fetch
 
-    # Convertir diccionarios a listas - solo UNA entrada por archivo fuente
-    version_strings = list(first_version_string_per_source.values())
-    detected_libraries = list(first_library_per_source.values())
-    return version_strings, detected_libraries
 
+def collect_file_scans(conn, pending_scans, scan_id, metrics):
+    """
+    Resultados de submit_file_scan() en orden; guarda los validadores HTTP de los
+    archivos descargados para el próximo re-escaneo incremental
 
+    Returns:
+        (version_strings, detected_libraries) de todos los archivos
+    """
+    all_version_strings = []
+    all_detected_libraries = []
+    for content_scan, fetch in pending_scans:
+        version_strings, detected_libraries = content_scan_result(content_scan, metrics)
+        if fetch['not_modified']:
+            touch_validators(conn, fetch['url'], KIND_FILE, scan_id)
+        elif fetch['headers'] is not None:
+            save_validators(conn, fetch['url'], KIND_FILE, fetch['headers'], fetch['size'],
+                            pack_results(version_strings, detected_libraries), scan_id)
+        all_version_strings.extend(version_strings)
+        all_detected_libraries.extend(detected_libraries)
+    return all_version_strings, all_detected_libraries
+
+
+def store_fetched_file_urls(pending_scans, scan_id, cursor):
+    """file_urls con el estado y tamaño de los GET del escaneo (re-escaneo incremental, sin HEAD)"""
+    cursor.executemany('''
+    INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code, not_modified)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(scan_id, fetch['url'], fetch['type'], fetch['size'], fetch['status_code'], int(fetch['not_modified']))
+          for _, fetch in pending_scans])
 
 
-def extract_library_name_from_context(line, file_url, version):
+def scan_file_for_versions(file_url, file_type, scan_id):
     """
-    Intenta extraer el nombre de la biblioteca del contexto
+    Enhanced version scanning with multiple patterns and automatic library detection
     """
-    line_lower = line.lower()
-    url_lower = file_url.lower()
-
-    # Bibliotecas conocidas en comentarios/líneas
-    LIBRARY_PATTERNS = [
-        ('jquery', 'jQuery'),
-        ('bootstrap', 'Bootstrap'),
-        ('react', 'React'),
-        ('vue', 'Vue.js'),
-        ('angular', 'Angular'),
-        ('lodash', 'Lodash'),
-        ('moment', 'Moment.js'),
-        ('chart', 'Chart.js'),
-        ('d3', 'D3.js'),
-        ('three', 'Three.js'),
-        ('axios', 'Axios'),
-        ('underscore', 'Underscore.js'),
-        ('backbone', 'Backbone.js'),
-        ('ember', 'Ember.js'),
-        ('knockout', 'Knockout.js'),
-        ('handlebars', 'Handlebars.js'),
-        ('mustache', 'Mustache.js'),
-        ('font-awesome', 'Font Awesome'),
-        ('fontawesome', 'Font Awesome'),
-        ('material', 'Material UI'),
-        ('semantic', 'Semantic UI'),
-        ('foundation', 'Foundation'),
-        ('bulma', 'Bulma'),
-        ('tailwind', 'Tailwind CSS'),
-    ]
-
-    # Buscar en la línea
-    for pattern, name in LIBRARY_PATTERNS:
-        if pattern in line_lower or pattern in url_lower:
-            return name
+    return content_scan_result(submit_file_scan(file_url, file_type, scan_id)[0])
 
-    # Buscar en la URL del archivo
-    filename = file_url.split('/')[-1].lower()
-    for pattern, name in LIBRARY_PATTERNS:
-        if pattern in filename:
-            return name
 
-    # Si no se encuentra, retornar nombre genérico
-    return f"Biblioteca desconocida ({filename.split('.')[0]})" if '.' in filename else "Biblioteca desconocida"
-
-def get_all_js_css_files(soup, base_url):
+def get_all_js_css_files(assets, base_url):
     files = []
 
     # Get all script files
-    scripts = soup.find_all('script', src=True)
-    for script in scripts:
-        src = script.get('src')
-        if src:
-            full_url = urljoin(base_url, src)
-            files.append({'url': full_url, 'type': 'js'})
+    for src in assets.script_srcs:
+        full_url = urljoin(base_url, src)
+        files.append({'url': full_url, 'type': 'js'})
 
     # Get all CSS files
-    links = soup.find_all('link', {'rel': 'stylesheet', 'href': True})
-    for link in links:
-        href = link.get('href')
-        if href:
-            full_url = urljoin(base_url, href)
-            files.append({'url': full_url, 'type': 'css'})
+    for href in assets.stylesheet_hrefs:
+        full_url = urljoin(base_url, href)
+        files.append({'url': full_url, 'type': 'css'})
 
     return files
 
@@ -4047,7 +4172,7 @@ def store_file_urls_with_info(files, scan_id, cursor):
                 file_size = int(content_length)
 
         except Exception as e:
-            print(f"  ! Could not get info for {file_url}: {str(e)}")
+            logger.debug("  ! Could not get info for %s: %s", file_url, e)
             status_code = 0
 
         # Store file URL information
@@ -4108,29 +4233,31 @@ def analyze_single_url_no_logging(url, project_id=None):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        metrics = ScanMetrics()
+        summary = ScanSummary(logger)
+        with metrics.stage('page_fetch'):
+            response = requests.get(url, headers=headers, timeout=10)
+        metrics.count('page_bytes', len(response.content))
+
+        from page_assets import extract_page_assets
+        with metrics.stage('html_parse'):
+            assets = extract_page_assets(response.content)
 
         # Get page title
-        title_tag = soup.find('title')
-        title = title_tag.text.strip() if title_tag else 'No title'
+        title = assets.title if assets.title is not None else 'No title'
 
         # Store scan info
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-        INSERT INTO scans (url, status_code, title, headers, project_id)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (url, response.status_code, title, json.dumps(dict(response.headers)), project_id))
-
-        scan_id = cursor.lastrowid
+        scan_id = insert_scan(cursor, url, response.status_code, title, headers_json(response.headers),
+                              project_id=project_id)
 
         # NO logging automático aquí para evitar conflictos en análisis masivos
 
         # Detect libraries
-        js_libraries = detect_js_libraries(soup, url)
-        css_libraries = detect_css_libraries(soup, url)
+        js_libraries = detect_js_libraries(assets, url)
+        css_libraries = detect_css_libraries(assets, url)
 
         all_libraries = js_libraries + css_libraries
 
@@ -4142,23 +4269,43 @@ def analyze_single_url_no_logging(url, project_id=None):
                 INSERT INTO libraries (scan_id, library_name, version, type, source_url)
                 VALUES (?, ?, ?, ?, ?)
                 ''', (scan_id, lib['name'], lib['version'], lib['type'], source_url))
-                print(f"  → Stored library: {lib['name']} from {source_url or 'No source'}")
+                logger.debug("  → Stored library: %s from %s", lib['name'], source_url or 'No source')
+                summary.add('stored', lib['name'])
             else:
-                print(f"  → Skipped duplicate library: {lib['name']} (source already exists: {source_url})")
+                logger.debug("  → Skipped duplicate library: %s (source already exists: %s)", lib['name'], source_url)
+                summary.add('duplicate')
 
         # Get all JS and CSS files
-        js_css_files = get_all_js_css_files(soup, url)
+        js_css_files = get_all_js_css_files(assets, url)
 
         # Store all file URLs with additional info using the same connection
-        store_file_urls_with_info(js_css_files, scan_id, cursor)
+        with metrics.stage('head_requests'):
+            store_file_urls_with_info(js_css_files, scan_id, cursor)
+        metrics.count('head_requests', len(js_css_files))
+        metrics.count('files_count', len(js_css_files))
 
         # Scan files for version strings and detect libraries
-        all_version_strings = []
-        all_detected_libraries = []
-        for file_info in js_css_files:
-            version_strings, detected_libraries = scan_file_for_versions(file_info['url'], file_info['type'], scan_id)
-            all_version_strings.extend(version_strings)
-            all_detected_libraries.extend(detected_libraries)
+        # Cada archivo pasa al pool de CPU apenas se descarga, mientras se descarga el siguiente
+        pending_scans = [submit_file_scan(file_info['url'], file_info['type'], scan_id, metrics)
+                         for file_info in js_css_files]
+        all_version_strings, all_detected_libraries = collect_file_scans(conn, pending_scans, scan_id, metrics)
+
+        # Scripts inline: los detectores solo corren sobre bloques no vistos antes (hash SHA-256)
+        inline_version_strings, inline_libraries, inline_stats = analyze_inline_scripts(
+            conn, scan_id, url, assets.inline_scripts, scan_content_for_versions)
+        all_version_strings.extend(inline_version_strings)
+        all_detected_libraries.extend(inline_libraries)
+        metrics.count('inline_cache_hits', inline_stats['reused'])
+        metrics.count('inline_cache_misses', inline_stats['analyzed'])
+        if inline_stats['blocks']:
+            logger.debug("  → Inline scripts: %d blocks (%d analyzed, %d cached)",
+                         inline_stats['blocks'], inline_stats['analyzed'], inline_stats['reused'])
+
+        # Validadores de la página para el próximo re-escaneo incremental
+        if response.status_code == 200:
+            save_validators(conn, url, KIND_PAGE, response.headers, len(response.content),
+                            pack_page(title, all_libraries, js_css_files, inline_version_strings, inline_libraries),
+                            scan_id)
 
         # Store version strings
         for vs in all_version_strings:
@@ -4176,11 +4323,20 @@ def analyze_single_url_no_logging(url, project_id=None):
                 VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (scan_id, lib['name'], lib['version'], lib['type'], source_url,
                       f"Detectada automáticamente por patrón de versión ({lib['detection_method']})", 0))
-                print(f"  → Stored auto-detected library: {lib['name']} from {source_url or 'No source'}")
+                logger.debug("  → Stored auto-detected library: %s from %s", lib['name'], source_url or 'No source')
+                summary.add('auto_detected', lib['name'])
             else:
-                print(f"  → Skipped duplicate auto-detected library: {lib['name']} (source already exists: {source_url})")
+                logger.debug("  → Skipped duplicate auto-detected library: %s (source already exists: %s)", lib['name'], source_url)
+                summary.add('duplicate')
 
-        conn.commit()
+        # is_vulnerable de las librerías del escaneo, en la misma transacción
+        reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
+
+        with metrics.stage('db_commit'):
+            conn.commit()
+        record_scan_metrics(conn, scan_id, metrics)
+        summary.log("✓ Analyzed %s - %d files, %d version strings, %.1f s", url, len(js_css_files),
+                    len(all_version_strings), metrics.total_seconds)
 
         return {
             'success': True,
@@ -4196,11 +4352,7 @@ def analyze_single_url_no_logging(url, project_id=None):
             if not conn:
                 conn = get_db_connection()
             cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO scans (url, status_code, title, headers)
-            VALUES (?, ?, ?, ?)
-            ''', (url, 0, f"Error: {str(e)}", "{}"))
-            scan_id = cursor.lastrowid
+            scan_id = insert_scan(cursor, url, 0, f"Error: {str(e)}", "{}")
             conn.commit()
         except:
             scan_id = None
@@ -4228,7 +4380,15 @@ def library_source_exists(cursor, scan_id, source_url):
     ).fetchone()
     return result is not None
 
-def analyze_single_url(url, project_id=None):
+def analyze_single_url(url, project_id=None, incremental=False):
+    """
+    Analiza una URL y guarda un escaneo nuevo
+
+    Con incremental=True (re-escaneo) la página y cada archivo se piden con los
+    validadores del escaneo anterior (ver incremental_scan.py): lo que responde
+    304 reutiliza su análisis guardado y no se hacen peticiones HEAD. Las filas
+    de libraries, file_urls y version_strings se guardan completas, no como delta.
+    """
     conn = None
     try:
         # Validate URL to prevent SSRF attacks
@@ -4239,23 +4399,46 @@ def analyze_single_url(url, project_id=None):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        metrics = ScanMetrics()
+        summary = ScanSummary(logger)
 
-        # Get page title
-        title_tag = soup.find('title')
-        title = title_tag.text.strip() if title_tag else 'No title'
+        # Análisis de página guardado y escaneo del que proviene (re-escaneo incremental)
+        page_entry, base_scan = None, None
+        if incremental:
+            conn = get_db_connection()
+            page_entry = load_validators(conn, [url], KIND_PAGE).get(url)
+            if page_entry:
+                base_scan = conn.execute('SELECT id, status_code, headers FROM scans WHERE id = ?',
+                                         (page_entry['last_scan_id'],)).fetchone()
+                if base_scan is None:
+                    page_entry = None
+
+        with metrics.stage('page_fetch'):
+            response = requests.get(url, headers={**headers, **conditional_headers(page_entry)}, timeout=10)
+        metrics.count('page_bytes', len(response.content))
+
+        page_unchanged = page_entry is not None and response.status_code == 304
+        if page_unchanged:
+            # HTML sin cambios: título, librerías del HTML y archivos del análisis anterior
+            title, all_libraries, js_css_files = unpack_page(page_entry['analysis'])
+            status_code = base_scan['status_code']
+            page_headers = {**json.loads(base_scan['headers'] or '{}'), **dict(response.headers)}
+        else:
+            from page_assets import extract_page_assets
+            with metrics.stage('html_parse'):
+                assets = extract_page_assets(response.content)
+
+            # Get page title
+            title = assets.title if assets.title is not None else 'No title'
+            status_code = response.status_code
+            page_headers = dict(response.headers)
 
         # Store scan info
-        conn = get_db_connection()
+        conn = conn or get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-        INSERT INTO scans (url, status_code, title, headers, project_id)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (url, response.status_code, title, json.dumps(dict(response.headers)), project_id))
-
-        scan_id = cursor.lastrowid
+        scan_id = insert_scan(cursor, url, status_code, title, headers_json(page_headers), project_id=project_id,
+                              base_scan_id=base_scan['id'] if page_unchanged else None)
 
         # Log the scan creation con conexión separada para evitar deadlocks
         try:
@@ -4265,20 +4448,18 @@ def analyze_single_url(url, project_id=None):
                 target_id=scan_id,
                 target_description=f"Nuevo análisis de URL: {url}",
                 success=True,
-                notes=f"Status: {response.status_code}, Título: {title[:50]}{'...' if len(title) > 50 else ''}"
+                notes=f"Status: {status_code}, Título: {title[:50]}{'...' if len(title) > 50 else ''}"
             )
         except Exception as log_error:
             # No fallar el escaneo por problemas de logging
-            print(f"⚠️ Error en logging (no crítico): {log_error}")
-            if LOGGING_DEBUG:
-                import traceback
-                traceback.print_exc()
+            logger.warning("⚠️ Error en logging (no crítico): %s", log_error, exc_info=LOGGING_DEBUG)
 
         # Detect libraries
-        js_libraries = detect_js_libraries(soup, url)
-        css_libraries = detect_css_libraries(soup, url)
+        if not page_unchanged:
+            js_libraries = detect_js_libraries(assets, url)
+            css_libraries = detect_css_libraries(assets, url)
 
-        all_libraries = js_libraries + css_libraries
+            all_libraries = js_libraries + css_libraries
 
         # 🚀 FASE 2: Store libraries with vulnerability and CDN analysis
         cdn_libraries = []
@@ -4292,7 +4473,8 @@ def analyze_single_url(url, project_id=None):
                 # 🌐 ANÁLISIS CDN 
                 cdn_analysis = None
                 if CDN_ANALYZER_AVAILABLE and source_url:
-                    cdn_analysis = analyze_cdn_url(source_url)
+                    with metrics.stage('cdn_lookups'):
+                        cdn_analysis = analyze_cdn_url(source_url)
                     if cdn_analysis:
                         cdn_libraries.append(cdn_analysis)
                         if cdn_analysis.get('is_outdated', False):
@@ -4312,29 +4494,62 @@ def analyze_single_url(url, project_id=None):
                     else:
                         cdn_indicator = f" 📦 {cdn_analysis.get('cdn_name', 'Unknown')}"
                 
-                print(f"  → Stored library: {lib['name']} v{lib['version']}{cdn_indicator}")
+                logger.debug("  → Stored library: %s v%s%s", lib['name'], lib['version'], cdn_indicator)
+                summary.add('stored', lib['name'])
             else:
-                print(f"  → Skipped duplicate library: {lib['name']} (source already exists: {source_url})")
+                logger.debug("  → Skipped duplicate library: %s (source already exists: %s)", lib['name'], source_url)
+                summary.add('duplicate')
         
         # 🌐 RESUMEN ANÁLISIS CDN
         if CDN_ANALYZER_AVAILABLE and cdn_libraries:
-            print(f"  🌐 CDN Analysis: {len(cdn_libraries)} libraries from CDN")
-            if outdated_cdn_count > 0:
-                print(f"    ⚠️ {outdated_cdn_count} outdated CDN libraries detected")
+            summary.add('cdn', amount=len(cdn_libraries))
+            summary.add('cdn_outdated', amount=outdated_cdn_count)
 
         # Get all JS and CSS files
-        js_css_files = get_all_js_css_files(soup, url)
+        if not page_unchanged:
+            js_css_files = get_all_js_css_files(assets, url)
 
         # Store all file URLs with additional info using the same connection
-        store_file_urls_with_info(js_css_files, scan_id, cursor)
+        # (el re-escaneo incremental los guarda desde los GET condicionales, sin HEAD)
+        file_validators = {}
+        if incremental:
+            file_validators = load_validators(conn, [file_info['url'] for file_info in js_css_files], KIND_FILE)
+        else:
+            with metrics.stage('head_requests'):
+                store_file_urls_with_info(js_css_files, scan_id, cursor)
+            metrics.count('head_requests', len(js_css_files))
+        metrics.count('files_count', len(js_css_files))
 
         # Scan files for version strings and detect libraries
-        all_version_strings = []
-        all_detected_libraries = []
-        for file_info in js_css_files:
-            version_strings, detected_libraries = scan_file_for_versions(file_info['url'], file_info['type'], scan_id)
-            all_version_strings.extend(version_strings)
-            all_detected_libraries.extend(detected_libraries)
+        # Cada archivo pasa al pool de CPU apenas se descarga, mientras se descarga el siguiente
+        pending_scans = [submit_file_scan(file_info['url'], file_info['type'], scan_id, metrics,
+                                          file_validators.get(file_info['url']))
+                         for file_info in js_css_files]
+        all_version_strings, all_detected_libraries = collect_file_scans(conn, pending_scans, scan_id, metrics)
+        if incremental:
+            store_fetched_file_urls(pending_scans, scan_id, cursor)
+        unchanged_files = sum(fetch['not_modified'] for _, fetch in pending_scans)
+
+        # Scripts inline: los detectores solo corren sobre bloques no vistos antes (hash SHA-256)
+        if page_unchanged:
+            inline_version_strings, inline_libraries = unpack_results(page_entry['analysis'].get('inline', {}), scan_id)
+            inline_stats = {'blocks': 0, 'analyzed': 0, 'reused': 0}
+            touch_validators(conn, url, KIND_PAGE, scan_id)
+        else:
+            inline_version_strings, inline_libraries, inline_stats = analyze_inline_scripts(
+                conn, scan_id, url, assets.inline_scripts, scan_content_for_versions)
+            # Validadores de la página para el próximo re-escaneo incremental
+            if response.status_code == 200:
+                save_validators(conn, url, KIND_PAGE, response.headers, len(response.content),
+                                pack_page(title, all_libraries, js_css_files, inline_version_strings, inline_libraries),
+                                scan_id)
+        all_version_strings.extend(inline_version_strings)
+        all_detected_libraries.extend(inline_libraries)
+        metrics.count('inline_cache_hits', inline_stats['reused'])
+        metrics.count('inline_cache_misses', inline_stats['analyzed'])
+        if inline_stats['blocks']:
+            logger.debug("  → Inline scripts: %d blocks (%d analyzed, %d cached)",
+                         inline_stats['blocks'], inline_stats['analyzed'], inline_stats['reused'])
 
         # Store version strings
         for vs in all_version_strings:
@@ -4352,18 +4567,29 @@ def analyze_single_url(url, project_id=None):
                 VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (scan_id, lib['name'], lib['version'], lib['type'], source_url,
                       f"Detectada automáticamente por patrón de versión ({lib['detection_method']})", 0))
-                print(f"  → Stored auto-detected library: {lib['name']} from {source_url or 'No source'}")
+                logger.debug("  → Stored auto-detected library: %s from %s", lib['name'], source_url or 'No source')
+                summary.add('auto_detected', lib['name'])
             else:
-                print(f"  → Skipped duplicate auto-detected library: {lib['name']} (source already exists: {source_url})")
+                logger.debug("  → Skipped duplicate auto-detected library: %s (source already exists: %s)", lib['name'], source_url)
+                summary.add('duplicate')
 
-        conn.commit()
+        # is_vulnerable de las librerías del escaneo, en la misma transacción
+        reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
+
+        with metrics.stage('db_commit'):
+            conn.commit()
+        record_scan_metrics(conn, scan_id, metrics)
+        summary.log("✓ Analyzed %s - %d files (%d unchanged), %d version strings, %.1f s", url, len(js_css_files),
+                    unchanged_files, len(all_version_strings), metrics.total_seconds)
 
         return {
             'success': True,
             'scan_id': scan_id,
             'libraries_count': len(all_libraries) + len(all_detected_libraries),
             'files_count': len(js_css_files),
-            'version_strings_count': len(all_version_strings)
+            'version_strings_count': len(all_version_strings),
+            'page_unchanged': page_unchanged,
+            'unchanged_files': unchanged_files
         }
 
     except Exception as e:
@@ -4372,11 +4598,7 @@ def analyze_single_url(url, project_id=None):
             if not conn:
                 conn = get_db_connection()
             cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO scans (url, status_code, title, headers)
-            VALUES (?, ?, ?, ?)
-            ''', (url, 0, f"Error: {str(e)}", "{}"))
-            scan_id = cursor.lastrowid
+            scan_id = insert_scan(cursor, url, 0, f"Error: {str(e)}", "{}")
             conn.commit()
         except:
             scan_id = None
@@ -4452,8 +4674,43 @@ def batch_analyze_route():
         flash('No se encontraron URLs válidas', 'error')
         return redirect(url_for('index'))
 
-    # Perform batch analysis
-    results = {
+    # El análisis corre en segundo plano; la página del trabajo consulta /api/jobs/<job_id>
+    actor = {
+        'user_id': session.get('user_id', 0),
+        'username': session.get('username', 'Sistema'),
+        'user_role': session.get('user_role', 'system'),
+        'ip_address': request.remote_addr,
+        'user_agent': request.headers.get('User-Agent'),
+        'session_id': session.get('session_id'),
+    }
+    payload = {'urls': urls, 'project_id': project_id, 'actor': actor}
+    job_id = get_state_store().create_job('batch_analyze', len(urls), owner=session.get('username'),
+                                          payload=payload)
+    start_batch_analysis(job_id, payload)
+
+    return redirect(url_for('batch_job', job_id=job_id))
+
+# Acciones del análisis masivo que se registran juntas en action_history
+BATCH_ACTIONS_FLUSH_EVERY = 10
+
+def start_batch_analysis(job_id, payload, start=0, results=None):
+    """Lanza (o reanuda desde la URL `start`) el hilo de un análisis masivo"""
+    threading.Thread(target=run_batch_analysis,
+                     args=(job_id, payload['urls'], payload['project_id'], payload['actor'], start, results),
+                     name=f'batch-{job_id[:8]}', daemon=True).start()
+
+def run_batch_analysis(job_id, urls, project_id, actor, start=0, results=None):
+    """
+    Analiza las URLs de un análisis masivo (hilo en segundo plano)
+
+    El progreso y el resumen parcial quedan en el trabajo job_id del estado
+    compartido después de cada URL, con un latido mientras corre: si el worker
+    se recicla, el trabajo queda 'orphaned' y resume_batch_job lo retoma desde
+    la URL `start` con el resumen `results`. actor trae los datos de la sesión
+    para action_history.
+    """
+    job_store = get_state_store()
+    results = results or {
         'total_urls': len(urls),
         'successful': 0,
         'failed': 0,
@@ -4467,78 +4724,143 @@ def batch_analyze_route():
     batch_actions = []
 
     try:
-        for i, url in enumerate(urls, 1):
-            print(f"[{i}/{len(urls)}] Analyzing: {url}")
-
-            # Usar análisis sin logging automático para evitar conflictos de base de datos
-            result = analyze_single_url_no_logging(url, project_id=project_id)
-
-            if result['success']:
-                results['successful'] += 1
-                results['total_libraries'] += result['libraries_count']
-                results['total_files'] += result['files_count']
-                results['total_version_strings'] += result['version_strings_count']
-                results['scan_ids'].append(result['scan_id'])
-                print(f"  ✓ Success: {result['libraries_count']} libs, {result['files_count']} files, {result['version_strings_count']} versions")
-
-                # Preparar acción de logging para lote
-                batch_actions.append({
-                    'user_id': session.get('user_id', 0),
-                    'username': session.get('username', 'Sistema'),
-                    'user_role': session.get('user_role', 'system'),
-                    'action_type': 'CREATE',
-                    'target_table': 'scans',
-                    'target_id': result['scan_id'],
-                    'target_description': f"Análisis masivo: {url}",
-                    'success': True,
-                    'ip_address': request.remote_addr,
-                    'user_agent': request.headers.get('User-Agent'),
-                    'session_id': session.get('session_id'),
-                    'notes': f"Análisis masivo ({i}/{len(urls)}) - Libs: {result['libraries_count']}, Files: {result['files_count']}"
-                })
-            else:
-                results['failed'] += 1
-                if result['scan_id']:
+        with job_heartbeat(job_id):
+            for i, url in enumerate(urls[start:], start + 1):
+                logger.info("[%d/%d] Analyzing: %s", i, len(urls), url)
+
+                # Usar análisis sin logging automático para evitar conflictos de base de datos
+                result = analyze_single_url_no_logging(url, project_id=project_id)
+
+                if result['success']:
+                    results['successful'] += 1
+                    results['total_libraries'] += result['libraries_count']
+                    results['total_files'] += result['files_count']
+                    results['total_version_strings'] += result['version_strings_count']
                     results['scan_ids'].append(result['scan_id'])
-                print(f"  ✗ Failed: {result['error']}")
-
-                # Preparar acción de logging de error para lote
-                batch_actions.append({
-                    'user_id': session.get('user_id', 0),
-                    'username': session.get('username', 'Sistema'),
-                    'user_role': session.get('user_role', 'system'),
-                    'action_type': 'CREATE',
-                    'target_table': 'scans',
-                    'target_id': result.get('scan_id'),
-                    'target_description': f"Análisis masivo fallido: {url}",
-                    'success': False,
-                    'error_message': result['error'],
-                    'ip_address': request.remote_addr,
-                    'user_agent': request.headers.get('User-Agent'),
-                    'session_id': session.get('session_id'),
-                    'notes': f"Análisis masivo ({i}/{len(urls)}) - Error"
-                })
+                    logger.debug("  ✓ Success: %d libs, %d files, %d versions",
+                                 result['libraries_count'], result['files_count'], result['version_strings_count'])
+
+                    # Preparar acción de logging para lote
+                    batch_actions.append(dict(actor, **{
+                        'action_type': 'CREATE',
+                        'target_table': 'scans',
+                        'target_id': result['scan_id'],
+                        'target_description': f"Análisis masivo: {url}",
+                        'success': True,
+                        'notes': f"Análisis masivo ({i}/{len(urls)}) - Libs: {result['libraries_count']}, Files: {result['files_count']}"
+                    }))
+                else:
+                    results['failed'] += 1
+                    if result['scan_id']:
+                        results['scan_ids'].append(result['scan_id'])
+                    logger.warning("  ✗ Failed: %s - %s", url, result['error'])
+
+                    # Preparar acción de logging de error para lote
+                    batch_actions.append(dict(actor, **{
+                        'action_type': 'CREATE',
+                        'target_table': 'scans',
+                        'target_id': result.get('scan_id'),
+                        'target_description': f"Análisis masivo fallido: {url}",
+                        'success': False,
+                        'error_message': result['error'],
+                        'notes': f"Análisis masivo ({i}/{len(urls)}) - Error"
+                    }))
+
+                # Registrar las acciones en lotes: un worker reciclado pierde a lo sumo uno
+                if len(batch_actions) >= BATCH_ACTIONS_FLUSH_EVERY:
+                    log_batch_actions(batch_actions)
+                    batch_actions = []
+
+                job_store.update_job(job_id, done=i, failed=results['failed'], result=results)
+
+                # Small delay to prevent overwhelming servers
+                if i < len(urls):
+                    time.sleep(0.5)
+
+            if batch_actions:
+                logger.info("📝 Registrando %d acciones en lote...", len(batch_actions))
+                log_batch_actions(batch_actions)
+
+            job_store.update_job(job_id, status='completed', result=results)
 
-            # Small delay to prevent overwhelming servers
-            time.sleep(0.5)
+    except Exception as e:
+        logger.error("❌ Batch analysis %s failed: %s", job_id, e)
+        job_store.update_job(job_id, status='failed', result=dict(results, error=str(e)))
 
-        # Registrar todas las acciones en lote al final
-        if batch_actions:
-            print(f"📝 Registrando {len(batch_actions)} acciones en lote...")
-            log_batch_actions(batch_actions)
+def get_visible_job(job_id, kind=None):
+    """Trabajo job_id si lo creó el usuario de la sesión (o es admin); None si no existe o es ajeno"""
+    job = get_state_store().get_job(job_id)
+    if not job or (kind and job['kind'] != kind):
+        return None
+    if job['owner'] != session.get('username') and session.get('user_role') != 'admin':
+        return None
+    return job
 
-        # Create summary message
-        if results['successful'] > 0:
-            flash(f'¡Análisis masivo completado! Se analizaron exitosamente {results["successful"]}/{results["total_urls"]} URLs. ' +
-                  f'Se encontraron {results["total_libraries"]} librerías, {results["total_files"]} archivos, ' +
-                  f'y {results["total_version_strings"]} cadenas de versión.', 'success')
-        else:
-            flash(f'Análisis masivo completado con errores. {results["failed"]} URLs fallaron al analizar.', 'error')
+@app.route('/batch-analyze/<job_id>')
+@login_required
+def batch_job(job_id):
+    """Progreso de un análisis masivo; la página consulta /api/jobs/<job_id> hasta que termina"""
+    job = get_visible_job(job_id, 'batch_analyze')
+    if not job:
+        flash('Análisis masivo no encontrado', 'error')
+        return redirect(url_for('index'))
+    return render_template('batch_job.html', job=job)
+
+@app.route('/batch-analyze/<job_id>/resume', methods=['POST'])
+@login_required
+def resume_batch_job(job_id):
+    """Reanuda en este worker un análisis masivo huérfano desde la última URL completada"""
+    job = get_visible_job(job_id, 'batch_analyze')
+    if not job:
+        flash('Análisis masivo no encontrado', 'error')
+        return redirect(url_for('index'))
+    payload = get_state_store().claim_job(job_id)
+    if payload is None:
+        flash('El análisis masivo no está detenido: sigue en curso o ya terminó', 'warning')
+    else:
+        logger.info("🔁 Resuming batch analysis %s at URL %d/%d", job_id, job['done'] + 1, job['total'])
+        start_batch_analysis(job_id, payload, start=job['done'], results=job['result'])
+        flash(f"Análisis masivo reanudado desde la URL {job['done'] + 1} de {job['total']}", 'success')
+    return redirect(url_for('batch_job', job_id=job_id))
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def api_job_status(job_id):
+    """Estado de un trabajo del usuario (compartido entre workers)"""
+    job = get_visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
 
-    except Exception as e:
-        flash(f'Análisis masivo fallido: {str(e)}', 'error')
 
-    return redirect(url_for('index'))
+# Token para que Prometheus lea /metrics sin sesión (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas de escaneo en formato de texto de Prometheus"""
+    authorization = request.headers.get('Authorization', '')
+    token_valid = bool(METRICS_TOKEN) and secrets.compare_digest(authorization, f'Bearer {METRICS_TOKEN}')
+    if not token_valid and 'user_id' not in session:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    conn = get_db_connection()
+    try:
+        body = render_prometheus(conn)
+    finally:
+        conn.close()
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/scan-metrics')
+@login_required
+def scan_metrics_page():
+    """Rendimiento del pipeline de escaneo: tiempos por etapa de los últimos escaneos"""
+    conn = get_db_connection()
+    try:
+        summary = summarize_recent_scans(conn, limit=200)
+    finally:
+        conn.close()
+    return render_template('scan_metrics.html', summary=summary)
 
 
 # Global Libraries Management Routes
@@ -4622,18 +4944,57 @@ def global_libraries():
     conn.close()
     return render_template('global_libraries.html', libraries=libraries, top_libraries=top_libraries)
 
+GLOBAL_LIBRARY_SEARCH_LIMIT = 50
+GLOBAL_LIBRARY_SEARCH_MAX_LIMIT = 200
+
+def conditional_json(body, etag):
+    """Respuesta JSON con ETag: el navegador revalida cada vez y recibe 304 si no cambió"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _catalog_json(payload):
+    """(cuerpo como el de jsonify, ETag)"""
+    body = (app.json.dumps(payload) + '\n').encode('utf-8')
+    return body, generate_etag(body)
+
 @app.route('/api/global-libraries')
 @login_required
 def api_global_libraries():
     conn = get_db_connection()
-    libraries = conn.execute('''
-        SELECT id, library_name, type, latest_safe_version, latest_version,
-               description, vulnerability_info, source_url
-        FROM global_libraries
-        ORDER BY library_name
-    ''').fetchall()
-    conn.close()
-    return jsonify([dict(lib) for lib in libraries])
+    try:
+        catalog = current_global_catalog(conn)
+    finally:
+        conn.close()
+    # Serializado y con su ETag una vez por versión del catálogo
+    body, etag = catalog.derived('api_json', lambda: _catalog_json(catalog.libraries))
+    return conditional_json(body, etag)
+
+@app.route('/api/global-libraries/search')
+@login_required
+def api_global_libraries_search():
+    """Página de librerías globales cuyo nombre empieza con q (selectores que cargan bajo demanda)"""
+    prefix = request.args.get('q', '').strip()
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', GLOBAL_LIBRARY_SEARCH_LIMIT, type=int), 1),
+                GLOBAL_LIBRARY_SEARCH_MAX_LIMIT)
+    conn = get_db_connection()
+    try:
+        catalog = current_global_catalog(conn)
+    finally:
+        conn.close()
+    items, total = catalog.search(prefix, offset, limit)
+    body, etag = _catalog_json({
+        'items': [{key: library[key] for key in ('id', 'library_name', 'type', 'latest_safe_version', 'latest_version')}
+                  for library in items],
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'version': catalog.version
+    })
+    return conditional_json(body, etag)
 
 @app.route('/add-global-library', methods=['POST'])
 @login_required
@@ -4671,6 +5032,7 @@ def add_global_library():
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (library_name, library_type, latest_safe_version, latest_version,
               description, vulnerability_info, source_url))
+        invalidate_ntg_catalog(conn)
 
         conn.commit()
         conn.close()
@@ -4712,6 +5074,10 @@ def edit_global_library(library_id):
             conn.close()
             return redirect(url_for('global_libraries'))
 
+        cursor.execute("SELECT latest_safe_version FROM global_libraries WHERE id = ?", (library_id,))
+        previous = cursor.fetchone()
+        safe_version_changed = previous is not None and (previous['latest_safe_version'] or '') != latest_safe_version
+
         cursor.execute('''
             UPDATE global_libraries
             SET library_name = ?, type = ?, latest_safe_version = ?, latest_version = ?,
@@ -4724,9 +5090,17 @@ def edit_global_library(library_id):
         if cursor.rowcount == 0:
             flash('Librería no encontrada', 'error')
         else:
+            invalidate_ntg_catalog(conn)
             flash(f'Librería "{library_name}" actualizada exitosamente', 'success')
 
         conn.commit()
+
+        # Re-evaluate every historical library associated with this catalog entry
+        result = reevaluate_vulnerabilities(conn, global_library_id=library_id) if safe_version_changed else None
+        if result:
+            logger.info("🔄 Vulnerabilidades re-evaluadas para '%s': %d filas, %d cambios en %.2fs",
+                        library_name, result['evaluated'], result['updated'], result['elapsed'])
+
         conn.close()
 
     except Exception as e:
@@ -4750,8 +5124,18 @@ def delete_global_library(library_id):
             conn.close()
             return redirect(url_for('global_libraries'))
 
+        # ON DELETE SET NULL limpia global_library_id: las filas asociadas se anotan antes
+        associated_ids = [row['id'] for row in cursor.execute(
+            "SELECT id FROM libraries WHERE global_library_id = ?", (library_id,)).fetchall()]
+
         cursor.execute("DELETE FROM global_libraries WHERE id = ?", (library_id,))
+        invalidate_ntg_catalog(conn)
         conn.commit()
+
+        # Associated libraries lose the global safe version fallback
+        if associated_ids:
+            reevaluate_vulnerabilities(conn, library_ids=associated_ids)
+
         conn.close()
 
         flash(f'Librería "{library["library_name"]}" eliminada exitosamente', 'success')
@@ -4787,7 +5171,6 @@ def asociar_bibliotecas():
         LIMIT ? OFFSET ?
     ''', (per_page, offset)).fetchall()
 
-    global_libraries = conn.execute('SELECT id, library_name, type FROM global_libraries ORDER BY library_name').fetchall()
     conn.close()
     
     # Create pagination object
@@ -4804,7 +5187,6 @@ def asociar_bibliotecas():
 
     return render_template('asociar_bibliotecas.html',
                            unassociated_libs=unassociated_libs,
-                           global_libraries=global_libraries,
                            pagination=pagination)
 
 @app.route('/global-library/<int:global_lib_id>/manual-libraries')
@@ -4829,7 +5211,7 @@ def global_library_manual_libraries(global_lib_id):
     manual_libraries = conn.execute('''
         SELECT l.id, l.library_name, l.version, l.type, l.source_url,
                l.description, l.latest_safe_version, l.latest_version,
-               l.is_manual, s.id as scan_id, s.url, s.title, s.scan_date,
+               l.is_manual, l.is_vulnerable, s.id as scan_id, s.url, s.title, s.scan_date,
                c.name as project_name, c.id as project_id
         FROM libraries l
         INNER JOIN scans s ON l.scan_id = s.id
@@ -4842,10 +5224,9 @@ def global_library_manual_libraries(global_lib_id):
     manual_libs_with_vuln = []
     for lib in manual_libraries:
         lib_dict = dict(lib)
-        # Check vulnerability using current version vs safe version (preferring library-specific, then global)
-        current_version = lib['version']
-        safe_version = lib['latest_safe_version'] or global_lib['latest_safe_version']
-        lib_dict['is_vulnerable'] = has_vulnerability(current_version, safe_version)
+        # libraries.is_vulnerable (library-specific safe version, then global); computed only if not evaluated yet
+        lib_dict['is_vulnerable'] = check_vulnerability_with_global(
+            lib['version'], lib['latest_safe_version'], global_lib['latest_safe_version'], lib['is_vulnerable'])
         manual_libs_with_vuln.append(lib_dict)
 
     conn.close()
@@ -4866,13 +5247,15 @@ def associate_library(library_id):
     try:
         conn = get_db_connection()
         # Check if library exists and is manual
-        lib = conn.execute('SELECT id FROM libraries WHERE id = ? AND is_manual = 1', (library_id,)).fetchone()
+        lib = conn.execute('SELECT id, scan_id FROM libraries WHERE id = ? AND is_manual = 1', (library_id,)).fetchone()
         if not lib:
             flash('La biblioteca manual no existe.', 'error')
             conn.close()
             return redirect(url_for('asociar_bibliotecas'))
 
         conn.execute('UPDATE libraries SET global_library_id = ? WHERE id = ?', (global_library_id, library_id))
+        reevaluate_vulnerabilities(conn, library_ids=[library_id], commit=False)
+        invalidate_project_reports(conn, scan_ids=[lib['scan_id']])
         conn.commit()
         conn.close()
         flash('Biblioteca asociada exitosamente.', 'success')
@@ -4892,7 +5275,7 @@ def asociar_proyectos():
         ORDER BY s.scan_date DESC
     ''').fetchall()
 
-    active_projects = conn.execute('SELECT id, name FROM projects WHERE is_active = 1 ORDER BY name').fetchall()
+    active_projects = project_choices(conn)
     conn.close()
 
     return render_template('asociar_proyectos.html',
@@ -4926,6 +5309,7 @@ def associate_scan(scan_id):
 
         # Update scan with project_id
         conn.execute('UPDATE scans SET project_id = ? WHERE id = ?', (project_id, scan_id))
+        invalidate_project_reports(conn, project_ids=[project_id])
         conn.commit()
         conn.close()
         flash('Escaneo asociado exitosamente al proyecto.', 'success')
@@ -4982,6 +5366,7 @@ def add_project():
             INSERT INTO projects (name, description, contact_email, contact_phone, website)
             VALUES (?, ?, ?, ?, ?)
         ''', (name, description, contact_email, contact_phone, website))
+        invalidate_project_choices(conn)
 
         conn.commit()
         conn.close()
@@ -5027,6 +5412,8 @@ def edit_project(project_id):
         if cursor.rowcount == 0:
             flash('Proyecto no encontrado', 'error')
         else:
+            invalidate_project_reports(conn, project_ids=[project_id])
+            invalidate_project_choices(conn)
             flash(f'Proyecto "{name}" actualizado exitosamente', 'success')
 
         conn.commit()
@@ -5055,6 +5442,7 @@ def delete_project(project_id):
 
         # Soft delete - mark as inactive instead of deleting
         cursor.execute("UPDATE projects SET is_active = 0 WHERE id = ?", (project_id,))
+        invalidate_project_choices(conn)
         conn.commit()
         conn.close()
 
@@ -5187,7 +5575,7 @@ def project_detail(project_id):
     stats['total_vulnerabilities'] = total_vulnerabilities
 
     # Get all projects for the edit modal dropdown
-    projects = conn.execute('SELECT id, name FROM projects WHERE is_active = 1 ORDER BY name').fetchall()
+    projects = project_choices(conn)
 
     conn.close()
     return render_template('project_detail.html', project=project, scans=scans, stats=stats, projects=projects, all_projects=projects)
@@ -5206,8 +5594,8 @@ def export_project_data(project_id, format):
             conn.close()
             return redirect(url_for('projects'))
 
-        # Get all scans for this project with libraries
-        scans_data = conn.execute('''
+        # Scans with libraries are streamed row by row once the response starts
+        scans_query = '''
             SELECT s.*,
                    GROUP_CONCAT(DISTINCT l.library_name || '|' || COALESCE(l.version, '') || '|' || l.type) as libraries_info
             FROM scans s
@@ -5215,7 +5603,7 @@ def export_project_data(project_id, format):
             WHERE s.project_id = ?
             GROUP BY s.id
             ORDER BY s.scan_date DESC
-        ''', (project_id,)).fetchall()
+        '''
 
         # Get statistics
         stats = conn.execute('''
@@ -5234,66 +5622,83 @@ def export_project_data(project_id, format):
         conn.close()
 
         if format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # Write project info section
-            writer.writerow(['# INFORMACIÓN DEL PROYECTO'])
-            writer.writerow(['Nombre', 'Descripción', 'Email', 'Teléfono', 'Sitio Web', 'Fecha Creación'])
-            writer.writerow([
-                project['name'],
-                project['description'] or '',
-                project['contact_email'] or '',
-                project['contact_phone'] or '',
-                project['website'] or '',
-                project['created_date'][:10] if project['created_date'] else ''
-            ])
-            writer.writerow([])  # Empty row for separation
-
-            # Write statistics section
-            writer.writerow(['# ESTADÍSTICAS'])
-            writer.writerow(['Total Escaneos', 'Bibliotecas Únicas', 'Total Archivos', 'Revisados', 'Pendientes'])
-            writer.writerow([
-                stats['total_scans'] or 0,
-                stats['unique_libraries'] or 0,
-                stats['total_files'] or 0,
-                stats['reviewed_scans'] or 0,
-                stats['pending_scans'] or 0
-            ])
-            writer.writerow([])  # Empty row for separation
+            def csv_rows():
+                # Write project info section
+                yield ['# INFORMACIÓN DEL PROYECTO']
+                yield ['Nombre', 'Descripción', 'Email', 'Teléfono', 'Sitio Web', 'Fecha Creación']
+                yield [
+                    project['name'],
+                    project['description'] or '',
+                    project['contact_email'] or '',
+                    project['contact_phone'] or '',
+                    project['website'] or '',
+                    project['created_date'][:10] if project['created_date'] else ''
+                ]
+                yield []  # Empty row for separation
+
+                # Write statistics section
+                yield ['# ESTADÍSTICAS']
+                yield ['Total Escaneos', 'Bibliotecas Únicas', 'Total Archivos', 'Revisados', 'Pendientes']
+                yield [
+                    stats['total_scans'] or 0,
+                    stats['unique_libraries'] or 0,
+                    stats['total_files'] or 0,
+                    stats['reviewed_scans'] or 0,
+                    stats['pending_scans'] or 0
+                ]
+                yield []  # Empty row for separation
+
+                # Write scans section
+                yield ['# ESCANEOS REALIZADOS']
+                yield ['URL', 'Título', 'Fecha', 'Estado HTTP', 'Revisado', 'Bibliotecas Detectadas']
+
+                for scan in iter_query(scans_query, (project_id,)):
+                    libraries = ''
+                    if scan['libraries_info']:
+                        lib_list = []
+                        for lib_info in scan['libraries_info'].split(','):
+                            parts = lib_info.split('|')
+                            if len(parts) >= 2:
+                                lib_name = parts[0]
+                                lib_version = parts[1] if parts[1] else 'N/A'
+                                lib_list.append(f"{lib_name} ({lib_version})")
+                        libraries = '; '.join(lib_list)
+
+                    yield [
+                        scan['url'],
+                        scan['title'] or '',
+                        scan['scan_date'][:16] if scan['scan_date'] else '',
+                        scan['status_code'] or 'Error',
+                        'Sí' if scan['reviewed'] == 1 else 'No',
+                        libraries or 'Sin bibliotecas'
+                    ]
 
-            # Write scans section
-            writer.writerow(['# ESCANEOS REALIZADOS'])
-            writer.writerow(['URL', 'Título', 'Fecha', 'Estado HTTP', 'Revisado', 'Bibliotecas Detectadas'])
+            filename = f"project_{project['name'].replace(' ', '_')}_data.csv"
+            return streaming_download(stream_csv(csv_rows()), 'text/csv', filename)
+
+        elif format == 'json':
+            def scan_to_dict(scan):
+                scan_obj = {
+                    'id': scan['id'],
+                    'url': scan['url'],
+                    'title': scan['title'],
+                    'scan_date': scan['scan_date'],
+                    'status_code': scan['status_code'],
+                    'reviewed': bool(scan['reviewed']),
+                    'libraries': []
+                }
 
-            for scan in scans_data:
-                libraries = ''
                 if scan['libraries_info']:
-                    lib_list = []
                     for lib_info in scan['libraries_info'].split(','):
                         parts = lib_info.split('|')
-                        if len(parts) >= 2:
-                            lib_name = parts[0]
-                            lib_version = parts[1] if parts[1] else 'N/A'
-                            lib_list.append(f"{lib_name} ({lib_version})")
-                    libraries = '; '.join(lib_list)
-
-                writer.writerow([
-                    scan['url'],
-                    scan['title'] or '',
-                    scan['scan_date'][:16] if scan['scan_date'] else '',
-                    scan['status_code'] or 'Error',
-                    'Sí' if scan['reviewed'] == 1 else 'No',
-                    libraries or 'Sin bibliotecas'
-                ])
-
-            response = make_response(output.getvalue())
-            filename = f"project_{project['name'].replace(' ', '_')}_data.csv"
-            response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-            response.headers["Content-type"] = "text/csv"
-            return response
+                        if len(parts) >= 3:
+                            scan_obj['libraries'].append({
+                                'name': parts[0],
+                                'version': parts[1] if parts[1] else None,
+                                'type': parts[2]
+                            })
+                return scan_obj
 
-        elif format == 'json':
             # Prepare JSON data
             export_data = {
                 'project': {
@@ -5312,37 +5717,11 @@ def export_project_data(project_id, format):
                     'reviewed_scans': stats['reviewed_scans'] or 0,
                     'pending_scans': stats['pending_scans'] or 0
                 },
-                'scans': []
+                'scans': (scan_to_dict(scan) for scan in iter_query(scans_query, (project_id,)))
             }
 
-            for scan in scans_data:
-                scan_obj = {
-                    'id': scan['id'],
-                    'url': scan['url'],
-                    'title': scan['title'],
-                    'scan_date': scan['scan_date'],
-                    'status_code': scan['status_code'],
-                    'reviewed': bool(scan['reviewed']),
-                    'libraries': []
-                }
-
-                if scan['libraries_info']:
-                    for lib_info in scan['libraries_info'].split(','):
-                        parts = lib_info.split('|')
-                        if len(parts) >= 3:
-                            scan_obj['libraries'].append({
-                                'name': parts[0],
-                                'version': parts[1] if parts[1] else None,
-                                'type': parts[2]
-                            })
-
-                export_data['scans'].append(scan_obj)
-
-            response = make_response(json.dumps(export_data, indent=2, ensure_ascii=False))
             filename = f"project_{project['name'].replace(' ', '_')}_data.json"
-            response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-            response.headers["Content-type"] = "application/json"
-            return response
+            return streaming_download(stream_json(export_data), 'application/json', filename)
         else:
             flash('Formato de exportación no válido', 'error')
             return redirect(url_for('project_detail', project_id=project_id))
@@ -5408,12 +5787,8 @@ def import_project_data(project_id):
                 status_code = int(row.get('Estado HTTP', 0)) if row.get('Estado HTTP', '').isdigit() else None
                 reviewed = 1 if row.get('Revisado', '').lower() in ['sí', 'si', 'yes', '1', 'true'] else 0
 
-                cursor.execute('''
-                    INSERT INTO scans (url, title, scan_date, status_code, reviewed, project_id, headers)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (url, title, scan_date, status_code, reviewed, project_id, '{}'))
-
-                scan_id = cursor.lastrowid
+                scan_id = insert_scan(cursor, url, status_code, title, '{}', scan_date=scan_date,
+                                      reviewed=reviewed, project_id=project_id)
                 imported_scans += 1
 
                 # Parse and insert libraries if present
@@ -5432,6 +5807,7 @@ def import_project_data(project_id):
                                 INSERT INTO libraries (scan_id, library_name, version, type, is_manual)
                                 VALUES (?, ?, ?, 'js', 1)
                             ''', (scan_id, lib_name, lib_version))
+                    reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
 
         elif file.filename.lower().endswith('.json'):
             # Parse JSON file
@@ -5460,12 +5836,8 @@ def import_project_data(project_id):
                 status_code = scan_data.get('status_code')
                 reviewed = 1 if scan_data.get('reviewed') else 0
 
-                cursor.execute('''
-                    INSERT INTO scans (url, title, scan_date, status_code, reviewed, project_id, headers)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (url, title, scan_date, status_code, reviewed, project_id, '{}'))
-
-                scan_id = cursor.lastrowid
+                scan_id = insert_scan(cursor, url, status_code, title, '{}', scan_date=scan_date,
+                                      reviewed=reviewed, project_id=project_id)
                 imported_scans += 1
 
                 # Insert libraries if present
@@ -5476,6 +5848,7 @@ def import_project_data(project_id):
                             INSERT INTO libraries (scan_id, library_name, version, type, is_manual)
                             VALUES (?, ?, ?, ?, 1)
                         ''', (scan_id, lib_name, lib.get('version'), lib.get('type', 'js')))
+                reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
 
         conn.commit()
         conn.close()
@@ -5506,127 +5879,102 @@ def import_project_data(project_id):
 def export_projects(format):
     """Export all projects and their associated URLs in the specified format"""
     try:
-        conn = get_db_connection()
-
-        # Get all projects with their scan counts
-        projects = conn.execute('''
+        timestamp = get_chile_time().strftime("%Y%m%d_%H%M%S")
+        projects_query = '''
             SELECT c.*,
-                   COUNT(DISTINCT s.id) as scan_count
+                   (SELECT COUNT(*) FROM scans s WHERE s.project_id = c.id) as scan_count
             FROM projects c
-            LEFT JOIN scans s ON c.id = s.project_id
             WHERE c.is_active = 1
-            GROUP BY c.id
             ORDER BY c.name
-        ''').fetchall()
+        '''
 
         if format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # Write headers for projects section
-            writer.writerow(['# PROYECTOS'])
-            writer.writerow(['Nombre', 'Descripción', 'Email', 'Teléfono', 'Sitio Web', 'Fecha Creación', 'Total URLs'])
-
-            # Write project data
-            for project in projects:
-                writer.writerow([
-                    project['name'],
-                    project['description'] or '',
-                    project['contact_email'] or '',
-                    project['contact_phone'] or '',
-                    project['website'] or '',
-                    project['created_date'][:10] if project['created_date'] else '',
-                    project['scan_count']
-                ])
-
-            writer.writerow([])  # Empty row separator
-            writer.writerow(['# URLS ASOCIADAS'])
-            writer.writerow(['Proyecto', 'URL', 'Título', 'Fecha Escaneo', 'Estado', 'Librerías'])
-
-            # Get all scans for active projects
-            scans = conn.execute('''
-                SELECT c.name as project_name, s.url, s.title, s.scan_date, s.status_code,
-                       COUNT(DISTINCT l.id) as library_count
-                FROM scans s
-                JOIN projects c ON s.project_id = c.id
-                LEFT JOIN libraries l ON s.id = l.scan_id
-                WHERE c.is_active = 1
-                GROUP BY s.id
-                ORDER BY c.name, s.scan_date DESC
-            ''').fetchall()
-
-            for scan in scans:
-                writer.writerow([
-                    scan['project_name'],
-                    scan['url'],
-                    scan['title'] or '',
-                    scan['scan_date'][:10] if scan['scan_date'] else '',
-                    scan['status_code'] or 'Error',
-                    scan['library_count']
-                ])
+            def csv_rows():
+                yield ['# PROYECTOS']
+                yield ['Nombre', 'Descripción', 'Email', 'Teléfono', 'Sitio Web', 'Fecha Creación', 'Total URLs']
+                for project in iter_query(projects_query):
+                    yield [
+                        project['name'],
+                        project['description'] or '',
+                        project['contact_email'] or '',
+                        project['contact_phone'] or '',
+                        project['website'] or '',
+                        project['created_date'][:10] if project['created_date'] else '',
+                        project['scan_count']
+                    ]
+
+                yield []  # Empty row separator
+                yield ['# URLS ASOCIADAS']
+                yield ['Proyecto', 'URL', 'Título', 'Fecha Escaneo', 'Estado', 'Librerías']
+
+                for scan in iter_query('''
+                    SELECT c.name as project_name, s.url, s.title, s.scan_date, s.status_code,
+                           (SELECT COUNT(*) FROM libraries l WHERE l.scan_id = s.id) as library_count
+                    FROM scans s
+                    JOIN projects c ON s.project_id = c.id
+                    WHERE c.is_active = 1
+                    ORDER BY c.name, s.scan_date DESC
+                '''):
+                    yield [
+                        scan['project_name'],
+                        scan['url'],
+                        scan['title'] or '',
+                        scan['scan_date'][:10] if scan['scan_date'] else '',
+                        scan['status_code'] or 'Error',
+                        scan['library_count']
+                    ]
+
+            return streaming_download(stream_csv(csv_rows()), 'text/csv', f'projects_export_{timestamp}.csv')
 
+        elif format == 'json':
+            conn = get_db_connection()
+            total_projects = conn.execute('SELECT COUNT(*) FROM projects WHERE is_active = 1').fetchone()[0]
             conn.close()
 
-            # Create response
-            output.seek(0)
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={'Content-Disposition': f'attachment; filename=projects_export_{get_chile_time().strftime("%Y%m%d_%H%M%S")}.csv'}
-            )
+            def projects_stream():
+                # One ordered pass over projects LEFT JOIN scans, grouped per project
+                rows = iter_query('''
+                    SELECT c.id as project_id, c.name, c.description, c.contact_email, c.contact_phone,
+                           c.website, c.created_date,
+                           s.id as scan_id, s.url, s.title, s.scan_date, s.status_code,
+                           (SELECT COUNT(*) FROM libraries l WHERE l.scan_id = s.id AND l.type = 'js') as libraries_count,
+                           (SELECT COUNT(*) FROM file_urls f WHERE f.scan_id = s.id AND f.file_type = 'js') as files_count
+                    FROM projects c
+                    LEFT JOIN scans s ON s.project_id = c.id
+                    WHERE c.is_active = 1
+                    ORDER BY c.name, c.id, s.scan_date DESC
+                ''')
+                for _, project_rows in groupby(rows, key=lambda row: row['project_id']):
+                    first = next(project_rows)
+                    scans = (row for row in chain([first], project_rows) if row['scan_id'] is not None)
+                    yield {
+                        'name': first['name'],
+                        'description': first['description'],
+                        'contact_email': first['contact_email'],
+                        'contact_phone': first['contact_phone'],
+                        'website': first['website'],
+                        'created_date': first['created_date'],
+                        'scans': ({
+                            'url': scan['url'],
+                            'title': scan['title'],
+                            'scan_date': scan['scan_date'],
+                            'status_code': scan['status_code'],
+                            'libraries_count': scan['libraries_count'],
+                            'files_count': scan['files_count']
+                        } for scan in scans)
+                    }
 
-        elif format == 'json':
-            # Build JSON structure
             export_data = {
                 'export_date': get_chile_time().isoformat(),
-                'total_projects': len(projects),
-                'projects': []
+                'total_projects': total_projects,
+                'projects': projects_stream()
             }
-
-            for project in projects:
-                # Get scans for this project
-                project_scans = conn.execute('''
-                    SELECT s.*, COUNT(DISTINCT CASE WHEN l.type = 'js' THEN l.id END) as libraries_count,
-                           COUNT(DISTINCT CASE WHEN f.file_type = 'js' THEN f.id END) as files_count
-                    FROM scans s
-                    LEFT JOIN libraries l ON s.id = l.scan_id
-                    LEFT JOIN file_urls f ON s.id = f.scan_id
-                    WHERE s.project_id = ?
-                    GROUP BY s.id
-                    ORDER BY s.scan_date DESC
-                ''', (project['id'],)).fetchall()
-
-                project_data = {
-                    'name': project['name'],
-                    'description': project['description'],
-                    'contact_email': project['contact_email'],
-                    'contact_phone': project['contact_phone'],
-                    'website': project['website'],
-                    'created_date': project['created_date'],
-                    'scans': []
-                }
-
-                for scan in project_scans:
-                    project_data['scans'].append({
-                        'url': scan['url'],
-                        'title': scan['title'],
-                        'scan_date': scan['scan_date'],
-                        'status_code': scan['status_code'],
-                        'libraries_count': scan['libraries_count'],
-                        'files_count': scan['files_count']
-                    })
-
-                export_data['projects'].append(project_data)
-
-            conn.close()
-
-            return Response(
-                json.dumps(export_data, indent=2, ensure_ascii=False),
-                mimetype='application/json',
-                headers={'Content-Disposition': f'attachment; filename=projects_export_{get_chile_time().strftime("%Y%m%d_%H%M%S")}.json'}
-            )
+            return streaming_download(stream_json(export_data), 'application/json', f'projects_export_{timestamp}.json')
 
         elif format == 'xlsx':
+            conn = get_db_connection()
+            projects = conn.execute(projects_query).fetchall()
+
             # Create Excel workbook with one sheet per project
             from openpyxl import Workbook
             from openpyxl.styles import Font, PatternFill, Alignment
@@ -5870,6 +6218,7 @@ def import_projects():
                     except Exception as e:
                         errors.append(f'Error importando proyecto: {str(e)}')
 
+            invalidate_project_choices(conn)
             conn.commit()
 
         elif file.filename.lower().endswith('.json'):
@@ -5911,6 +6260,7 @@ def import_projects():
                 except Exception as e:
                     errors.append(f'Error importando proyecto {project_name}: {str(e)}')
 
+            invalidate_project_choices(conn)
             conn.commit()
 
         conn.close()
@@ -6274,7 +6624,7 @@ def restore_deleted_record(table_name, data):
             # Generar nuevo ID
             new_id = get_next_available_id(table_name)
             data['id'] = new_id
-            print(f"⚠️ ID {original_id} ya existe, usando nuevo ID {new_id}")
+            logger.warning("⚠️ ID %s ya existe, usando nuevo ID %s", original_id, new_id)
 
         # Remover campos automáticos que no deben insertarse
         data_copy = data.copy()
@@ -6287,10 +6637,10 @@ def restore_deleted_record(table_name, data):
         conn.execute(f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders})', values)
         conn.commit()
 
-        print(f"✅ Registro restaurado en {table_name} con ID {data_copy.get('id')}")
+        logger.info("✅ Registro restaurado en %s con ID %s", table_name, data_copy.get('id'))
 
     except Exception as e:
-        print(f"❌ Error al restaurar registro en {table_name}: {e}")
+        logger.error("❌ Error al restaurar registro en %s: %s", table_name, e)
         raise
     finally:
         conn.close()
@@ -6317,10 +6667,10 @@ def revert_update(table_name, record_id, previous_data):
         conn.execute(f'UPDATE {table_name} SET {set_clause} WHERE id = ?', values)
         conn.commit()
 
-        print(f"✅ Registro revertido en {table_name}#{record_id}")
+        logger.info("✅ Registro revertido en %s#%s", table_name, record_id)
 
     except Exception as e:
-        print(f"❌ Error al revertir registro en {table_name}#{record_id}: {e}")
+        logger.error("❌ Error al revertir registro en %s#%s: %s", table_name, record_id, e)
         raise
     finally:
         conn.close()
@@ -6452,74 +6802,62 @@ def delete_user(user_id):
 @app.route('/export/db')
 @login_required
 def export_db():
+    """Instantánea consistente de analysis.db (API de backup); ?compress=gzip la comprime al vuelo"""
+    compress = request.args.get('compress', '').lower() in ('1', 'true', 'gzip')
+    if storage.get_storage().dialect != 'sqlite':
+        flash('La exportación directa solo existe con SQLite; en PostgreSQL usa pg_dump', 'error')
+        return redirect(url_for('index'))
     try:
-        # Use absolute path and validate file exists to prevent path traversal
-        import os
         db_path = os.path.abspath('analysis.db')
 
         if not os.path.exists(db_path) or not os.path.isfile(db_path):
             flash('Archivo de base de datos no encontrado', 'error')
             return redirect(url_for('index'))
 
-        return send_file(db_path, as_attachment=True, download_name='analysis_backup.db')
-    except Exception as e:
+        snapshot_path = create_snapshot(db_path)
+    except (sqlite3.Error, OSError) as e:
         flash(f'Error al exportar base de datos: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+    download_name = 'analysis_backup.db.gz' if compress else 'analysis_backup.db'
+    headers = {'Content-Disposition': f'attachment; filename={download_name}'}
+    if not compress:
+        headers['Content-Length'] = str(os.path.getsize(snapshot_path))
+    # El archivo temporal se borra al terminar (o cortarse) la descarga
+    return Response(stream_with_context(stream_file(snapshot_path, compress=compress, remove=True)),
+                    mimetype='application/gzip' if compress else 'application/vnd.sqlite3',
+                    headers=headers)
+
 # Global Libraries Import/Export Routes
 @app.route('/export-global-libraries/<format>')
 @login_required
 def export_global_libraries(format):
     try:
-        conn = get_db_connection()
-        libraries = conn.execute('''
+        libraries_query = '''
             SELECT library_name, type, latest_safe_version, latest_version,
                    description, vulnerability_info, source_url
             FROM global_libraries
             ORDER BY library_name
-        ''').fetchall()
-        conn.close()
+        '''
 
         if format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # Write headers
-            writer.writerow([
-                'Nombre', 'Tipo', 'Versión Segura', 'Última Versión',
-                'Descripción', 'Vulnerabilidades', 'URL Fuente'
-            ])
-
-            # Write data
-            for lib in libraries:
-                writer.writerow([
-                    lib['library_name'], lib['type'], lib['latest_safe_version'] or '',
-                    lib['latest_version'] or '', lib['description'] or '',
-                    lib['vulnerability_info'] or '', lib['source_url'] or ''
-                ])
+            def csv_rows():
+                yield [
+                    'Nombre', 'Tipo', 'Versión Segura', 'Última Versión',
+                    'Descripción', 'Vulnerabilidades', 'URL Fuente'
+                ]
+                for lib in iter_query(libraries_query):
+                    yield [
+                        lib['library_name'], lib['type'], lib['latest_safe_version'] or '',
+                        lib['latest_version'] or '', lib['description'] or '',
+                        lib['vulnerability_info'] or '', lib['source_url'] or ''
+                    ]
 
-            response = make_response(output.getvalue())
-            response.headers["Content-Disposition"] = "attachment; filename=global_libraries.csv"
-            response.headers["Content-type"] = "text/csv"
-            return response
+            return streaming_download(stream_csv(csv_rows()), 'text/csv', 'global_libraries.csv')
 
         elif format == 'json':
-            libraries_data = []
-            for lib in libraries:
-                libraries_data.append({
-                    'library_name': lib['library_name'],
-                    'type': lib['type'],
-                    'latest_safe_version': lib['latest_safe_version'],
-                    'latest_version': lib['latest_version'],
-                    'description': lib['description'],
-                    'vulnerability_info': lib['vulnerability_info'],
-                    'source_url': lib['source_url']
-                })
-
-            response = make_response(json.dumps(libraries_data, indent=2))
-            response.headers["Content-Disposition"] = "attachment; filename=global_libraries.json"
-            response.headers["Content-type"] = "application/json"
-            return response
+            libraries_data = (dict(lib) for lib in iter_query(libraries_query))
+            return streaming_download(stream_json(libraries_data), 'application/json', 'global_libraries.json')
         else:
             flash('Formato de exportación no válido', 'error')
             return redirect(url_for('global_libraries'))
@@ -6629,6 +6967,9 @@ def import_global_libraries():
                 except Exception as e:
                     errors.append(f'Error procesando "{library_name}": {str(e)}')
 
+        if imported_count > 0:
+            invalidate_ntg_catalog(conn)
+
         conn.commit()
         conn.close()
 
@@ -6654,52 +6995,10 @@ def import_global_libraries():
 @login_required
 def export_statistics(format):
     try:
-        conn = get_db_connection()
-
-        # Get all scans first
-        all_scans = conn.execute('''
-            SELECT
-                s.id,
-                s.url,
-                s.title,
-                s.scan_date,
-                s.status_code,
-                c.name as project_name,
-                COUNT(DISTINCT l2.id) as library_count,
-                COUNT(DISTINCT f.id) as file_count
-            FROM scans s
-            LEFT JOIN projects c ON s.project_id = c.id
-            LEFT JOIN libraries l2 ON s.id = l2.scan_id
-            LEFT JOIN file_urls f ON s.id = f.scan_id
-            GROUP BY s.id
-            ORDER BY s.scan_date DESC
-        ''').fetchall()
-
-        # Filter vulnerable scans using has_vulnerability function
-        vulnerable_scans = []
-        for scan in all_scans:
-            scan_dict = dict(scan)
-
-            # Get libraries for this scan to count vulnerabilities correctly
-            libraries = conn.execute('''
-                SELECT l.version, COALESCE(l.latest_safe_version, gl.latest_safe_version) as safe_version
-                FROM libraries l
-                LEFT JOIN global_libraries gl ON l.library_name = gl.library_name AND l.type = gl.type
-                WHERE l.scan_id = ?
-                AND COALESCE(l.latest_safe_version, gl.latest_safe_version) IS NOT NULL
-                AND l.version IS NOT NULL
-                AND l.version != ''
-            ''', (scan['id'],)).fetchall()
-
-            vulnerability_count = sum(1 for lib in libraries
-                                    if has_vulnerability(lib['version'], lib['safe_version']))
-
-            if vulnerability_count > 0:
-                scan_dict['vulnerability_count'] = vulnerability_count
-                vulnerable_scans.append(scan_dict)
+        timestamp = get_chile_time().strftime("%Y%m%d_%H%M%S")
 
         # Also get detailed vulnerability info for each scan
-        vulnerabilities = conn.execute('''
+        vulnerabilities_query = '''
             SELECT
                 l.scan_id,
                 l.library_name,
@@ -6713,85 +7012,78 @@ def export_statistics(format):
                 AND l.version != l.latest_safe_version
                 AND l.version < l.latest_safe_version
             ORDER BY l.scan_id, l.library_name
-        ''').fetchall()
-
-        conn.close()
+        '''
 
         if format == 'csv':
-            # Create CSV response
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # Write header for scans
-            writer.writerow(['URL', 'Título', 'Proyecto', 'Fecha Escaneo', 'Estado', 'Vulnerabilidades', 'Total Librerías', 'Total Archivos'])
-
-            # Write scan data
-            for scan in vulnerable_scans:
-                writer.writerow([
-                    scan['url'],
-                    scan['title'] or '',
-                    scan['project_name'] or 'Sin proyecto',
-                    scan['scan_date'],
-                    scan['status_code'],
-                    scan['vulnerability_count'],
-                    scan['library_count'],
-                    scan['file_count']
-                ])
-
-            # Add separator
-            writer.writerow([])
-            writer.writerow(['--- Detalle de Vulnerabilidades ---'])
-            writer.writerow(['ID Escaneo', 'Librería', 'Versión Actual', 'Versión Segura', 'Descripción', 'URL Fuente'])
-
-            # Write vulnerability details
-            for vuln in vulnerabilities:
-                writer.writerow([
-                    vuln['scan_id'],
-                    vuln['library_name'],
-                    vuln['version'],
-                    vuln['latest_safe_version'],
-                    vuln['description'] or '',
-                    vuln['source_url'] or ''
-                ])
-
-            # Prepare response
-            output.seek(0)
-            response = Response(output.getvalue(), mimetype='text/csv')
-            response.headers['Content-Disposition'] = f'attachment; filename=estadisticas_vulnerabilidades_{get_chile_time().strftime("%Y%m%d_%H%M%S")}.csv'
-            return response
+            def csv_rows():
+                # Write header for scans
+                yield ['URL', 'Título', 'Proyecto', 'Fecha Escaneo', 'Estado', 'Vulnerabilidades', 'Total Librerías', 'Total Archivos']
+
+                for scan in iter_vulnerable_scans():
+                    yield [
+                        scan['url'],
+                        scan['title'] or '',
+                        scan['project_name'] or 'Sin proyecto',
+                        scan['scan_date'],
+                        scan['status_code'],
+                        scan['vulnerability_count'],
+                        scan['library_count'],
+                        scan['file_count']
+                    ]
+
+                # Add separator
+                yield []
+                yield ['--- Detalle de Vulnerabilidades ---']
+                yield ['ID Escaneo', 'Librería', 'Versión Actual', 'Versión Segura', 'Descripción', 'URL Fuente']
+
+                for vuln in iter_query(vulnerabilities_query):
+                    yield [
+                        vuln['scan_id'],
+                        vuln['library_name'],
+                        vuln['version'],
+                        vuln['latest_safe_version'],
+                        vuln['description'] or '',
+                        vuln['source_url'] or ''
+                    ]
+
+            return streaming_download(stream_csv(csv_rows()), 'text/csv',
+                                      f'estadisticas_vulnerabilidades_{timestamp}.csv')
 
         elif format == 'json':
-            # Prepare JSON data
+            # The summary is accumulated while vulnerable_scans streams, in the same pass
+            totals = {'total_vulnerable_scans': 0, 'total_vulnerabilities': 0}
+
+            def vulnerable_scans():
+                for scan in iter_vulnerable_scans():
+                    totals['total_vulnerable_scans'] += 1
+                    totals['total_vulnerabilities'] += scan['vulnerability_count']
+                    yield scan
+
+            def summary():
+                # Only read after vulnerable_scans is exhausted (it comes later in the document)
+                yield from totals.items()
+
+            def vulnerability_details():
+                # Group vulnerabilities by scan_id (rows arrive ordered by scan_id)
+                rows = iter_query(vulnerabilities_query)
+                for scan_id, scan_vulns in groupby(rows, key=lambda row: row['scan_id']):
+                    yield scan_id, ({
+                        'library_name': vuln['library_name'],
+                        'current_version': vuln['version'],
+                        'safe_version': vuln['latest_safe_version'],
+                        'description': vuln['description'],
+                        'source_url': vuln['source_url']
+                    } for vuln in scan_vulns)
+
             data = {
                 'export_date': get_chile_time().isoformat(),
-                'summary': {
-                    'total_vulnerable_scans': len(vulnerable_scans),
-                    'total_vulnerabilities': sum(scan['vulnerability_count'] for scan in vulnerable_scans)
-                },
-                'vulnerable_scans': [dict(scan) for scan in vulnerable_scans],
-                'vulnerability_details': []
+                'vulnerable_scans': vulnerable_scans(),
+                'vulnerability_details': JsonObjectStream(vulnerability_details()),
+                'summary': JsonObjectStream(summary())
             }
 
-            # Group vulnerabilities by scan_id
-            scan_vulns = {}
-            for vuln in vulnerabilities:
-                scan_id = vuln['scan_id']
-                if scan_id not in scan_vulns:
-                    scan_vulns[scan_id] = []
-                scan_vulns[scan_id].append({
-                    'library_name': vuln['library_name'],
-                    'current_version': vuln['version'],
-                    'safe_version': vuln['latest_safe_version'],
-                    'description': vuln['description'],
-                    'source_url': vuln['source_url']
-                })
-
-            data['vulnerability_details'] = scan_vulns
-
-            # Return JSON response
-            response = Response(json.dumps(data, indent=2, ensure_ascii=False), mimetype='application/json')
-            response.headers['Content-Disposition'] = f'attachment; filename=estadisticas_vulnerabilidades_{get_chile_time().strftime("%Y%m%d_%H%M%S")}.json'
-            return response
+            return streaming_download(stream_json(data), 'application/json',
+                                      f'estadisticas_vulnerabilidades_{timestamp}.json')
 
         else:
             flash('Formato de exportación no válido', 'error')
@@ -6841,16 +7133,14 @@ def import_statistics():
                             updated_scans += 1
                         else:
                             # Create new scan
-                            cursor.execute('''
-                                INSERT INTO scans (url, title, scan_date, status_code)
-                                VALUES (?, ?, ?, ?)
-                            ''', (
+                            scan_id = insert_scan(
+                                cursor,
                                 scan_data['url'],
+                                scan_data.get('status_code', 200),
                                 scan_data.get('title', ''),
-                                scan_data.get('scan_date', format_chile_time(fmt='%Y-%m-%d %H:%M:%S')),
-                                scan_data.get('status_code', 200)
-                            ))
-                            scan_id = cursor.lastrowid
+                                None,
+                                scan_date=scan_data.get('scan_date', format_chile_time(fmt='%Y-%m-%d %H:%M:%S'))
+                            )
                             imported_scans += 1
 
                         # Import vulnerability details if available
@@ -6874,6 +7164,7 @@ def import_statistics():
                                         vuln.get('description'),
                                         vuln.get('source_url')
                                     ))
+                            reevaluate_vulnerabilities(conn, scan_id=scan_id, commit=False)
 
                     except Exception as e:
                         errors.append(f'Error procesando escaneo "{scan_data.get("url", "unknown")}": {str(e)}')
@@ -6944,6 +7235,9 @@ if __name__ == '__main__':
     # Initialize database tables on startup
     init_database()
     create_default_admin()
+    if storage.get_storage().dialect == 'sqlite':
+        start_retention_worker()
+        start_backup_worker()
 
     # Configure for development vs production
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Índice en memoria del catálogo global de librerías (global_libraries)
+
+El analizador asocia librerías NTG (ntg_*.js) con el catálogo global dentro del
+loop por línea de scan_file_for_versions. En vez de abrir una conexión por cada
+coincidencia, el catálogo NTG se carga una vez por lote de escaneos en un
+NTGCatalog (diccionario por nombre exacto) y viaja con cada archivo a los
+workers de content_pool.
+
+El dashboard usa el mismo catálogo en memoria (GlobalCatalog, del que sale el
+subconjunto NTG): /api/global-libraries responde con un ETag por versión y los
+selectores de librería global buscan por prefijo, paginados, sin volver a leer
+la tabla.
+
+La versión vive en la tabla catalog_state de la misma base de datos: las rutas
+que modifican global_libraries la incrementan con bump_catalog_version(), de modo
+que cualquier proceso (dashboard, analyzer.py por línea de comandos) detecta el
+cambio con una sola consulta.
+"""
+
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import storage
+
+CATALOG_NAME = 'global_libraries'
+
+GLOBAL_CATALOG_COLUMNS = ('id', 'library_name', 'type', 'latest_safe_version', 'latest_version',
+                          'description', 'vulnerability_info', 'source_url')
+
+
+def ensure_catalog_state_table(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def get_catalog_version(conn: sqlite3.Connection, name: str = CATALOG_NAME) -> int:
+    try:
+        row = conn.execute("SELECT version FROM catalog_state WHERE name = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        # Base de datos anterior a catalog_state
+        return 0
+    return row[0] if row else 0
+
+
+def bump_catalog_version(conn: sqlite3.Connection, name: str = CATALOG_NAME) -> int:
+    """
+    Marca el catálogo como modificado. Se ejecuta dentro de la transacción del
+    llamador (el commit lo hace quien modificó global_libraries).
+    """
+    ensure_catalog_state_table(conn)
+    conn.execute('''
+        INSERT INTO catalog_state (name, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET version = catalog_state.version + 1, updated_at = CURRENT_TIMESTAMP
+    ''', (name,))
+    if name == CATALOG_NAME:
+        _clear_local_cache()
+    return get_catalog_version(conn, name)
+
+
+class PrefixTrie:
+    """Trie de caracteres con búsqueda por prefijo"""
+
+    __slots__ = ('_root', '_size')
+
+    _VALUE = object()  # marcador de fin de clave dentro de cada nodo
+
+    def __init__(self):
+        self._root: Dict = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, key: str, value):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if self._VALUE not in node:
+            self._size += 1
+        node[self._VALUE] = value
+
+    def get(self, key: str, default=None):
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return default
+        return node.get(self._VALUE, default)
+
+    def items_with_prefix(self, prefix: str) -> Iterator[Tuple[str, object]]:
+        """(clave, valor) de todas las claves que empiezan con prefix, en orden lexicográfico"""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return
+        stack = [(prefix, node)]
+        while stack:
+            key, node = stack.pop()
+            if self._VALUE in node:
+                yield key, node[self._VALUE]
+            children = sorted((char for char in node if char is not self._VALUE), reverse=True)
+            stack.extend((key + char, node[char]) for char in children)
+
+
+class NTGCatalog:
+    """
+    Librerías globales ntg_* indexadas por nombre
+
+    lookup() asocia solo por nombre exacto, como el diccionario
+    {library_name: datos} que reemplaza. Viaja pickleado con cada archivo a los
+    workers de content_pool, así que no lleva más índices; el listado por
+    prefijo es GlobalCatalog.search().
+    """
+
+    def __init__(self, rows, version: int = 0):
+        self.version = version
+        self._by_name: Dict[str, Dict] = {}
+        for row in rows:
+            entry = {
+                'id': row['id'],
+                'name': row['library_name'],
+                'type': row['type'],
+                'latest_safe_version': row['latest_safe_version'],
+                'latest_version': row['latest_version'],
+                'description': row['description']
+            }
+            self._by_name[entry['name']] = entry
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self._by_name.get(name)
+
+    def lookup(self, name: str) -> Optional[Dict]:
+        """Entrada del catálogo con exactamente ese nombre (None si no existe)"""
+        return self._by_name.get(name)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """Formato histórico de get_ntg_global_libraries(): {library_name: datos}"""
+        return dict(self._by_name)
+
+
+def get_empty_ntg_catalog() -> NTGCatalog:
+    return NTGCatalog([], version=-1)
+
+
+class GlobalCatalog:
+    """
+    Catálogo global completo en una versión de catalog_state
+
+    libraries conserva el orden de la tabla (ORDER BY library_name) para
+    /api/global-libraries; search() pagina por prefijo del nombre sin distinguir
+    mayúsculas (orden alfabético en minúsculas) para los selectores que se
+    cargan bajo demanda; ntg es el subconjunto que usa el analizador.
+    """
+
+    def __init__(self, rows, version: int = 0):
+        self.version = version
+        self.libraries = [dict(zip(GLOBAL_CATALOG_COLUMNS, row)) for row in rows]
+        self._by_id = {library['id']: library for library in self.libraries}
+        self._trie = PrefixTrie()
+        for library in self.libraries:
+            key = library['library_name'].lower()
+            same_name = self._trie.get(key)
+            if same_name is None:
+                self._trie.insert(key, [library])
+            else:
+                same_name.append(library)
+        self._ntg: Optional[NTGCatalog] = None
+        self._derived: Dict[str, object] = {}
+
+    def __len__(self):
+        return len(self.libraries)
+
+    def get(self, library_id: int) -> Optional[Dict]:
+        return self._by_id.get(library_id)
+
+    def search(self, prefix: str = '', offset: int = 0, limit: int = 50) -> Tuple[List[Dict], int]:
+        """(página de librerías cuyo nombre empieza con prefix, total de coincidencias)"""
+        matches = [library for _, same_name in self._trie.items_with_prefix(prefix.lower())
+                   for library in same_name]
+        return matches[offset:offset + limit], len(matches)
+
+    @property
+    def ntg(self) -> NTGCatalog:
+        if self._ntg is None:
+            # Mismo criterio que LIKE 'ntg_%': 'ntg' sin distinguir mayúsculas y al menos un carácter más
+            self._ntg = NTGCatalog([library for library in self.libraries
+                                    if len(library['library_name']) > 3
+                                    and library['library_name'][:3].lower() == 'ntg'], self.version)
+        return self._ntg
+
+    def derived(self, name: str, build):
+        """build() calculado una vez por versión (p.ej. el JSON de la API y su ETag)"""
+        if name not in self._derived:
+            self._derived[name] = build()
+        return self._derived[name]
+
+
+def load_global_catalog(conn) -> GlobalCatalog:
+    # La versión se lee antes que las filas: un cambio concurrente obliga a recargar
+    version = get_catalog_version(conn)
+    rows = conn.execute(f'''
+        SELECT {', '.join(GLOBAL_CATALOG_COLUMNS)}
+        FROM global_libraries
+        ORDER BY library_name
+    ''').fetchall()
+    return GlobalCatalog(rows, version)
+
+
+_cache: Dict[object, GlobalCatalog] = {}
+_cache_lock = threading.Lock()
+
+
+def _clear_local_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_global_catalog(conn, key) -> GlobalCatalog:
+    """
+    Catálogo global vigente de la base de conn (key la identifica dentro del
+    proceso). Cuesta una consulta (la versión) si el catálogo en memoria sigue
+    vigente y una carga completa si cambió.
+    """
+    version = get_catalog_version(conn)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached.version == version:
+        return cached
+    catalog = load_global_catalog(conn)
+    with _cache_lock:
+        _cache[key] = catalog
+    return catalog
+
+
+def get_ntg_catalog(db_path: str) -> NTGCatalog:
+    """Catálogo NTG vigente para db_path (subconjunto del catálogo global en memoria)"""
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        # Misma clave que las conexiones del pool: el dashboard y sus escaneos comparten el catálogo
+        return get_global_catalog(conn, storage.sqlite_database_key(db_path)).ntg
+    finally:
+        conn.close()
+
+
+def invalidate_ntg_catalog(conn: sqlite3.Connection) -> int:
+    """Invalida el catálogo en todos los procesos tras modificar global_libraries"""
+    return bump_catalog_version(conn)
+
+
+# --- Datos de formularios por versión ----------------------------------------
+
+PROJECTS_STATE = 'projects'
+
+_versioned: Dict[Tuple, Tuple[int, object]] = {}
+
+
+def cached_for_version(conn, name: str, loader, key=None):
+    """
+    loader(conn) en memoria mientras la versión `name` de catalog_state no
+    cambie (p.ej. la lista de proyectos de los formularios).
+    key distingue bases de datos dentro del proceso. La versión se lee antes que
+    los datos: un cambio concurrente deja guardada la versión anterior y la
+    siguiente llamada recarga.
+    """
+    version = get_catalog_version(conn, name)
+    with _cache_lock:
+        cached = _versioned.get((name, key))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    value = loader(conn)
+    with _cache_lock:
+        _versioned[(name, key)] = (version, value)
+    return value
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Configuración de Gunicorn (servidor WSGI preforking) para el dashboard
+
+Variables de entorno:
+    WEB_WORKERS   procesos worker (default: 2 * CPUs + 1)
+    WEB_THREADS   hilos por worker (default: 4)
+    WEB_BIND      dirección de escucha (default: FLASK_HOST:FLASK_PORT)
+    WEB_TIMEOUT   segundos antes de reciclar un worker bloqueado (default: 600: el
+                  análisis y el re-escaneo de una URL corren dentro de la petición;
+                  los análisis masivos van en un hilo aparte, ver shared_state.py)
+    CONTENT_POOL_WORKERS  procesos de análisis por worker (default: CPUs / workers,
+                  mínimo 1; ver content_pool.py)
+    LOG_LEVEL     nivel de gunicorn y de los logs de la aplicación (default: info;
+                  debug muestra el detalle por librería y archivo, ver app_logging.py)
+    RETENTION_KEEP_SCANS  escaneos completos por URL; los anteriores se archivan en
+                  segundo plano desde los workers (default: 0, desactivado; ver retention.py)
+    BACKUP_INTERVAL_HOURS  respaldos programados incrementales con rotación
+                  (default: 0, desactivado; ver backup.py)
+    STORAGE_BACKEND  sqlite (default) o postgresql; STORAGE_POOL_SIZE conexiones
+                  reutilizables por worker (default: 8; ver storage.py)
+"""
+
+import multiprocessing
+import os
+import secrets
+
+bind = os.environ.get('WEB_BIND') or f"{os.environ.get('FLASK_HOST', '0.0.0.0')}:{os.environ.get('FLASK_PORT', '5000')}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Cada worker tiene su propio pool de análisis (content_pool): repartir los CPUs
+os.environ.setdefault('CONTENT_POOL_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+timeout = int(os.environ.get('WEB_TIMEOUT', '600'))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers periódicamente para acotar el crecimiento de memoria
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    """Se ejecuta una vez en el maestro, antes de crear los workers"""
+    # Todos los workers deben firmar las sesiones con la misma clave
+    if not os.environ.get('FLASK_SECRET_KEY'):
+        os.environ['FLASK_SECRET_KEY'] = secrets.token_hex(32)
+        server.log.warning("FLASK_SECRET_KEY no definida: se generó una clave temporal compartida por los workers")
+
+    from dashboard import init_database, create_default_admin
+    import storage
+    init_database()
+    create_default_admin()
+    # Las conexiones del pool no deben heredarse en los workers
+    storage.get_storage().close_all()
+    server.log.info(f"🔒 Dashboard listo: {workers} workers x {threads} threads en {bind}")
+
+
+def post_fork(server, worker):
+    """Se ejecuta en cada worker recién creado"""
+    # Cada worker lanza sus hilos de mantenimiento (solo SQLite); el lease en analysis.db (retención)
+    # y el lock en BACKUP_DIR (respaldos) dejan trabajar a uno solo
+    import storage
+    if storage.get_storage().dialect != 'sqlite':
+        return
+    from retention import start_retention_worker
+    from backup import start_backup_worker
+    start_retention_worker()
+    start_backup_worker()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Re-escaneo incremental con peticiones HTTP condicionales
+
+Cada escaneo del dashboard guarda, por URL de página y de archivo JS/CSS, los
+validadores de la respuesta (ETag, Last-Modified) junto con el resultado de su
+análisis en la tabla http_validators (una fila por URL, no por escaneo).
+
+Un re-escaneo incremental envía If-None-Match / If-Modified-Since con esos
+validadores. Si el servidor responde 304:
+  - página: se reutilizan título, librerías detectadas en el HTML, lista de
+    archivos y resultados de scripts inline, sin descargar ni parsear el HTML;
+  - archivo: se reutilizan sus cadenas de versión y librerías detectadas, sin
+    descargarlo ni pasar por las regex y firmas.
+Solo se descargan y analizan los recursos que cambiaron, y no se hacen las
+peticiones HEAD (estado y tamaño salen del GET condicional o del caché).
+
+Lo que NO ahorra es almacenamiento: no se guardan deltas contra el escaneo
+anterior. Cada re-escaneo escribe sus filas completas en libraries, file_urls y
+version_strings, porque las vistas, reportes, exportaciones, comparaciones y la
+retención leen los resultados por scan_id y un escaneo archivado no puede
+depender de otro. scans.base_scan_id apunta al escaneo cuyo análisis de página
+se reutilizó y file_urls.not_modified marca los archivos que respondieron 304,
+solo como referencia. El costo en disco de esas filas repetidas lo acotan el
+almacenamiento normalizado (URLs y headers como claves enteras, ver
+normalized_storage.py) y la retención (retention.py).
+
+El ahorro es de red y CPU: con la página y todos sus archivos sin cambios, un
+re-escaneo hace una petición condicional por recurso sin cuerpo y ninguna HEAD,
+en lugar de GET + HEAD por archivo y el análisis de cada uno. El formulario de
+re-escaneo manda full=1 para forzar el análisis completo (por ejemplo, si un
+servidor responde 304 con validadores incorrectos).
+
+Un análisis guardado solo se reutiliza con la misma analyzer_version(), que
+cambia sola al modificar los patrones de versión (content_scanner) o las firmas
+de library_signatures. La asociación con el catálogo global (global_library_id)
+no se guarda: depende del catálogo actual y se resuelve en cada escaneo.
+"""
+
+import hashlib
+import json
+import sqlite3
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Incrementar al cambiar el formato de `analysis` o un detector que no entra en
+# analyzer_version(): detect_js_libraries/detect_css_libraries del dashboard,
+# extract_library_name_from_context o el filtrado de líneas de content_scanner
+INCREMENTAL_ANALYZER_VERSION = 1
+
+KIND_PAGE = 'page'
+KIND_FILE = 'file'
+
+# Campos de cada resultado que no dependen del escaneo
+_VERSION_STRING_FIELDS = ('file_url', 'file_type', 'line_number', 'line_content', 'version_keyword')
+_LIBRARY_FIELDS = ('name', 'version', 'type', 'source', 'detection_method', 'confidence')
+
+
+@lru_cache(maxsize=None)
+def analyzer_version() -> int:
+    """
+    Versión de los análisis guardados: INCREMENTAL_ANALYZER_VERSION más una huella
+    de los patrones de versión y las firmas de librerías (calculada una vez por proceso)
+    """
+    from content_scanner import VERSION_PATTERN_SOURCES
+    from library_signatures import get_detection_engine
+
+    digest = hashlib.sha256(repr((INCREMENTAL_ANALYZER_VERSION, VERSION_PATTERN_SOURCES)).encode())
+    for key, signature in sorted(get_detection_engine().signatures.items()):
+        digest.update(repr((key, sorted(vars(signature).items()))).encode())
+    # Entero positivo de 31 bits: la columna es INTEGER también en PostgreSQL
+    return int(digest.hexdigest()[:7], 16)
+
+
+def ensure_http_validators_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS http_validators (
+            url TEXT NOT NULL,
+            kind TEXT NOT NULL, -- 'page' o 'file'
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER, -- bytes del cuerpo en la última respuesta 200
+            analyzer_version INTEGER NOT NULL,
+            analysis TEXT, -- JSON con el resultado reutilizable
+            last_scan_id INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (url, kind)
+        )
+    ''')
+
+
+def response_validators(headers) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """(etag, last_modified) de la respuesta, o None si no permite peticiones condicionales"""
+    etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return None
+    return etag, last_modified
+
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    if not entry:
+        return {}
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def load_validators(conn, urls: Iterable[str], kind: str) -> Dict[str, Dict]:
+    """{url: {etag, last_modified, size, analysis, last_scan_id}} de las URLs ya vistas"""
+    urls = list(dict.fromkeys(urls))
+    entries = {}
+    try:
+        # Lotes por debajo del límite de variables de SQLite
+        for start in range(0, len(urls), 500):
+            batch = urls[start:start + 500]
+            rows = conn.execute(f'''
+                SELECT url, etag, last_modified, size, analysis, last_scan_id
+                FROM http_validators
+                WHERE kind = ? AND analyzer_version = ? AND url IN ({','.join('?' * len(batch))})
+            ''', [kind, analyzer_version()] + batch).fetchall()
+            for row in rows:
+                entries[row[0]] = {
+                    'etag': row[1],
+                    'last_modified': row[2],
+                    'size': row[3],
+                    'analysis': json.loads(row[4] or '{}'),
+                    'last_scan_id': row[5],
+                }
+    except sqlite3.OperationalError:
+        # Base de datos anterior a http_validators
+        ensure_http_validators_table(conn)
+    return entries
+
+
+def save_validators(conn, url: str, kind: str, headers, size: int, analysis: Dict, scan_id: int):
+    """Guarda validadores y análisis de una respuesta 200 (ignora respuestas sin ETag/Last-Modified)"""
+    validators = response_validators(headers)
+    if validators is None:
+        return
+    conn.execute('''
+        INSERT INTO http_validators (url, kind, etag, last_modified, size, analyzer_version, analysis, last_scan_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url, kind) DO UPDATE SET
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            size = excluded.size,
+            analyzer_version = excluded.analyzer_version,
+            analysis = excluded.analysis,
+            last_scan_id = excluded.last_scan_id,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (url, kind, validators[0], validators[1], size, analyzer_version(),
+          json.dumps(analysis), scan_id))
+
+
+def touch_validators(conn, url: str, kind: str, scan_id: int):
+    """Registra que el recurso se reutilizó (304) en este escaneo"""
+    conn.execute('UPDATE http_validators SET last_scan_id = ?, updated_at = CURRENT_TIMESTAMP WHERE url = ? AND kind = ?',
+                 (scan_id, url, kind))
+
+
+def pack_results(version_strings: List[Dict], libraries: List[Dict]) -> Dict:
+    """Resultado de un análisis sin los campos propios del escaneo (scan_id)"""
+    return {
+        'version_strings': [{field: vs.get(field) for field in _VERSION_STRING_FIELDS} for vs in version_strings],
+        'libraries': [{field: lib.get(field) for field in _LIBRARY_FIELDS} for lib in libraries],
+    }
+
+
+def unpack_results(packed: Dict, scan_id: int) -> Tuple[List[Dict], List[Dict]]:
+    """(version_strings, libraries) de un análisis guardado, asignados al escaneo nuevo"""
+    version_strings = [dict(vs, scan_id=scan_id) for vs in packed.get('version_strings', [])]
+    libraries = [_unpack_library(lib) for lib in packed.get('libraries', [])]
+    return version_strings, libraries
+
+
+def _unpack_library(lib: Dict) -> Dict:
+    # Solo los campos de _LIBRARY_FIELDS: descarta global_library_id de análisis más antiguos
+    return {field: lib.get(field) for field in _LIBRARY_FIELDS}
+
+
+def pack_page(title: str, libraries: List[Dict], files: List[Dict],
+              inline_version_strings: List[Dict], inline_libraries: List[Dict]) -> Dict:
+    """Análisis de la página reutilizable cuando el HTML no cambia"""
+    return {
+        'title': title,
+        'libraries': pack_results([], libraries)['libraries'],
+        'files': [{'url': f['url'], 'type': f['type']} for f in files],
+        'inline': pack_results(inline_version_strings, inline_libraries),
+    }
+
+
+def unpack_page(analysis: Dict) -> Tuple[str, List[Dict], List[Dict]]:
+    """(título, librerías del HTML, archivos JS/CSS) de un análisis de página guardado"""
+    return (analysis.get('title') or 'No title',
+            [_unpack_library(lib) for lib in analysis.get('libraries', [])],
+            [dict(f) for f in analysis.get('files', [])])
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Análisis de scripts inline (<script> sin src) con deduplicación por hash
+
+Los bloques inline suelen traer banners de bundlers o asignaciones como
+jQuery.fn.jquery, pero en un sitio se repiten casi idénticos en todas las
+páginas (y en cada re-escaneo). Cada bloque se identifica por el SHA-256 de su
+contenido: los detectores (detect_libraries_by_content y el escáner de
+versiones) solo corren sobre bloques nunca vistos, y el resultado queda en la
+tabla inline_script_analysis para reutilizarlo en escaneos posteriores.
+
+Los resultados se materializan por escaneo en version_strings y libraries con
+una URL sintética <url de la página>#inline-<hash>, igual que un archivo externo.
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Incrementar cuando cambien los detectores: fuerza re-analizar bloques ya guardados
+INLINE_ANALYZER_VERSION = 1
+
+# Los detectores solo miran el inicio de bloques enormes (JSON embebido, bundles)
+INLINE_SCRIPT_MAX_CHARS = 512 * 1024
+
+INLINE_HASH_PREFIX_CHARS = 16
+
+# Campos de cada resultado que no dependen de la página ni del escaneo
+_VERSION_STRING_FIELDS = ('line_number', 'line_content', 'version_keyword')
+_LIBRARY_FIELDS = ('name', 'version', 'detection_method', 'confidence', 'global_library_id')
+
+ScanContentFunc = Callable[[str, str, str, int], Tuple[List[Dict], List[Dict]]]
+
+
+def ensure_inline_script_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS inline_script_analysis (
+            content_hash TEXT PRIMARY KEY,
+            size INTEGER,
+            analyzer_version INTEGER NOT NULL,
+            version_strings TEXT, -- JSON: cadenas de versión encontradas en el bloque
+            libraries TEXT, -- JSON: librerías detectadas en el bloque
+            first_scan_id INTEGER,
+            last_scan_id INTEGER,
+            times_seen INTEGER DEFAULT 1,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def inline_script_hash(body: str) -> str:
+    return hashlib.sha256(body.strip().encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def inline_script_url(page_url: str, content_hash: str) -> str:
+    return f"{page_url}#inline-{content_hash[:INLINE_HASH_PREFIX_CHARS]}"
+
+
+def _unique_blocks(inline_scripts: Iterable[str]) -> Dict[str, str]:
+    """{hash: contenido} en orden de aparición, sin bloques repetidos en la página"""
+    blocks = {}
+    for body in inline_scripts:
+        if body and body.strip():
+            blocks.setdefault(inline_script_hash(body), body)
+    return blocks
+
+
+def _load_known(conn, hashes: List[str]) -> Dict[str, Tuple[List[Dict], List[Dict]]]:
+    known = {}
+    # Lotes por debajo del límite de variables de SQLite
+    for start in range(0, len(hashes), 500):
+        batch = hashes[start:start + 500]
+        placeholders = ','.join('?' * len(batch))
+        rows = conn.execute(f'''
+            SELECT content_hash, version_strings, libraries
+            FROM inline_script_analysis
+            WHERE analyzer_version = ? AND content_hash IN ({placeholders})
+        ''', [INLINE_ANALYZER_VERSION] + batch).fetchall()
+        for row in rows:
+            known[row[0]] = (json.loads(row[1] or '[]'), json.loads(row[2] or '[]'))
+    return known
+
+
+def analyze_inline_scripts(conn, scan_id: int, page_url: str, inline_scripts: Iterable[str],
+                           scan_content: ScanContentFunc) -> Tuple[List[Dict], List[Dict], Dict[str, int]]:
+    """
+    Ejecuta el escáner de contenido solo sobre bloques inline nuevos
+
+    Args:
+        conn: conexión del escaneo (las escrituras se confirman con su commit)
+        scan_content: función (content, file_url, file_type, scan_id) ->
+            (version_strings, detected_libraries), la misma que se usa para archivos externos
+
+    Returns:
+        (version_strings, detected_libraries, estadísticas) listos para insertar
+        en version_strings y libraries del escaneo
+    """
+    blocks = _unique_blocks(inline_scripts)
+    stats = {'blocks': len(blocks), 'analyzed': 0, 'reused': 0}
+    if not blocks:
+        return [], [], stats
+
+    try:
+        known = _load_known(conn, list(blocks))
+    except sqlite3.OperationalError:
+        # Base de datos anterior a inline_script_analysis
+        ensure_inline_script_table(conn)
+        known = {}
+
+    version_strings, detected_libraries = [], []
+    for content_hash, body in blocks.items():
+        file_url = inline_script_url(page_url, content_hash)
+
+        if content_hash in known:
+            block_versions, block_libraries = known[content_hash]
+            stats['reused'] += 1
+            conn.execute('''
+                UPDATE inline_script_analysis
+                SET last_scan_id = ?, times_seen = times_seen + 1
+                WHERE content_hash = ?
+            ''', (scan_id, content_hash))
+        else:
+            found_versions, found_libraries = scan_content(body[:INLINE_SCRIPT_MAX_CHARS], file_url, 'js', scan_id)
+            block_versions = [{field: vs.get(field) for field in _VERSION_STRING_FIELDS} for vs in found_versions]
+            block_libraries = [{field: lib.get(field) for field in _LIBRARY_FIELDS} for lib in found_libraries]
+            stats['analyzed'] += 1
+            conn.execute('''
+                INSERT INTO inline_script_analysis
+                    (content_hash, size, analyzer_version, version_strings, libraries, first_scan_id, last_scan_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(content_hash) DO UPDATE SET
+                    analyzer_version = excluded.analyzer_version,
+                    version_strings = excluded.version_strings,
+                    libraries = excluded.libraries,
+                    last_scan_id = excluded.last_scan_id,
+                    times_seen = inline_script_analysis.times_seen + 1
+            ''', (content_hash, len(body), INLINE_ANALYZER_VERSION, json.dumps(block_versions),
+                  json.dumps(block_libraries), scan_id, scan_id))
+
+        for vs in block_versions:
+            version_strings.append(dict(vs, scan_id=scan_id, file_url=file_url, file_type='js'))
+        for lib in block_libraries:
+            detected_libraries.append(dict(lib, type='js', source=file_url))
+
+    return version_strings, detected_libraries, stats
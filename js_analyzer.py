@@ -2,13 +2,14 @@
 import requests
 import sqlite3
 import re
-import json
 import ipaddress
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 from datetime import datetime
 import time
 
+from normalized_storage import headers_json, insert_scan
+
 # Import our advanced library detector
 try:
     from library_detector import LibraryDetector, detect_libraries_advanced
@@ -18,6 +19,14 @@ except ImportError:
     print("⚠️ Advanced library detector not available, using basic detection")
     ADVANCED_DETECTION_AVAILABLE = False
 
+# Estado de vulnerabilidad de las librerías guardadas (libraries.is_vulnerable)
+try:
+    from vulnerability_evaluator import reevaluate_library_vulnerabilities
+    VULNERABILITY_EVALUATOR_AVAILABLE = True
+except ImportError:
+    print("⚠️ Vulnerability evaluator not available, libraries.is_vulnerable will not be set")
+    VULNERABILITY_EVALUATOR_AVAILABLE = False
+
 class LibraryAnalyzer:
     def __init__(self, db_path="analysis.db"):
         self.db_path = db_path
@@ -697,12 +706,9 @@ class LibraryAnalyzer:
             conn.execute('PRAGMA busy_timeout=30000')
             cursor = conn.cursor()
 
-            cursor.execute('''
-            INSERT INTO scans (url, status_code, title, headers, project_id, reviewed)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (url, response.status_code, title, json.dumps(dict(response.headers)), None, 0))
-
-            scan_id = cursor.lastrowid
+            # insert_scan: cursor.lastrowid no sirve a través de la vista scans
+            scan_id = insert_scan(cursor, url, response.status_code, title, headers_json(response.headers),
+                                  project_id=None, reviewed=0)
 
             # Detect libraries with contextual enhancement
             js_libraries = self.detect_js_libraries(soup, url)
@@ -754,6 +760,10 @@ class LibraryAnalyzer:
                 ''', (scan_id, lib['name'], lib['version'], lib['type'], lib['source'],
                       f"Detectada automáticamente por patrón de versión ({lib['detection_method']})", 0))
 
+            # is_vulnerable de las librerías del escaneo, en la misma transacción
+            if VULNERABILITY_EVALUATOR_AVAILABLE:
+                reevaluate_library_vulnerabilities(conn, scan_id=scan_id, commit=False)
+
             conn.commit()
 
             print(f"✓ Analyzed {url} - Found {len(all_libraries)} libraries, {len(js_css_files)} files, {len(all_version_strings)} version strings")
@@ -770,10 +780,7 @@ class LibraryAnalyzer:
                     conn.execute('PRAGMA synchronous=FULL')
                     conn.execute('PRAGMA busy_timeout=30000')
                 cursor = conn.cursor()
-                cursor.execute('''
-                INSERT INTO scans (url, status_code, title, headers, project_id, reviewed)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ''', (url, 0, f"Error: {str(e)}", "{}", None, 0))
+                insert_scan(cursor, url, 0, f"Error: {str(e)}", "{}", project_id=None, reviewed=0)
                 conn.commit()
             except:
                 pass  # If we can't store the error, just continue
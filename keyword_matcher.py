@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de muchas palabras clave en una sola pasada
+
+KeywordMatcher agrupa palabras clave por categoría y compila todas en una única
+alternancia (de la más larga a la más corta) que el motor de regex recorre una
+vez sobre el texto en minúsculas. Reemplaza los any(word in texto ...) repetidos
+por categoría, que re-escaneaban el documento completo una vez por palabra.
+Cuando una categoría ya se encontró sus palabras salen de la alternancia.
+
+Una coincidencia de la palabra más larga en una posición implica también a todas
+las palabras que son prefijo de ella, por lo que el resultado es exactamente el
+conjunto de categorías con alguna palabra contenida en el texto.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Set
+
+
+class KeywordMatcher:
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        keyword_categories: Dict[str, Set[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword_categories.setdefault(keyword.lower(), set()).add(category)
+
+        # Categorías que implica encontrar cada palabra (incluye las palabras prefijo)
+        self._implied = {
+            keyword: frozenset(category for other, cats in keyword_categories.items()
+                               if keyword.startswith(other) for category in cats)
+            for keyword in keyword_categories
+        }
+        self._categories = frozenset(category for cats in keyword_categories.values() for category in cats)
+        self._regex_for = lru_cache(maxsize=64)(self._compile)
+
+    def _compile(self, pending: frozenset):
+        """Alternancia solo con las palabras que aún pueden aportar categorías pendientes"""
+        keywords = sorted((keyword for keyword, cats in self._implied.items() if cats & pending),
+                          key=len, reverse=True)
+        return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+    @property
+    def categories(self) -> frozenset:
+        return self._categories
+
+    def match(self, text: str, limit: Optional[int] = None) -> Set[str]:
+        """
+        Categorías con al menos una palabra presente en text
+
+        Args:
+            limit: cantidad máxima de caracteres a revisar desde el inicio
+        """
+        found: Set[str] = set()
+        if not text or not self._categories:
+            # Sin palabras la alternancia vacía coincidiría con '' en cada posición
+            return found
+        sample = (text if limit is None else text[:limit]).lower()
+
+        regex = self._regex_for(self._categories)
+        position = 0
+        while True:
+            match = regex.search(sample, position)
+            if match is None:
+                break
+            new_categories = self._implied[match.group()] - found
+            if new_categories:
+                found |= new_categories
+                if len(found) == len(self._categories):
+                    break  # todas las categorías ya están presentes
+                regex = self._regex_for(self._categories - found)
+            # La siguiente búsqueda parte un carácter después: coincidencias solapadas
+            position = match.start() + 1
+        return found
@@ -4,10 +4,15 @@ Sistema avanzado de detección de librerías JavaScript y CSS
 Basado en patrones RegEx del js-file-extractor.html
 """
 import re
+import threading
 import requests
 from urllib.parse import urlparse
 from typing import Dict, List, Tuple, Optional
 
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
 class LibraryDetector:
     
     # Patrones de detección para librerías conocidas
@@ -165,8 +170,65 @@ class LibraryDetector:
         'analytics': ['google-analytics', 'gtag', 'matomo', 'hotjar']
     }
 
+    # Patrones para detectar en comentarios y headers
+    HEADER_PATTERNS = [
+        r'/\*!\s*(.+?)\s+v?(\d+\.\d+\.\d+)',  # /* LibraryName v1.2.3 */
+        r'//\s*(.+?)\s+v?(\d+\.\d+\.\d+)',     # // LibraryName v1.2.3
+        r'@version\s+(\d+\.\d+\.\d+)',         # @version 1.2.3
+        r'@name\s+(.+)',                       # @name LibraryName
+    ]
+
     def __init__(self):
-        self.detected_libraries = []
+        # Sin estado mutable: una sola instancia (get_library_detector) se comparte entre hilos
+        self._trigger_regex, self._trigger_libraries, self._library_regexes = self._compile_filename_patterns()
+        self._header_regexes = [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in self.HEADER_PATTERNS]
+
+    @staticmethod
+    def _required_prefix(pattern: str) -> str:
+        """Literal con el que debe empezar cualquier coincidencia del patrón"""
+        pattern = re.sub(r'^\(\?:[^()]*\)\?', '', pattern)  # prefijo opcional, p. ej. (?:jquery\.)?
+        literal = re.match(r'[\w@/-]*', pattern).group(0)
+        if len(pattern) > len(literal) and pattern[len(literal)] in '?*{':
+            literal = literal[:-1]  # el último carácter es opcional
+        return literal.lower()
+
+    @classmethod
+    def _compile_filename_patterns(cls):
+        """
+        Precompila los patrones de nombre de archivo
+
+        - Una regex de disparo con todos los prefijos literales requeridos: un solo
+          findall indica qué librerías pueden aparecer en el nombre.
+        - Por librería, una regex combinada de lookaheads con grupos con nombre, en
+          el orden de sus patrones: un match() equivale a probar cada patrón con
+          re.search y quedarse con el primero que coincide.
+        """
+        prefixes = {}
+        library_regexes = {}
+        for lib_index, (library_name, config) in enumerate(cls.LIBRARY_PATTERNS.items()):
+            alternatives = []
+            groups = []
+            for pattern_index, pattern in enumerate(config['patterns']):
+                group_name = f'l{lib_index}p{pattern_index}'
+                alternatives.append(f'(?=.*?(?P<{group_name}>{pattern}))')
+                groups.append((group_name, pattern, re.compile(pattern).groups > 0))
+                prefixes.setdefault(cls._required_prefix(pattern), set()).add(library_name)
+
+            regex = re.compile('|'.join(alternatives), re.IGNORECASE | re.DOTALL)
+            # El primer grupo interno del patrón viene justo después del grupo con nombre
+            library_regexes[library_name] = (regex, [
+                (group_name, pattern, regex.groupindex[group_name] + 1 if has_version else None)
+                for group_name, pattern, has_version in groups
+            ])
+
+        # Un prefijo encontrado habilita también a las librerías cuyo prefijo es más corto
+        trigger_libraries = {
+            prefix: {lib for other, libs in prefixes.items() if prefix.startswith(other) for lib in libs}
+            for prefix in prefixes
+        }
+        alternation = '|'.join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True))
+        trigger_regex = re.compile(f'(?=({alternation}))', re.IGNORECASE)
+        return trigger_regex, trigger_libraries, library_regexes
 
     def detect_from_filename(self, filename: str, file_url: str = None) -> List[Dict]:
         """
@@ -174,30 +236,37 @@ class LibraryDetector:
         """
         detections = []
         filename_lower = filename.lower()
-        
+
+        candidates = set()
+        for prefix in self._trigger_regex.findall(filename_lower):
+            candidates |= self._trigger_libraries[prefix]
+
         for library_name, config in self.LIBRARY_PATTERNS.items():
-            for pattern in config['patterns']:
-                match = re.search(pattern, filename_lower, re.IGNORECASE)
-                if match:
-                    version = match.group(1) if match.groups() else 'unknown'
-                    
-                    # Calcular confianza basada en el patrón
-                    confidence = self._calculate_confidence(match, filename, config)
-                    
-                    detection = {
-                        'library_name': library_name,
-                        'version': version,
-                        'type': config['type'],
-                        'confidence': confidence,
-                        'detection_method': 'filename_pattern',
-                        'matched_pattern': pattern,
-                        'source_file': filename,
-                        'source_url': file_url
-                    }
-                    
-                    detections.append(detection)
-                    break  # Solo el primer patrón que coincida
-        
+            if library_name not in candidates:
+                continue
+            regex, groups = self._library_regexes[library_name]
+            match = regex.match(filename_lower)
+            if not match:
+                continue
+
+            # Solo el primer patrón que coincida
+            group_name, pattern, version_group = next(group for group in groups if match.group(group[0]) is not None)
+            version = match.group(version_group) if version_group else 'unknown'
+
+            # Calcular confianza basada en el patrón
+            confidence = self._calculate_confidence(version if version_group else None, filename, config)
+
+            detections.append({
+                'library_name': library_name,
+                'version': version,
+                'type': config['type'],
+                'confidence': confidence,
+                'detection_method': 'filename_pattern',
+                'matched_pattern': pattern,
+                'source_file': filename,
+                'source_url': file_url
+            })
+
         return detections
 
     def detect_from_content(self, content: str, file_url: str = None) -> List[Dict]:
@@ -205,17 +274,10 @@ class LibraryDetector:
         Detectar librerías desde el contenido del archivo
         """
         detections = []
+        header = content[:2000]  # Solo los primeros 2KB
         
-        # Patrones para detectar en comentarios y headers
-        header_patterns = [
-            r'/\*!\s*(.+?)\s+v?(\d+\.\d+\.\d+)',  # /* LibraryName v1.2.3 */
-            r'//\s*(.+?)\s+v?(\d+\.\d+\.\d+)',     # // LibraryName v1.2.3
-            r'@version\s+(\d+\.\d+\.\d+)',         # @version 1.2.3
-            r'@name\s+(.+)',                       # @name LibraryName
-        ]
-        
-        for pattern in header_patterns:
-            matches = re.finditer(pattern, content[:2000], re.IGNORECASE)  # Solo los primeros 2KB
+        for pattern, regex in self._header_regexes:
+            matches = regex.finditer(header)
             for match in matches:
                 lib_info = self._analyze_header_match(match)
                 if lib_info:
@@ -261,7 +323,7 @@ class LibraryDetector:
         
         return detections
 
-    def _calculate_confidence(self, match: re.Match, filename: str, config: Dict) -> float:
+    def _calculate_confidence(self, version: Optional[str], filename: str, config: Dict) -> float:
         """
         Calcular nivel de confianza de la detección
         """
@@ -274,7 +336,7 @@ class LibraryDetector:
                     confidence += 0.1
         
         # Boost si tiene versión específica
-        if match.groups() and len(match.group(1).split('.')) == 3:
+        if version is not None and len(version.split('.')) == 3:
             confidence += 0.1
         
         # Boost si es archivo minificado
@@ -342,16 +404,31 @@ class LibraryDetector:
             content_length = response.headers.get('Content-Length')
             if content_length:
                 return int(content_length)
-        except:
-            pass
+        except Exception as e:
+            logger.debug("  ! Could not get size for %s: %s", file_url, e)
         return None
 
+_library_detector = None
+_library_detector_lock = threading.Lock()
+
+
+def get_library_detector() -> LibraryDetector:
+    """Instancia compartida (thread-safe) con los patrones ya compilados"""
+    global _library_detector
+    if _library_detector is None:
+        with _library_detector_lock:
+            if _library_detector is None:
+                _library_detector = LibraryDetector()
+                logger.debug("✅ Library detector ready: %d filename patterns", len(LibraryDetector.LIBRARY_PATTERNS))
+    return _library_detector
+
+
 # Función helper para usar en analyzer.py
 def detect_libraries_advanced(file_url: str, filename: str = None, content: str = None) -> List[Dict]:
     """
     Función principal para detectar librerías con el sistema avanzado
     """
-    detector = LibraryDetector()
+    detector = get_library_detector()
     all_detections = []
     
     if not filename:
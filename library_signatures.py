@@ -5,8 +5,13 @@ Implementa detección por contenido real de archivos, no solo patrones de URL
 """
 
 import re
+import threading
 from typing import Dict, List, Tuple, Optional
 
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
 class LibrarySignature:
     """
     Representa una firma única de librería con múltiples patrones de detección
@@ -195,6 +200,9 @@ class LibraryDetectionEngine:
                 detection['detection_method'] = 'content_analysis'
                 detections.append(detection)
 
+        if detections:
+            logger.debug("  🎯 Firmas de contenido (%s): %s", file_type,
+                         ', '.join(f"{d['library_name']} v{d.get('version', 'unknown')}" for d in detections))
         return detections
 
     def _analyze_signature(self, content: str, content_lower: str, signature: LibrarySignature) -> Optional[Dict]:
@@ -285,8 +293,30 @@ class LibraryDetectionEngine:
         }
 
 
-# Instancia global del motor de detección
-detection_engine = LibraryDetectionEngine()
+# Instancia global del motor de detección (se construye en el primer uso)
+_detection_engine: Optional[LibraryDetectionEngine] = None
+_detection_engine_lock = threading.Lock()
+
+
+def get_detection_engine() -> LibraryDetectionEngine:
+    """
+    Retorna el motor de detección compartido, creándolo la primera vez
+    Evita construir todas las firmas al importar el módulo
+    """
+    global _detection_engine
+    if _detection_engine is None:
+        with _detection_engine_lock:
+            if _detection_engine is None:
+                _detection_engine = LibraryDetectionEngine()
+                logger.debug("🎯 Motor de firmas listo: %d librerías", len(_detection_engine.signatures))
+    return _detection_engine
+
+
+def __getattr__(name):
+    # Compatibilidad con `from library_signatures import detection_engine`
+    if name == 'detection_engine':
+        return get_detection_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def detect_libraries_by_content(file_content: str, file_type: str) -> List[Dict]:
@@ -300,15 +330,16 @@ def detect_libraries_by_content(file_content: str, file_type: str) -> List[Dict]
     Returns:
         Lista de librerías detectadas con metadata
     """
-    return detection_engine.detect_library_in_content(file_content, file_type)
+    return get_detection_engine().detect_library_in_content(file_content, file_type)
 
 
 def get_library_info(library_name: str) -> Optional[Dict]:
     """
     Obtiene información detallada de una librería soportada
     """
-    if library_name in detection_engine.signatures:
-        sig = detection_engine.signatures[library_name]
+    signatures = get_detection_engine().signatures
+    if library_name in signatures:
+        sig = signatures[library_name]
         return {
             'name': sig.name,
             'type': sig.library_type,
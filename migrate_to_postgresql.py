@@ -1,447 +1,612 @@
 #!/usr/bin/env python3
 """
 Script de Migración: SQLite (analysis.db) → PostgreSQL
-Migra únicamente los datos de analysis.db a una base de datos PostgreSQL unificada.
+Migra los datos de analysis.db al esquema de storage.py (STORAGE_BACKEND=postgresql).
+
+La migración es un flujo continuo, tabla por tabla:
+
+  - lectura por páginas con keyset (WHERE id > último ORDER BY id LIMIT n):
+    nunca hay más de --chunk-size filas en memoria, ni en SQLite ni en Python
+  - transformación con generadores (tipos laxos de SQLite → tipos de la columna
+    destino, fechas normalizadas, NUL eliminados)
+  - carga con COPY FROM STDIN en formato texto, un COPY por página
+  - checkpoint por tabla (migration_checkpoints) en la misma transacción que
+    cada página: si el proceso se corta, volver a ejecutar retoma donde quedó
+  - tablas independientes en paralelo (--jobs); las hijas esperan a sus padres
+  - verificación: filas y checksum de SQLite (releído y transformado) frente a
+    PostgreSQL, por tabla
+
+Las filas huérfanas (librerías de escaneos borrados, etc.) se omiten y las
+referencias opcionales rotas (project_id, global_library_id) quedan en NULL.
+Para migrar una base en uso, migra una instantánea: python backup.py snapshot copia.db
+
+Uso:
+    python migrate_to_postgresql.py [--sqlite analysis.db] [--dsn ...] [--jobs 4]
+                                    [--chunk-size 5000] [--reset] [--verify-only] [--yes]
 """
 
+import argparse
+import hashlib
+import io
+import os
+import re
 import sqlite3
-import psycopg2
-import psycopg2.extras
-import json
 import sys
-import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+import storage
+
+# Orden de migración y dependencias (una tabla empieza cuando terminaron sus padres)
+MIGRATION_ORDER = [
+    'users',
+    'projects',
+    'global_libraries',
+    'scans',
+    'libraries',
+    'file_urls',
+    'version_strings',
+    'action_history',
+    'scan_metrics',
+    'http_validators',
+    'inline_script_analysis',
+    'catalog_state',
+]
+TABLE_DEPENDENCIES = {
+    'scans': ('projects',),
+    'libraries': ('scans', 'global_libraries'),
+    'file_urls': ('scans',),
+    'version_strings': ('scans',),
+}
+
+# Filas que PostgreSQL rechazaría por clave foránea: se omiten
+ORPHAN_FILTERS = {
+    'libraries': 'EXISTS (SELECT 1 FROM scans p WHERE p.id = t.scan_id)',
+    'file_urls': 'EXISTS (SELECT 1 FROM scans p WHERE p.id = t.scan_id)',
+    'version_strings': 'EXISTS (SELECT 1 FROM scans p WHERE p.id = t.scan_id)',
+}
+# Referencias opcionales: si el padre no existe quedan en NULL (ON DELETE SET NULL)
+NULLABLE_REFERENCES = {
+    'scans': {'project_id': 'projects'},
+    'libraries': {'global_library_id': 'global_libraries'},
+}
+
+CHECKPOINT_TABLE = '''
+CREATE TABLE IF NOT EXISTS migration_checkpoints (
+    table_name TEXT PRIMARY KEY,
+    last_key BIGINT,
+    rows_copied BIGINT NOT NULL DEFAULT 0,
+    rows_coerced BIGINT NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT false,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_JOBS = 4
+
+INTEGER_TYPES = {'integer', 'bigint', 'smallint'}
+FLOAT_TYPES = {'double precision', 'real', 'numeric'}
+TIMESTAMP_TYPES = {'timestamp without time zone', 'timestamp with time zone', 'date'}
+
+# Escapes del formato texto de COPY (y NUL, que PostgreSQL no admite en TEXT)
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\x00': ''})
+COPY_NULL = '\\N'
+_NEEDS_ESCAPE = re.compile(r'[\\\t\n\r\x00]').search
+
+
+def column_kind(data_type: str) -> str:
+    if data_type in INTEGER_TYPES:
+        return 'int'
+    if data_type in FLOAT_TYPES:
+        return 'float'
+    if data_type in TIMESTAMP_TYPES:
+        return 'timestamp'
+    if data_type == 'boolean':
+        return 'bool'
+    return 'text'
+
+
+def normalize_timestamp(value) -> Optional[str]:
+    """'YYYY-MM-DD HH:MM:SS[.ffffff]' sin zona (lo que guarda una columna TIMESTAMP)"""
+    if isinstance(value, (int, float)):
+        raise ValueError(value)
+    parsed = datetime.fromisoformat(str(value).strip())
+    return parsed.replace(tzinfo=None).isoformat(sep=' ')
+
+
+def coerce_value(value, kind: str):
+    """Valor de SQLite (tipado laxo) → valor válido para la columna destino; ValueError si no hay forma"""
+    if value is None:
+        return None
+    if kind == 'int':
+        if isinstance(value, str):
+            value = value.strip()
+            if not value.lstrip('-').isdigit():
+                value = float(value)
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if kind == 'timestamp':
+        return normalize_timestamp(value)
+    if kind == 'bool':
+        return bool(int(value)) if not isinstance(value, str) else value.strip().lower() in ('1', 't', 'true')
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace').replace('\x00', '')
+    return str(value).replace('\x00', '')
+
+
+def _int_value(value):
+    return value if type(value) is int else coerce_value(value, 'int')
+
+
+def _float_value(value):
+    return value if type(value) is float else coerce_value(value, 'float')
+
+
+def _text_value(value):
+    if type(value) is str:
+        return value.replace('\x00', '') if '\x00' in value else value
+    return coerce_value(value, 'text')
+
+
+# Conversión por tipo de columna, con atajo para el caso común (el valor ya tiene el tipo)
+COERCERS: Dict[str, Callable] = {
+    'int': _int_value,
+    'float': _float_value,
+    'timestamp': lambda value: None if value is None else normalize_timestamp(value),
+    'bool': lambda value: coerce_value(value, 'bool'),
+    'text': _text_value,
+}
+COPY_FORMATTERS: Dict[str, Callable] = {
+    'int': str,
+    'float': repr,
+    'timestamp': str,
+    'bool': lambda value: 't' if value else 'f',
+    'text': lambda value: value.translate(COPY_ESCAPES) if _NEEDS_ESCAPE(value) else value,
+}
+# Representación común a SQLite y PostgreSQL para el checksum
+CANONICAL: Dict[str, Callable] = {
+    'int': lambda value: str(int(value)),
+    'float': lambda value: repr(float(value)),
+    'timestamp': normalize_timestamp,
+    'bool': lambda value: 't' if value else 'f',
+    'text': lambda value: value,
+}
+
+
+def copy_line(values: Iterable, formatters: List[Callable]) -> bytes:
+    return ('\t'.join([COPY_NULL if value is None else formatter(value)
+                       for value, formatter in zip(values, formatters)]) + '\n').encode('utf-8')
+
+
+class RowChecksum:
+    """Filas y suma (mod 2^64) de los hashes de cada fila: no depende del orden"""
+
+    def __init__(self):
+        self.rows = 0
+        self.total = 0
+
+    def add(self, values: Iterable, canonical_functions: List[Callable]):
+        canonical = '\x1f'.join([COPY_NULL if value is None else canonical(value)
+                                 for value, canonical in zip(values, canonical_functions)])
+        digest = hashlib.blake2b(canonical.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, 'big')) & 0xFFFFFFFFFFFFFFFF
+        self.rows += 1
+
+    @property
+    def hexdigest(self) -> str:
+        return f'{self.total:016x}'
+
+
+class IteratorStream(io.RawIOBase):
+    """Archivo de solo lectura sobre un iterador de bytes (para copy_expert)"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class TablePlan:
+    """Columnas comunes, clave de paginación y filtros de una tabla"""
+
+    def __init__(self, name: str, source_columns: List[str], target_types: Dict[str, str]):
+        self.name = name
+        self.columns = [column for column in source_columns if column in target_types]
+        self.kinds = [column_kind(target_types[column]) for column in self.columns]
+        self.coercers = [COERCERS[kind] for kind in self.kinds]
+        self.formatters = [COPY_FORMATTERS[kind] for kind in self.kinds]
+        self.canonical = [CANONICAL[kind] for kind in self.kinds]
+        self.key = 'id' if 'id' in source_columns else 'rowid'
+        self.filter = ORPHAN_FILTERS.get(name)
+        self.nullable_references = NULLABLE_REFERENCES.get(name, {})
+        self.has_serial_id = 'id' in self.columns
+
+    def select_sql(self, after_key: bool) -> str:
+        conditions = []
+        if after_key:
+            conditions.append(f't.{self.key} > ?')
+        if self.filter:
+            conditions.append(self.filter)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        columns = ', '.join(f't.{column}' for column in self.columns)
+        return f'SELECT t.{self.key}, {columns} FROM {self.name} t {where} ORDER BY t.{self.key} LIMIT ?'
+
+    def count_sql(self) -> str:
+        where = f'WHERE {self.filter}' if self.filter else ''
+        return f'SELECT COUNT(*) FROM {self.name} t {where}'
+
 
 class DatabaseMigrator:
-    def __init__(self, sqlite_path: str = "analysis.db", 
-                 postgres_config: Dict[str, str] = None):
+    def __init__(self, sqlite_path: str = "analysis.db",
+                 postgres_config: Dict[str, str] = None, dsn: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, jobs: int = DEFAULT_JOBS):
         self.sqlite_path = sqlite_path
-        self.postgres_config = postgres_config or {
-            'host': 'localhost',
-            'port': '5432',
-            'database': 'ntg_analyzer',
-            'user': 'ntg_user',
-            'password': 'ntg_password'
-        }
+        if dsn:
+            self.dsn = dsn
+        elif postgres_config:
+            self.dsn = psycopg2.extensions.make_dsn(**{
+                ('dbname' if key == 'database' else key): value for key, value in postgres_config.items()})
+        else:
+            self.dsn = storage.postgres_dsn()
+        self.chunk_size = chunk_size
+        self.jobs = max(1, jobs)
         self.stats = {
             'tables_migrated': 0,
             'total_records': 0,
+            'coerced_values': 0,
             'errors': [],
             'start_time': datetime.now()
         }
+        self._stats_lock = threading.Lock()
+        self._parent_ids: Dict[str, set] = {}
 
     def log(self, message: str, level: str = "INFO"):
         """Log con timestamp"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] {level}: {message}")
+        print(f"[{timestamp}] {level}: {message}", flush=True)
+
+    # --- Conexiones ------------------------------------------------------
 
-    def create_postgresql_schema(self, pg_cursor):
-        """Crea el esquema optimizado de PostgreSQL"""
+    def sqlite_connection(self) -> sqlite3.Connection:
+        """Conexión de solo lectura (cada hilo abre la suya)"""
+        conn = sqlite3.connect(f'file:{os.path.abspath(self.sqlite_path)}?mode=ro', uri=True,
+                               timeout=60.0, check_same_thread=False)
+        # Las vistas de normalized_storage no llaman funciones Python al leer
+        return conn
+
+    def postgres_connection(self):
+        conn = psycopg2.connect(self.dsn, options='-c timezone=UTC')
+        # Fechas como texto, igual que storage.PostgresStorage
+        timestamp_as_text = psycopg2.extensions.new_type((1114, 1184), 'TIMESTAMP_AS_TEXT', lambda value, cursor: value)
+        psycopg2.extensions.register_type(timestamp_as_text, conn)
+        with conn.cursor() as cursor:
+            # Un corte pierde a lo sumo las últimas páginas, junto con su checkpoint
+            cursor.execute('SET synchronous_commit = off')
+        conn.commit()
+        return conn
+
+    # --- Esquema ---------------------------------------------------------
+
+    def create_postgresql_schema(self, pg_cursor=None, reset: bool = False):
+        """Esquema de storage.py más la tabla de checkpoints; reset vacía destino y checkpoints"""
         self.log("Creando esquema PostgreSQL...")
-        
-        schema_sql = """
-        -- Eliminar tablas si existen (para re-ejecutar el script)
-        DROP TABLE IF EXISTS action_history CASCADE;
-        DROP TABLE IF EXISTS version_strings CASCADE;
-        DROP TABLE IF EXISTS file_urls CASCADE;
-        DROP TABLE IF EXISTS libraries CASCADE;
-        DROP TABLE IF EXISTS scans CASCADE;
-        DROP TABLE IF EXISTS global_libraries CASCADE;
-        DROP TABLE IF EXISTS clients CASCADE;
-        DROP TABLE IF EXISTS users CASCADE;
-
-        -- === TABLAS PRINCIPALES ===
-
-        -- Usuarios y autenticación
-        CREATE TABLE users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(100) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            role VARCHAR(50) NOT NULL DEFAULT 'analyst',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Clientes
-        CREATE TABLE clients (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(255) UNIQUE NOT NULL,
-            description TEXT,
-            contact_email VARCHAR(255),
-            contact_phone VARCHAR(50),
-            website VARCHAR(500),
-            is_active BOOLEAN DEFAULT true,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Catálogo global de librerías
-        CREATE TABLE global_libraries (
-            id SERIAL PRIMARY KEY,
-            library_name VARCHAR(255) UNIQUE NOT NULL,
-            type VARCHAR(10) CHECK (type IN ('js', 'css')),
-            latest_safe_version VARCHAR(50),
-            latest_version VARCHAR(50),
-            description TEXT,
-            vulnerability_info TEXT,
-            source_url VARCHAR(500),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Escaneos principales
-        CREATE TABLE scans (
-            id SERIAL PRIMARY KEY,
-            url VARCHAR(2000) NOT NULL,
-            status_code INTEGER,
-            title TEXT,
-            headers JSONB,
-            reviewed BOOLEAN DEFAULT false,
-            client_id INTEGER REFERENCES clients(id) ON DELETE SET NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            scan_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Librerías detectadas
-        CREATE TABLE libraries (
-            id SERIAL PRIMARY KEY,
-            scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
-            library_name VARCHAR(255) NOT NULL,
-            version VARCHAR(50),
-            type VARCHAR(10) CHECK (type IN ('js', 'css')),
-            source_url VARCHAR(2000),
-            description TEXT,
-            latest_safe_version VARCHAR(50),
-            latest_version VARCHAR(50),
-            is_manual BOOLEAN DEFAULT false,
-            global_library_id INTEGER REFERENCES global_libraries(id) ON DELETE SET NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- URLs de archivos encontrados
-        CREATE TABLE file_urls (
-            id SERIAL PRIMARY KEY,
-            scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
-            file_url VARCHAR(2000) NOT NULL,
-            file_type VARCHAR(10) CHECK (file_type IN ('js', 'css')),
-            file_size BIGINT,
-            status_code INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Strings de versión encontrados
-        CREATE TABLE version_strings (
-            id SERIAL PRIMARY KEY,
-            scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
-            file_url VARCHAR(2000) NOT NULL,
-            file_type VARCHAR(10) CHECK (file_type IN ('js', 'css')),
-            line_number INTEGER,
-            line_content TEXT,
-            version_keyword VARCHAR(50),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- Historial de acciones (unificado)
-        CREATE TABLE action_history (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
-            username VARCHAR(100) NOT NULL,
-            user_role VARCHAR(50) NOT NULL,
-            action_type VARCHAR(50) NOT NULL,
-            target_table VARCHAR(100) NOT NULL,
-            target_id INTEGER,
-            target_description TEXT,
-            data_before JSONB,
-            data_after JSONB,
-            ip_address INET,
-            user_agent TEXT,
-            success BOOLEAN DEFAULT true,
-            error_message TEXT,
-            session_id VARCHAR(255),
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- === ÍNDICES OPTIMIZADOS ===
-        CREATE INDEX idx_scans_client_id ON scans(client_id);
-        CREATE INDEX idx_scans_created_at ON scans(created_at);
-        CREATE INDEX idx_scans_url_hash ON scans USING hash(url);
-
-        CREATE INDEX idx_libraries_scan_id ON libraries(scan_id);
-        CREATE INDEX idx_libraries_name_version ON libraries(library_name, version);
-        CREATE INDEX idx_libraries_global_lib ON libraries(global_library_id);
-
-        CREATE INDEX idx_file_urls_scan_id ON file_urls(scan_id);
-        CREATE INDEX idx_version_strings_scan_id ON version_strings(scan_id);
-
-        -- Índices especializados para historial
-        CREATE INDEX idx_history_user_id ON action_history(user_id);
-        CREATE INDEX idx_history_created_at ON action_history(created_at);
-        CREATE INDEX idx_history_action_type ON action_history(action_type);
-        CREATE INDEX idx_history_target ON action_history(target_table, target_id);
-        """
-        
+        backend = storage.PostgresStorage(self.dsn, pool_size=1)
         try:
-            pg_cursor.execute(schema_sql)
-            self.log("✅ Esquema PostgreSQL creado exitosamente")
-        except Exception as e:
-            self.log(f"❌ Error creando esquema: {e}", "ERROR")
-            raise
+            backend.ensure_schema()
+        finally:
+            backend.close_all()
 
-    def extract_sqlite_data(self, table_name: str) -> List[Dict[str, Any]]:
-        """Extrae datos de una tabla SQLite"""
+        conn = self.postgres_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_path)
-            conn.row_factory = sqlite3.Row  # Para acceso por nombre de columna
-            cursor = conn.cursor()
-            
-            cursor.execute(f"SELECT * FROM {table_name}")
-            rows = cursor.fetchall()
-            
-            # Convertir a lista de diccionarios
-            data = []
-            for row in rows:
-                row_dict = dict(row)
-                # Convertir campos que requieren transformación
-                row_dict = self.transform_row_data(table_name, row_dict)
-                data.append(row_dict)
-            
+            with conn.cursor() as cursor:
+                cursor.execute(CHECKPOINT_TABLE)
+                if reset:
+                    cursor.execute(f"TRUNCATE {', '.join(MIGRATION_ORDER)}, migration_checkpoints RESTART IDENTITY CASCADE")
+                    self.log("🧹 Tablas destino y checkpoints vaciados (--reset)")
+            conn.commit()
+        finally:
             conn.close()
-            self.log(f"📊 Extraídos {len(data)} registros de tabla '{table_name}'")
-            return data
-            
-        except Exception as e:
-            self.log(f"❌ Error extrayendo datos de {table_name}: {e}", "ERROR")
-            return []
-
-    def transform_row_data(self, table_name: str, row_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Transforma datos específicos por tabla para PostgreSQL"""
-        
-        # Transformaciones específicas por tabla
-        if table_name == 'scans':
-            # Convertir headers de TEXT a JSONB
-            if 'headers' in row_data and row_data['headers']:
+        self.log("✅ Esquema PostgreSQL listo")
+
+    def target_columns(self, pg_conn, table_name: str) -> Dict[str, str]:
+        with pg_conn.cursor() as cursor:
+            cursor.execute(storage.TABLE_INFO_SQL, (table_name,))
+            return {row[1]: row[2] for row in cursor.fetchall()}
+
+    def get_sqlite_tables(self) -> List[str]:
+        """Tablas y vistas de SQLite que existen en el esquema destino"""
+        conn = self.sqlite_connection()
+        try:
+            names = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'")}
+        finally:
+            conn.close()
+        tables = [table for table in MIGRATION_ORDER if table in names]
+        self.log(f"📋 Tablas a migrar: {', '.join(tables)}")
+        return tables
+
+    def plan_table(self, sqlite_conn, pg_conn, table_name: str) -> TablePlan:
+        source_columns = [row[1] for row in sqlite_conn.execute(f'PRAGMA table_info({table_name})')]
+        return TablePlan(table_name, source_columns, self.target_columns(pg_conn, table_name))
+
+    def load_parent_ids(self):
+        """Ids de las tablas padre pequeñas (para anular referencias rotas)"""
+        parents = {parent for references in NULLABLE_REFERENCES.values() for parent in references.values()}
+        conn = self.sqlite_connection()
+        try:
+            for parent in parents:
                 try:
-                    # Si ya es string JSON, parsearlo
-                    if isinstance(row_data['headers'], str):
-                        row_data['headers'] = json.loads(row_data['headers'])
-                except (json.JSONDecodeError, TypeError):
-                    # Si falla, dejar como objeto vacío
-                    row_data['headers'] = {}
+                    self._parent_ids[parent] = {row[0] for row in conn.execute(f'SELECT id FROM {parent}')}
+                except sqlite3.OperationalError:
+                    self._parent_ids[parent] = set()
+        finally:
+            conn.close()
+
+    # --- Extracción y transformación ---------------------------------------
+
+    def extract_sqlite_data(self, sqlite_conn, plan: TablePlan,
+                            last_key: Optional[int] = None) -> Iterator[List[Tuple]]:
+        """Páginas de filas (clave, columnas...) ordenadas por clave, a partir de last_key"""
+        while True:
+            if last_key is None:
+                rows = sqlite_conn.execute(plan.select_sql(False), (self.chunk_size,)).fetchall()
             else:
-                row_data['headers'] = {}
-                
-            # Convertir reviewed INTEGER a BOOLEAN
-            if 'reviewed' in row_data:
-                row_data['reviewed'] = bool(row_data['reviewed'])
-        
-        elif table_name == 'clients':
-            # Convertir is_active INTEGER a BOOLEAN
-            if 'is_active' in row_data:
-                row_data['is_active'] = bool(row_data['is_active'])
-        
-        elif table_name == 'libraries':
-            # Convertir is_manual INTEGER a BOOLEAN
-            if 'is_manual' in row_data:
-                row_data['is_manual'] = bool(row_data['is_manual'])
-        
-        elif table_name == 'users':
-            # Renombrar password a password_hash para claridad
-            if 'password' in row_data:
-                row_data['password_hash'] = row_data.pop('password')
-        
-        elif table_name == 'action_history':
-            # Transformar datos JSON
-            for json_field in ['data_before', 'data_after']:
-                if json_field in row_data and row_data[json_field]:
+                rows = sqlite_conn.execute(plan.select_sql(True), (last_key, self.chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_key = rows[-1][0]
+
+    def transform_row_data(self, plan: TablePlan, rows: Iterable[Tuple], counters: Dict[str, int]) -> Iterator[Tuple]:
+        """Filas de SQLite → valores para la tabla destino (sin la clave de paginación)"""
+        references = [(plan.columns.index(column), self._parent_ids.get(parent, set()))
+                      for column, parent in plan.nullable_references.items() if column in plan.columns]
+        coercers = plan.coercers
+        for row in rows:
+            try:
+                values = [coerce(value) for coerce, value in zip(coercers, row[1:])]
+            except (ValueError, TypeError, OverflowError):
+                # Valor que no cabe en la columna destino: queda en NULL
+                values = []
+                for coerce, value in zip(coercers, row[1:]):
                     try:
-                        if isinstance(row_data[json_field], str):
-                            row_data[json_field] = json.loads(row_data[json_field])
-                    except (json.JSONDecodeError, TypeError):
-                        row_data[json_field] = None
-            
-            # Convertir success INTEGER a BOOLEAN
-            if 'success' in row_data:
-                row_data['success'] = bool(row_data['success'])
-        
-        return row_data
-
-    def insert_postgresql_data(self, pg_cursor, table_name: str, data: List[Dict[str, Any]]):
-        """Inserta datos en PostgreSQL usando bulk insert"""
-        if not data:
-            self.log(f"⚠️  No hay datos para insertar en tabla '{table_name}'")
+                        values.append(coerce(value))
+                    except (ValueError, TypeError, OverflowError):
+                        counters['coerced'] += 1
+                        values.append(None)
+            for index, valid_ids in references:
+                if values[index] is not None and values[index] not in valid_ids:
+                    counters['coerced'] += 1
+                    values[index] = None
+            yield tuple(values)
+
+    # --- Carga -----------------------------------------------------------
+
+    def read_checkpoint(self, pg_conn, table_name: str) -> Optional[Tuple]:
+        with pg_conn.cursor() as cursor:
+            cursor.execute('SELECT last_key, rows_copied, rows_coerced, completed FROM migration_checkpoints '
+                           'WHERE table_name = %s', (table_name,))
+            return cursor.fetchone()
+
+    def copy_chunk(self, pg_conn, plan: TablePlan, rows: List[Tuple], counters: Dict[str, int]) -> int:
+        """COPY de una página y su checkpoint en una sola transacción"""
+        copied = [0]
+
+        def lines():
+            for values in self.transform_row_data(plan, rows, counters):
+                copied[0] += 1
+                yield copy_line(values, plan.formatters)
+
+        with pg_conn.cursor() as cursor:
+            cursor.copy_expert(f"COPY {plan.name} ({', '.join(plan.columns)}) FROM STDIN",
+                               IteratorStream(lines()), size=64 * 1024)
+            cursor.execute('''
+                INSERT INTO migration_checkpoints (table_name, last_key, rows_copied, rows_coerced, updated_at)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP(0))
+                ON CONFLICT (table_name) DO UPDATE SET
+                    last_key = EXCLUDED.last_key,
+                    rows_copied = migration_checkpoints.rows_copied + EXCLUDED.rows_copied,
+                    rows_coerced = EXCLUDED.rows_coerced,
+                    updated_at = EXCLUDED.updated_at
+            ''', (plan.name, rows[-1][0], copied[0], counters['coerced']))
+        pg_conn.commit()
+        return copied[0]
+
+    def reset_sequence(self, pg_conn, plan: TablePlan):
+        if not plan.has_serial_id:
             return
-        
+        with pg_conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL)
+                FROM {plan.name}
+            ''', (plan.name,))
+        pg_conn.commit()
+
+    def migrate_table(self, table_name: str) -> bool:
+        """Migra (o retoma) una tabla completa de SQLite a PostgreSQL"""
+        sqlite_conn = self.sqlite_connection()
+        pg_conn = self.postgres_connection()
         try:
-            # Obtener columnas de la primera fila
-            columns = list(data[0].keys())
-            
-            # Preparar valores para inserción
-            values_list = []
-            for row in data:
-                values = tuple(row.get(col) for col in columns)
-                values_list.append(values)
-            
-            # Construir query de inserción
-            columns_str = ', '.join(columns)
-            placeholders = ', '.join(['%s'] * len(columns))
-            
-            insert_query = f"""
-                INSERT INTO {table_name} ({columns_str}) 
-                VALUES ({placeholders})
-            """
-            
-            # Ejecutar inserción masiva
-            psycopg2.extras.execute_batch(
-                pg_cursor, 
-                insert_query, 
-                values_list,
-                page_size=1000  # Procesar en lotes de 1000
-            )
-            
-            self.log(f"✅ Insertados {len(data)} registros en tabla '{table_name}'")
-            self.stats['total_records'] += len(data)
-            
+            plan = self.plan_table(sqlite_conn, pg_conn, table_name)
+            checkpoint = self.read_checkpoint(pg_conn, table_name)
+            if checkpoint and checkpoint[3]:
+                self.log(f"⏭️  '{table_name}' ya migrada ({checkpoint[1]:,} registros)")
+                return True
+            if checkpoint is None:
+                with pg_conn.cursor() as cursor:
+                    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {table_name})')
+                    if cursor.fetchone()[0]:
+                        raise RuntimeError(f"'{table_name}' ya tiene datos sin checkpoint; usa --reset")
+                pg_conn.commit()
+                last_key, copied, counters = None, 0, {'coerced': 0}
+                self.log(f"🔄 Migrando '{table_name}'...")
+            else:
+                last_key, copied, counters = checkpoint[0], checkpoint[1], {'coerced': checkpoint[2]}
+                self.log(f"↩️  Retomando '{table_name}' después de la clave {last_key} ({copied:,} registros)")
+
+            for rows in self.extract_sqlite_data(sqlite_conn, plan, last_key):
+                copied += self.copy_chunk(pg_conn, plan, rows, counters)
+
+            self.reset_sequence(pg_conn, plan)
+            with pg_conn.cursor() as cursor:
+                cursor.execute('''
+                    INSERT INTO migration_checkpoints (table_name, rows_copied, completed, updated_at)
+                    VALUES (%s, 0, true, CURRENT_TIMESTAMP(0))
+                    ON CONFLICT (table_name) DO UPDATE SET completed = true, updated_at = EXCLUDED.updated_at
+                ''', (table_name,))
+            pg_conn.commit()
+
+            with self._stats_lock:
+                self.stats['tables_migrated'] += 1
+                self.stats['total_records'] += copied
+                self.stats['coerced_values'] += counters['coerced']
+            coerced = f", {counters['coerced']:,} valores anulados" if counters['coerced'] else ''
+            self.log(f"✅ '{table_name}': {copied:,} registros{coerced}")
+            return True
         except Exception as e:
-            error_msg = f"Error insertando en {table_name}: {e}"
+            pg_conn.rollback()
+            error_msg = f"Error migrando {table_name}: {e}"
             self.log(f"❌ {error_msg}", "ERROR")
-            self.stats['errors'].append(error_msg)
-            raise
-
-    def migrate_table(self, pg_cursor, table_name: str, sqlite_table_name: str = None):
-        """Migra una tabla completa de SQLite a PostgreSQL"""
-        sqlite_table_name = sqlite_table_name or table_name
-        
-        self.log(f"🔄 Migrando tabla '{sqlite_table_name}' -> '{table_name}'...")
-        
-        # Extraer datos de SQLite
-        data = self.extract_sqlite_data(sqlite_table_name)
-        
-        if data:
-            # Insertar en PostgreSQL
-            self.insert_postgresql_data(pg_cursor, table_name, data)
-            self.stats['tables_migrated'] += 1
-        else:
-            self.log(f"⚠️  Tabla '{sqlite_table_name}' está vacía o no existe")
+            with self._stats_lock:
+                self.stats['errors'].append(error_msg)
+            return False
+        finally:
+            sqlite_conn.close()
+            pg_conn.close()
 
-    def get_sqlite_tables(self) -> List[str]:
-        """Obtiene lista de tablas relevantes de SQLite"""
+    def migration_waves(self, tables: List[str]) -> List[List[str]]:
+        """Grupos de tablas que pueden cargarse en paralelo (respetando TABLE_DEPENDENCIES)"""
+        pending, done, waves = list(tables), set(), []
+        while pending:
+            wave = [table for table in pending
+                    if all(parent in done or parent not in tables for parent in TABLE_DEPENDENCIES.get(table, ()))]
+            waves.append(wave)
+            done.update(wave)
+            pending = [table for table in pending if table not in done]
+        return waves
+
+    # --- Verificación ----------------------------------------------------
+
+    def sqlite_checksum(self, plan: TablePlan) -> RowChecksum:
+        """Releer SQLite con la misma transformación que la carga"""
+        checksum, counters = RowChecksum(), {'coerced': 0}
+        conn = self.sqlite_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' 
-                AND name NOT LIKE 'sqlite_%'
-                AND name NOT IN ('sqlite_sequence', 'sqlite_stat1')
-                ORDER BY name
-            """)
-            
-            tables = [row[0] for row in cursor.fetchall()]
+            for rows in self.extract_sqlite_data(conn, plan):
+                for values in self.transform_row_data(plan, rows, counters):
+                    checksum.add(values, plan.canonical)
+        finally:
             conn.close()
-            
-            self.log(f"📋 Tablas encontradas en SQLite: {', '.join(tables)}")
-            return tables
-            
-        except Exception as e:
-            self.log(f"❌ Error obteniendo tablas de SQLite: {e}", "ERROR")
-            return []
+        return checksum
+
+    def postgres_checksum(self, plan: TablePlan) -> RowChecksum:
+        checksum = RowChecksum()
+        conn = self.postgres_connection()
+        try:
+            with conn.cursor(name=f'verify_{plan.name}') as cursor:
+                cursor.itersize = self.chunk_size
+                cursor.execute(f"SELECT {', '.join(plan.columns)} FROM {plan.name}")
+                for row in cursor:
+                    checksum.add(row, plan.canonical)
+        finally:
+            conn.rollback()
+            conn.close()
+        return checksum
+
+    def verify_table(self, table_name: str) -> bool:
+        sqlite_conn = self.sqlite_connection()
+        pg_conn = self.postgres_connection()
+        try:
+            plan = self.plan_table(sqlite_conn, pg_conn, table_name)
+        finally:
+            sqlite_conn.close()
+            pg_conn.close()
+        source, target = self.sqlite_checksum(plan), self.postgres_checksum(plan)
+        ok = source.rows == target.rows and source.total == target.total
+        detail = (f"{source.rows:,} registros, checksum {source.hexdigest}" if ok else
+                  f"SQLite {source.rows:,} / {source.hexdigest} ≠ PostgreSQL {target.rows:,} / {target.hexdigest}")
+        self.log(f"  {'✅' if ok else '❌'} {table_name}: {detail}", "INFO" if ok else "ERROR")
+        return ok
 
-    def verify_migration(self, pg_cursor):
-        """Verifica que la migración fue exitosa"""
+    def verify_migration(self, pg_cursor=None, tables: Optional[List[str]] = None) -> bool:
+        """Filas y checksum de cada tabla en ambos lados (en paralelo)"""
         self.log("🔍 Verificando migración...")
-        
-        verification_queries = [
-            "SELECT COUNT(*) FROM users",
-            "SELECT COUNT(*) FROM clients", 
-            "SELECT COUNT(*) FROM global_libraries",
-            "SELECT COUNT(*) FROM scans",
-            "SELECT COUNT(*) FROM libraries",
-            "SELECT COUNT(*) FROM file_urls",
-            "SELECT COUNT(*) FROM version_strings",
-            "SELECT COUNT(*) FROM action_history"
-        ]
-        
-        for query in verification_queries:
-            try:
-                pg_cursor.execute(query)
-                count = pg_cursor.fetchone()[0]
-                table_name = query.split('FROM ')[1]
-                self.log(f"  ✅ {table_name}: {count} registros")
-            except Exception as e:
-                self.log(f"  ❌ Error verificando {query}: {e}", "ERROR")
-
-    def run_migration(self):
-        """Ejecuta la migración completa"""
+        if not self._parent_ids:
+            self.load_parent_ids()
+        tables = tables or self.get_sqlite_tables()
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            results = list(executor.map(self.verify_table, tables))
+        return all(results)
+
+    # --- Ejecución -------------------------------------------------------
+
+    def run_migration(self, reset: bool = False, verify: bool = True) -> bool:
+        """Ejecuta (o retoma) la migración completa"""
         self.log("🚀 Iniciando migración SQLite → PostgreSQL")
         self.log(f"📂 Archivo SQLite: {self.sqlite_path}")
-        self.log(f"🐘 PostgreSQL: {self.postgres_config['host']}:{self.postgres_config['port']}/{self.postgres_config['database']}")
-        
+        self.log(f"🐘 PostgreSQL: {psycopg2.extensions.parse_dsn(self.dsn).get('host', 'localhost')} "
+                 f"({self.jobs} tablas en paralelo, páginas de {self.chunk_size:,} filas)")
+
         # Verificar que existe el archivo SQLite
         if not os.path.exists(self.sqlite_path):
             self.log(f"❌ No se encontró el archivo SQLite: {self.sqlite_path}", "ERROR")
             return False
-        
+
         try:
-            # Conectar a PostgreSQL
-            pg_conn = psycopg2.connect(**self.postgres_config)
-            pg_conn.autocommit = False  # Usar transacciones
-            pg_cursor = pg_conn.cursor()
-            
-            self.log("✅ Conectado a PostgreSQL")
-            
-            # Crear esquema
-            self.create_postgresql_schema(pg_cursor)
-            pg_conn.commit()
-            
-            # Orden de migración (respetando foreign keys)
-            migration_order = [
-                'users',
-                'clients', 
-                'global_libraries',
-                'scans',
-                'libraries',
-                'file_urls',
-                'version_strings',
-                'action_history'
-            ]
-            
-            # Migrar cada tabla
-            for table_name in migration_order:
-                try:
-                    self.migrate_table(pg_cursor, table_name)
-                    pg_conn.commit()  # Commit después de cada tabla
-                except Exception as e:
-                    self.log(f"❌ Error migrando tabla {table_name}: {e}", "ERROR")
-                    pg_conn.rollback()
-                    # Continuar con la siguiente tabla
-                    continue
-            
-            # Verificar migración
-            self.verify_migration(pg_cursor)
-            
-            # Finalizar
-            pg_conn.commit()
-            pg_cursor.close()
-            pg_conn.close()
-            
+            self.create_postgresql_schema(reset=reset)
+            self.load_parent_ids()
+            tables = self.get_sqlite_tables()
+
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for wave in self.migration_waves(tables):
+                    results = dict(zip(wave, executor.map(self.migrate_table, wave)))
+                    failed = [table for table, ok in results.items() if not ok]
+                    if failed:
+                        # Las tablas hijas no pueden cargarse sin sus padres
+                        self.log(f"⛔ Migración detenida; vuelve a ejecutar para retomar ({', '.join(failed)})", "ERROR")
+                        return False
+
+            verified = self.verify_migration(tables=tables) if verify else True
+
             # Mostrar estadísticas finales
             duration = datetime.now() - self.stats['start_time']
-            self.log("🎉 Migración completada exitosamente!")
-            self.log(f"📊 Estadísticas finales:")
+            self.log("🎉 Migración completada exitosamente!" if verified else "⚠️  Migración completada con diferencias")
+            self.log("📊 Estadísticas finales:")
             self.log(f"  - Tablas migradas: {self.stats['tables_migrated']}")
             self.log(f"  - Total registros: {self.stats['total_records']}")
+            self.log(f"  - Valores anulados: {self.stats['coerced_values']}")
             self.log(f"  - Duración: {duration}")
             self.log(f"  - Errores: {len(self.stats['errors'])}")
-            
+
             if self.stats['errors']:
                 self.log("⚠️  Errores encontrados:")
                 for error in self.stats['errors']:
                     self.log(f"    - {error}")
-            
-            return True
-            
+
+            return verified and not self.stats['errors']
+
         except Exception as e:
             self.log(f"❌ Error general de migración: {e}", "ERROR")
             return False
@@ -449,55 +614,58 @@ class DatabaseMigrator:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sqlite', default='analysis.db', help='Base SQLite de origen')
+    parser.add_argument('--dsn', help='DSN de PostgreSQL (default: DATABASE_URL o POSTGRES_*)')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='Tablas cargadas en paralelo')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Filas por página (y por COPY)')
+    parser.add_argument('--reset', action='store_true', help='Vaciar tablas destino y checkpoints antes de empezar')
+    parser.add_argument('--verify-only', action='store_true', help='Solo comparar filas y checksums')
+    parser.add_argument('--no-verify', action='store_true', help='Omitir la verificación final')
+    parser.add_argument('--yes', '-y', action='store_true', help='No pedir confirmación')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("🔄 MIGRADOR SQLite → PostgreSQL")
     print("📦 ntg-js-analyzer Database Migration Tool")
     print("=" * 60)
-    
-    # Configuración PostgreSQL (modificar según tu setup)
-    postgres_config = {
-        'host': os.getenv('POSTGRES_HOST', 'localhost'),
-        'port': os.getenv('POSTGRES_PORT', '5432'),
-        'database': os.getenv('POSTGRES_DB', 'ntg_analyzer'),
-        'user': os.getenv('POSTGRES_USER', 'ntg_user'),
-        'password': os.getenv('POSTGRES_PASSWORD', 'ntg_password')
-    }
-    
-    # Verificar variables de entorno
-    print("\n📋 Configuración:")
-    for key, value in postgres_config.items():
-        if key == 'password':
-            print(f"  {key}: {'*' * len(value)}")
-        else:
-            print(f"  {key}: {value}")
-    
-    print(f"\n📂 SQLite source: analysis.db")
-    
-    # Confirmar antes de proceder
-    response = input("\n¿Proceder con la migración? (y/N): ").strip().lower()
-    if response not in ['y', 'yes', 'sí', 'si']:
-        print("❌ Migración cancelada por el usuario")
-        return
-    
-    # Ejecutar migración
+
     migrator = DatabaseMigrator(
-        sqlite_path="analysis.db",
-        postgres_config=postgres_config
+        sqlite_path=args.sqlite,
+        dsn=args.dsn,
+        chunk_size=args.chunk_size,
+        jobs=args.jobs
     )
-    
-    success = migrator.run_migration()
-    
+
+    # Verificar configuración
+    print("\n📋 Configuración:")
+    for key, value in psycopg2.extensions.parse_dsn(migrator.dsn).items():
+        print(f"  {key}: {'*' * len(value) if key == 'password' else value}")
+    print(f"\n📂 SQLite source: {args.sqlite}")
+
+    if args.verify_only:
+        sys.exit(0 if migrator.verify_migration() else 1)
+
+    # Confirmar antes de proceder
+    if not args.yes:
+        action = 'vaciar el destino y migrar' if args.reset else 'migrar (o retomar)'
+        response = input(f"\n¿Proceder a {action}? (y/N): ").strip().lower()
+        if response not in ['y', 'yes', 'sí', 'si']:
+            print("❌ Migración cancelada por el usuario")
+            return
+
+    success = migrator.run_migration(reset=args.reset, verify=not args.no_verify)
+
     if success:
         print("\n🎉 ¡Migración completada exitosamente!")
         print("\n📝 Próximos pasos:")
-        print("  1. Verificar datos en PostgreSQL")
-        print("  2. Configurar aplicación para usar PostgreSQL")
-        print("  3. Realizar backup de analysis.db original")
-        print("  4. Actualizar string de conexión en dashboard.py")
+        print("  1. Realizar backup de analysis.db original")
+        print("  2. Definir STORAGE_BACKEND=postgresql y DATABASE_URL (ver storage.py)")
+        print("  3. Reiniciar el dashboard")
     else:
-        print("\n❌ Migración falló. Revisa los logs arriba.")
+        print("\n❌ Migración incompleta. Revisa los logs arriba; volver a ejecutar retoma desde el último checkpoint.")
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento normalizado de escaneos en analysis.db
+
+Cada escaneo repetía en sus tablas hijas las URLs completas (file_urls.file_url,
+version_strings.file_url, libraries.source_url) y el JSON completo de headers
+(scans.headers), aunque los mismos CDN y sitios aparecen en miles de escaneos.
+El esquema normalizado guarda:
+
+  - urls:          diccionario de URLs (id entero, url única)
+  - header_blobs:  headers HTTP deduplicados por hash SHA-256
+  - scans_data, libraries_data, file_urls_data, version_strings_data:
+                   las filas de siempre, con claves enteras en vez de texto
+
+Los headers se separan en una parte estable (Server, CSP, HSTS, ...), que se
+comparte entre escaneos del mismo sitio, y los volátiles (Date, Set-Cookie,
+ETag, ...), que cambian en cada respuesta y quedan en el escaneo.
+
+Para las consultas existentes, scans, libraries, file_urls y version_strings son
+vistas con las columnas originales; sus triggers INSTEAD OF (SQL puro, cualquier
+conexión sqlite3 puede escribir) traducen INSERT, UPDATE y DELETE a las tablas
+*_data. Un INSERT a la vista scans guarda los headers tal cual, sin deduplicar;
+insert_scan() y compact_headers() los separan en Python, y solo cuando la vista
+los reconstruye byte a byte. cursor.lastrowid no funciona a través de una vista:
+los escaneos cuyo id se necesita se insertan con insert_scan().
+
+La migración (ensure_normalized_storage) corre desde init_database: renombra las
+tablas antiguas conservando ids y secuencias, mueve el texto a los diccionarios,
+crea las vistas y compacta el archivo.
+
+Uso:
+    python normalized_storage.py [analysis.db]     # migra, deduplica headers y muestra el tamaño por tabla
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Vista (nombre original) -> tabla física
+DATA_TABLES = {
+    'scans': 'scans_data',
+    'libraries': 'libraries_data',
+    'file_urls': 'file_urls_data',
+    'version_strings': 'version_strings_data',
+}
+
+# Vista -> (columna de texto, columna id en la tabla física, columna que la precede en la vista)
+URL_COLUMNS = {
+    'libraries': ('source_url', 'source_url_id', 'type'),
+    'file_urls': ('file_url', 'url_id', 'scan_id'),
+    'version_strings': ('file_url', 'url_id', 'scan_id'),
+}
+HEADER_COLUMNS = ('headers_id', 'volatile_headers')
+HEADERS_AFTER = 'title'
+
+# Headers que cambian en cada respuesta aunque el sitio no cambie (en minúsculas)
+VOLATILE_HEADERS = frozenset({
+    'date', 'expires', 'age', 'set-cookie', 'last-modified', 'etag', 'content-length',
+    'x-request-id', 'x-runtime', 'cf-ray', 'x-amz-cf-id', 'x-amz-request-id', 'x-served-by',
+    'x-cache', 'x-cache-hits', 'x-timer', 'x-varnish', 'server-timing', 'report-to', 'x-iinfo',
+})
+
+
+# --- Headers -----------------------------------------------------------------
+
+def headers_json(headers) -> str:
+    """
+    JSON compacto de los headers de una respuesta
+
+    Es el mismo formato que produce json_patch en la vista scans, así que los
+    escaneos guardados con este texto se pueden deduplicar sin alterarlo.
+    """
+    return json.dumps(dict(headers), separators=(',', ':'), ensure_ascii=False)
+
+
+@lru_cache(maxsize=1024)
+def split_headers(headers: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (parte estable, parte volátil) de un JSON de headers
+
+    La parte estable conserva todas las claves en su orden, con null en lugar
+    de los valores volátiles; json_patch(estable, volátil) devuelve el objeto
+    original. Un texto que no es un objeto JSON se guarda completo como parte estable.
+    """
+    if headers is None:
+        return None, None
+    try:
+        parsed = json.loads(headers)
+    except (TypeError, ValueError):
+        return headers, None
+    if not isinstance(parsed, dict):
+        return headers, None
+    volatile = {name: value for name, value in parsed.items() if name.lower() in VOLATILE_HEADERS}
+    if not volatile:
+        return headers, None
+    stable = {name: None if name in volatile else value for name, value in parsed.items()}
+    return (json.dumps(stable, separators=(',', ':'), ensure_ascii=False),
+            json.dumps(volatile, separators=(',', ':'), ensure_ascii=False))
+
+
+def headers_hash(stable: str) -> str:
+    return hashlib.sha256(stable.encode('utf-8')).hexdigest()
+
+
+# --- Escritura directa -------------------------------------------------------
+
+def intern_url(cursor, url: Optional[str]) -> Optional[int]:
+    if url is None:
+        return None
+    cursor.execute('INSERT OR IGNORE INTO urls (url) VALUES (?)', (url,))
+    return cursor.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()[0]
+
+
+def intern_headers(cursor, headers) -> Tuple[Optional[int], Optional[str]]:
+    """
+    (headers_id, headers volátiles) para guardar en scans_data
+
+    Si la vista no reconstruiría el texto byte a byte (otro formato JSON, claves
+    duplicadas, ...) retorna (None, headers): el texto queda tal cual en la fila.
+    """
+    if isinstance(headers, dict):
+        headers = headers_json(headers)
+    stable, volatile = split_headers(headers)
+    if stable is None:
+        return None, volatile
+    if volatile is not None and not cursor.execute('SELECT json_patch(?, ?) IS ?',
+                                                   (stable, volatile, headers)).fetchone()[0]:
+        return None, headers
+    digest = headers_hash(stable)
+    cursor.execute('INSERT OR IGNORE INTO header_blobs (hash, headers) VALUES (?, ?)', (digest, stable))
+    return cursor.execute('SELECT id FROM header_blobs WHERE hash = ?', (digest,)).fetchone()[0], volatile
+
+
+def insert_scan(cursor, url: str, status_code, title, headers, **columns) -> int:
+    """
+    Inserta un escaneo en scans_data y retorna su id
+
+    headers es el JSON (o dict) de la respuesta; columns, el resto de columnas
+    de scans (project_id, scan_date, reviewed, base_scan_id, ...). En una base
+    sin migrar (scans es una tabla) inserta directamente en scans.
+    """
+    if _object_type(cursor, 'scans_data') is None:
+        if isinstance(headers, dict):
+            headers = headers_json(headers)
+        values = {'url': url, 'status_code': status_code, 'title': title, 'headers': headers, **columns}
+        cursor.execute(f"INSERT INTO scans ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+                       list(values.values()))
+        return cursor.lastrowid
+    headers_id, volatile = intern_headers(cursor, headers)
+    values = {'url': url, 'status_code': status_code, 'title': title,
+              'headers_id': headers_id, 'volatile_headers': volatile, **columns}
+    cursor.execute(f"INSERT INTO scans_data ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+                   list(values.values()))
+    return cursor.lastrowid
+
+
+def compact_headers(conn, batch_size: int = 1000) -> int:
+    """
+    Deduplica los headers que llegaron sin separar (INSERT directo a la vista
+    scans); no confirma la transacción. Retorna cuántos escaneos compactó.
+    """
+    compacted = 0
+    last_id = 0
+    cursor = conn.cursor()
+    while True:
+        rows = conn.execute('''
+            SELECT id, volatile_headers FROM scans_data
+            WHERE headers_id IS NULL AND volatile_headers IS NOT NULL AND id > ?
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return compacted
+        for scan_id, headers in rows:
+            headers_id, volatile = intern_headers(cursor, headers)
+            if headers_id is not None:
+                cursor.execute('UPDATE scans_data SET headers_id = ?, volatile_headers = ? WHERE id = ?',
+                               (headers_id, volatile, scan_id))
+                compacted += 1
+        last_id = rows[-1][0]
+
+
+# --- Esquema -----------------------------------------------------------------
+
+def _object_type(conn, name: str) -> Optional[str]:
+    row = conn.execute('SELECT type FROM sqlite_master WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _table_columns(conn, table: str):
+    """[(nombre, default SQL)] en el orden de la tabla"""
+    return [(row[1], row[4]) for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _decoded_column(view: str) -> Tuple[str, str, Tuple[str, ...], str]:
+    """(columna de la vista, expresión que la reconstruye, columnas ocultas, columna anterior)"""
+    if view == 'scans':
+        expression = '''CASE
+            WHEN d.volatile_headers IS NULL THEN (SELECT headers FROM header_blobs WHERE id = d.headers_id)
+            WHEN d.headers_id IS NULL THEN d.volatile_headers
+            ELSE json_patch((SELECT headers FROM header_blobs WHERE id = d.headers_id), d.volatile_headers)
+        END'''
+        return 'headers', expression, HEADER_COLUMNS, HEADERS_AFTER
+    text_column, id_column, after = URL_COLUMNS[view]
+    return text_column, f'(SELECT url FROM urls WHERE id = d.{id_column})', (id_column,), after
+
+
+def _schema_statements(conn, view: str):
+    """[(nombre, sql)] de la vista y sus triggers según las columnas actuales de la tabla física"""
+    data_table = DATA_TABLES[view]
+    decoded, expression, hidden, after = _decoded_column(view)
+    columns = [(name, default) for name, default in _table_columns(conn, data_table) if name not in hidden]
+
+    select = []
+    for name, _ in columns:
+        select.append(f'd.{name}')
+        if name == after:
+            select.append(f'{expression} AS {decoded}')
+    if f'{expression} AS {decoded}' not in select:
+        select.append(f'{expression} AS {decoded}')
+    statements = [(view, f"CREATE VIEW {view} AS\nSELECT {', '.join(select)}\nFROM {data_table} d")]
+
+    # Las columnas omitidas en el INSERT llegan como NULL a la vista: se aplica el DEFAULT de la tabla
+    values = [f'COALESCE(NEW.{name}, {default})' if default is not None else f'NEW.{name}'
+              for name, default in columns]
+    if view == 'scans':
+        # Sin headers_id la vista devuelve volatile_headers tal cual (compact_headers deduplica después)
+        intern = ''
+        hidden_values = ['NULL', 'NEW.headers']
+    else:
+        intern = (f'INSERT OR IGNORE INTO urls (url) SELECT NEW.{decoded} WHERE NEW.{decoded} IS NOT NULL;')
+        hidden_values = [f'(SELECT id FROM urls WHERE url = NEW.{decoded})']
+
+    insert_columns = ', '.join([name for name, _ in columns] + list(hidden))
+    statements.append((f'{view}_insert', f'''CREATE TRIGGER {view}_insert INSTEAD OF INSERT ON {view}
+BEGIN
+    {intern}
+    INSERT INTO {data_table} ({insert_columns})
+    VALUES ({', '.join(values + hidden_values)});
+END'''))
+
+    assignments = ', '.join(f'{name} = NEW.{name}' for name, _ in columns if name != 'id')
+    statements.append((f'{view}_update', f'''CREATE TRIGGER {view}_update INSTEAD OF UPDATE ON {view}
+BEGIN
+    UPDATE {data_table} SET {assignments} WHERE id = OLD.id;
+END'''))
+
+    hidden_assignments = ', '.join(f'{name} = {value}' for name, value in zip(hidden, hidden_values))
+    statements.append((f'{view}_update_{decoded}', f'''CREATE TRIGGER {view}_update_{decoded} INSTEAD OF UPDATE OF {decoded} ON {view}
+BEGIN
+    {intern}
+    UPDATE {data_table} SET {hidden_assignments} WHERE id = OLD.id;
+END'''))
+
+    statements.append((f'{view}_delete', f'''CREATE TRIGGER {view}_delete INSTEAD OF DELETE ON {view}
+BEGIN
+    DELETE FROM {data_table} WHERE id = OLD.id;
+END'''))
+    return statements
+
+
+def _create_dictionaries(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS header_blobs (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE, -- SHA-256 de headers
+            headers TEXT NOT NULL -- JSON sin los headers volátiles
+        )
+    ''')
+
+
+def _drop_indexes_on(conn, table: str, column: str):
+    """DROP COLUMN falla si la columna está indexada"""
+    for index in conn.execute(f'PRAGMA index_list({table})').fetchall():
+        name = index[1]
+        if name.startswith('sqlite_autoindex'):
+            continue
+        if column in [info[2] for info in conn.execute(f'PRAGMA index_info({name})')]:
+            conn.execute(f'DROP INDEX {name}')
+            logger.info("  → Índice %s eliminado (columna %s.%s normalizada)", name, table, column)
+
+
+def _migrate_table(conn, view: str):
+    """Convierte la tabla antigua en su tabla *_data conservando ids, índices y secuencia"""
+    data_table = DATA_TABLES[view]
+    conn.execute(f'ALTER TABLE {view} RENAME TO {data_table}')
+
+    if view == 'scans':
+        _drop_indexes_on(conn, data_table, 'headers')
+        conn.execute(f'ALTER TABLE {data_table} ADD COLUMN headers_id INTEGER REFERENCES header_blobs(id)')
+        conn.execute(f'ALTER TABLE {data_table} ADD COLUMN volatile_headers TEXT')
+        conn.execute(f'UPDATE {data_table} SET volatile_headers = headers WHERE headers IS NOT NULL')
+        conn.execute(f'ALTER TABLE {data_table} DROP COLUMN headers')
+        compact_headers(conn)
+        return
+
+    text_column, id_column, _ = URL_COLUMNS[view]
+    _drop_indexes_on(conn, data_table, text_column)
+    conn.execute(f'ALTER TABLE {data_table} ADD COLUMN {id_column} INTEGER REFERENCES urls(id)')
+    conn.execute(f'INSERT OR IGNORE INTO urls (url) SELECT {text_column} FROM {data_table} WHERE {text_column} IS NOT NULL')
+    conn.execute(f'UPDATE {data_table} SET {id_column} = (SELECT id FROM urls WHERE url = {data_table}.{text_column})')
+    conn.execute(f'ALTER TABLE {data_table} DROP COLUMN {text_column}')
+
+
+def ensure_normalized_storage(conn, vacuum: bool = True) -> bool:
+    """
+    Migra las tablas antiguas al esquema normalizado y mantiene las vistas de
+    compatibilidad al día con las columnas de las tablas *_data (idempotente)
+
+    Confirma la transacción en curso de conn. Retorna True si migró tablas.
+    """
+    legacy = [view for view in DATA_TABLES if _object_type(conn, view) == 'table']
+    if not legacy and all(_object_type(conn, table) for table in DATA_TABLES.values()):
+        current = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type IN ('view', 'trigger')"))
+        if all(current.get(name) == sql for view in DATA_TABLES for name, sql in _schema_statements(conn, view)):
+            return False
+
+    had_rows = any(conn.execute(f'SELECT 1 FROM {view} LIMIT 1').fetchone() for view in legacy)
+    conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _create_dictionaries(conn)
+        for view in legacy:
+            _migrate_table(conn, view)
+        for view in DATA_TABLES:
+            for name, sql in _schema_statements(conn, view):
+                conn.execute(f"DROP {'VIEW' if name == view else 'TRIGGER'} IF EXISTS {name}")
+                conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if legacy and had_rows:
+        logger.info("✅ Migrated %s to normalized storage (urls, header_blobs)", ', '.join(legacy))
+        if vacuum:
+            try:
+                conn.execute('VACUUM')
+            except sqlite3.OperationalError as e:
+                logger.warning("⚠️ VACUUM after migration skipped: %s", e)
+    return bool(legacy)
+
+
+def _references(conn, dictionary: str):
+    """[(tabla, columna)] con una clave foránea hacia el diccionario (tablas *_data y resúmenes)"""
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return [(table, fk[3]) for table in tables
+            for fk in conn.execute(f'PRAGMA foreign_key_list({table})') if fk[2] == dictionary]
+
+
+def prune_dictionaries(conn) -> Dict[str, int]:
+    """Elimina URLs y headers que ya no referencia ningún escaneo (tras borrar escaneos)"""
+    pruned = {'urls': 0, 'header_blobs': 0}
+    for dictionary in ('urls', 'header_blobs'):
+        references = ' UNION '.join(f'SELECT {column} FROM {table} WHERE {column} IS NOT NULL'
+                                    for table, column in _references(conn, dictionary))
+        if not references:
+            continue
+        pruned[dictionary] = conn.execute(f'DELETE FROM {dictionary} WHERE id NOT IN ({references})').rowcount
+    conn.commit()
+    return pruned
+
+
+def table_sizes(conn) -> Optional[Dict[str, int]]:
+    """Bytes por tabla (índices incluidos) según dbstat, o None si SQLite no lo trae"""
+    try:
+        rows = conn.execute('''
+            SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize)
+            FROM dbstat s LEFT JOIN sqlite_master m ON m.name = s.name
+            GROUP BY 1 ORDER BY 2 DESC
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return dict(rows)
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'analysis.db'
+    if not os.path.exists(db_path):
+        print(f"❌ Base de datos no encontrada: {db_path}")
+        sys.exit(1)
+
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path, timeout=60.0)
+    migrated = ensure_normalized_storage(conn)
+    compacted = compact_headers(conn)
+    conn.commit()
+    pruned = prune_dictionaries(conn)
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    sizes = table_sizes(conn)
+    conn.close()
+
+    size_after = os.path.getsize(db_path)
+    print(f"{'✅ Migrada' if migrated else 'ℹ️ Ya estaba normalizada'}: {db_path}")
+    print(f"   Tamaño: {size_before / 1e6:.2f} MB → {size_after / 1e6:.2f} MB")
+    if compacted:
+        print(f"   Headers: {compacted} escaneos insertados sin deduplicar compactados")
+    if any(pruned.values()):
+        print(f"   Diccionarios: {pruned['urls']} URLs y {pruned['header_blobs']} headers sin uso eliminados")
+    for table, size in (sizes or {}).items():
+        print(f"   {table:28} {size / 1e3:>10.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Extracción de recursos de una página HTML en una sola pasada
+
+Reemplaza el árbol completo de BeautifulSoup (html.parser, Python puro) que se
+recorría varias veces con find_all. El documento se tokeniza una vez con el
+parser de lxml en modo "target" (eventos, sin construir árbol) y se obtiene un
+PageAssets inmutable con título, scripts, links, scripts inline y texto visible.
+
+Si lxml no está instalado se usa html.parser de la librería estándar con la
+misma interfaz.
+"""
+
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Etiquetas cuyo contenido no es texto visible de la página
+NON_TEXT_TAGS = ('script', 'style', 'noscript', 'template')
+
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.I)
+
+
+@dataclass(frozen=True)
+class PageAssets:
+    """Recursos de una página, en orden de aparición en el documento"""
+    title: Optional[str]
+    script_srcs: Tuple[str, ...]
+    link_hrefs: Tuple[str, ...]
+    stylesheet_hrefs: Tuple[str, ...]
+    inline_scripts: Tuple[str, ...]
+    text: str
+    html: str
+
+    def scripts_matching(self, pattern) -> List[str]:
+        """src de scripts que coinciden con una regex (equivale a find_all('script', src=re))"""
+        return [src for src in self.script_srcs if pattern.search(src)]
+
+    def links_matching(self, pattern) -> List[str]:
+        """href de <link> que coinciden con una regex (equivale a find_all('link', href=re))"""
+        return [href for href in self.link_hrefs if pattern.search(href)]
+
+
+def decode_html(content) -> str:
+    """
+    Decodifica el cuerpo de la respuesta: charset declarado en <meta>, luego UTF-8
+    y como último recurso windows-1252 (mismo orden práctico que UnicodeDammit)
+    """
+    if isinstance(content, str):
+        return content
+
+    match = META_CHARSET_PATTERN.search(content[:4096])
+    candidates = [match.group(1).decode('ascii', 'ignore')] if match else []
+    candidates += ['utf-8', 'windows-1252']
+
+    for encoding in candidates:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode('utf-8', errors='replace')
+
+
+class _AssetCollector:
+    """Recibe los eventos del parser y acumula solo lo que usa el pipeline"""
+
+    def __init__(self):
+        self.title = None
+        self.script_srcs = []
+        self.link_hrefs = []
+        self.stylesheet_hrefs = []
+        self.inline_scripts = []
+        self.text = []
+        self._stack = []
+        self._title_parts = None
+        self._script_parts = None
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        self._stack.append(tag)
+
+        if tag == 'script':
+            src = attrib.get('src')
+            if src:
+                self.script_srcs.append(src)
+                self._script_parts = None
+            else:
+                self._script_parts = []
+        elif tag == 'link':
+            href = attrib.get('href')
+            if href:
+                self.link_hrefs.append(href)
+                if 'stylesheet' in (attrib.get('rel') or '').split():
+                    self.stylesheet_hrefs.append(href)
+        elif tag == 'title' and self.title is None and self._title_parts is None:
+            self._title_parts = []
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if tag == 'script' and self._script_parts is not None:
+            body = ''.join(self._script_parts)
+            if body.strip():
+                self.inline_scripts.append(body)
+            self._script_parts = None
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+
+        # Cierra hasta la etiqueta abierta correspondiente (HTML mal formado)
+        if tag in self._stack:
+            while self._stack and self._stack.pop() != tag:
+                pass
+
+    def data(self, data):
+        current = self._stack[-1] if self._stack else ''
+        if current == 'script':
+            if self._script_parts is not None:
+                self._script_parts.append(data)
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if current not in NON_TEXT_TAGS:
+            self.text.append(data)
+
+    def close(self):
+        return self
+
+
+class _StdlibAssetParser(HTMLParser):
+    """Adaptador de html.parser a la interfaz start/end/data del colector"""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {name: value or '' for name, value in attrs})
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def extract_page_assets(content) -> PageAssets:
+    """
+    Extrae los recursos de la página en una sola pasada
+
+    Args:
+        content: cuerpo de la respuesta (bytes o str)
+    """
+    html = decode_html(content)
+    collector = _AssetCollector()
+
+    if LXML_AVAILABLE and html.strip():
+        parser = etree.HTMLParser(target=collector, huge_tree=True, remove_comments=True)
+        parser.feed(html)
+        parser.close()
+    else:
+        stdlib_parser = _StdlibAssetParser(collector)
+        stdlib_parser.feed(html)
+        stdlib_parser.close()
+
+    return PageAssets(
+        title=collector.title,
+        script_srcs=tuple(collector.script_srcs),
+        link_hrefs=tuple(collector.link_hrefs),
+        stylesheet_hrefs=tuple(collector.stylesheet_hrefs),
+        inline_scripts=tuple(collector.inline_scripts),
+        text=' '.join(part for part in collector.text if part.strip()),
+        html=html
+    )
@@ -5,6 +5,8 @@ Script para poblar el catálogo global de librerías con datos del js-file-extra
 import sqlite3
 import json
 
+from global_catalog import invalidate_ntg_catalog
+
 # Base de datos de librerías conocidas (extraída del archivo HTML)
 KNOWN_LIBRARIES = {
     'jquery': {
@@ -140,6 +142,8 @@ def populate_global_libraries():
             added_count += 1
             print(f"🆕 Agregada: {library_name} v{info['current']}")
     
+    if added_count or updated_count:
+        invalidate_ntg_catalog(conn)
     conn.commit()
     conn.close()
     
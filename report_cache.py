@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Caché de reportes consolidados por proyecto (/report/project/<id>)
+
+Generar el reporte consolidado recorre todos los escaneos revisados del
+proyecto (librerías, archivos, headers de seguridad) y renderiza una página que
+crece con la cantidad de URLs. El resultado renderizado se guarda en
+project_report_cache junto a un watermark:
+
+    versión del proyecto : máximo id y cantidad de escaneos revisados : versión del catálogo global : formato
+
+  - project_report_state.version se incrementa (dentro de la transacción del
+    llamador) con cada evento que cambia el reporte: revisar o borrar escaneos,
+    asociarlos o desasociarlos del proyecto, editar sus librerías o archivos y
+    editar el proyecto (invalidate_project_reports)
+  - el máximo id y el conteo de escaneos revisados cubren cambios hechos por
+    otros caminos (analyzer.py, retención)
+  - la versión de catalog_state cubre las ediciones del catálogo global
+  - el formato lo entrega quien registra el constructor (p.ej. la fecha de
+    modificación de la plantilla), para no servir HTML de una versión anterior
+
+Los eventos además encolan la reconstrucción en un hilo en segundo plano, así
+la siguiente visita ya encuentra el reporte listo. Si el watermark no coincide
+(p.ej. otro worker aún no reconstruye) el reporte se genera en la petición.
+El watermark se lee siempre antes que los datos: si un cambio ocurre mientras se
+construye, el reporte queda con el watermark anterior y se regenera.
+
+Configuración:
+    REPORT_CACHE_ENABLED=1             0 genera el reporte en cada visita
+    REPORT_REBUILD_DELAY_SECONDS=2     espera antes de reconstruir (agrupa eventos seguidos)
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+import storage
+from app_logging import get_logger
+from global_catalog import get_catalog_version
+
+logger = get_logger(__name__)
+
+REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+REPORT_REBUILD_DELAY_SECONDS = float(os.environ.get('REPORT_REBUILD_DELAY_SECONDS', '2'))
+
+REPORT_FIELDS = ('content_html', 'scripts_html', 'scan_count')
+
+
+def ensure_report_cache_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS project_report_state (
+            project_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS project_report_cache (
+            project_id INTEGER PRIMARY KEY,
+            watermark TEXT NOT NULL,
+            content_html TEXT,
+            scripts_html TEXT,
+            scan_count INTEGER DEFAULT 0,
+            build_ms REAL,
+            built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# --- Watermark ---------------------------------------------------------------
+
+def report_watermark(conn, project_id: int, report_format: str = '') -> str:
+    row = conn.execute('SELECT version FROM project_report_state WHERE project_id = ?', (project_id,)).fetchone()
+    version = row[0] if row else 0
+    max_id, reviewed = conn.execute(
+        'SELECT MAX(id), COUNT(*) FROM scans WHERE project_id = ? AND reviewed = 1', (project_id,)
+    ).fetchone()
+    return f'{version}:{max_id or 0}:{reviewed}:{get_catalog_version(conn)}:{report_format}'
+
+
+def projects_for_scans(conn, scan_ids: Iterable[int]) -> set:
+    scan_ids = list(scan_ids)
+    if not scan_ids:
+        return set()
+    placeholders = ','.join('?' * len(scan_ids))
+    rows = conn.execute(f'SELECT DISTINCT project_id FROM scans WHERE id IN ({placeholders}) '
+                        f'AND project_id IS NOT NULL', scan_ids).fetchall()
+    return {row[0] for row in rows}
+
+
+def invalidate_project_reports(conn, scan_ids: Iterable[int] = (), project_ids: Iterable = ()) -> set:
+    """
+    Marca como obsoletos los reportes de los proyectos indicados y de los que
+    contienen scan_ids (llamar antes de borrar o reasignar esos escaneos). Corre
+    dentro de la transacción del llamador, que hace el commit.
+    """
+    projects = projects_for_scans(conn, scan_ids)
+    projects.update(int(project_id) for project_id in project_ids if project_id)
+    if not projects:
+        return projects
+    conn.executemany('''
+        INSERT INTO project_report_state (project_id, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(project_id) DO UPDATE SET version = project_report_state.version + 1,
+                                              updated_at = CURRENT_TIMESTAMP
+    ''', [(project_id,) for project_id in sorted(projects)])
+    schedule_rebuild(projects)
+    return projects
+
+
+# --- Lectura y escritura -----------------------------------------------------
+
+def load_report(conn, project_id: int, watermark: str) -> Optional[Dict]:
+    row = conn.execute(f'''
+        SELECT {', '.join(REPORT_FIELDS)} FROM project_report_cache
+        WHERE project_id = ? AND watermark = ?
+    ''', (project_id, watermark)).fetchone()
+    return dict(zip(REPORT_FIELDS, row)) if row else None
+
+
+def store_report(conn, project_id: int, watermark: str, report: Dict, build_ms: float):
+    conn.execute(f'''
+        INSERT INTO project_report_cache (project_id, watermark, {', '.join(REPORT_FIELDS)}, build_ms, built_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(project_id) DO UPDATE SET watermark = excluded.watermark,
+            content_html = excluded.content_html, scripts_html = excluded.scripts_html,
+            scan_count = excluded.scan_count, build_ms = excluded.build_ms, built_at = excluded.built_at
+    ''', (project_id, watermark, *(report[field] for field in REPORT_FIELDS), build_ms))
+    conn.commit()
+
+
+# --- Construcción ------------------------------------------------------------
+
+_builder: Optional[Callable[[int], Optional[Dict]]] = None
+_report_format = ''
+_build_locks: Dict[int, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def set_report_builder(builder: Callable[[int], Optional[Dict]], report_format: str = ''):
+    """
+    Registra la función que genera un reporte: builder(project_id) retorna un
+    dict con REPORT_FIELDS o None si el proyecto no existe.
+    """
+    global _builder, _report_format
+    _builder = builder
+    _report_format = report_format
+
+
+def _lock_for(project_id: int) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(project_id, threading.Lock())
+
+
+def get_project_report(project_id: int) -> Optional[Dict]:
+    """Reporte vigente del proyecto: desde la caché o generado (y guardado) ahora"""
+    if not REPORT_CACHE_ENABLED:
+        return _builder(project_id)
+
+    conn = storage.connect()
+    try:
+        watermark = report_watermark(conn, project_id, _report_format)
+        report = load_report(conn, project_id, watermark)
+        if report is not None:
+            return report
+        # Una sola construcción por proyecto y proceso; quien espera reutiliza el resultado
+        with _lock_for(project_id):
+            watermark = report_watermark(conn, project_id, _report_format)
+            report = load_report(conn, project_id, watermark)
+            if report is not None:
+                return report
+            conn.rollback()
+            started = time.perf_counter()
+            report = _builder(project_id)
+            if report is None:
+                return None
+            build_ms = (time.perf_counter() - started) * 1000
+            store_report(conn, project_id, watermark, report, build_ms)
+            logger.info("📄 Project report %d built in %.0f ms (%d scans)",
+                        project_id, build_ms, report['scan_count'])
+            return report
+    finally:
+        conn.close()
+
+
+# --- Reconstrucción en segundo plano -----------------------------------------
+
+_rebuild_queue: 'queue.Queue[int]' = queue.Queue()
+_worker_started = False
+_worker_lock = threading.Lock()
+
+
+def schedule_rebuild(project_ids: Iterable[int]):
+    if not REPORT_CACHE_ENABLED or _builder is None:
+        return
+    for project_id in project_ids:
+        _rebuild_queue.put(project_id)
+    start_report_worker()
+
+
+def start_report_worker() -> bool:
+    """Hilo que regenera los reportes invalidados (uno por proceso, se inicia con el primer evento)"""
+    global _worker_started
+    with _worker_lock:
+        if _worker_started:
+            return True
+        _worker_started = True
+
+    def loop():
+        while True:
+            pending = {_rebuild_queue.get()}
+            # Eventos seguidos (p.ej. revisar varios escaneos) generan una sola reconstrucción
+            time.sleep(REPORT_REBUILD_DELAY_SECONDS)
+            while True:
+                try:
+                    pending.add(_rebuild_queue.get_nowait())
+                except queue.Empty:
+                    break
+            for project_id in sorted(pending):
+                try:
+                    get_project_report(project_id)
+                except Exception as e:
+                    logger.warning("⚠️ Project report %d rebuild failed: %s", project_id, e)
+
+    threading.Thread(target=loop, name='report-cache', daemon=True).start()
+    return True
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Retención de escaneos antiguos: resumen por URL y archivo en bases fechadas
+
+analysis.db conserva completos solo los últimos RETENTION_KEEP_SCANS escaneos de
+cada URL, más el último escaneo revisado de cada URL y proyecto (el que usa el
+reporte consolidado). Los demás con más de RETENTION_MIN_AGE_DAYS días se
+procesan por lotes:
+
+  - scan_rollups:       una fila compacta por escaneo archivado (fecha, estado,
+                        título, conteos y archivo donde quedó), para que
+                        /url-history siga mostrando la línea de tiempo completa
+  - library_rollups:    por URL y librería, primera y última detección y cantidad
+                        de escaneos distintos (el resumen de librerías del historial)
+  - library_timelines:  lo mismo por versión (las versiones encontradas)
+  - data/archive/analysis-archive-AAAA-MM.db:
+                        las filas originales de scans, libraries, file_urls,
+                        version_strings (con URLs y headers en texto, legibles
+                        sin los diccionarios de normalized_storage) y de las
+                        tablas por escaneo como scan_metrics, según el mes del
+                        escaneo; los totales de scan_metrics se suman antes a
+                        scan_metrics_totals para que /metrics no retroceda
+
+Cada lote es una transacción IMMEDIATE acotada a RETENTION_BATCH_SCANS escaneos
+con una pausa entre lotes, para no bloquear los escaneos en curso. Al terminar se
+eliminan URLs y headers sin uso y se devuelven las páginas libres al sistema con
+PRAGMA incremental_vacuum, también por tramos.
+
+El proceso corre en segundo plano (start_retention_worker) en cada worker del
+servidor; un lease en retention_state asegura que solo uno trabaje a la vez.
+
+Configuración:
+    RETENTION_KEEP_SCANS=0           escaneos completos por URL (0 desactiva la retención)
+    RETENTION_MIN_AGE_DAYS=30        no se archivan escaneos más recientes que esto
+    RETENTION_ARCHIVE_DIR=data/archive
+    RETENTION_BATCH_SCANS=50         escaneos por transacción
+    RETENTION_INTERVAL_HOURS=6       cada cuánto corre el proceso en segundo plano
+    RETENTION_VACUUM_PAGES=1000      páginas liberadas por tramo de incremental_vacuum
+
+Uso:
+    python retention.py [analysis.db] [--keep 5] [--min-age-days 30] [--dry-run]
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app_logging import get_logger
+from normalized_storage import DATA_TABLES, prune_dictionaries
+from scan_metrics import fold_scan_metrics
+
+logger = get_logger(__name__)
+
+RETENTION_KEEP_SCANS = int(os.environ.get('RETENTION_KEEP_SCANS', '0'))
+RETENTION_MIN_AGE_DAYS = int(os.environ.get('RETENTION_MIN_AGE_DAYS', '30'))
+RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR', os.path.join('data', 'archive'))
+RETENTION_BATCH_SCANS = int(os.environ.get('RETENTION_BATCH_SCANS', '50'))
+RETENTION_INTERVAL_HOURS = float(os.environ.get('RETENTION_INTERVAL_HOURS', '6'))
+RETENTION_VACUUM_PAGES = int(os.environ.get('RETENTION_VACUUM_PAGES', '1000'))
+
+# Pausa entre lotes y entre tramos de vacuum (segundos): deja pasar a los escaneos
+BATCH_PAUSE_SECONDS = 0.2
+
+# Un worker que murió a mitad de una pasada libera el lease tras este tiempo
+LEASE_SECONDS = 15 * 60
+
+# Cada cuánto revisa el hilo si toca una pasada (los workers se reciclan, el intervalo no)
+SCHEDULE_CHECK_SECONDS = 300
+
+ARCHIVE_PREFIX = 'analysis-archive-'
+CHILD_TABLES = ('libraries', 'file_urls', 'version_strings')
+# Tablas por escaneo fuera de normalized_storage que se archivan y borran con él
+SCAN_TABLES = ('scan_metrics',)
+
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def ensure_retention_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_rollups (
+            id INTEGER PRIMARY KEY, -- id original del escaneo archivado
+            url_id INTEGER NOT NULL REFERENCES urls(id),
+            scan_date TIMESTAMP,
+            status_code INTEGER,
+            title TEXT,
+            project_id INTEGER,
+            library_count INTEGER DEFAULT 0,
+            version_string_count INTEGER DEFAULT 0,
+            file_count INTEGER DEFAULT 0,
+            archive_file TEXT, -- nombre del archivo en RETENTION_ARCHIVE_DIR
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scan_rollups_url ON scan_rollups(url_id, scan_date)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS library_timelines (
+            url_id INTEGER NOT NULL REFERENCES urls(id),
+            library_name TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT '',
+            version TEXT NOT NULL DEFAULT '', -- '' si no se detectó versión
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            scan_count INTEGER DEFAULT 0,
+            PRIMARY KEY (url_id, library_name, type, version)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS library_rollups (
+            url_id INTEGER NOT NULL REFERENCES urls(id),
+            library_name TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT '',
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            scan_count INTEGER DEFAULT 0, -- escaneos distintos, sin importar la versión
+            PRIMARY KEY (url_id, library_name, type)
+        ) WITHOUT ROWID
+    ''')
+    # Cada lote copia, resume y borra las filas hijas por scan_id
+    for view in CHILD_TABLES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{view}_scan_id ON {DATA_TABLES[view]}(scan_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS retention_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+def archive_file_name(scan_date: Optional[str]) -> str:
+    """Archivo de archivo según el mes del escaneo (AAAA-MM)"""
+    month = (scan_date or '')[:7] or 'unknown'
+    return f'{ARCHIVE_PREFIX}{month}.db'
+
+
+# --- Lease entre workers -----------------------------------------------------
+
+def _lease_owner() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def acquire_lease(conn, owner: str, now: Optional[float] = None) -> bool:
+    now = time.time() if now is None else now
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute("SELECT value FROM retention_state WHERE key = 'lease'").fetchone()
+        if row and row[0]:
+            holder, _, until = row[0].rpartition('|')
+            if holder != owner and float(until) > now:
+                conn.execute('ROLLBACK')
+                return False
+        conn.execute("INSERT OR REPLACE INTO retention_state (key, value) VALUES ('lease', ?)",
+                     (f'{owner}|{now + LEASE_SECONDS}',))
+        conn.execute('COMMIT')
+        return True
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def release_lease(conn, owner: str):
+    conn.execute("DELETE FROM retention_state WHERE key = 'lease' AND value LIKE ?", (f'{owner}|%',))
+
+
+# --- Selección y archivo -----------------------------------------------------
+
+def find_candidates(conn, keep: int, min_age_days: int, limit: int) -> List[sqlite3.Row]:
+    """
+    Escaneos fuera de los últimos `keep` de su URL y más antiguos que min_age_days,
+    del más antiguo al más nuevo. El último escaneo revisado de cada URL y proyecto
+    nunca es candidato: el reporte consolidado del proyecto lo lee aunque la URL
+    se haya re-escaneado muchas veces desde la revisión.
+    """
+    return conn.execute('''
+        SELECT id, scan_date FROM (
+            SELECT id, scan_date, reviewed,
+                   ROW_NUMBER() OVER (PARTITION BY url ORDER BY scan_date DESC, id DESC) AS position,
+                   ROW_NUMBER() OVER (PARTITION BY url, project_id, reviewed = 1
+                                      ORDER BY scan_date DESC, id DESC) AS reviewed_position
+            FROM scans_data
+        )
+        WHERE position > ? AND scan_date < datetime('now', ?)
+          AND NOT (reviewed = 1 AND reviewed_position = 1)
+        ORDER BY scan_date, id
+        LIMIT ?
+    ''', (keep, f'-{min_age_days} days', limit)).fetchall()
+
+
+def _ensure_archive_schema(conn, schema: str):
+    """Tablas del archivo con las columnas actuales de las vistas (se agregan las nuevas)"""
+    for view in DATA_TABLES:
+        columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info({view})')]
+        existing = [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({view})')]
+        if not existing:
+            others = ', '.join(column for column in columns if column != 'id')
+            conn.execute(f'CREATE TABLE {schema}.{view} (id INTEGER PRIMARY KEY, {others})')
+            if view != 'scans':
+                conn.execute(f'CREATE INDEX {schema}.idx_{view}_scan_id ON {view}(scan_id)')
+            continue
+        for column in columns:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {schema}.{view} ADD COLUMN {column}')
+
+
+def _scan_tables(conn) -> List[str]:
+    """Tablas de SCAN_TABLES presentes en la base (una base antigua puede no tenerlas)"""
+    return [table for table in SCAN_TABLES
+            if conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()]
+
+
+def _ensure_scan_table_archive(conn, schema: str, table: str):
+    """Copia de una tabla de SCAN_TABLES en el archivo, con las columnas actuales"""
+    columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info({table})')]
+    existing = [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+    if not existing:
+        conn.execute(f'CREATE TABLE {schema}.{table} (scan_id INTEGER PRIMARY KEY, '
+                     f'{", ".join(column for column in columns if column != "scan_id")})')
+        return
+    for column in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {column}')
+
+
+def _copy_rows(conn, schema: str, view: str, where: str, ids: List[int]) -> int:
+    columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({view})'))
+    placeholders = ','.join('?' * len(ids))
+    return conn.execute(f'''
+        INSERT OR REPLACE INTO {schema}.{view} ({columns})
+        SELECT {columns} FROM main.{view} WHERE {where} IN ({placeholders})
+    ''', ids).rowcount
+
+
+def _rollup(conn, ids: List[int], archive_file: str):
+    placeholders = ','.join('?' * len(ids))
+    conn.execute(f'INSERT OR IGNORE INTO urls (url) SELECT url FROM scans_data WHERE id IN ({placeholders})', ids)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO scan_rollups
+            (id, url_id, scan_date, status_code, title, project_id,
+             library_count, version_string_count, file_count, archive_file)
+        SELECT s.id, (SELECT id FROM urls WHERE url = s.url), s.scan_date, s.status_code, s.title, s.project_id,
+               (SELECT COUNT(*) FROM libraries_data WHERE scan_id = s.id),
+               (SELECT COUNT(*) FROM version_strings_data WHERE scan_id = s.id),
+               (SELECT COUNT(*) FROM file_urls_data WHERE scan_id = s.id),
+               ?
+        FROM scans_data s WHERE s.id IN ({placeholders})
+    ''', [archive_file] + ids)
+    conn.execute(f'''
+        INSERT INTO library_timelines (url_id, library_name, type, version, first_seen, last_seen, scan_count)
+        SELECT (SELECT id FROM urls WHERE url = s.url), l.library_name, IFNULL(l.type, ''), IFNULL(l.version, ''),
+               MIN(s.scan_date), MAX(s.scan_date), COUNT(DISTINCT s.id)
+        FROM libraries_data l JOIN scans_data s ON s.id = l.scan_id
+        WHERE s.id IN ({placeholders}) AND l.library_name IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT(url_id, library_name, type, version) DO UPDATE SET
+            first_seen = MIN(first_seen, excluded.first_seen),
+            last_seen = MAX(last_seen, excluded.last_seen),
+            scan_count = scan_count + excluded.scan_count
+    ''', ids)
+    # Cada escaneo cuenta una vez por librería aunque traiga varias versiones; los
+    # lotes no se solapan, así que los conteos se pueden sumar entre lotes
+    conn.execute(f'''
+        INSERT INTO library_rollups (url_id, library_name, type, first_seen, last_seen, scan_count)
+        SELECT (SELECT id FROM urls WHERE url = s.url), l.library_name, IFNULL(l.type, ''),
+               MIN(s.scan_date), MAX(s.scan_date), COUNT(DISTINCT s.id)
+        FROM libraries_data l JOIN scans_data s ON s.id = l.scan_id
+        WHERE s.id IN ({placeholders}) AND l.library_name IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT(url_id, library_name, type) DO UPDATE SET
+            first_seen = MIN(first_seen, excluded.first_seen),
+            last_seen = MAX(last_seen, excluded.last_seen),
+            scan_count = scan_count + excluded.scan_count
+    ''', ids)
+
+
+def archive_batch(conn, ids: List[int], archive_dir: str, archive_file: str) -> int:
+    """
+    Archiva y resume un lote de escaneos del mismo mes en una transacción
+
+    conn debe estar en modo autocommit (isolation_level=None). Solo se procesan
+    los escaneos que siguen en analysis.db dentro de la transacción, así dos
+    pasadas concurrentes no duplican los contadores de library_timelines.
+    Retorna la cantidad de escaneos archivados.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS archive", (os.path.join(archive_dir, archive_file),))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(ids))
+            ids = [row[0] for row in conn.execute(f'SELECT id FROM scans_data WHERE id IN ({placeholders})', ids)]
+            if ids:
+                _ensure_archive_schema(conn, 'archive')
+                _copy_rows(conn, 'archive', 'scans', 'id', ids)
+                for view in CHILD_TABLES:
+                    _copy_rows(conn, 'archive', view, 'scan_id', ids)
+                scan_tables = _scan_tables(conn)
+                for table in scan_tables:
+                    _ensure_scan_table_archive(conn, 'archive', table)
+                    _copy_rows(conn, 'archive', table, 'scan_id', ids)
+                if 'scan_metrics' in scan_tables:
+                    fold_scan_metrics(conn, ids)
+                _rollup(conn, ids, archive_file)
+
+                placeholders = ','.join('?' * len(ids))
+                for view in CHILD_TABLES:
+                    conn.execute(f'DELETE FROM {DATA_TABLES[view]} WHERE scan_id IN ({placeholders})', ids)
+                for table in scan_tables:
+                    conn.execute(f'DELETE FROM {table} WHERE scan_id IN ({placeholders})', ids)
+                conn.execute(f'DELETE FROM scans_data WHERE id IN ({placeholders})', ids)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.execute('DETACH DATABASE archive')
+    return len(ids)
+
+
+# --- Compactación ------------------------------------------------------------
+
+def enable_incremental_vacuum(conn) -> bool:
+    """
+    Activa auto_vacuum=INCREMENTAL; en una base con datos requiere un VACUUM
+    completo (una sola vez). Retorna True si la base ya quedó en ese modo.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == SQLITE_AUTO_VACUUM_INCREMENTAL:
+        return True
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    logger.info("🧹 Converting analysis.db to auto_vacuum=INCREMENTAL (one-time VACUUM)")
+    try:
+        conn.execute('VACUUM')
+    except sqlite3.OperationalError as e:
+        logger.warning("⚠️ VACUUM skipped, space will be reclaimed on a later pass: %s", e)
+        return False
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == SQLITE_AUTO_VACUUM_INCREMENTAL
+
+
+def incremental_vacuum(conn, pages_per_step: int = RETENTION_VACUUM_PAGES,
+                       pause: float = BATCH_PAUSE_SECONDS) -> int:
+    """Devuelve las páginas libres al sistema por tramos; retorna las páginas liberadas"""
+    if not enable_incremental_vacuum(conn):
+        return 0
+    pages_before = conn.execute('PRAGMA page_count').fetchone()[0]
+    while conn.execute('PRAGMA freelist_count').fetchone()[0]:
+        # execute() solo avanza un paso (una página): executescript corre el PRAGMA completo
+        conn.executescript(f'PRAGMA incremental_vacuum({pages_per_step})')
+        time.sleep(pause)
+    return pages_before - conn.execute('PRAGMA page_count').fetchone()[0]
+
+
+# --- Pasada completa ---------------------------------------------------------
+
+def run_retention(db_path: str = 'analysis.db', keep: int = RETENTION_KEEP_SCANS,
+                  min_age_days: int = RETENTION_MIN_AGE_DAYS, archive_dir: str = RETENTION_ARCHIVE_DIR,
+                  batch_size: int = RETENTION_BATCH_SCANS, pause: float = BATCH_PAUSE_SECONDS,
+                  dry_run: bool = False) -> Dict[str, int]:
+    """
+    Archiva los escaneos fuera de la política y compacta la base
+
+    Retorna {'scans', 'batches', 'urls', 'header_blobs', 'pages'}; con dry_run
+    solo cuenta los escaneos que se archivarían.
+    """
+    stats = {'scans': 0, 'batches': 0, 'urls': 0, 'header_blobs': 0, 'pages': 0}
+    if keep < 1:
+        return stats
+
+    conn = sqlite3.connect(db_path, timeout=60.0, isolation_level=None)
+    conn.execute('PRAGMA busy_timeout = 60000')
+    try:
+        ensure_retention_tables(conn)
+        if dry_run:
+            stats['scans'] = len(find_candidates(conn, keep, min_age_days, -1))
+            return stats
+
+        owner = _lease_owner()
+        if not acquire_lease(conn, owner):
+            logger.debug("Retention pass skipped: another worker holds the lease")
+            return stats
+        try:
+            while True:
+                candidates = find_candidates(conn, keep, min_age_days, batch_size)
+                if not candidates:
+                    break
+                # Un lote por archivo: el del mes del escaneo más antiguo
+                archive_file = archive_file_name(candidates[0][1])
+                ids = [scan_id for scan_id, scan_date in candidates if archive_file_name(scan_date) == archive_file]
+                archived = archive_batch(conn, ids, archive_dir, archive_file)
+                stats['scans'] += archived
+                stats['batches'] += 1
+                logger.debug("Archived %d scans into %s", archived, archive_file)
+                if not acquire_lease(conn, owner):
+                    # El lease venció y otro worker lo tomó: que él continúe la pasada
+                    logger.warning("⚠️ Retention lease lost after %d batches, stopping this pass", stats['batches'])
+                    return stats
+                time.sleep(pause)
+
+            if stats['scans']:
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    pruned = prune_dictionaries(conn)
+                finally:
+                    # prune_dictionaries confirma; si falló, la transacción sigue abierta
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                stats['urls'], stats['header_blobs'] = pruned['urls'], pruned['header_blobs']
+                stats['pages'] = incremental_vacuum(conn, pause=pause)
+            conn.execute("INSERT OR REPLACE INTO retention_state (key, value) VALUES ('last_run', datetime('now'))")
+        finally:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            release_lease(conn, owner)
+    finally:
+        conn.close()
+
+    if stats['scans']:
+        logger.info("🗄️ Retention: %d scans archived in %d batches, %d URLs and %d headers pruned, %d pages released",
+                    stats['scans'], stats['batches'], stats['urls'], stats['header_blobs'], stats['pages'])
+    return stats
+
+
+def retention_due(db_path: str = 'analysis.db', interval_hours: float = RETENTION_INTERVAL_HOURS) -> bool:
+    """True si la última pasada completa (retention_state.last_run) tiene más de interval_hours"""
+    conn = sqlite3.connect(db_path, timeout=60.0)
+    try:
+        row = conn.execute("SELECT value > datetime('now', ?) FROM retention_state WHERE key = 'last_run'",
+                           (f'-{interval_hours * 3600:.0f} seconds',)).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return not (row and row[0])
+
+
+_worker_started = False
+_worker_lock = threading.Lock()
+
+
+def start_retention_worker(db_path: str = 'analysis.db') -> bool:
+    """Hilo en segundo plano que corre run_retention cada RETENTION_INTERVAL_HOURS (uno por proceso)"""
+    global _worker_started
+    if RETENTION_KEEP_SCANS < 1:
+        return False
+    with _worker_lock:
+        if _worker_started:
+            return True
+        _worker_started = True
+
+    db_path = os.path.abspath(db_path)
+
+    def loop():
+        while True:
+            try:
+                if retention_due(db_path):
+                    run_retention(db_path)
+            except Exception as e:
+                logger.warning("⚠️ Retention pass failed: %s", e)
+            time.sleep(SCHEDULE_CHECK_SECONDS)
+
+    threading.Thread(target=loop, name='retention', daemon=True).start()
+    logger.info("🗄️ Retention enabled: keeping %d scans per URL, archiving to %s",
+                RETENTION_KEEP_SCANS, RETENTION_ARCHIVE_DIR)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('db', nargs='?', default='analysis.db')
+    parser.add_argument('--keep', type=int, default=RETENTION_KEEP_SCANS or 5, help='Escaneos completos por URL')
+    parser.add_argument('--min-age-days', type=int, default=RETENTION_MIN_AGE_DAYS)
+    parser.add_argument('--archive-dir', default=RETENTION_ARCHIVE_DIR)
+    parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SCANS)
+    parser.add_argument('--dry-run', action='store_true', help='Solo cuenta los escaneos que se archivarían')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Base de datos no encontrada: {args.db}")
+        raise SystemExit(1)
+
+    size_before = os.path.getsize(args.db)
+    stats = run_retention(args.db, keep=args.keep, min_age_days=args.min_age_days, archive_dir=args.archive_dir,
+                          batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"ℹ️ Se archivarían {stats['scans']} escaneos (se conservan {args.keep} por URL)")
+        return
+    print(f"✅ {stats['scans']} escaneos archivados en {stats['batches']} lotes → {args.archive_dir}")
+    print(f"   Diccionarios: {stats['urls']} URLs y {stats['header_blobs']} headers sin uso eliminados")
+    print(f"   Tamaño: {size_before / 1e6:.2f} MB → {os.path.getsize(args.db) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
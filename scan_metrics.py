@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Métricas por escaneo: tiempos por etapa, bytes transferidos y aciertos de caché
+
+Cada escaneo lleva un ScanMetrics que acumula el tiempo de cada etapa del
+pipeline (descarga de la página, parseo HTML, HEAD, descargas, regex, firmas de
+contenido, CDN, commit) y los contadores de bytes y cachés. Al terminar se
+guarda una fila en scan_metrics; /metrics (formato de texto de Prometheus) y la
+página de rendimiento agregan sobre esa tabla, así los valores son los mismos
+sin importar qué worker del servidor atendió cada escaneo.
+
+Las etapas de análisis (regex_scan, content_signatures) suman el tiempo de los
+procesos de content_pool, por lo que pueden superar al tiempo total del escaneo.
+
+La retención (retention.py) archiva las filas de escaneos antiguos; antes de
+borrarlas las suma a scan_metrics_totals con fold_scan_metrics(), y /metrics
+agrega esa fila a la tabla viva para que los contadores nunca bajen.
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Etapas en orden del pipeline
+STAGES = (
+    'page_fetch',
+    'html_parse',
+    'head_requests',
+    'file_downloads',
+    'regex_scan',
+    'content_signatures',
+    'cdn_lookups',
+    'db_commit',
+)
+
+STAGE_LABELS = {
+    'page_fetch': 'Descarga de página',
+    'html_parse': 'Parseo HTML',
+    'head_requests': 'Peticiones HEAD',
+    'file_downloads': 'Descarga de archivos',
+    'regex_scan': 'Regex de versiones',
+    'content_signatures': 'Firmas de contenido',
+    'cdn_lookups': 'Análisis CDN',
+    'db_commit': 'Commit en BD',
+}
+
+COUNTERS = (
+    'page_bytes',
+    'file_bytes',
+    'files_count',
+    'head_requests',
+    'inline_cache_hits',
+    'inline_cache_misses',
+    'not_modified',
+)
+
+# Límites (segundos) del histograma de duración total en /metrics
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRIC_PREFIX = 'js_analyzer'
+
+# Columnas de scan_metrics_totals, en el orden de _aggregate_row()
+TOTAL_COLUMNS = (('scan_count', 'total_ms') + tuple(f'{stage}_ms' for stage in STAGES) + COUNTERS
+                 + tuple(f'le_{str(bucket).replace(".", "_")}' for bucket in DURATION_BUCKETS))
+
+
+class ScanMetrics:
+    """Acumulador de tiempos y contadores de un escaneo (usado por un solo hilo)"""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.stage_seconds: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
+
+    def add_stage_times(self, timings: Optional[Dict[str, float]]):
+        for name, seconds in (timings or {}).items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._started
+
+
+def ensure_scan_metrics_table(conn):
+    stage_columns = ',\n'.join(f'            {stage}_ms REAL DEFAULT 0' for stage in STAGES)
+    counter_columns = ',\n'.join(f'            {counter} INTEGER DEFAULT 0' for counter in COUNTERS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS scan_metrics (
+            scan_id INTEGER PRIMARY KEY,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_ms REAL,
+{stage_columns},
+{counter_columns}
+        )
+    ''')
+    # Contadores agregados después de crear la tabla
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(scan_metrics)').fetchall()}
+    for counter in COUNTERS:
+        if counter not in existing:
+            conn.execute(f'ALTER TABLE scan_metrics ADD COLUMN {counter} INTEGER DEFAULT 0')
+
+    # Acumulado de las filas archivadas por la retención (una sola fila, id = 1)
+    total_columns = ',\n'.join(f'            {column} REAL DEFAULT 0' for column in TOTAL_COLUMNS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS scan_metrics_totals (
+            id INTEGER PRIMARY KEY,
+{total_columns}
+        )
+    ''')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(scan_metrics_totals)').fetchall()}
+    for column in TOTAL_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE scan_metrics_totals ADD COLUMN {column} REAL DEFAULT 0')
+
+
+def record_scan_metrics(conn, scan_id: int, metrics: ScanMetrics):
+    """
+    Guarda las métricas del escaneo y confirma. Se llama después del commit del
+    escaneo para incluir su duración; un error aquí nunca hace fallar el escaneo.
+    """
+    columns = ['scan_id', 'total_ms'] + [f'{stage}_ms' for stage in STAGES] + list(COUNTERS)
+    values = ([scan_id, metrics.total_seconds * 1000]
+              + [metrics.stage_seconds[stage] * 1000 for stage in STAGES]
+              + [metrics.counters[counter] for counter in COUNTERS])
+    query = f"INSERT OR REPLACE INTO scan_metrics ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    try:
+        try:
+            conn.execute(query, values)
+        except sqlite3.OperationalError:
+            # Base de datos anterior a scan_metrics (o a alguno de sus contadores)
+            ensure_scan_metrics_table(conn)
+            conn.execute(query, values)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("  ⚠️ No se pudieron guardar las métricas del escaneo %s: %s", scan_id, e)
+
+
+def _aggregate_row(conn, where: str = '', params=()):
+    sums = ', '.join(f'COALESCE(SUM({stage}_ms), 0)' for stage in STAGES)
+    counters = ', '.join(f'COALESCE(SUM({counter}), 0)' for counter in COUNTERS)
+    buckets = ', '.join(f'SUM(CASE WHEN total_ms <= {bucket * 1000} THEN 1 ELSE 0 END)' for bucket in DURATION_BUCKETS)
+    return conn.execute(f'''
+        SELECT COUNT(*), COALESCE(SUM(total_ms), 0), {sums}, {counters}, {buckets}
+        FROM scan_metrics {where}
+    ''', params).fetchone()
+
+
+def fold_scan_metrics(conn, scan_ids: List[int]) -> int:
+    """
+    Suma las filas de scan_metrics de scan_ids a scan_metrics_totals; se llama
+    en la misma transacción que las borra. Retorna las filas acumuladas.
+    """
+    if not scan_ids:
+        return 0
+    row = _aggregate_row(conn, f"WHERE scan_id IN ({','.join('?' * len(scan_ids))})", scan_ids)
+    if not row[0]:
+        return 0
+    ensure_scan_metrics_table(conn)
+    conn.execute('INSERT OR IGNORE INTO scan_metrics_totals (id) VALUES (1)')
+    conn.execute(f"UPDATE scan_metrics_totals SET {', '.join(f'{column} = {column} + ?' for column in TOTAL_COLUMNS)} "
+                 "WHERE id = 1", [value or 0 for value in row])
+    return row[0]
+
+
+def _archived_totals(conn):
+    try:
+        return conn.execute(f"SELECT {', '.join(TOTAL_COLUMNS)} FROM scan_metrics_totals WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # Base de datos anterior a scan_metrics_totals
+        return None
+
+
+def _split_aggregate(row):
+    row = list(row)
+    count, total_ms = row[0] or 0, row[1] or 0
+    stages = dict(zip(STAGES, row[2:2 + len(STAGES)]))
+    offset = 2 + len(STAGES)
+    counters = dict(zip(COUNTERS, row[offset:offset + len(COUNTERS)]))
+    buckets = [value or 0 for value in row[offset + len(COUNTERS):]]
+    return count, total_ms, stages, counters, buckets
+
+
+def render_prometheus(conn) -> str:
+    """Exposición en formato de texto de Prometheus (contadores acumulados desde el inicio)"""
+    try:
+        row = [float(value or 0) for value in _aggregate_row(conn)]
+        archived = _archived_totals(conn)
+        if archived:
+            row = [live + float(value or 0) for live, value in zip(row, archived)]
+        count, total_ms, stages, counters, buckets = _split_aggregate(row)
+        count, buckets = int(count), [int(value) for value in buckets]
+        counters = {counter: int(value) for counter, value in counters.items()}
+    except sqlite3.OperationalError:
+        count, total_ms, stages, counters, buckets = 0, 0, dict.fromkeys(STAGES, 0), dict.fromkeys(COUNTERS, 0), \
+            [0] * len(DURATION_BUCKETS)
+
+    p = METRIC_PREFIX
+    lines = [
+        f'# HELP {p}_scan_duration_seconds Duración total de cada escaneo.',
+        f'# TYPE {p}_scan_duration_seconds histogram',
+    ]
+    for bucket, cumulative in zip(DURATION_BUCKETS, buckets):
+        lines.append(f'{p}_scan_duration_seconds_bucket{{le="{bucket}"}} {cumulative}')
+    lines += [
+        f'{p}_scan_duration_seconds_bucket{{le="+Inf"}} {count}',
+        f'{p}_scan_duration_seconds_sum {total_ms / 1000:.6f}',
+        f'{p}_scan_duration_seconds_count {count}',
+        f'# HELP {p}_scan_stage_seconds_total Tiempo acumulado por etapa del escaneo.',
+        f'# TYPE {p}_scan_stage_seconds_total counter',
+    ]
+    lines += [f'{p}_scan_stage_seconds_total{{stage="{stage}"}} {stages[stage] / 1000:.6f}' for stage in STAGES]
+    lines += [
+        f'# HELP {p}_downloaded_bytes_total Bytes descargados (página y archivos JS/CSS).',
+        f'# TYPE {p}_downloaded_bytes_total counter',
+        f'{p}_downloaded_bytes_total{{kind="page"}} {counters["page_bytes"]}',
+        f'{p}_downloaded_bytes_total{{kind="files"}} {counters["file_bytes"]}',
+        f'# HELP {p}_http_requests_total Peticiones a recursos de las páginas escaneadas.',
+        f'# TYPE {p}_http_requests_total counter',
+        f'{p}_http_requests_total{{method="HEAD"}} {counters["head_requests"]}',
+        f'{p}_http_requests_total{{method="GET"}} {counters["files_count"] + count}',
+        f'# HELP {p}_cache_requests_total Consultas a cachés del pipeline por resultado.',
+        f'# TYPE {p}_cache_requests_total counter',
+        f'{p}_cache_requests_total{{cache="inline_scripts",result="hit"}} {counters["inline_cache_hits"]}',
+        f'{p}_cache_requests_total{{cache="inline_scripts",result="miss"}} {counters["inline_cache_misses"]}',
+        f'# HELP {p}_not_modified_total Archivos que respondieron 304 en re-escaneos incrementales.',
+        f'# TYPE {p}_not_modified_total counter',
+        f'{p}_not_modified_total {counters["not_modified"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_recent_scans(conn, limit: int = 200) -> Dict:
+    """Resumen de los últimos `limit` escaneos para la página de rendimiento"""
+    try:
+        rows = conn.execute('''
+            SELECT m.*, s.url
+            FROM scan_metrics m
+            LEFT JOIN scans s ON s.id = m.scan_id
+            ORDER BY m.scan_id DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    rows = [dict(row) for row in rows]
+
+    count = len(rows)
+    totals = sorted(row['total_ms'] or 0 for row in rows)
+    stage_totals = {stage: sum(row[f'{stage}_ms'] or 0 for row in rows) for stage in STAGES}
+    stage_sum = sum(stage_totals.values()) or 1
+    counters = {counter: sum(row.get(counter) or 0 for row in rows) for counter in COUNTERS}
+    inline_lookups = counters['inline_cache_hits'] + counters['inline_cache_misses']
+
+    return {
+        'count': count,
+        'avg_ms': sum(totals) / count if count else 0,
+        'p50_ms': _percentile(totals, 0.5),
+        'p95_ms': _percentile(totals, 0.95),
+        'stages': [{
+            'name': stage,
+            'label': STAGE_LABELS[stage],
+            'avg_ms': stage_totals[stage] / count if count else 0,
+            'share': 100 * stage_totals[stage] / stage_sum,
+        } for stage in STAGES],
+        'counters': counters,
+        'avg_page_kb': counters['page_bytes'] / 1024 / count if count else 0,
+        'avg_files_kb': counters['file_bytes'] / 1024 / count if count else 0,
+        'inline_hit_rate': 100 * counters['inline_cache_hits'] / inline_lookups if inline_lookups else None,
+        'recent': rows[:50],
+    }
@@ -133,13 +133,12 @@ def log_security_event(event_type, details, ip_address=None):
 
 
 # Rate Limiting Implementation
-import time
-from collections import defaultdict, deque
 from functools import wraps
 from flask import request, jsonify, flash, redirect, url_for
+from shared_state import get_state_store
 
-# In-memory rate limiting store (for production, use Redis)
-rate_limit_store = defaultdict(lambda: deque())
+# Rate limit counters live in the shared state backend (see shared_state.py)
+# so that every WSGI worker process enforces the same limits.
 
 def get_client_ip():
     """
@@ -195,15 +194,15 @@ def rate_limit(limit_key, custom_message=None):
                 log_security_event('rate_limit_config_error', str(e), client_ip)
                 return f(*args, **kwargs)
             
-            current_time = time.time()
-            
-            # Clean old requests outside time window
-            requests_queue = rate_limit_store[rate_key]
-            while requests_queue and requests_queue[0] <= current_time - time_window:
-                requests_queue.popleft()
+            try:
+                allowed, _ = get_state_store().rate_limit_hit(rate_key, max_requests, time_window)
+            except Exception as e:
+                # Fail open: an unavailable state backend must not take the app down
+                log_security_event('rate_limit_config_error', f"State backend error: {e}", client_ip)
+                return f(*args, **kwargs)
             
             # Check if limit exceeded
-            if len(requests_queue) >= max_requests:
+            if not allowed:
                 log_security_event('rate_limit_exceeded', f"Limit: {RATE_LIMITS[limit_key]}", client_ip)
                 
                 # Return appropriate response based on request type
@@ -215,9 +214,6 @@ def rate_limit(limit_key, custom_message=None):
                     flash(message, 'error')
                     return redirect(url_for('index'))
             
-            # Add current request to queue
-            requests_queue.append(current_time)
-            
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -235,19 +231,5 @@ def get_rate_limit_status(limit_key, client_ip=None):
     rate_key = f"{client_ip}:{limit_key}"
     max_requests, time_window = parse_rate_limit(RATE_LIMITS[limit_key])
     
-    current_time = time.time()
-    requests_queue = rate_limit_store[rate_key]
-    
-    # Clean old requests
-    while requests_queue and requests_queue[0] <= current_time - time_window:
-        requests_queue.popleft()
-    
-    remaining = max_requests - len(requests_queue)
-    reset_time = requests_queue[0] + time_window if requests_queue else current_time
-    
-    return {
-        'limit': max_requests,
-        'remaining': max(0, remaining),
-        'reset_time': reset_time,
-        'current_requests': len(requests_queue)
-    }
\ No newline at end of file
+    # Read-only: does not create an entry for keys that never made a request
+    return get_state_store().rate_limit_status(rate_key, max_requests, time_window)
\ No newline at end of file
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Estado compartido entre workers del servidor WSGI
+
+Guarda los contadores de rate limiting y el progreso de trabajos (análisis masivos)
+en un backend visible para todos los procesos. Por defecto usa un archivo SQLite
+en modo WAL; MemoryStateStore es el reemplazo local para un único proceso.
+
+Un trabajo corre en un hilo del worker que lo creó y guarda su entrada (payload)
+junto al progreso. Mientras corre, job_heartbeat() actualiza updated_at; si el
+worker se recicla o muere, el latido se detiene y get_job() lo reporta como
+'orphaned' pasados JOB_STALE_SECONDS. claim_job() lo toma de forma atómica
+(un solo worker) para reanudarlo desde donde quedó.
+
+Configuración:
+    SHARED_STATE_BACKEND=sqlite|memory   (default: sqlite)
+    SHARED_STATE_PATH=data/shared_state.db
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'sqlite').lower()
+SHARED_STATE_PATH = os.environ.get('SHARED_STATE_PATH', os.path.join('data', 'shared_state.db'))
+
+# Trabajos terminados se conservan este tiempo para consultas de estado
+JOB_RETENTION_SECONDS = 24 * 3600
+
+# Latido de un trabajo en curso; sin latido por JOB_STALE_SECONDS queda huérfano
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = 120
+
+JOB_FIELDS = ('id', 'kind', 'status', 'total', 'done', 'failed', 'owner', 'result',
+              'created_at', 'updated_at')
+
+
+def _job_status(job: Dict, now: float) -> Dict:
+    """Copia del trabajo; 'running' sin latido reciente se reporta como 'orphaned'"""
+    job = dict(job)
+    if job['status'] == 'running' and job['updated_at'] < now - JOB_STALE_SECONDS:
+        job['status'] = 'orphaned'
+    return job
+
+
+# Límite duro de claves en memoria; las más antiguas (LRU) se descartan primero
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+
+# Cada cuánto se barren claves inactivas (segundos)
+RATE_LIMIT_SWEEP_INTERVAL = 60
+
+
+def sliding_window_counter(state: Optional[Tuple[float, int, int]], max_requests: int,
+                           window: int, now: float, consume: bool):
+    """
+    Rate limiting por contador de ventana deslizante (O(1) de memoria por clave)
+
+    En vez de guardar cada timestamp se guardan dos contadores: la ventana fija
+    actual y la anterior. La cantidad de peticiones en los últimos `window`
+    segundos se estima ponderando la ventana anterior por la fracción que aún se
+    solapa con la ventana deslizante.
+
+    Args:
+        state: (window_start, previous_count, current_count) o None si la clave es nueva
+        consume: True para registrar la petición si está permitida, False solo consulta
+
+    Returns:
+        (allowed, new_state, status) donde status tiene limit/remaining/reset_time/current_requests
+    """
+    current_start = math.floor(now / window) * window
+    previous_count = current_count = 0
+
+    if state is not None:
+        window_start, stored_previous, stored_current = state
+        if window_start == current_start:
+            previous_count, current_count = stored_previous, stored_current
+        elif window_start == current_start - window:
+            previous_count = stored_current
+
+    overlap = 1.0 - (now - current_start) / window
+    estimated = previous_count * overlap + current_count
+    allowed = estimated + 1 <= max_requests
+
+    if consume and allowed:
+        current_count += 1
+        estimated += 1
+
+    status = {
+        'limit': max_requests,
+        'remaining': max(0, int(max_requests - math.ceil(estimated - 1e-9))),
+        'reset_time': current_start + window,
+        'current_requests': int(math.ceil(estimated - 1e-9))
+    }
+    return allowed, (current_start, previous_count, current_count), status
+
+
+def _is_idle(state: Tuple[float, int, int], window: int, now: float) -> bool:
+    # Tras dos ventanas completas sin peticiones ambos contadores valen cero
+    return now >= state[0] + 2 * window
+
+
+class MemoryStateStore:
+    """
+    Backend en memoria del proceso actual (desarrollo, tests, un solo worker)
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._lock = threading.Lock()
+        # rate_key -> (window_start, previous_count, current_count, window)
+        self._limits: OrderedDict = OrderedDict()
+        self._max_keys = max_keys
+        self._last_sweep = time.time()
+        self._jobs: Dict[str, Dict] = {}
+        self._payloads: Dict[str, Optional[Dict]] = {}
+
+    def _evict(self, now: float):
+        if now - self._last_sweep >= RATE_LIMIT_SWEEP_INTERVAL:
+            self._last_sweep = now
+            idle = [key for key, entry in self._limits.items() if _is_idle(entry[:3], entry[3], now)]
+            for key in idle:
+                del self._limits[key]
+        while len(self._limits) > self._max_keys:
+            self._limits.popitem(last=False)
+
+    def rate_limit_hit(self, rate_key: str, max_requests: int, window: int,
+                       now: Optional[float] = None) -> Tuple[bool, Dict]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._limits.get(rate_key)
+            allowed, state, status = sliding_window_counter(
+                entry[:3] if entry else None, max_requests, window, now, consume=True)
+            self._limits[rate_key] = state + (window,)
+            self._limits.move_to_end(rate_key)
+            self._evict(now)
+            return allowed, status
+
+    def rate_limit_status(self, rate_key: str, max_requests: int, window: int,
+                          now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._limits.get(rate_key)
+        return sliding_window_counter(entry[:3] if entry else None, max_requests, window,
+                                      now, consume=False)[2]
+
+    def rate_limit_key_count(self) -> int:
+        with self._lock:
+            return len(self._limits)
+
+    def create_job(self, kind: str, total: int, owner: Optional[str] = None,
+                   payload: Optional[Dict] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs = {k: v for k, v in self._jobs.items()
+                          if v['status'] == 'running' or v['updated_at'] > now - JOB_RETENTION_SECONDS}
+            self._jobs[job_id] = {
+                'id': job_id, 'kind': kind, 'status': 'running', 'total': total,
+                'done': 0, 'failed': 0, 'owner': owner, 'result': None,
+                'created_at': now, 'updated_at': now
+            }
+            self._payloads[job_id] = payload
+        return job_id
+
+    def update_job(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update({k: v for k, v in fields.items() if k in JOB_FIELDS})
+                job['updated_at'] = time.time()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _job_status(job, time.time()) if job else None
+
+    def claim_job(self, job_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        now = time.time() if now is None else now
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or _job_status(job, now)['status'] != 'orphaned':
+                return None
+            job['updated_at'] = now
+            return self._payloads.get(job_id)
+
+
+class SQLiteStateStore:
+    """
+    Backend SQLite compartido entre procesos
+
+    Cada operación de rate limiting corre en una transacción IMMEDIATE, por lo que
+    dos workers no pueden admitir la misma petición sobre el límite.
+    """
+
+    def __init__(self, db_path: str = SHARED_STATE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso (no se comparten tras fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        # Reemplazada por rate_limits (un registro de tamaño fijo por clave)
+        conn.execute("DROP TABLE IF EXISTS rate_limit_hits")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                rate_key TEXT PRIMARY KEY,
+                window_start REAL NOT NULL,
+                previous_count INTEGER NOT NULL,
+                current_count INTEGER NOT NULL,
+                expires_at REAL NOT NULL -- momento en que la clave queda inactiva
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits(expires_at)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total INTEGER DEFAULT 0,
+                done INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                owner TEXT,
+                result TEXT, -- JSON
+                payload TEXT, -- JSON con la entrada del trabajo (para reanudarlo)
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL -- también el latido mientras corre
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'payload' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN payload TEXT')
+
+    def rate_limit_hit(self, rate_key: str, max_requests: int, window: int,
+                       now: Optional[float] = None) -> Tuple[bool, Dict]:
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT window_start, previous_count, current_count FROM rate_limits WHERE rate_key = ?",
+                (rate_key,)
+            ).fetchone()
+            allowed, state, status = sliding_window_counter(row, max_requests, window, now, consume=True)
+            conn.execute('''
+                INSERT OR REPLACE INTO rate_limits
+                (rate_key, window_start, previous_count, current_count, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (rate_key, state[0], state[1], state[2], state[0] + 2 * window))
+            self._evict(conn, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, status
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if now - getattr(self._local, 'last_sweep', 0) >= RATE_LIMIT_SWEEP_INTERVAL:
+            self._local.last_sweep = now
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+
+    def rate_limit_status(self, rate_key: str, max_requests: int, window: int,
+                          now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        row = self._connect().execute(
+            "SELECT window_start, previous_count, current_count FROM rate_limits WHERE rate_key = ?",
+            (rate_key,)
+        ).fetchone()
+        return sliding_window_counter(row, max_requests, window, now, consume=False)[2]
+
+    def rate_limit_key_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+    def create_job(self, kind: str, total: int, owner: Optional[str] = None,
+                   payload: Optional[Dict] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM jobs WHERE status != 'running' AND updated_at < ?",
+                     (now - JOB_RETENTION_SECONDS,))
+        conn.execute('''
+            INSERT INTO jobs (id, kind, status, total, owner, payload, created_at, updated_at)
+            VALUES (?, ?, 'running', ?, ?, ?, ?, ?)
+        ''', (job_id, kind, total, owner, json.dumps(payload, default=str), now, now))
+        return job_id
+
+    def update_job(self, job_id: str, **fields):
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS and k != 'id'}
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'], default=str)
+        fields['updated_at'] = time.time()
+        set_clause = ', '.join(f'{column} = ?' for column in fields)
+        self._connect().execute(f'UPDATE jobs SET {set_clause} WHERE id = ?',
+                                list(fields.values()) + [job_id])
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        if job['result']:
+            job['result'] = json.loads(job['result'])
+        return _job_status(job, time.time())
+
+    def claim_job(self, job_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Solo un worker gana: el UPDATE renueva el latido que usa la condición
+            claimed = conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running' AND updated_at < ?",
+                (now, job_id, now - JOB_STALE_SECONDS)
+            ).rowcount
+            row = conn.execute('SELECT payload FROM jobs WHERE id = ?', (job_id,)).fetchone() if claimed else None
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return json.loads(row[0]) if row and row[0] else None
+
+
+@contextmanager
+def job_heartbeat(job_id: str, interval: float = JOB_HEARTBEAT_SECONDS):
+    """Mantiene vivo el trabajo mientras dura el bloque (un hilo renueva updated_at)"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            get_state_store().update_job(job_id)
+
+    threading.Thread(target=beat, name=f'job-heartbeat-{job_id[:8]}', daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """Retorna el backend de estado compartido configurado (singleton por proceso)"""
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                if SHARED_STATE_BACKEND == 'memory':
+                    _state_store = MemoryStateStore()
+                else:
+                    _state_store = SQLiteStateStore(SHARED_STATE_PATH)
+    return _state_store
@@ -0,0 +1,144 @@
+// Global library selectors loaded on demand
+// Instead of embedding the whole global catalog in every page, selects marked with
+// data-global-library-select fetch pages from /api/global-libraries/search when they
+// are first used. An <input data-global-library-search="select-id"> filters by prefix.
+
+(function() {
+    const ENDPOINT = '/api/global-libraries/search';
+    const PAGE_SIZE = 50;
+    const MORE_VALUE = '__more__';
+
+    // Responses per (prefix, offset), shared by every selector on the page
+    const pages = new Map();
+
+    function fetchPage(prefix, offset) {
+        const key = prefix + '\u0000' + offset;
+        if (!pages.has(key)) {
+            const params = new URLSearchParams({ q: prefix, offset: offset, limit: PAGE_SIZE });
+            const request = fetch(`${ENDPOINT}?${params}`, {
+                credentials: 'same-origin',
+                headers: { 'Accept': 'application/json' }
+            }).then(function(response) {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            }).catch(function(error) {
+                pages.delete(key);
+                throw error;
+            });
+            pages.set(key, request);
+        }
+        return pages.get(key);
+    }
+
+    function optionFor(library) {
+        const option = document.createElement('option');
+        option.value = library.id;
+        option.textContent = `${library.library_name} (${(library.type || '').toUpperCase()})`;
+        option.setAttribute('data-name', library.library_name);
+        option.setAttribute('data-type', library.type || '');
+        option.setAttribute('data-safe-version', library.latest_safe_version || '');
+        option.setAttribute('data-latest-version', library.latest_version || '');
+        return option;
+    }
+
+    function render(select, page, append) {
+        const more = select.querySelector(`option[value="${MORE_VALUE}"]`);
+        if (more) {
+            more.remove();
+        }
+        if (!append) {
+            // Keep the empty option and the current selection
+            Array.from(select.options).forEach(function(option) {
+                if (option.value && option.value !== select.value) {
+                    option.remove();
+                }
+            });
+        }
+        const present = new Set(Array.from(select.options).map(option => option.value));
+        page.items.forEach(function(library) {
+            if (!present.has(String(library.id))) {
+                select.appendChild(optionFor(library));
+            }
+        });
+        const loaded = page.offset + page.items.length;
+        if (loaded < page.total) {
+            const option = document.createElement('option');
+            option.value = MORE_VALUE;
+            option.textContent = `Cargar más (${page.total - loaded} restantes)...`;
+            select.appendChild(option);
+        }
+        select.dataset.nextOffset = loaded;
+    }
+
+    function load(select, prefix, offset) {
+        select.dataset.prefix = prefix;
+        return fetchPage(prefix, offset).then(function(page) {
+            // A newer search may have started meanwhile
+            if (select.dataset.prefix === prefix) {
+                render(select, page, offset > 0);
+            }
+        }).catch(function(error) {
+            console.error('Error loading global libraries:', error);
+        });
+    }
+
+    function ensureLoaded(select) {
+        if (select.dataset.nextOffset === undefined) {
+            load(select, select.dataset.prefix || '', 0);
+        }
+    }
+
+    function attachSelect(select) {
+        select.addEventListener('focus', function() { ensureLoaded(select); });
+        select.addEventListener('mousedown', function() { ensureLoaded(select); });
+        // Capture phase: the page handlers never see the "load more" option selected
+        select.addEventListener('change', function(event) {
+            if (select.value === MORE_VALUE) {
+                event.stopImmediatePropagation();
+                select.value = select.dataset.previousValue || '';
+                load(select, select.dataset.prefix || '', Number(select.dataset.nextOffset));
+            } else {
+                select.dataset.previousValue = select.value;
+            }
+        }, true);
+    }
+
+    function attachSearch(input) {
+        const select = document.getElementById(input.dataset.globalLibrarySearch);
+        if (!select) {
+            return;
+        }
+        let timer = null;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() { load(select, input.value.trim(), 0); }, 200);
+        });
+        input.addEventListener('keydown', function(event) {
+            // Enter filters, it does not submit the surrounding form
+            if (event.key === 'Enter') {
+                event.preventDefault();
+                clearTimeout(timer);
+                load(select, input.value.trim(), 0);
+            }
+        });
+    }
+
+    // Select a library that may not be among the loaded options (edit modal)
+    function setValue(select, library) {
+        const id = library && library.id ? String(library.id) : '';
+        if (id && !Array.from(select.options).some(option => option.value === id)) {
+            select.appendChild(optionFor(library));
+        }
+        select.value = id;
+        select.dataset.previousValue = id;
+    }
+
+    window.GlobalLibrarySelect = { load: load, setValue: setValue };
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('select[data-global-library-select]').forEach(attachSelect);
+        document.querySelectorAll('input[data-global-library-search]').forEach(attachSearch);
+    });
+})();
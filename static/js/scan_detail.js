@@ -221,6 +221,8 @@ document.addEventListener('DOMContentLoaded', function() {
         const libSafeVersion = button.getAttribute('data-lib-safe-version');
         const libLatestVersion = button.getAttribute('data-lib-latest-version');
         const libGlobalId = button.getAttribute('data-lib-global-id');
+        const libGlobalName = button.getAttribute('data-lib-global-name');
+        const libGlobalType = button.getAttribute('data-lib-global-type');
         
         // Populate form fields
         document.getElementById('edit_library_name').value = libName;
@@ -230,7 +232,9 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('edit_description').value = libDescription;
         document.getElementById('edit_latest_safe_version').value = libSafeVersion;
         document.getElementById('edit_latest_version').value = libLatestVersion;
-        document.getElementById('edit_global_library_id').value = libGlobalId;
+        // The catalog options load on demand: add the current association if missing
+        GlobalLibrarySelect.setValue(document.getElementById('edit_global_library_id'),
+            libGlobalId ? { id: libGlobalId, library_name: libGlobalName, type: libGlobalType } : null);
         
         // Update form action
         document.getElementById('editLibraryForm').action = '/edit-library/' + libId;
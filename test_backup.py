@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de backup.py: instantáneas, respaldos incrementales y restauración
+
+Trabaja sobre una base SQLite en modo WAL en un directorio temporal:
+
+    python test_backup.py
+    python -m pytest -q test_backup.py
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import backup
+
+
+@contextmanager
+def wal_database():
+    """(directorio temporal, ruta de una base WAL con una tabla de escaneos de prueba)"""
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-backup-')
+    db_path = os.path.join(workdir, 'analysis.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE scans (id INTEGER PRIMARY KEY, url TEXT, title TEXT)')
+    conn.executemany('INSERT INTO scans (url, title) VALUES (?, ?)',
+                     [(f'https://backup.example/{n}', 'x' * 200) for n in range(2000)])
+    conn.commit()
+    conn.close()
+    try:
+        yield workdir, db_path
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*), MAX(id), SUM(LENGTH(title)) FROM scans').fetchone()
+    finally:
+        conn.close()
+
+
+def test_snapshot_is_consistent():
+    """La instantánea incluye lo confirmado en el WAL, no lo pendiente, y es un archivo autocontenido"""
+    with wal_database() as (workdir, db_path):
+        writer = sqlite3.connect(db_path)
+        writer.execute("INSERT INTO scans (url, title) VALUES ('https://backup.example/wal', 'confirmado')")
+        writer.commit()  # queda en el WAL, sin checkpoint
+        writer.execute("INSERT INTO scans (url, title) VALUES ('https://backup.example/pendiente', 'sin confirmar')")
+
+        path = backup.create_snapshot(db_path, directory=workdir)
+        writer.rollback()
+        writer.close()
+        conn = sqlite3.connect(path)
+        titles = [row[0] for row in conn.execute("SELECT title FROM scans WHERE url LIKE '%/wal' OR url LIKE '%/pendiente'")]
+        journal = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        integrity = conn.execute('PRAGMA quick_check').fetchone()[0]
+        conn.close()
+        with open(path, 'rb') as f:
+            original = f.read()
+        streamed = gzip.decompress(b''.join(backup.stream_file(path, compress=True, remove=True, chunk_size=4096)))
+        removed = not os.path.exists(path)
+
+    ok = (titles == ['confirmado'] and journal == 'delete' and integrity == 'ok'
+          and streamed == original and removed)
+    print(f"{'✅' if ok else '❌'} Instantánea consistente en modo WAL ({integrity}, journal {journal})")
+    assert ok, f'títulos {titles}, journal {journal}, integridad {integrity}, gzip igual {streamed == original}, borrada {removed}'
+
+
+def test_incremental_restore_passes_quick_check():
+    """Cada punto de la cadena (completo e incrementales) se restaura con quick_check 'ok' y sus datos"""
+    failures = []
+    with wal_database() as (workdir, db_path):
+        backup_dir = os.path.join(workdir, 'backups')
+        points = []
+        conn = sqlite3.connect(db_path)
+        for step in range(3):
+            result = backup.run_backup(db_path, backup_dir, full_every=5, keep_chains=2)
+            points.append((result, rows(db_path)))
+            # Cambio pequeño: un incremental solo lleva las páginas tocadas
+            conn.execute('UPDATE scans SET title = ? WHERE id BETWEEN ? AND ?', (f'paso {step}', step * 10 + 1, step * 10 + 5))
+            conn.execute("INSERT INTO scans (url, title) VALUES ('https://backup.example/nuevo', 'nuevo')")
+            conn.commit()
+        conn.execute('DELETE FROM scans WHERE id > 1000')
+        conn.commit()
+        conn.execute('VACUUM')  # la base se achica: el incremental trunca el archivo
+        conn.close()
+        points.append((backup.run_backup(db_path, backup_dir, full_every=5, keep_chains=2), rows(db_path)))
+
+        kinds = [result['kind'] for result, _ in points]
+        if kinds != ['full', 'incremental', 'incremental', 'incremental']:
+            failures.append(f'tipos de respaldo {kinds}')
+        total_pages = points[0][0]['pages']
+        if not 0 < points[1][0]['pages'] < total_pages / 4:
+            failures.append(f"el incremental copió {points[1][0]['pages']} de {total_pages} páginas")
+
+        for n, (result, expected) in enumerate(points):
+            dest = os.path.join(workdir, f'restaurada-{n}.db')
+            restored = backup.restore(os.path.join(backup_dir, result['file']), dest)
+            if restored['integrity'] != 'ok':
+                failures.append(f"{result['file']}: quick_check {restored['integrity']}")
+            if len(restored['applied']) != n + 1:
+                failures.append(f"{result['file']}: aplicó {restored['applied']}")
+            if rows(dest) != expected:
+                failures.append(f"{result['file']}: restaurada {rows(dest)}, esperada {expected}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Restauración de la cadena completa e incrementales")
+    assert not failures, '; '.join(failures)
+
+
+def test_restore_requires_full_backup():
+    """Sin el completo de su cadena, restore falla en vez de producir una base parcial"""
+    with wal_database() as (workdir, db_path):
+        backup_dir = os.path.join(workdir, 'backups')
+        backup.run_backup(db_path, backup_dir)
+        delta = backup.run_backup(db_path, backup_dir)['file']
+        for name in os.listdir(backup_dir):
+            if name.endswith('-full.db.gz'):
+                os.remove(os.path.join(backup_dir, name))
+        try:
+            backup.restore(os.path.join(backup_dir, delta), os.path.join(workdir, 'restaurada.db'))
+            raised = False
+        except FileNotFoundError:
+            raised = True
+    print(f"{'✅' if raised else '❌'} restore sin respaldo completo")
+    assert raised, 'restore no falló sin el respaldo completo'
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de backup.py...\n")
+    results = {
+        'Instantánea WAL': run(test_snapshot_is_consistent),
+        'Restauración incremental': run(test_incremental_restore_passes_quick_check),
+        'Sin respaldo completo': run(test_restore_requires_full_backup),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
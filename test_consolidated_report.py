@@ -5,6 +5,7 @@ Script de prueba para el reporte consolidado de proyecto
 
 import dashboard
 import sqlite3
+from storage import insert_scan
 
 def test_project_consolidated_data():
     """Prueba la función get_project_consolidated_data"""
@@ -35,12 +36,9 @@ def test_project_consolidated_data():
         print("⚠️ No hay escaneos revisados en este proyecto. Creando un escaneo de prueba...")
         # Crear un escaneo de prueba
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO scans (url, scan_date, status_code, title, headers, project_id, reviewed)
-            VALUES (?, datetime('now'), 200, 'Test Page', '{}', ?, 1)
-        ''', ('https://test.example.com', project['id']))
-        
-        scan_id = cursor.lastrowid
+        # insert_scan: cursor.lastrowid no sirve a través de la vista scans
+        scan_id = insert_scan(cursor, 'https://test.example.com', 200, 'Test Page', '{}',
+                              project_id=project['id'], reviewed=1)
         
         # Agregar una biblioteca de prueba
         cursor.execute('''
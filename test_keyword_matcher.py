@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de keyword_matcher.py: una pasada de regex equivale a buscar cada palabra
+
+    python test_keyword_matcher.py
+    python -m pytest -q test_keyword_matcher.py
+"""
+
+import random
+
+from keyword_matcher import KeywordMatcher
+
+CATEGORIES = {
+    'cms': ['wp-content', 'wordpress', 'drupal', 'joomla'],
+    'shop': ['cart', 'carrito', 'checkout', 'shop'],
+    'login': ['login', 'log', 'sign in', 'iniciar sesión'],
+    'prefix': ['wp', 'car'],
+}
+
+
+def expected_categories(categories, text, limit=None):
+    """Referencia: any(palabra in texto) por categoría, como hacía analyzer.py"""
+    sample = (text if limit is None else text[:limit]).lower()
+    return {category for category, keywords in categories.items()
+            if any(keyword.lower() in sample for keyword in keywords)}
+
+
+def test_matches_naive_search():
+    """Mismo resultado que la búsqueda palabra por palabra, incluidas las palabras prefijo y solapadas"""
+    matcher = KeywordMatcher(CATEGORIES)
+    cases = [
+        '',
+        'Carrito de compras',              # 'car' es prefijo de 'carrito'
+        'https://example.com/wp-content/', # 'wp' es prefijo de 'wp-content'
+        'WORDPRESS Login',                 # mayúsculas
+        'catalog blog',                    # 'log' dentro de otras palabras
+        'cacart',                          # coincidencia que empieza dentro de otra
+        'Iniciar Sesión para el checkout',
+    ]
+    rng = random.Random(42)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz -/'
+    words = [keyword for keywords in CATEGORIES.values() for keyword in keywords]
+    for _ in range(300):
+        parts = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(4)]
+        parts += rng.sample(words, rng.randint(0, 2))
+        rng.shuffle(parts)
+        cases.append(''.join(parts))
+
+    failures = [(text, matcher.match(text), expected_categories(CATEGORIES, text))
+                for text in cases if matcher.match(text) != expected_categories(CATEGORIES, text)]
+    print(f"{'✅' if not failures else '❌'} KeywordMatcher igual a la búsqueda ingenua en {len(cases)} textos")
+    assert not failures, f'diferencias: {failures[:5]}'
+
+
+def test_limit_and_categories():
+    """`limit` corta el texto antes de buscar y `categories` lista todas las categorías"""
+    matcher = KeywordMatcher(CATEGORIES)
+    text = 'x' * 100 + 'drupal'
+    ok = (matcher.match(text, limit=100) == set()
+          and matcher.match(text, limit=106) == {'cms'}
+          and matcher.match(text) == expected_categories(CATEGORIES, text)
+          and matcher.categories == frozenset(CATEGORIES)
+          and KeywordMatcher({}).match('login') == set())
+    print(f"{'✅' if ok else '❌'} Límite de caracteres y categorías")
+    assert ok, 'límite o categorías incorrectos'
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de keyword_matcher.py...\n")
+    results = {
+        'Búsqueda ingenua': run(test_matches_naive_search),
+        'Límite y categorías': run(test_limit_and_categories),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
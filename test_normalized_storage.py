@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de normalized_storage.py: migración, vistas y triggers INSTEAD OF
+
+Cada prueba parte de una base en memoria con las tablas antiguas (texto completo
+en cada fila) y la migra con ensure_normalized_storage:
+
+    python test_normalized_storage.py
+    python -m pytest -q test_normalized_storage.py
+"""
+
+import sqlite3
+
+import normalized_storage as ns
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE scans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT NOT NULL,
+        scan_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status_code INTEGER,
+        title TEXT,
+        headers TEXT,
+        reviewed INTEGER DEFAULT 0
+    );
+    CREATE TABLE libraries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id INTEGER,
+        library_name TEXT NOT NULL,
+        version TEXT,
+        type TEXT,
+        source_url TEXT,
+        is_manual INTEGER DEFAULT 0
+    );
+    CREATE TABLE version_strings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id INTEGER,
+        file_url TEXT NOT NULL,
+        file_type TEXT,
+        line_number INTEGER,
+        line_content TEXT,
+        version_keyword TEXT
+    );
+    CREATE TABLE file_urls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id INTEGER,
+        file_url TEXT NOT NULL,
+        file_type TEXT,
+        file_size INTEGER,
+        status_code INTEGER
+    );
+    CREATE INDEX idx_file_urls_url ON file_urls (file_url);
+'''
+
+SITE = 'https://normalizado.example/'
+# Mismo sitio, distinta respuesta: solo cambian los headers volátiles
+HEADERS = ['{"Server":"nginx","Date":"Mon, 05 Jan 2026 10:00:00 GMT","Set-Cookie":"a=1"}',
+           '{"Server":"nginx","Date":"Tue, 06 Jan 2026 10:00:00 GMT","Set-Cookie":"a=2"}']
+
+
+def legacy_database():
+    """Base en memoria con el esquema anterior a la normalización"""
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(LEGACY_SCHEMA)
+    return conn
+
+
+def snapshot(conn):
+    """Filas de las cuatro tablas/vistas, comparables antes y después de migrar"""
+    return {view: conn.execute(f'SELECT * FROM {view} ORDER BY id').fetchall() for view in ns.DATA_TABLES}
+
+
+def test_migration_preserves_rows():
+    """La migración conserva ids, texto, headers byte a byte y la secuencia de AUTOINCREMENT"""
+    conn = legacy_database()
+    for n, headers in enumerate(HEADERS + ['{"server": "apache"}', 'no es JSON']):
+        conn.execute('INSERT INTO scans (url, status_code, title, headers, reviewed) VALUES (?, 200, ?, ?, ?)',
+                     (SITE, f'Escaneo {n}', headers, n % 2))
+        conn.execute('INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code) VALUES (?, ?, ?, ?, ?)',
+                     (n + 1, SITE + 'app.js', 'js', 100 + n, 200))
+        conn.execute('''INSERT INTO version_strings (scan_id, file_url, file_type, line_number, line_content, version_keyword)
+                        VALUES (?, ?, 'js', 1, 'v1.0.0', 'version')''', (n + 1, SITE + 'app.js'))
+        conn.execute("INSERT INTO libraries (scan_id, library_name, version, type, source_url) VALUES (?, 'jquery', '3.5.1', 'js', ?)",
+                     (n + 1, None if n == 3 else SITE + 'jquery.js'))
+    conn.execute('DELETE FROM scans WHERE id = 4')  # la secuencia queda en 4
+    conn.commit()
+    before = snapshot(conn)
+
+    migrated = ns.ensure_normalized_storage(conn, vacuum=False)
+    after = snapshot(conn)
+    next_id = ns.insert_scan(conn.cursor(), SITE, 200, 'Nuevo', HEADERS[0])
+    urls = conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+    blobs = conn.execute('SELECT COUNT(*) FROM header_blobs').fetchone()[0]
+    second_run = ns.ensure_normalized_storage(conn, vacuum=False)
+
+    # app.js y jquery.js; los dos primeros escaneos comparten sus headers estables
+    ok = migrated and not second_run and before == after and next_id == 5 and urls == 2 and blobs == 2
+    print(f"{'✅' if ok else '❌'} Migración: filas idénticas, {urls} URLs y {blobs} headers únicos")
+    assert ok, f'migrada {migrated}, segunda {second_run}, iguales {before == after}, id {next_id}, urls {urls}, blobs {blobs}'
+
+
+def test_views_round_trip():
+    """INSERT, UPDATE y DELETE a través de las vistas llegan a las tablas *_data"""
+    conn = legacy_database()
+    ns.ensure_normalized_storage(conn, vacuum=False)
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            failures.append(message)
+
+    cursor = conn.cursor()
+    first = ns.insert_scan(cursor, SITE, 200, 'Primero', HEADERS[0], reviewed=1)
+    second = ns.insert_scan(cursor, SITE, 200, 'Segundo', {'Server': 'nginx', 'Date': 'Wed', 'Set-Cookie': 'a=3'})
+    # INSERT directo a la vista: headers sin deduplicar y columnas por defecto
+    conn.execute('INSERT INTO scans (url, status_code, title, headers) VALUES (?, 200, ?, ?)',
+                 (SITE, 'Por la vista', HEADERS[1]))
+    third = conn.execute('SELECT MAX(id) FROM scans').fetchone()[0]
+
+    rows = {row[0]: row[1:] for row in conn.execute('SELECT id, headers, reviewed, scan_date FROM scans')}
+    check(rows[first][0] == HEADERS[0], f'headers de insert_scan alterados: {rows[first][0]}')
+    check(rows[second][0] == '{"Server":"nginx","Date":"Wed","Set-Cookie":"a=3"}', 'headers de un dict alterados')
+    check(rows[third][0] == HEADERS[1], 'headers insertados por la vista alterados')
+    check(rows[first][1] == 1 and rows[third][1] == 0, 'reviewed o su DEFAULT no llegan a scans_data')
+    check(rows[third][2] is not None, 'scan_date sin DEFAULT al insertar por la vista')
+    check(conn.execute('SELECT COUNT(*) FROM header_blobs').fetchone()[0] == 1,
+          'los headers estables del mismo sitio no se comparten')
+
+    # La vista guarda el texto completo; compact_headers lo deduplica sin cambiarlo
+    check(ns.compact_headers(conn) == 1, 'compact_headers no compactó el escaneo insertado por la vista')
+    check(conn.execute('SELECT headers FROM scans WHERE id = ?', (third,)).fetchone()[0] == HEADERS[1],
+          'compact_headers alteró los headers')
+
+    conn.execute('INSERT INTO file_urls (scan_id, file_url, file_type) VALUES (?, ?, ?)', (first, SITE + 'a.js', 'js'))
+    conn.execute('INSERT INTO file_urls (scan_id, file_url, file_type) VALUES (?, ?, ?)', (second, SITE + 'a.js', 'js'))
+    check(conn.execute('SELECT COUNT(DISTINCT url_id) FROM file_urls_data').fetchone()[0] == 1,
+          'la misma URL de archivo no se comparte entre escaneos')
+
+    conn.execute('UPDATE file_urls SET file_url = ?, file_size = 10 WHERE scan_id = ?', (SITE + 'b.js', second))
+    conn.execute('UPDATE scans SET title = ?, reviewed = 1 WHERE id = ?', ('Renombrado', third))
+    check(conn.execute('SELECT file_url, file_size FROM file_urls WHERE scan_id = ?', (second,)).fetchone()
+          == (SITE + 'b.js', 10), 'UPDATE de file_url por la vista no se aplicó')
+    check(conn.execute('SELECT title, reviewed, headers FROM scans WHERE id = ?', (third,)).fetchone()
+          == ('Renombrado', 1, HEADERS[1]), 'UPDATE por la vista scans no se aplicó o alteró los headers')
+
+    conn.execute('DELETE FROM file_urls WHERE scan_id = ?', (first,))
+    conn.execute('DELETE FROM scans WHERE id = ?', (first,))
+    check(conn.execute('SELECT COUNT(*) FROM scans_data WHERE id = ?', (first,)).fetchone()[0] == 0,
+          'DELETE por la vista no borra de scans_data')
+    pruned = ns.prune_dictionaries(conn)
+    check(pruned['urls'] == 1 and conn.execute('SELECT url FROM urls').fetchall() == [(SITE + 'b.js',)],
+          f'prune_dictionaries: {pruned}')
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} INSERT/UPDATE/DELETE a través de las vistas")
+    assert not failures, '; '.join(failures)
+
+
+def test_headers_kept_verbatim():
+    """Headers que json_patch no reconstruiría byte a byte se guardan tal cual"""
+    conn = legacy_database()
+    ns.ensure_normalized_storage(conn, vacuum=False)
+    cursor = conn.cursor()
+    samples = [
+        '{"Server": "nginx", "Date": "Mon"}',   # separadores con espacios
+        '{"Date":"Mon","Date":"Tue"}',           # claves duplicadas
+        '{"Server":"nginx","ETag":null}',        # un null volátil lo borraría json_patch
+        '[1, 2]',
+        None,
+    ]
+    stored = []
+    for headers in samples:
+        scan_id = ns.insert_scan(cursor, SITE, 200, 'Literal', headers)
+        stored.append(conn.execute('SELECT headers FROM scans WHERE id = ?', (scan_id,)).fetchone()[0])
+    ok = stored == samples
+    print(f"{'✅' if ok else '❌'} Headers sin formato compacto se conservan byte a byte")
+    assert ok, f'guardados {stored}'
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de normalized_storage.py...\n")
+    results = {
+        'Migración': run(test_migration_preserves_rows),
+        'Vistas y triggers': run(test_views_round_trip),
+        'Headers literales': run(test_headers_kept_verbatim),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
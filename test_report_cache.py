@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de report_cache.py: cuándo se sirve el reporte guardado y cuándo se regenera
+
+Las pruebas usan una base temporal creada por init_database y el constructor
+real del dashboard, contando cuántas veces se ejecuta:
+
+    python test_report_cache.py
+    python -m pytest -q test_report_cache.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import global_catalog
+import report_cache
+import storage
+
+
+@contextmanager
+def counted_reports():
+    """
+    (dashboard, proyecto, escaneos, construcciones, reconstrucciones encoladas)
+    sobre una base temporal con un proyecto de dos escaneos, el primero revisado
+    """
+    import dashboard
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-report-cache-')
+    previous_dir = os.getcwd()
+    builds, scheduled = [], []
+    original_schedule = report_cache.schedule_rebuild
+
+    def counting_builder(project_id):
+        builds.append(project_id)
+        return dashboard.render_project_report(project_id)
+
+    try:
+        os.chdir(workdir)
+        dashboard.init_database()
+        conn = sqlite3.connect('analysis.db')
+        conn.execute("INSERT INTO projects (name, is_active) VALUES ('Proyecto caché', 1)")
+        project_id = conn.execute("SELECT id FROM projects WHERE name = 'Proyecto caché'").fetchone()[0]
+        cursor = conn.cursor()
+        scan_ids = [storage.insert_scan(cursor, f'https://cache{n}.example/', 200, f'Sitio {n}', '{}',
+                                        project_id=project_id, reviewed=int(n == 0)) for n in range(2)]
+        conn.commit()
+        conn.close()
+
+        # Sin hilo de reconstrucción: cada construcción ocurre en la petición y se puede contar
+        report_cache.schedule_rebuild = lambda project_ids: scheduled.extend(project_ids)
+        report_cache.set_report_builder(counting_builder, dashboard._project_report_format())
+        yield dashboard, project_id, scan_ids, builds, scheduled
+    finally:
+        report_cache.schedule_rebuild = original_schedule
+        report_cache.set_report_builder(dashboard.render_project_report, dashboard._project_report_format())
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_review_invalidates_report():
+    """El reporte se sirve de la caché hasta que un escaneo del proyecto se revisa desde el dashboard"""
+    failures = []
+    with counted_reports() as (dashboard, project_id, scan_ids, builds, scheduled):
+        app = dashboard.app
+        csrf = app.config.get('WTF_CSRF_ENABLED', True)
+        app.config['WTF_CSRF_ENABLED'] = False
+        try:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = 1
+                session['username'] = 'analista'
+                session['user_role'] = 'analyst'
+
+            for _ in range(2):
+                response = client.get(f'/report/project/{project_id}')
+            if response.status_code != 200 or b'cache0.example' not in response.data or len(builds) != 1:
+                failures.append(f'visitas repetidas: estado {response.status_code}, {len(builds)} construcciones')
+
+            client.post(f'/toggle-reviewed/{scan_ids[1]}')
+            if project_id not in scheduled:
+                failures.append('revisar un escaneo no encola la reconstrucción')
+            response = client.get(f'/report/project/{project_id}')
+            if b'cache1.example' not in response.data or len(builds) != 2:
+                failures.append(f'tras revisar: {len(builds)} construcciones, escaneo nuevo presente '
+                                f'{b"cache1.example" in response.data}')
+            client.get(f'/report/project/{project_id}')
+            if len(builds) != 2:
+                failures.append('el reporte regenerado no quedó en la caché')
+        finally:
+            app.config['WTF_CSRF_ENABLED'] = csrf
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Caché del reporte invalidada al revisar un escaneo")
+    assert not failures, '; '.join(failures)
+
+
+def test_watermark_covers_other_writers():
+    """Escaneos revisados escritos sin invalidar (analyzer.py) y cambios del catálogo también regeneran"""
+    failures = []
+    with counted_reports() as (dashboard, project_id, scan_ids, builds, scheduled):
+        report = report_cache.get_project_report(project_id)
+        report_cache.get_project_report(project_id)
+        if report['scan_count'] != 1 or len(builds) != 1:
+            failures.append(f"inicial: {report['scan_count']} escaneos, {len(builds)} construcciones")
+
+        conn = sqlite3.connect('analysis.db')
+        storage.insert_scan(conn.cursor(), 'https://cache2.example/', 200, 'Sitio 2', '{}',
+                            project_id=project_id, reviewed=1)
+        conn.commit()
+        report = report_cache.get_project_report(project_id)
+        if report['scan_count'] != 2 or len(builds) != 2:
+            failures.append(f"escaneo revisado sin invalidar: {report['scan_count']} escaneos, {len(builds)} construcciones")
+
+        # Un escaneo sin revisar no cambia el reporte
+        storage.insert_scan(conn.cursor(), 'https://cache3.example/', 200, 'Sitio 3', '{}', project_id=project_id)
+        conn.commit()
+        report_cache.get_project_report(project_id)
+        if len(builds) != 2:
+            failures.append('un escaneo sin revisar regeneró el reporte')
+
+        global_catalog.bump_catalog_version(conn)
+        conn.commit()
+        conn.close()
+        report_cache.get_project_report(project_id)
+        if len(builds) != 3:
+            failures.append('un cambio del catálogo global no regeneró el reporte')
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Watermark: escaneos revisados externos y catálogo")
+    assert not failures, '; '.join(failures)
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de report_cache.py...\n")
+    results = {
+        'Revisión de escaneos': run(test_review_invalidates_report),
+        'Watermark': run(test_watermark_covers_other_writers),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de retention.py: qué se archiva, qué se conserva y qué se resume
+
+Cada prueba trabaja sobre una base temporal creada por init_database:
+
+    python test_retention.py
+    python -m pytest -q test_retention.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import retention
+import scan_metrics
+import storage
+
+OLD = '2020-01-{:02d} 10:00:00'
+
+
+@contextmanager
+def fresh_database():
+    """Directorio temporal con analysis.db recién creada; retorna la ruta de la base"""
+    import dashboard
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-retention-')
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        dashboard.init_database()
+        yield os.path.join(workdir, 'analysis.db')
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def add_scans(conn, url, count, project_id=None, reviewed=()):
+    """`count` escaneos antiguos de url (uno por día); reviewed = posiciones (0..count-1) revisadas"""
+    cursor = conn.cursor()
+    scan_ids = []
+    for n in range(count):
+        scan_id = storage.insert_scan(cursor, url, 200, f'Escaneo {n}', '{}', project_id=project_id,
+                                      scan_date=OLD.format(n + 1), reviewed=int(n in reviewed))
+        cursor.execute('INSERT INTO libraries (scan_id, library_name, version, type) VALUES (?, ?, ?, ?)',
+                       (scan_id, 'jquery', '3.5.1', 'js'))
+        scan_ids.append(scan_id)
+    conn.commit()
+    return scan_ids
+
+
+def test_keeps_latest_reviewed_scan():
+    """El último escaneo revisado de una URL sobrevive aunque esté fuera de los últimos `keep`"""
+    import dashboard
+
+    with fresh_database() as db_path:
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO projects (name, is_active) VALUES ('Proyecto retención', 1)")
+        project_id = conn.execute("SELECT id FROM projects WHERE name = 'Proyecto retención'").fetchone()[0]
+        # Revisados el 1.º y el 2.º; después 6 re-escaneos sin revisar
+        scan_ids = add_scans(conn, 'https://retencion.example/', 8, project_id=project_id, reviewed=(0, 1))
+        conn.close()
+
+        stats = retention.run_retention(db_path, keep=2, min_age_days=0,
+                                        archive_dir=os.path.join(os.path.dirname(db_path), 'archive'), pause=0)
+
+        conn = sqlite3.connect(db_path)
+        remaining = [row[0] for row in conn.execute('SELECT id FROM scans ORDER BY id')]
+        conn.close()
+        report = dashboard.get_project_consolidated_data(project_id)
+
+    ok = stats['scans'] == 5 and remaining == [scan_ids[1]] + scan_ids[-2:]
+    ok = ok and [scan['id'] for scan in report['scans']] == [scan_ids[1]]
+    print(f"{'✅' if ok else '❌'} Retención conserva el último escaneo revisado: quedan {remaining}")
+    assert ok, f'retención: archivados {stats["scans"]}, quedan {remaining}, reporte {report["scans"]}'
+
+
+def test_archive_files_and_rollups():
+    """dry_run no cambia nada; cada mes va a su archivo con las filas completas y los resúmenes cuentan todo"""
+    headers = '{"Server":"nginx","Date":"Mon, 06 Jan 2020 10:00:00 GMT"}'
+    url = 'https://archivo.example/'
+    with fresh_database() as db_path:
+        archive_dir = os.path.join(os.path.dirname(db_path), 'archive')
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        for scan_date, version in [('2020-01-05 10:00:00', '3.4.1'), ('2020-01-20 10:00:00', '3.5.1'),
+                                   ('2020-02-03 10:00:00', '3.5.1'), ('2020-02-10 10:00:00', '3.6.0')]:
+            scan_id = storage.insert_scan(cursor, url, 200, 'Archivo', headers, scan_date=scan_date)
+            cursor.execute('INSERT INTO libraries (scan_id, library_name, version, type) VALUES (?, ?, ?, ?)',
+                           (scan_id, 'jquery', version, 'js'))
+            cursor.execute('INSERT INTO file_urls (scan_id, file_url, file_type) VALUES (?, ?, ?)',
+                           (scan_id, url + 'jquery.js', 'js'))
+        # Reciente: min_age_days lo protege aunque exceda `keep`
+        storage.insert_scan(cursor, url, 200, 'Reciente', headers)
+        conn.commit()
+        conn.close()
+
+        planned = retention.run_retention(db_path, keep=1, min_age_days=30, archive_dir=archive_dir, dry_run=True)
+        untouched = not os.path.exists(archive_dir)
+        stats = retention.run_retention(db_path, keep=1, min_age_days=30, archive_dir=archive_dir, pause=0)
+
+        files = sorted(os.listdir(archive_dir))
+        archived = {}
+        for name in files:
+            archive = sqlite3.connect(os.path.join(archive_dir, name))
+            archived[name] = (archive.execute('SELECT scan_date, headers FROM scans ORDER BY id').fetchall(),
+                              archive.execute('SELECT COUNT(*) FROM libraries').fetchone()[0],
+                              archive.execute('SELECT COUNT(*) FROM file_urls').fetchone()[0])
+            archive.close()
+        conn = sqlite3.connect(db_path)
+        remaining = [row[0] for row in conn.execute('SELECT title FROM scans')]
+        timelines = conn.execute('''SELECT version, first_seen, last_seen, scan_count FROM library_timelines
+                                    ORDER BY version''').fetchall()
+        rollup = conn.execute('SELECT first_seen, last_seen, scan_count FROM library_rollups').fetchall()
+        conn.close()
+
+    january, february = f'{retention.ARCHIVE_PREFIX}2020-01.db', f'{retention.ARCHIVE_PREFIX}2020-02.db'
+    ok = (planned['scans'] == 4 and untouched and stats['scans'] == 4 and stats['batches'] == 2
+          and files == [january, february] and remaining == ['Reciente']
+          and archived[january] == ([('2020-01-05 10:00:00', headers), ('2020-01-20 10:00:00', headers)], 2, 2)
+          and [row[0] for row in archived[february][0]] == ['2020-02-03 10:00:00', '2020-02-10 10:00:00']
+          and timelines == [('3.4.1', '2020-01-05 10:00:00', '2020-01-05 10:00:00', 1),
+                            ('3.5.1', '2020-01-20 10:00:00', '2020-02-03 10:00:00', 2),
+                            ('3.6.0', '2020-02-10 10:00:00', '2020-02-10 10:00:00', 1)]
+          and rollup == [('2020-01-05 10:00:00', '2020-02-10 10:00:00', 4)])
+    print(f"{'✅' if ok else '❌'} Archivos por mes y resúmenes de librerías ({stats['scans']} escaneos)")
+    assert ok, f'plan {planned}, stats {stats}, archivos {archived}, quedan {remaining}, timelines {timelines}, rollup {rollup}'
+
+
+def test_prometheus_counters_survive_archive():
+    """Los contadores de /metrics no bajan cuando la retención borra filas de scan_metrics"""
+    with fresh_database() as db_path:
+        conn = sqlite3.connect(db_path)
+        scan_ids = add_scans(conn, 'https://metricas.example/', 6)
+        for scan_id in scan_ids:
+            metrics = scan_metrics.ScanMetrics()
+            metrics.count('page_bytes', 1000)
+            metrics.count('files_count', 3)
+            scan_metrics.record_scan_metrics(conn, scan_id, metrics)
+        before = scan_metrics.render_prometheus(conn)
+        conn.close()
+
+        stats = retention.run_retention(db_path, keep=1, min_age_days=0,
+                                        archive_dir=os.path.join(os.path.dirname(db_path), 'archive'), pause=0)
+
+        conn = sqlite3.connect(db_path)
+        live = conn.execute('SELECT COUNT(*) FROM scan_metrics').fetchone()[0]
+        after = scan_metrics.render_prometheus(conn)
+        conn.close()
+
+    def value(text, name):
+        return [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(name + ' ')]
+
+    ok = stats['scans'] == 5 and live == 1
+    for name in ('js_analyzer_scan_duration_seconds_count', 'js_analyzer_downloaded_bytes_total{kind="page"}',
+                 'js_analyzer_http_requests_total{method="GET"}', 'js_analyzer_scan_duration_seconds_bucket{le="+Inf"}'):
+        ok = ok and value(before, name) == value(after, name) != []
+    print(f"{'✅' if ok else '❌'} Contadores de /metrics tras archivar ({live} fila viva)")
+    assert ok, f'contadores antes:\n{before}\ndespués:\n{after}'
+
+
+def test_prune_failure_releases_lease():
+    """Si la limpieza de diccionarios falla, la transacción se revierte y el lease se libera"""
+    original = retention.prune_dictionaries
+
+    def failing(conn):
+        conn.execute("DELETE FROM urls WHERE id < 0")
+        raise sqlite3.OperationalError('disk I/O error')
+
+    with fresh_database() as db_path:
+        conn = sqlite3.connect(db_path)
+        add_scans(conn, 'https://lease.example/', 3)
+        conn.close()
+        retention.prune_dictionaries = failing
+        try:
+            retention.run_retention(db_path, keep=1, min_age_days=0,
+                                    archive_dir=os.path.join(os.path.dirname(db_path), 'archive'), pause=0)
+            raised = False
+        except sqlite3.OperationalError:
+            raised = True
+        finally:
+            retention.prune_dictionaries = original
+
+        conn = sqlite3.connect(db_path)
+        lease = conn.execute("SELECT value FROM retention_state WHERE key = 'lease'").fetchone()
+        archived = conn.execute('SELECT COUNT(*) FROM scan_rollups').fetchone()[0]
+        conn.close()
+
+    ok = raised and lease is None and archived == 2
+    print(f"{'✅' if ok else '❌'} Fallo en la limpieza: lease {lease}, {archived} escaneos archivados")
+    assert ok, f'lease {lease}, archivados {archived}, excepción {raised}'
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de retention.py...\n")
+    results = {
+        'Último escaneo revisado': run(test_keeps_latest_reviewed_scan),
+        'Archivos y resúmenes': run(test_archive_files_and_rollups),
+        'Contadores de /metrics': run(test_prometheus_counters_survive_archive),
+        'Fallo en la limpieza': run(test_prune_failure_releases_lease),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
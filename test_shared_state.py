@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de shared_state.py: rate limiting y trabajos en segundo plano compartidos entre workers
+
+Las pruebas corren contra MemoryStateStore y contra SQLiteStateStore sobre un
+archivo temporal (el backend que comparten los workers de gunicorn):
+
+    python test_shared_state.py
+    python -m pytest -q test_shared_state.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import shared_state
+
+
+@contextmanager
+def state_stores():
+    """(nombre, store) de cada backend, con la base SQLite en un directorio temporal"""
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-state-')
+    try:
+        yield [('memoria', shared_state.MemoryStateStore()),
+               ('SQLite', shared_state.SQLiteStateStore(os.path.join(workdir, 'shared_state.db')))]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_rate_limit_rejects_over_limit():
+    """La petición N+1 dentro de la ventana se rechaza; otra clave y la ventana siguiente no se ven afectadas"""
+    failures = []
+    limit, window = 5, 60
+    start = 1_000_020.0  # inicio exacto de una ventana fija (múltiplo de 60)
+    with state_stores() as stores:
+        for name, store in stores:
+            hits = [store.rate_limit_hit('ip:1', limit, window, now=start + n)[0] for n in range(limit)]
+            allowed, status = store.rate_limit_hit('ip:1', limit, window, now=start + limit)
+            if not all(hits) or allowed:
+                failures.append(f'{name}: {limit} permitidas y la siguiente rechazada, obtenido {hits + [allowed]}')
+            if status['remaining'] != 0 or status['current_requests'] != limit:
+                failures.append(f'{name}: estado tras el límite {status}')
+            if not store.rate_limit_hit('ip:2', limit, window, now=start + limit)[0]:
+                failures.append(f'{name}: el límite de una clave afecta a otra')
+
+            # El rechazo no consume: la consulta sigue viendo `limit` peticiones
+            if store.rate_limit_status('ip:1', limit, window, now=start + limit)['current_requests'] != limit:
+                failures.append(f'{name}: una petición rechazada se contó')
+
+            # A mitad de la ventana siguiente la anterior pesa la mitad (5 * 0.5 = 2.5)
+            middle = start + window + window / 2
+            allowed = [store.rate_limit_hit('ip:1', limit, window, now=middle)[0] for _ in range(3)]
+            if allowed != [True, True, False]:
+                failures.append(f'{name}: ventana deslizante a mitad de camino {allowed}')
+
+            # Dos ventanas completas después el contador vuelve a cero
+            later = start + 3 * window
+            if not all(store.rate_limit_hit('ip:1', limit, window, now=later)[0] for _ in range(limit)):
+                failures.append(f'{name}: la clave no se libera tras la ventana')
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Rate limiting por ventana deslizante")
+    assert not failures, '; '.join(failures)
+
+
+def test_rate_limit_keys_are_bounded():
+    """MemoryStateStore descarta las claves menos recientes al pasar de max_keys"""
+    store = shared_state.MemoryStateStore(max_keys=3)
+    for n in range(5):
+        store.rate_limit_hit(f'ip:{n}', 1, 60, now=1_000_020.0)
+    # ip:0 fue descartada: vuelve a tener su cupo completo
+    fresh = store.rate_limit_hit('ip:0', 1, 60, now=1_000_021.0)[0]
+    limited = store.rate_limit_hit('ip:4', 1, 60, now=1_000_021.0)[0]
+    ok = store.rate_limit_key_count() == 3 and fresh and not limited
+    print(f"{'✅' if ok else '❌'} Claves de rate limiting acotadas ({store.rate_limit_key_count()} en memoria)")
+    assert ok, f'claves {store.rate_limit_key_count()}, ip:0 permitida {fresh}, ip:4 permitida {limited}'
+
+
+def test_orphaned_job_is_claimed_once():
+    """Un trabajo sin latido queda 'orphaned' y solo un worker puede reclamarlo"""
+    failures = []
+    payload = {'urls': ['https://a.example/', 'https://b.example/'], 'project_id': None}
+    with state_stores() as stores:
+        for name, store in stores:
+            job_id = store.create_job('batch_analyze', 2, owner='alice', payload=payload)
+            store.update_job(job_id, done=1)
+            now = time.time()
+            if store.get_job(job_id)['status'] != 'running':
+                failures.append(f'{name}: trabajo recién actualizado no está running')
+            if store.claim_job(job_id, now=now) is not None:
+                failures.append(f'{name}: se reclamó un trabajo con latido')
+
+            # El worker murió: sin latido por más de JOB_STALE_SECONDS
+            later = now + shared_state.JOB_STALE_SECONDS + 1
+            first = store.claim_job(job_id, now=later)
+            second = store.claim_job(job_id, now=later)
+            if first != payload:
+                failures.append(f'{name}: claim_job devolvió {first!r}')
+            if second is not None:
+                failures.append(f'{name}: el trabajo se reclamó dos veces')
+            job = store.get_job(job_id)
+            if 'payload' in job or job['done'] != 1:
+                failures.append(f'{name}: get_job expone payload o perdió el progreso: {job}')
+
+            store.update_job(job_id, status='completed')
+            if store.claim_job(job_id, now=later + 10 * shared_state.JOB_STALE_SECONDS) is not None:
+                failures.append(f'{name}: se reclamó un trabajo terminado')
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Trabajos huérfanos y claim_job")
+    assert not failures, '; '.join(failures)
+
+
+def test_stale_status_is_reported():
+    """get_job reporta 'orphaned' cuando el latido venció y 'running' mientras se renueva"""
+    failures = []
+    with state_stores() as stores:
+        for name, store in stores:
+            job_id = store.create_job('batch_analyze', 1, owner='alice')
+            if isinstance(store, shared_state.SQLiteStateStore):
+                store._connect().execute('UPDATE jobs SET updated_at = updated_at - ? WHERE id = ?',
+                                         (shared_state.JOB_STALE_SECONDS + 1, job_id))
+            else:
+                store._jobs[job_id]['updated_at'] -= shared_state.JOB_STALE_SECONDS + 1
+            if store.get_job(job_id)['status'] != 'orphaned':
+                failures.append(f'{name}: un trabajo sin latido no se reporta como orphaned')
+            store.update_job(job_id)
+            if store.get_job(job_id)['status'] != 'running':
+                failures.append(f'{name}: el latido no renueva el trabajo')
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} Estado orphaned por latido vencido")
+    assert not failures, '; '.join(failures)
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de shared_state.py...\n")
+    results = {
+        'Rate limiting': run(test_rate_limit_rejects_over_limit),
+        'Claves acotadas': run(test_rate_limit_keys_are_bounded),
+        'Trabajos huérfanos': run(test_orphaned_job_is_claimed_once),
+        'Latido vencido': run(test_stale_status_is_reported),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de storage.py: la misma API sobre SQLite y PostgreSQL
+
+SQLite se prueba sobre una base temporal. PostgreSQL solo si TEST_POSTGRES_DSN
+apunta a una base desechable (las tablas se crean y los datos de prueba se borran):
+
+    docker compose -f docker-compose-postgres.yml up -d postgres
+    TEST_POSTGRES_DSN="host=localhost dbname=ntg_analyzer user=ntg_user password=ntg_password" \\
+        python test_storage.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import global_catalog
+import storage
+
+
+def exercise_repository(backend):
+    """Ida y vuelta por las funciones de repositorio; retorna la lista de fallos"""
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            failures.append(message)
+
+    conn = backend.connect()
+    try:
+        conn.execute('INSERT INTO projects (name, is_active) VALUES (?, 1)', ('Proyecto storage',))
+        project_id = conn.execute('SELECT id FROM projects WHERE name = ?', ('Proyecto storage',)).fetchone()[0]
+        conn.execute('INSERT INTO global_libraries (library_name, type, latest_safe_version) VALUES (?, ?, ?)',
+                     ('storage-lib', 'js', '3.5.0'))
+        global_id = conn.execute("SELECT id FROM global_libraries WHERE library_name = 'storage-lib'").fetchone()[0]
+
+        cursor = conn.cursor()
+        url = 'https://storage.example.com/'
+        scan_ids = [storage.insert_scan(cursor, url, 200, f'Escaneo {n}', '{"server": "nginx"}',
+                                        project_id=project_id, scan_date=f'2026-01-0{n + 1} 10:00:00')
+                    for n in range(2)]
+        for scan_id in scan_ids:
+            cursor.execute('''INSERT INTO libraries (scan_id, library_name, version, type, source_url, global_library_id)
+                              VALUES (?, ?, ?, ?, ?, ?)''',
+                           (scan_id, 'storage-lib', '3.4.1', 'js', url + 'lib.js', global_id))
+            cursor.execute('INSERT INTO file_urls (scan_id, file_url, file_type, file_size, status_code) VALUES (?, ?, ?, ?, ?)',
+                           (scan_id, url + 'lib.js', 'js', 1234, 200))
+            cursor.execute('''INSERT INTO version_strings (scan_id, file_url, file_type, line_number, line_content, version_keyword)
+                              VALUES (?, ?, ?, ?, ?, ?)''',
+                           (scan_id, url + 'lib.js', 'js', 1, 'v3.4.1 100%', 'version'))
+        conn.commit()
+
+        scan = storage.get_scan(conn, scan_ids[0])
+        check(scan is not None and scan['url'] == url, 'get_scan no devuelve el escaneo insertado')
+        check(scan is not None and scan['project_name'] == 'Proyecto storage', 'get_scan sin project_name')
+        check(scan is not None and str(scan['scan_date']).startswith('2026-01-01 10:00:00'),
+              f"scan_date no llega como texto: {scan['scan_date'] if scan else None!r}")
+
+        libraries = storage.libraries_for_scan(conn, scan_ids[0])
+        check(len(libraries) == 1 and libraries[0]['gl_latest_safe_version'] == '3.5.0',
+              'libraries_for_scan sin los datos del catálogo global')
+        check(len(storage.file_urls_for_scan(conn, scan_ids[0])) == 1, 'file_urls_for_scan')
+        version_strings = storage.version_strings_for_scan(conn, scan_ids[0])
+        check(len(version_strings) == 1 and version_strings[0]['line_content'] == 'v3.4.1 100%',
+              'version_strings_for_scan')
+        check([row['id'] for row in storage.scans_for_url(conn, url)] == scan_ids, 'scans_for_url fuera de orden')
+
+        # Página de detalle en una consulta (agregación JSON y funciones de ventana)
+        cursor.execute('''INSERT INTO version_strings (scan_id, file_url, file_type, line_number, line_content, version_keyword)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       (scan_ids[1], url + 'lib.js', 'js', 7, '@version 3.4.1', 'version'))
+        conn.commit()
+        detail = storage.scan_detail(conn, scan_ids[1])
+        check(detail is not None and detail['scan']['project_name'] == 'Proyecto storage', 'scan_detail sin el escaneo')
+        check(detail is not None and [lib['gl_latest_safe_version'] for lib in detail['libraries']] == ['3.5.0'],
+              'scan_detail sin los datos del catálogo global')
+        check(detail is not None and [f['file_size'] for f in detail['file_urls']] == [1234], 'scan_detail sin archivos')
+        groups = detail['version_strings'] if detail else []
+        check(len(groups) == 1 and groups[0]['lines_count'] == 2
+              and [line['line_number'] for line in groups[0]['lines']] == [1, 7]
+              and groups[0]['all_ids'][0] == groups[0]['id'],
+              f'scan_detail agrupa mal las version strings: {groups}')
+        check(detail is not None and detail['navigation'] == {'current_position': 2, 'total_scans': 2,
+                                                               'previous_scan_id': scan_ids[0], 'next_scan_id': None},
+              f"scan_detail navegación: {detail['navigation'] if detail else None}")
+        check(storage.scan_detail(conn, -1) is None, 'scan_detail de un escaneo inexistente')
+
+        listing = {row['id']: row['library_count'] for row in storage.list_scans_with_library_counts(conn)}
+        check(listing.get(scan_ids[1]) == 1, 'list_scans_with_library_counts')
+        check(any(row['name'] == 'Proyecto storage' for row in storage.active_projects(conn)), 'active_projects')
+        check(any(row['library_name'] == 'storage-lib' for row in storage.list_global_libraries(conn)),
+              'list_global_libraries')
+        check(storage.get_global_library(conn, global_id)['latest_safe_version'] == '3.5.0', 'get_global_library')
+
+        # Catálogo global en memoria: búsqueda por prefijo sin distinguir mayúsculas
+        catalog = global_catalog.load_global_catalog(conn)
+        check(catalog.get(global_id)['latest_safe_version'] == '3.5.0', 'GlobalCatalog.get')
+        items, total = catalog.search('STORAGE-', limit=1)
+        check(total == 1 and [item['id'] for item in items] == [global_id], f'GlobalCatalog.search: {items}')
+        check(catalog.search('storage-lib-x') == ([], 0), 'GlobalCatalog.search sin coincidencias')
+
+        # Búsqueda con LIKE: en PostgreSQL se traduce a ILIKE (igual que SQLite con ASCII)
+        found = conn.execute('SELECT COUNT(*) FROM scans WHERE url LIKE ?', ('%STORAGE.example%',)).fetchone()[0]
+        check(found == 2, f'LIKE distingue mayúsculas ({found} de 2)')
+
+        check(storage.get_scan_reviewed(conn, scan_ids[0]) == 0, 'get_scan_reviewed inicial')
+        storage.set_scan_reviewed(conn, scan_ids[0], 1)
+        conn.commit()
+        check(storage.get_scan_reviewed(conn, scan_ids[0]) == 1, 'set_scan_reviewed')
+        check(storage.get_scan_reviewed(conn, -1) is None, 'get_scan_reviewed de un escaneo inexistente')
+
+        storage.record_action(conn, user_id=0, username='test', user_role='system', action_type='DELETE',
+                              target_table='scans', target_id=scan_ids[0], success=True)
+        conn.commit()
+        action = conn.execute('SELECT success, timestamp FROM action_history WHERE username = ? AND target_id = ?',
+                              ('test', scan_ids[0])).fetchone()
+        check(action is not None and action['success'] == 1 and len(str(action['timestamp'])) == 19,
+              f'record_action: {tuple(action) if action else None}')
+
+        stats = storage.library_stats(conn)
+        check(stats['overview']['total_scans'] >= 2, 'library_stats')
+
+        deleted = storage.delete_scans(conn, scan_ids)
+        conn.commit()
+        check(deleted == 2, f'delete_scans borró {deleted} escaneos')
+        check(storage.get_scan(conn, scan_ids[0]) is None, 'el escaneo sigue después de delete_scans')
+        check(conn.execute('SELECT COUNT(*) FROM libraries WHERE scan_id IN (?, ?)', scan_ids).fetchone()[0] == 0,
+              'delete_scans dejó librerías huérfanas')
+    finally:
+        # Limpieza (la base de PostgreSQL puede ser compartida con otras pruebas)
+        conn.rollback()
+        conn.execute("DELETE FROM action_history WHERE username = 'test'")
+        conn.execute("DELETE FROM global_libraries WHERE library_name = 'storage-lib'")
+        conn.execute("DELETE FROM projects WHERE name = 'Proyecto storage'")
+        conn.commit()
+        conn.close()
+    return failures
+
+
+def test_translate_sql():
+    """Traducción de consultas SQLite a PostgreSQL"""
+    cases = [
+        ('SELECT * FROM scans WHERE id = ?', True, 'SELECT * FROM scans WHERE id = %s'),
+        ("SELECT '?' FROM scans WHERE title = ?", True, "SELECT '?' FROM scans WHERE title = %s"),
+        ("SELECT * FROM file_urls WHERE file_url LIKE '%/vendor.%'", False,
+         "SELECT * FROM file_urls WHERE file_url ILIKE '%/vendor.%'"),
+        ("SELECT * FROM scans WHERE url LIKE ? AND title = '%x'", True,
+         "SELECT * FROM scans WHERE url ILIKE %s AND title = '%%x'"),
+        ('SELECT GROUP_CONCAT(DISTINCT version) FROM libraries', False,
+         "SELECT STRING_AGG(DISTINCT CAST(version AS TEXT), ',') FROM libraries"),
+        ("SELECT GROUP_CONCAT(DISTINCT l.library_name || '|' || COALESCE(l.version, ''), ';') FROM libraries l", False,
+         "SELECT STRING_AGG(DISTINCT CAST(l.library_name || '|' || COALESCE(l.version, '') AS TEXT), ';') FROM libraries l"),
+        ('INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)', True,
+         'INSERT INTO users (username, password) VALUES (%s, %s) ON CONFLICT DO NOTHING'),
+        ('INSERT OR REPLACE INTO scan_metrics (scan_id, total_ms) VALUES (?, ?)', True,
+         'INSERT INTO scan_metrics (scan_id, total_ms) VALUES (%s, %s) '
+         'ON CONFLICT (scan_id) DO UPDATE SET total_ms = EXCLUDED.total_ms'),
+        ('UPDATE catalog_state SET updated_at = CURRENT_TIMESTAMP', False,
+         'UPDATE catalog_state SET updated_at = CURRENT_TIMESTAMP(0)'),
+        ('BEGIN IMMEDIATE', False, None),
+        ('PRAGMA busy_timeout = 20000', False, None),
+    ]
+    failed = 0
+    for sql, has_params, expected in cases:
+        result = storage.translate_sql(sql, has_params)
+        if result != expected:
+            failed += 1
+            print(f"❌ {sql!r}\n   esperado: {expected!r}\n   obtenido: {result!r}")
+    print(f"{'✅' if not failed else '❌'} translate_sql: {len(cases) - failed}/{len(cases)} casos")
+    assert failed == 0, f'translate_sql: {failed} de {len(cases)} casos fallaron'
+
+
+def test_sqlite_pool():
+    """El pool reutiliza conexiones, revierte lo no confirmado y descarta las de un archivo reemplazado"""
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-storage-')
+    try:
+        backend = storage.SQLiteStorage(os.path.join(workdir, 'pool.db'), pool_size=2)
+        conn = backend.connect()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.execute('INSERT INTO t VALUES (1)')      # sin commit
+        conn.close()
+        conn.close()                                   # un segundo close() no la duplica en el pool
+
+        again = backend.connect()
+        other = backend.connect()
+        ok = again is conn and other is not conn
+        ok = ok and again.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+        ok = ok and isinstance(again.execute('SELECT 1 AS one').fetchone(), sqlite3.Row)
+        again.close()
+        other.close()
+
+        # Base reemplazada (reset-database, restauración de un respaldo)
+        os.remove(backend.path)
+        os.remove(backend.path + '-wal') if os.path.exists(backend.path + '-wal') else None
+        fresh = backend.connect()
+        ok = ok and fresh is not conn
+        ok = ok and fresh.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 't'").fetchone()[0] == 0
+        fresh.close()
+        backend.close_all()
+        print(f"{'✅' if ok else '❌'} Pool SQLite: {backend.stats()}")
+        assert ok, f'pool SQLite: {backend.stats()}'
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_sqlite_repository():
+    """Repositorio sobre una base SQLite recién creada por init_database"""
+    import dashboard
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-storage-')
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        dashboard.init_database()
+        backend = storage.SQLiteStorage('analysis.db')
+        failures = exercise_repository(backend)
+        backend.close_all()
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"❌ SQLite: {failure}")
+    print(f"{'✅' if not failures else '❌'} Repositorio SQLite")
+    assert not failures, '; '.join(failures)
+
+
+def test_postgres_repository():
+    """Repositorio sobre PostgreSQL (TEST_POSTGRES_DSN)"""
+    dsn = os.environ.get('TEST_POSTGRES_DSN')
+    if not dsn:
+        print("⏭️  PostgreSQL omitido: define TEST_POSTGRES_DSN con una base desechable")
+        return
+    assert storage.PSYCOPG2_AVAILABLE, 'TEST_POSTGRES_DSN definido pero psycopg2 no está instalado'
+    backend = storage.PostgresStorage(dsn, pool_size=2)
+    try:
+        backend.ensure_schema()
+        failures = exercise_repository(backend)
+        conn = backend.connect()
+        try:
+            conn.create_function('has_vulnerability', 2, max)
+            failures.append('create_function no falla en PostgreSQL')
+        except NotImplementedError:
+            pass
+        finally:
+            conn.close()
+    finally:
+        backend.close_all()
+    for failure in failures:
+        print(f"❌ PostgreSQL: {failure}")
+    print(f"{'✅' if not failures else '❌'} Repositorio PostgreSQL")
+    assert not failures, '; '.join(failures)
+
+
+def test_migration_transform():
+    """Conversión de tipos laxos de SQLite y formato texto de COPY del migrador"""
+    try:
+        import migrate_to_postgresql as migrator
+    except ImportError as e:
+        print(f"⏭️  Migrador omitido: {e}")
+        return
+
+    plan = migrator.TablePlan('t', ['id', 'n', 'ts', 'body'], {
+        'id': 'integer', 'n': 'integer', 'ts': 'timestamp without time zone', 'body': 'text'})
+    counters = {'coerced': 0}
+    rows = [(1, 1, '3.0', '2026-01-01T10:00:00Z', 'a\tb\\c\nd\x00'),
+            (2, 2, 'abc', 'no es fecha', 42),
+            (3, 3, None, '2026-01-01 10:00:00.120', None)]
+    values = list(migrator.DatabaseMigrator(dsn='dbname=unused').transform_row_data(plan, rows, counters))
+    lines = b''.join(migrator.copy_line(row, plan.formatters) for row in values)
+
+    ok = values == [(1, 3, '2026-01-01 10:00:00', 'a\tb\\c\nd'),
+                    (2, None, None, '42'),
+                    (3, None, '2026-01-01 10:00:00.120000', None)]
+    ok = ok and counters['coerced'] == 2
+    ok = ok and lines.split(b'\n')[0] == b'1\t3\t2026-01-01 10:00:00\ta\\tb\\\\c\\nd'
+    ok = ok and lines.split(b'\n')[2] == b'3\t\\N\t2026-01-01 10:00:00.120000\t\\N'
+
+    # El checksum no depende del orden de las filas
+    first, second = migrator.RowChecksum(), migrator.RowChecksum()
+    for row in values:
+        first.add(row, plan.canonical)
+    for row in reversed(values):
+        second.add(row, plan.canonical)
+    ok = ok and first.hexdigest == second.hexdigest and first.rows == 3
+    print(f"{'✅' if ok else '❌'} Transformación del migrador")
+    assert ok, f'transformación del migrador: {values}'
+
+
+def test_postgres_migration():
+    """Migración SQLite → PostgreSQL, reanudación y verificación (TEST_POSTGRES_DSN)"""
+    dsn = os.environ.get('TEST_POSTGRES_DSN')
+    if not dsn or not storage.PSYCOPG2_AVAILABLE:
+        print("⏭️  Migración a PostgreSQL omitida: define TEST_POSTGRES_DSN con una base desechable")
+        return
+    import dashboard
+    import migrate_to_postgresql as migrator
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-storage-')
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        dashboard.init_database()
+        conn = sqlite3.connect('analysis.db')
+        cursor = conn.cursor()
+        for n in range(120):
+            scan_id = storage.insert_scan(cursor, f'https://m{n % 7}.example/', 200, f'Sitio\t{n}', '{}')
+            cursor.execute('INSERT INTO libraries (scan_id, library_name, version, type) VALUES (?, ?, ?, ?)',
+                           (scan_id, 'jquery', f'3.{n}', 'js'))
+        # Huérfana: PostgreSQL la rechazaría por clave foránea
+        cursor.execute("INSERT INTO libraries (scan_id, library_name, type) VALUES (999999, 'huérfana', 'js')")
+        conn.commit()
+        conn.close()
+
+        first = migrator.DatabaseMigrator('analysis.db', dsn=dsn, chunk_size=25, jobs=3)
+        ok = first.run_migration(reset=True)
+        # Segunda ejecución: todas las tablas tienen su checkpoint completo
+        second = migrator.DatabaseMigrator('analysis.db', dsn=dsn, chunk_size=25, jobs=3)
+        ok = ok and second.run_migration() and second.stats['total_records'] == 0
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"{'✅' if ok else '❌'} Migración a PostgreSQL")
+    assert ok, 'migración a PostgreSQL'
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de storage.py...\n")
+    results = {
+        'translate_sql': run(test_translate_sql),
+        'Pool SQLite': run(test_sqlite_pool),
+        'Repositorio SQLite': run(test_sqlite_repository),
+        'Repositorio PostgreSQL': run(test_postgres_repository),
+        'Transformación del migrador': run(test_migration_transform),
+        'Migración a PostgreSQL': run(test_postgres_migration),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
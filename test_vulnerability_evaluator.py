@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de vulnerability_evaluator.py: la evaluación vectorizada equivale a has_vulnerability
+
+    python test_vulnerability_evaluator.py
+    python -m pytest -q test_vulnerability_evaluator.py
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import storage
+import vulnerability_evaluator as ve
+
+EDGE_CASES = [
+    ('3.4.1', '3.5.0'), ('3.5.0', '3.5.0'), ('3.5', '3.5.0'), ('3.5.0.1', '3.5'),
+    ('v3.4.1', '3.5.0'), ('3.4.1-beta', '3.4.1'), ('1.10.0', '1.9.9'), ('2', '10'),
+    ('', '1.0.0'), (None, '1.0.0'), ('1.0.0', ''), ('1.0.0', None), (None, None),
+    ('abc', '1.0.0'), ('1.0.0', 'latest'), ('..', '0.0.1'),
+    ('1.99999999999999999999999', '1.2'), ('1.2', '1.99999999999999999999999'),
+    ('99999999999999999999999.1', '99999999999999999999999.2'),
+]
+
+
+def random_version(rng):
+    """Versiones como las que llegan de los escáneres: prefijos, sufijos y largos distintos"""
+    parts = '.'.join(str(rng.choice([0, 1, 2, 9, 10, 11, 100])) for _ in range(rng.randint(1, 4)))
+    return rng.choice(['', 'v', 'V ']) + parts + rng.choice(['', '', '-rc1', '.min', 'b'])
+
+
+def test_matches_has_vulnerability():
+    """Mismo resultado que dashboard.has_vulnerability en casos borde y versiones aleatorias"""
+    from dashboard import has_vulnerability
+
+    rng = random.Random(7)
+    pairs = EDGE_CASES + [(random_version(rng), random_version(rng)) for _ in range(2000)]
+    flags = ve.evaluate_vulnerabilities([current for current, _ in pairs], [safe for _, safe in pairs])
+    mismatches = [(current, safe, bool(flag)) for (current, safe), flag in zip(pairs, flags)
+                  if bool(flag) != has_vulnerability(current, safe)]
+    print(f"{'✅' if not mismatches else '❌'} evaluate_vulnerabilities igual a has_vulnerability en {len(pairs)} pares")
+    assert not mismatches, f'diferencias (actual, segura, vectorizado): {mismatches[:5]}'
+
+
+@contextmanager
+def library_database():
+    """Conexión a una base temporal recién creada por init_database"""
+    import dashboard
+
+    workdir = tempfile.mkdtemp(prefix='js-analyzer-vulnerability-')
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        dashboard.init_database()
+        conn = sqlite3.connect('analysis.db')
+        yield conn
+        conn.close()
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_reevaluate_updates_only_changes():
+    """La versión segura individual tiene prioridad, solo se escriben cambios y cada alcance se respeta"""
+    failures = []
+    with library_database() as conn:
+        conn.execute("INSERT INTO global_libraries (library_name, type, latest_safe_version) VALUES ('jquery', 'js', '3.5.0')")
+        conn.execute("INSERT INTO global_libraries (library_name, type, latest_safe_version) VALUES ('lodash', 'js', '4.17.21')")
+        jquery, lodash = [row[0] for row in conn.execute('SELECT id FROM global_libraries ORDER BY id')]
+        scans = [storage.insert_scan(conn.cursor(), f'https://vuln{n}.example/', 200, 'Sitio', '{}') for n in range(2)]
+        rows = {
+            # nombre: (scan, versión, segura individual, librería global)
+            'global': (scans[0], '3.4.1', None, jquery),             # vulnerable por la global
+            'individual': (scans[0], '3.4.1', '3.0.0', jquery),      # la individual manda: no vulnerable
+            'vacia': (scans[0], '3.4.1', '', jquery),                # '' cuenta como sin individual
+            'sin_segura': (scans[0], '1.0.0', None, None),
+            'lodash': (scans[1], '4.17.20', None, lodash),
+        }
+        for name, (scan_id, version, safe, global_id) in rows.items():
+            conn.execute('''INSERT INTO libraries (scan_id, library_name, version, type, latest_safe_version,
+                            global_library_id) VALUES (?, ?, ?, 'js', ?, ?)''',
+                         (scan_id, name, version, safe, global_id))
+        conn.commit()
+        # libraries es una vista: los ids se leen por nombre (lastrowid no funciona)
+        ids = dict(conn.execute('SELECT library_name, id FROM libraries'))
+
+        def flags():
+            return {name: conn.execute('SELECT is_vulnerable FROM libraries WHERE id = ?', (ids[name],)).fetchone()[0]
+                    for name in ids}
+
+        stats = ve.reevaluate_library_vulnerabilities(conn)
+        expected = {'global': 1, 'individual': 0, 'vacia': 1, 'sin_segura': 0, 'lodash': 1}
+        if flags() != expected or stats['evaluated'] != 5 or stats['vulnerable'] != 3:
+            failures.append(f'evaluación completa: {flags()} {stats}')
+        if ve.reevaluate_library_vulnerabilities(conn)['updated'] != 0:
+            failures.append('una segunda evaluación sin cambios escribió filas')
+
+        # Editar la versión segura del catálogo re-evalúa solo sus librerías
+        conn.execute("UPDATE global_libraries SET latest_safe_version = '3.4.0' WHERE id = ?", (jquery,))
+        conn.execute("UPDATE libraries SET version = '4.17.21' WHERE id = ?", (ids['lodash'],))
+        stats = ve.reevaluate_library_vulnerabilities(conn, global_library_id=jquery)
+        if stats['evaluated'] != 3 or flags() != dict(expected, **{'global': 0, 'vacia': 0}):
+            failures.append(f'alcance global_library_id: {flags()} {stats}')
+
+        stats = ve.reevaluate_library_vulnerabilities(conn, scan_id=scans[1])
+        if stats['evaluated'] != 1 or flags()['lodash'] != 0:
+            failures.append(f'alcance scan_id: {flags()} {stats}')
+
+        conn.execute("UPDATE libraries SET version = '0.1' WHERE id IN (?, ?)", (ids['global'], ids['sin_segura']))
+        stats = ve.reevaluate_library_vulnerabilities(conn, library_ids=[ids['global'], ids['sin_segura']])
+        if stats != dict(stats, evaluated=2, vulnerable=1, updated=1) or flags()['global'] != 1:
+            failures.append(f'alcance library_ids: {flags()} {stats}')
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} reevaluate_library_vulnerabilities sobre la base")
+    assert not failures, '; '.join(failures)
+
+
+def run(test) -> bool:
+    """Ejecuta una prueba fuera de pytest: True si no falla ninguna aserción"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("🧪 Iniciando pruebas de vulnerability_evaluator.py...\n")
+    results = {
+        'Equivalencia con has_vulnerability': run(test_matches_has_vulnerability),
+        'Re-evaluación en la base': run(test_reevaluate_updates_only_changes),
+    }
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE PRUEBAS")
+    print("=" * 50)
+    for name, passed in results.items():
+        print(f"{name}: {'✅ PASÓ' if passed else '❌ FALLÓ'}")
+    if not all(results.values()):
+        raise SystemExit(1)
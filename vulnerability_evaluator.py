@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Re-evaluación masiva y vectorizada del estado de vulnerabilidad de librerías
+Compara versiones con NumPy en lugar de llamar has_vulnerability fila por fila
+"""
+
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+_NON_VERSION_CHARS = re.compile(r'[^0-9\.]')
+_INT64_MAX = np.iinfo(np.int64).max
+
+# Ids por consulta al re-evaluar filas puntuales (bajo el límite de variables de SQLite)
+ID_BATCH_SIZE = 500
+
+
+def parse_version_parts(version) -> Optional[List[int]]:
+    """
+    Descompone una versión en enteros con las mismas reglas que compare_versions
+    Retorna None para versiones vacías (no comparables)
+    """
+    if not version:
+        return None
+    clean = _NON_VERSION_CHARS.sub('', str(version))
+    return [int(x) for x in clean.split('.') if x.isdigit()]
+
+
+def encode_versions(versions: Iterable) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convierte una secuencia de versiones en una matriz de claves comparables
+
+    Las versiones se factorizan primero, por lo que cada string distinto se
+    parsea una sola vez aunque aparezca en millones de filas.
+
+    Returns:
+        keys: matriz int64 (n, ancho) rellenada con ceros a la derecha
+        present: bool (n,) False cuando la versión está vacía
+        overflow: bool (n,) True cuando algún componente no cabe en int64
+    """
+    values = list(versions)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    codes, uniques = pd.factorize(array, use_na_sentinel=True)
+
+    parsed = [parse_version_parts(value) for value in uniques]
+    width = max([len(parts) for parts in parsed if parts] or [1])
+
+    unique_keys = np.zeros((len(uniques) + 1, width), dtype=np.int64)
+    unique_present = np.zeros(len(uniques) + 1, dtype=bool)
+    unique_overflow = np.zeros(len(uniques) + 1, dtype=bool)
+
+    for i, parts in enumerate(parsed):
+        if parts is None:
+            continue
+        unique_present[i] = True
+        if any(part > _INT64_MAX for part in parts):
+            unique_overflow[i] = True
+            continue
+        unique_keys[i, :len(parts)] = parts
+
+    # El código -1 (NULL) apunta a la última fila, vacía y no presente
+    codes = np.where(codes < 0, len(uniques), codes)
+    return unique_keys[codes], unique_present[codes], unique_overflow[codes]
+
+
+def _pad_columns(keys: np.ndarray, width: int) -> np.ndarray:
+    if keys.shape[1] >= width:
+        return keys
+    return np.pad(keys, ((0, 0), (0, width - keys.shape[1])))
+
+
+def compare_version_arrays(current_keys: np.ndarray, safe_keys: np.ndarray) -> np.ndarray:
+    """
+    Comparación lexicográfica vectorizada fila a fila
+    Retorna un arreglo int8 con -1, 0 o 1, equivalente a compare_versions
+    """
+    width = max(current_keys.shape[1], safe_keys.shape[1])
+    current_keys = _pad_columns(current_keys, width)
+    safe_keys = _pad_columns(safe_keys, width)
+
+    diff = np.sign(current_keys - safe_keys).astype(np.int8)
+    nonzero = diff != 0
+    first_diff = nonzero.argmax(axis=1)
+    result = diff[np.arange(len(diff)), first_diff]
+    result[~nonzero.any(axis=1)] = 0
+    return result
+
+
+def evaluate_vulnerabilities(current_versions, safe_versions) -> np.ndarray:
+    """
+    Versión vectorizada de has_vulnerability(current, safe)
+    safe_versions debe contener ya la versión segura efectiva (individual o global)
+    """
+    current_versions = list(current_versions)
+    safe_versions = list(safe_versions)
+
+    current_keys, current_present, current_overflow = encode_versions(current_versions)
+    safe_keys, safe_present, safe_overflow = encode_versions(safe_versions)
+
+    vulnerable = (compare_version_arrays(current_keys, safe_keys) < 0) & current_present & safe_present
+
+    # Componentes gigantes (> int64) se resuelven con enteros de Python
+    for i in np.flatnonzero(current_overflow | safe_overflow):
+        current_parts = parse_version_parts(current_versions[i])
+        safe_parts = parse_version_parts(safe_versions[i])
+        if current_parts is None or safe_parts is None:
+            vulnerable[i] = False
+            continue
+        max_len = max(len(current_parts), len(safe_parts))
+        current_parts += [0] * (max_len - len(current_parts))
+        safe_parts += [0] * (max_len - len(safe_parts))
+        vulnerable[i] = current_parts < safe_parts
+
+    return vulnerable
+
+
+def ensure_vulnerability_column(conn: sqlite3.Connection):
+    """Agrega libraries.is_vulnerable si la base de datos aún no la tiene"""
+    try:
+        conn.execute("SELECT is_vulnerable FROM libraries LIMIT 1")
+    except sqlite3.OperationalError:
+        conn.execute("ALTER TABLE libraries ADD COLUMN is_vulnerable INTEGER")
+        conn.commit()
+
+
+def reevaluate_library_vulnerabilities(conn: sqlite3.Connection,
+                                       global_library_id: Optional[int] = None,
+                                       scan_id: Optional[int] = None,
+                                       library_ids: Optional[Sequence[int]] = None,
+                                       commit: bool = True) -> Dict:
+    """
+    Recalcula libraries.is_vulnerable para todo el historial (o solo para las
+    filas asociadas a global_library_id, las de un escaneo o las de library_ids)
+    y escribe los cambios en un único executemany
+
+    La versión segura efectiva sigue la misma regla que la vista de escaneo:
+    primero la individual de la librería y luego la del catálogo global.
+    Con commit=False los cambios quedan en la transacción del llamador (al
+    guardar un escaneo o editar una librería).
+    """
+    start_time = time.time()
+    ensure_vulnerability_column(conn)
+
+    query = '''
+        SELECT l.id,
+               l.version,
+               COALESCE(NULLIF(l.latest_safe_version, ''), gl.latest_safe_version) AS safe_version,
+               l.is_vulnerable
+        FROM libraries l
+        LEFT JOIN global_libraries gl ON l.global_library_id = gl.id
+    '''
+    if library_ids is not None:
+        library_ids = list(library_ids)
+        rows = []
+        for start in range(0, len(library_ids), ID_BATCH_SIZE):
+            batch = library_ids[start:start + ID_BATCH_SIZE]
+            rows += conn.execute(query + f" WHERE l.id IN ({','.join('?' * len(batch))})", batch).fetchall()
+    elif scan_id is not None:
+        rows = conn.execute(query + ' WHERE l.scan_id = ?', (scan_id,)).fetchall()
+    elif global_library_id is not None:
+        rows = conn.execute(query + ' WHERE l.global_library_id = ?', (global_library_id,)).fetchall()
+    else:
+        rows = conn.execute(query).fetchall()
+    if not rows:
+        return {'evaluated': 0, 'vulnerable': 0, 'updated': 0, 'elapsed': time.time() - start_time}
+
+    ids, current_versions, safe_versions, stored_flags = zip(*rows)
+    ids = np.fromiter(ids, dtype=np.int64, count=len(rows))
+    stored = np.fromiter((-1 if flag is None else flag for flag in stored_flags),
+                         dtype=np.int64, count=len(rows))
+
+    flags = evaluate_vulnerabilities(current_versions, safe_versions).astype(np.int64)
+    changed = flags != stored
+
+    conn.executemany(
+        "UPDATE libraries SET is_vulnerable = ? WHERE id = ?",
+        zip(flags[changed].tolist(), ids[changed].tolist())
+    )
+    if commit:
+        conn.commit()
+
+    return {
+        'evaluated': len(rows),
+        'vulnerable': int(flags.sum()),
+        'updated': int(changed.sum()),
+        'elapsed': time.time() - start_time
+    }
+
+
+def main():
+    """Backfill completo de libraries.is_vulnerable sobre analysis.db"""
+    conn = sqlite3.connect('analysis.db', timeout=60.0)
+    try:
+        print("🔄 Re-evaluando vulnerabilidades de todas las librerías...")
+        result = reevaluate_library_vulnerabilities(conn)
+        print(f"✅ {result['evaluated']} librerías evaluadas, "
+              f"{result['vulnerable']} vulnerables, {result['updated']} actualizadas "
+              f"en {result['elapsed']:.2f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
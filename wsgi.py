@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada WSGI para producción
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+La inicialización de la base de datos corre una sola vez en el proceso maestro
+(ver on_starting en gunicorn.conf.py), no en cada worker.
+"""
+
+from dashboard import app
+
+application = app